@@ -405,6 +405,13 @@ if _role_enabled("worker"):
     except Exception as e:
         print("[bp][warn] acervo_tasks_bp:", e)
 
+    # === NOVO: Manutenção (TTL sweeper) — /tasks/ttl-sweep ===
+    try:
+        from routes.maintenance_tasks_bp import maintenance_tasks_bp
+        _register_bp(maintenance_tasks_bp, "maintenance_tasks_bp (/tasks/ttl-sweep)")
+    except Exception as e:
+        print("[bp][warn] maintenance_tasks_bp:", e)
+
     try:
         from routes.servicos_foto import servicos_foto_bp
         _register_bp(servicos_foto_bp, "servicos_foto_bp (/api/servicos/foto)")
@@ -616,6 +623,13 @@ if _role_enabled("worker"):
     except Exception as e:
         print("[bp][warn] voz_stt_bp:", e)
 
+    # Clientes Google Speech/TTS compartilhados: abre os canais gRPC no boot (thread de fundo)
+    try:
+        from services.speech_clients import warm_up_from_env
+        warm_up_from_env()
+    except Exception as e:
+        print("[boot][warn] speech_clients warm-up:", e)
+
 # =====================================
 # Health simples adicional e versão
 # =====================================
@@ -3,7 +3,7 @@
 MEI Robô — KV Cache com TTL (Firestore + memória) — V1.0
 
 Uso:
-    from cache.kv import make_key, put, get
+    from cache.kv import make_key, put, get, get_many, put_many, incr
     k = make_key(uid, intent="precos", slug="corte-masculino")
     put(uid, k, {"texto": "Corte: R$ 40"}, ttl_sec=3600)
     v = get(uid, k)  # -> {"texto": "Corte: R$ 40"} ou None se expirado
@@ -12,13 +12,24 @@ Backend:
   - Firestore quando disponível (_db_ready() = True)
       Doc: profissionais/{uid}/cache/{docId}
       Campos: value (qualquer JSON), expAt (ISO), createdAt, updatedAt
+  - Redis quando CACHE_BACKEND=redis e REDIS_URL definido
+      Chave: {CACHE_REDIS_PREFIX}:{uid}:{docId} → JSON, TTL nativo (SET EX)
+      Lote: MGET / pipeline; contadores: INCRBY/INCRBYFLOAT (incr())
+      Erro de conexão → memória (mesmo padrão do Firestore), nova tentativa após cooldown
   - Memória (processo) quando sem Firebase → TTL local
+
+L1 (processo) na frente do Firestore:
+  - get: consulta L1 antes do documento; TTL do L1 = min(CACHE_L1_TTL_SEC, expAt do L2)
+  - put: write-through (Firestore + L1); delete: invalida L1
+  - get_many/put_many: lote via get_all / WriteBatch
+  - stats(): hits/misses e hit ratio por backend (l1, firestore, redis, memory)
 """
 
 from __future__ import annotations
-from typing import Any, Optional, Dict, Tuple
+from typing import Any, Optional, Dict, List, Tuple
 from datetime import datetime, timedelta, timezone
 import threading
+import time
 import re
 import os
 import json
@@ -53,10 +64,81 @@ if _DB is None:
 
 def _db_ready() -> bool:
     """Firestore só é usado se houver client E FIREBASE_PROJECT_ID definido."""
-    if os.getenv("CACHE_BACKEND", "").lower() == "memory":
+    if os.getenv("CACHE_BACKEND", "").lower() in ("memory", "redis"):
         return False
     return (_DB is not None) and bool(os.getenv("FIREBASE_PROJECT_ID"))
 
+# ================== Redis (tolerante) ==================
+_REDIS = None
+_REDIS_DOWN_UNTIL = 0.0
+_REDIS_RETRY_SEC = float(os.getenv("CACHE_REDIS_RETRY_SEC", "30") or "30")
+_REDIS_PREFIX = (os.getenv("CACHE_REDIS_PREFIX") or "meirobo:kv").strip()
+_redis_init_lock = threading.Lock()
+
+def set_redis_client(client: Any) -> None:
+    """Injeta um client Redis (ex.: fake em testes). None → volta ao lazy por REDIS_URL."""
+    global _REDIS, _REDIS_DOWN_UNTIL
+    _REDIS = client
+    _REDIS_DOWN_UNTIL = 0.0
+
+def _redis_client():
+    global _REDIS
+    if _REDIS is not None:
+        return _REDIS
+    url = (os.getenv("REDIS_URL") or "").strip()
+    if not url:
+        return None
+    with _redis_init_lock:
+        if _REDIS is None:
+            import redis  # type: ignore
+            _REDIS = redis.from_url(
+                url,
+                decode_responses=True,
+                socket_timeout=float(os.getenv("CACHE_REDIS_TIMEOUT_SEC", "0.5") or "0.5"),
+                socket_connect_timeout=float(os.getenv("CACHE_REDIS_TIMEOUT_SEC", "0.5") or "0.5"),
+            )
+    return _REDIS
+
+def _redis_ready() -> bool:
+    """Redis só quando CACHE_BACKEND=redis, com client disponível e fora do cooldown de erro."""
+    if os.getenv("CACHE_BACKEND", "").lower() != "redis":
+        return False
+    if _REDIS_DOWN_UNTIL and time.time() < _REDIS_DOWN_UNTIL:
+        return False
+    try:
+        return _redis_client() is not None
+    except Exception as e:
+        _redis_failed("init", e)
+        return False
+
+def _redis_outage(e: Exception) -> bool:
+    """Conexão/timeout = backend fora; ResponseError (WRONGTYPE, valor não numérico...) é erro de dado."""
+    if isinstance(e, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        from redis.exceptions import ConnectionError as _RConnErr, TimeoutError as _RTimeout  # type: ignore
+    except Exception:
+        return False
+    return isinstance(e, (_RConnErr, _RTimeout))
+
+def _redis_failed(op: str, e: Exception) -> None:
+    global _REDIS_DOWN_UNTIL
+    _REDIS_DOWN_UNTIL = time.time() + _REDIS_RETRY_SEC
+    logging.info("[cache.kv][%s] redis indisponível, fallback to memory: %s", op, e)
+
+def _rkey(uid: str, doc_id: str) -> str:
+    return f"{_REDIS_PREFIX}:{uid}:{doc_id}"
+
+def _rdecode(raw: Any) -> Optional[Any]:
+    if raw is None:
+        return None
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8", errors="ignore")
+    try:
+        return json.loads(raw)
+    except Exception:
+        return None
+
 # ================== Chaves ==================
 _DOC_ID_MAX = 1400  # margem para limites do Firestore
 
@@ -84,54 +166,105 @@ def make_key(uid: str, intent: str, slug: str) -> str:
     return _sanitize_doc_id(f"{_norm(uid)}::{_norm(intent)}::{_norm(slug)}")
 
 # ================== Memória (fallback) ==================
-_mem: Dict[str, Tuple[Any, float]] = {}
-_mem_lock = threading.Lock()
-_MEM_MAX = 5000  # limite simples
+try:
+    from cache.lru import LRUCache  # type: ignore
+except Exception:  # pragma: no cover - import relativo (pacote)
+    from .lru import LRUCache  # type: ignore
+
+_MEM_MAX = int(os.getenv("CACHE_MEM_MAX", "5000") or "5000")
+_MEM_MAX_BYTES = int(os.getenv("CACHE_MEM_MAX_BYTES", str(64 * 1024 * 1024)) or "0")
+_mem = LRUCache(max_items=_MEM_MAX, max_bytes=_MEM_MAX_BYTES, name="cache.kv.memory")
+_MISSING = object()
 
 def _mem_put(doc_id: str, value: Any, ttl_sec: int) -> bool:
-    exp_ts = (_now_utc() + timedelta(seconds=max(1, int(ttl_sec)))).timestamp()
-    with _mem_lock:
-        if len(_mem) >= _MEM_MAX:
-            # política simples: drop de itens expirados, senão FIFO
-            expired = [k for k, (_, ts) in _mem.items() if ts <= _now_utc().timestamp()]
-            for k in expired[:1000]:
-                _mem.pop(k, None)
-            if len(_mem) >= _MEM_MAX:
-                # remove um item arbitrário
-                _mem.pop(next(iter(_mem)), None)
-        _mem[doc_id] = (value, exp_ts)
+    _mem.set(doc_id, value, ttl=max(1, int(ttl_sec)))
     return True
 
 def _mem_get(doc_id: str) -> Optional[Any]:
-    with _mem_lock:
-        row = _mem.get(doc_id)
-        if not row:
-            return None
-        value, exp_ts = row
-        if exp_ts <= _now_utc().timestamp():
-            _mem.pop(doc_id, None)
-            return None
-        return value
+    return _mem.get(doc_id)
 
 def _mem_del(doc_id: str) -> bool:
-    with _mem_lock:
-        return _mem.pop(doc_id, None) is not None
+    return _mem.pop(doc_id, _MISSING) is not _MISSING
 
 def _mem_cleanup(limit: int = 200) -> int:
-    removed = 0
-    now_ts = _now_utc().timestamp()
-    with _mem_lock:
-        for k in list(_mem.keys())[: max(10, limit)]:
-            _, exp_ts = _mem.get(k, (None, 0))
-            if exp_ts <= now_ts:
-                _mem.pop(k, None)
-                removed += 1
-    return removed
+    return _mem.sweep(limit=max(10, limit))
+
+# ================== L1 (processo, na frente do Firestore) ==================
+_L1_TTL_SEC = int(os.getenv("CACHE_L1_TTL_SEC", "30") or "30")
+_L1_MAX = int(os.getenv("CACHE_L1_MAX", "2000") or "2000")
+_l1 = LRUCache(max_items=_L1_MAX, max_bytes=_MEM_MAX_BYTES // 4, name="cache.kv.l1")
+
+def _l1_put(uid: str, doc_id: str, value: Any, exp_ts: float) -> None:
+    """exp_ts em epoch (expAt do L2); o L1 guarda no relógio monotônico, limitado a _L1_TTL_SEC."""
+    if _L1_TTL_SEC <= 0:
+        return
+    ttl = min(float(_L1_TTL_SEC), exp_ts - _now_utc().timestamp())
+    if ttl <= 0:
+        return
+    _l1.set((uid, doc_id), value, ttl=ttl)
+
+def _l1_get(uid: str, doc_id: str) -> Tuple[bool, Any]:
+    value = _l1.get((uid, doc_id), _MISSING)
+    if value is _MISSING:
+        return False, None
+    return True, value
+
+def _l1_del(uid: str, doc_id: str) -> None:
+    _l1.pop((uid, doc_id), None)
+
+# ================== Métricas ==================
+_stats: Dict[str, Dict[str, int]] = {
+    "l1": {"hits": 0, "misses": 0},
+    "firestore": {"hits": 0, "misses": 0},
+    "redis": {"hits": 0, "misses": 0},
+    "memory": {"hits": 0, "misses": 0},
+}
+_stats_lock = threading.Lock()
+
+def _count(backend: str, hit: bool, n: int = 1) -> None:
+    with _stats_lock:
+        row = _stats.setdefault(backend, {"hits": 0, "misses": 0})
+        row["hits" if hit else "misses"] += n
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    """Snapshot de hits/misses e hit ratio por backend."""
+    out: Dict[str, Dict[str, Any]] = {}
+    with _stats_lock:
+        for backend, row in _stats.items():
+            total = row["hits"] + row["misses"]
+            out[backend] = {
+                "hits": row["hits"],
+                "misses": row["misses"],
+                "hit_ratio": round(row["hits"] / total, 4) if total else 0.0,
+            }
+    out["l1"]["size"] = len(_l1)
+    out["l1"]["lru"] = _l1.stats()
+    out["memory"]["lru"] = _mem.stats()
+    return out
 
 # ================== Firestore helpers ==================
+_BATCH_MAX = 400  # limite 500 por WriteBatch; 400 dá folga
+
 def _cache_doc(uid: str, doc_id: str):
     return _DB.collection(f"profissionais/{uid}/cache").document(doc_id)
 
+def _parse_exp(exp_s: Any) -> Optional[datetime]:
+    if not exp_s:
+        return None
+    try:
+        return datetime.fromisoformat(str(exp_s).replace("Z", "+00:00"))
+    except Exception:
+        return None
+
+def _body(value: Any, ttl_sec: int) -> Dict[str, Any]:
+    now = _now_utc()
+    return {
+        "value": value,
+        "expAt": _iso(now + timedelta(seconds=max(1, int(ttl_sec)))),
+        "createdAt": _iso(now),
+        "updatedAt": _iso(now),
+    }
+
 # ================== API pública ==================
 def put(uid: str, key: str, value: Any, ttl_sec: int = 3600) -> bool:
     """
@@ -142,20 +275,24 @@ def put(uid: str, key: str, value: Any, ttl_sec: int = 3600) -> bool:
         return False
     doc_id = _sanitize_doc_id(key)
 
+    if _redis_ready():
+        try:
+            _redis_client().set(_rkey(uid, doc_id), json.dumps(value, ensure_ascii=False), ex=max(1, int(ttl_sec)))
+            return True
+        except Exception as e:
+            _redis_failed("put", e)
+            return _mem_put(doc_id, value, ttl_sec)
+
     if not _db_ready():
         return _mem_put(doc_id, value, ttl_sec)
 
     try:
-        now = _now_utc()
-        body = {
-            "value": value,
-            "expAt": _iso(now + timedelta(seconds=max(1, int(ttl_sec)))),
-            "createdAt": _iso(now),
-            "updatedAt": _iso(now),
-        }
+        body = _body(value, ttl_sec)
         _cache_doc(uid, doc_id).set(body)
+        _l1_put(uid, doc_id, value, _parse_exp(body["expAt"]).timestamp())
         return True
     except Exception as e:
+        _l1_del(uid, doc_id)
         logging.info("[cache.kv][put] fallback to memory: %s", e)
         return _mem_put(doc_id, value, ttl_sec)
 
@@ -168,42 +305,71 @@ def get(uid: str, key: str) -> Optional[Any]:
         return None
     doc_id = _sanitize_doc_id(key)
 
+    if _redis_ready():
+        try:
+            value = _rdecode(_redis_client().get(_rkey(uid, doc_id)))
+            _count("redis", value is not None)
+            return value
+        except Exception as e:
+            _redis_failed("get", e)
+            return _mem_get(doc_id)
+
     if not _db_ready():
-        return _mem_get(doc_id)
+        value = _mem_get(doc_id)
+        _count("memory", value is not None)
+        return value
+
+    hit, value = _l1_get(uid, doc_id)
+    _count("l1", hit)
+    if hit:
+        return value
 
     try:
         snap = _cache_doc(uid, doc_id).get()
-        if not getattr(snap, "exists", False):
-            return None
-        obj = snap.to_dict() or {}
-        exp_s = obj.get("expAt")
-        if not exp_s:
-            return None
-        try:
-            exp_dt = datetime.fromisoformat(str(exp_s).replace("Z", "+00:00"))
-        except Exception:
-            return None
-        if exp_dt <= _now_utc():
-            # expirado → remove
-            try:
-                _cache_doc(uid, doc_id).delete()
-            except Exception:
-                pass
-            return None
-        return obj.get("value")
+        value = _from_snapshot(uid, doc_id, snap)
+        _count("firestore", value is not None)
+        return value
     except Exception as e:
         logging.info("[cache.kv][get] fallback to memory: %s", e)
         return _mem_get(doc_id)
 
+def _from_snapshot(uid: str, doc_id: str, snap: Any) -> Optional[Any]:
+    """Valida TTL de um snapshot do L2; válido → popula L1, expirado → remove."""
+    if not getattr(snap, "exists", False):
+        return None
+    obj = snap.to_dict() or {}
+    exp_dt = _parse_exp(obj.get("expAt"))
+    if exp_dt is None:
+        return None
+    if exp_dt <= _now_utc():
+        # expirado → remove
+        try:
+            _cache_doc(uid, doc_id).delete()
+        except Exception:
+            pass
+        return None
+    value = obj.get("value")
+    _l1_put(uid, doc_id, value, exp_dt.timestamp())
+    return value
+
 def delete(uid: str, key: str) -> bool:
     uid = (uid or "").strip()
     if not uid or not key:
         return False
     doc_id = _sanitize_doc_id(key)
 
+    if _redis_ready():
+        try:
+            _redis_client().delete(_rkey(uid, doc_id))
+            return True
+        except Exception as e:
+            _redis_failed("delete", e)
+            return _mem_del(doc_id)
+
     if not _db_ready():
         return _mem_del(doc_id)
 
+    _l1_del(uid, doc_id)
     try:
         _cache_doc(uid, doc_id).delete()
         return True
@@ -211,13 +377,165 @@ def delete(uid: str, key: str) -> bool:
         logging.info("[cache.kv][delete] fallback to memory: %s", e)
         return _mem_del(doc_id)
 
+def get_many(uid: str, keys: List[str]) -> Dict[str, Any]:
+    """
+    Lê várias chaves de uma vez. Retorna {key: value} só com as encontradas (não expiradas).
+    Redis: um MGET. Firestore: L1 primeiro; faltantes num único get_all.
+    """
+    uid = (uid or "").strip()
+    keys = [k for k in (keys or []) if k]
+    if not uid or not keys:
+        return {}
+    out: Dict[str, Any] = {}
+
+    if _redis_ready():
+        doc_ids = [_sanitize_doc_id(k) for k in keys]
+        try:
+            raws = _redis_client().mget([_rkey(uid, d) for d in doc_ids])
+            for k, raw in zip(keys, raws):
+                value = _rdecode(raw)
+                _count("redis", value is not None)
+                if value is not None:
+                    out[k] = value
+            return out
+        except Exception as e:
+            _redis_failed("get_many", e)
+
+    if not _db_ready():
+        for k in keys:
+            value = _mem_get(_sanitize_doc_id(k))
+            _count("memory", value is not None)
+            if value is not None:
+                out[k] = value
+        return out
+
+    missing: Dict[str, str] = {}
+    for k in keys:
+        doc_id = _sanitize_doc_id(k)
+        hit, value = _l1_get(uid, doc_id)
+        _count("l1", hit)
+        if hit:
+            out[k] = value
+        else:
+            missing[doc_id] = k
+    if not missing:
+        return out
+
+    try:
+        refs = [_cache_doc(uid, doc_id) for doc_id in missing]
+        for snap in _DB.get_all(refs):
+            doc_id = getattr(snap, "id", None) or getattr(getattr(snap, "reference", None), "id", None)
+            if doc_id not in missing:
+                continue
+            value = _from_snapshot(uid, doc_id, snap)
+            _count("firestore", value is not None)
+            if value is not None:
+                out[missing[doc_id]] = value
+    except Exception as e:
+        logging.info("[cache.kv][get_many] fallback to memory: %s", e)
+        for doc_id, k in missing.items():
+            value = _mem_get(doc_id)
+            if value is not None:
+                out[k] = value
+    return out
+
+def put_many(uid: str, items: Dict[str, Any], ttl_sec: int = 3600) -> bool:
+    """
+    Salva vários pares {key: value} com o mesmo TTL.
+    Redis: um pipeline de SET EX. Firestore: WriteBatch em blocos de até _BATCH_MAX, write-through no L1.
+    """
+    uid = (uid or "").strip()
+    items = {k: v for k, v in (items or {}).items() if k}
+    if not uid or not items:
+        return False
+
+    if _redis_ready():
+        try:
+            pipe = _redis_client().pipeline(transaction=False)
+            for k, v in items.items():
+                pipe.set(_rkey(uid, _sanitize_doc_id(k)), json.dumps(v, ensure_ascii=False), ex=max(1, int(ttl_sec)))
+            pipe.execute()
+            return True
+        except Exception as e:
+            _redis_failed("put_many", e)
+
+    if not _db_ready():
+        for k, v in items.items():
+            _mem_put(_sanitize_doc_id(k), v, ttl_sec)
+        return True
+
+    try:
+        batch = _DB.batch()
+        pending = []
+        for k, v in items.items():
+            doc_id = _sanitize_doc_id(k)
+            body = _body(v, ttl_sec)
+            batch.set(_cache_doc(uid, doc_id), body)
+            pending.append((doc_id, v, _parse_exp(body["expAt"]).timestamp()))
+            if len(pending) % _BATCH_MAX == 0:
+                batch.commit()
+                batch = _DB.batch()
+        batch.commit()
+        for doc_id, v, exp_ts in pending:
+            _l1_put(uid, doc_id, v, exp_ts)
+        return True
+    except Exception as e:
+        logging.info("[cache.kv][put_many] fallback to memory: %s", e)
+        for k, v in items.items():
+            _mem_put(_sanitize_doc_id(k), v, ttl_sec)
+        return True
+
+_incr_lock = threading.Lock()
+
+def incr(uid: str, key: str, delta: float = 1, ttl_sec: int = 3600) -> float:
+    """
+    Incremento atômico de contador numérico; retorna o novo valor.
+    Redis: INCRBY (int) / INCRBYFLOAT + EXPIRE no mesmo pipeline (atômico entre instâncias).
+    Firestore/memória: read-modify-write sob lock do processo.
+    Erro de dado no Redis (chave com valor não numérico) levanta; só conexão/timeout cai na memória.
+    """
+    uid = (uid or "").strip()
+    if not uid or not key:
+        return 0
+    doc_id = _sanitize_doc_id(key)
+    is_int = isinstance(delta, int) and not isinstance(delta, bool)
+
+    if _redis_ready():
+        try:
+            rk = _rkey(uid, doc_id)
+            pipe = _redis_client().pipeline(transaction=True)
+            if is_int:
+                pipe.incrby(rk, int(delta))
+            else:
+                pipe.incrbyfloat(rk, float(delta))
+            pipe.expire(rk, max(1, int(ttl_sec)))
+            res = pipe.execute()
+            return int(res[0]) if is_int else float(res[0])
+        except Exception as e:
+            if not _redis_outage(e):
+                # erro de dado: falha só este incr, sem desligar o Redis do processo
+                logging.warning("[cache.kv][incr] erro no valor de %s: %s", doc_id, e)
+                raise
+            _redis_failed("incr", e)
+
+    with _incr_lock:
+        cur = get(uid, key)
+        try:
+            cur = int(cur) if is_int else float(cur)
+        except Exception:
+            cur = 0
+        new = cur + delta
+        put(uid, key, new, ttl_sec=ttl_sec)
+        return new
+
 def cleanup_expired(uid: Optional[str] = None, limit: int = 200) -> int:
     """
-    Remove chaves expiradas. Em memória: remove até `limit`. Em Firestore: best-effort (somente memória).
+    Remove chaves expiradas. Em memória: remove até `limit`. Redis: TTL nativo (nada a fazer).
+    Em Firestore: best-effort (somente memória).
     Retorna quantidade removida.
     """
     if not _db_ready():
         return _mem_cleanup(limit=limit)
-    # Para Firestore, manteremos cleanup manual/externo (query por expAt < now requer índice).
-    # Aqui retornamos 0 e deixamos a remoção preguiçosa do `get()` fazer o serviço.
+    # Para Firestore, o cleanup é externo: POST /tasks/ttl-sweep (services/ttl_sweeper) varre
+    # o collection group "cache" por expAt < now. Aqui retornamos 0 (o `get()` também apaga preguiçoso).
     return 0
@@ -0,0 +1,209 @@
+# cache/lru.py
+"""
+MEI Robô — Cache em processo: LRU O(1) + TTL com heap de expiração — V1.0
+
+Uso:
+    from cache.lru import LRUCache
+    c = LRUCache(max_items=5000, max_bytes=32 * 1024 * 1024, default_ttl=3600, name="kv.mem")
+    c.set("k", {"texto": "oi"}, ttl=60)
+    c.get("k")      # -> {"texto": "oi"} ou None se expirado/evictado
+    c.stats()       # -> hits, misses, evictions, expirations, items, bytes, hit_ratio
+
+Política:
+  - get/set/pop em O(1) (OrderedDict; acesso move para o fim = mais recente)
+  - expiração preguiçosa: get descarta item vencido; set varre o topo do
+    min-heap de expiração (só itens vencidos, amortizado)
+  - estourou max_items/max_bytes → remove o menos usado recentemente (LRU),
+    nunca um item "quente" arbitrário
+  - thread-safe (um lock por instância, sem lock global entre caches)
+"""
+
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+import heapq
+import itertools
+import threading
+import time
+
+_MISSING = object()
+
+
+def approx_size(value: Any, _depth: int = 0) -> int:
+    """Estimativa barata de bytes para valores JSON-like (str/bytes/dict/list/números)."""
+    if value is None or isinstance(value, bool):
+        return 8
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8", errors="ignore"))
+    if isinstance(value, (int, float)):
+        return 16
+    if _depth >= 6:
+        return 64
+    if isinstance(value, dict):
+        return 64 + sum(approx_size(k, _depth + 1) + approx_size(v, _depth + 1) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return 56 + sum(approx_size(v, _depth + 1) for v in value)
+    return 64
+
+
+class LRUCache:
+    """LRU thread-safe com TTL por chave, limite de itens e de bytes, e estatísticas."""
+
+    def __init__(
+        self,
+        max_items: int = 1000,
+        max_bytes: int = 0,
+        default_ttl: Optional[float] = None,
+        name: str = "",
+        sizeof: Optional[Callable[[Any], int]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name or "lru"
+        self.max_items = max(1, int(max_items))
+        self.max_bytes = max(0, int(max_bytes or 0))  # 0 = sem limite de bytes
+        self.default_ttl = default_ttl
+        self._sizeof = sizeof or approx_size
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (value, exp_ts | None, size_bytes)
+        self._data: "OrderedDict[Any, Tuple[Any, Optional[float], int]]" = OrderedDict()
+        self._heap: list = []  # (exp_ts, seq, key) — entradas velhas são descartadas na varredura
+        self._seq = itertools.count()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    # ---------- internos (chamados com lock) ----------
+    def _drop(self, key: Any) -> None:
+        row = self._data.pop(key, None)
+        if row is not None:
+            self._bytes -= row[2]
+
+    def _sweep_locked(self, now: float, limit: Optional[int] = None) -> int:
+        removed = 0
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            if limit is not None and removed >= limit:
+                break
+            exp_ts, _, key = heapq.heappop(heap)
+            row = self._data.get(key)
+            # só remove se a entrada atual ainda é a que gerou este marcador
+            if row is not None and row[1] == exp_ts:
+                self._drop(key)
+                self._expirations += 1
+                removed += 1
+        # compacta marcadores órfãos (sobrescritas/pops) para o heap não crescer sem limite
+        if len(heap) > 2 * len(self._data) + 64:
+            self._heap = [(row[1], next(self._seq), k) for k, row in self._data.items() if row[1] is not None]
+            heapq.heapify(self._heap)
+        return removed
+
+    def _evict_locked(self) -> None:
+        while self._data and (
+            len(self._data) > self.max_items or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            key, row = self._data.popitem(last=False)
+            self._bytes -= row[2]
+            self._evictions += 1
+
+    # ---------- API ----------
+    def get(self, key: Any, default: Any = None) -> Any:
+        now = self._clock()
+        with self._lock:
+            row = self._data.get(key, _MISSING)
+            if row is _MISSING:
+                self._misses += 1
+                return default
+            value, exp_ts, _ = row
+            if exp_ts is not None and exp_ts <= now:
+                self._drop(key)
+                self._expirations += 1
+                self._misses += 1
+                return default
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def __contains__(self, key: Any) -> bool:
+        now = self._clock()
+        with self._lock:
+            row = self._data.get(key)
+            return row is not None and (row[1] is None or row[1] > now)
+
+    def set(self, key: Any, value: Any, ttl: Optional[float] = None) -> None:
+        """Grava com TTL em segundos (None → default_ttl; sem ambos → não expira)."""
+        ttl = self.default_ttl if ttl is None else ttl
+        now = self._clock()
+        exp_ts = (now + max(0.0, float(ttl))) if ttl is not None else None
+        size = self._sizeof(value) if self.max_bytes else 0
+        with self._lock:
+            self._drop(key)
+            self._data[key] = (value, exp_ts, size)
+            self._bytes += size
+            if exp_ts is not None:
+                heapq.heappush(self._heap, (exp_ts, next(self._seq), key))
+            self._sweep_locked(now, limit=64)
+            self._evict_locked()
+
+    def set_until(self, key: Any, value: Any, exp_ts: float) -> None:
+        """Grava com expiração absoluta no relógio do cache (ver now())."""
+        self.set(key, value, ttl=max(0.0, exp_ts - self._clock()))
+
+    def expires_at(self, key: Any) -> Optional[float]:
+        with self._lock:
+            row = self._data.get(key)
+            return row[1] if row is not None else None
+
+    def now(self) -> float:
+        return self._clock()
+
+    def pop(self, key: Any, default: Any = None) -> Any:
+        with self._lock:
+            row = self._data.get(key, _MISSING)
+            if row is _MISSING:
+                return default
+            self._drop(key)
+            return row[0]
+
+    def pop_matching(self, pred: Callable[[Any], bool]) -> int:
+        """Remove as chaves com pred(key) verdadeiro (O(n); invalidação em lote). Retorna quantas."""
+        with self._lock:
+            keys = [k for k in self._data if pred(k)]
+            for k in keys:
+                self._drop(k)
+            return len(keys)
+
+    def sweep(self, limit: Optional[int] = None) -> int:
+        """Remove itens vencidos (até `limit`). Retorna quantos removeu."""
+        with self._lock:
+            return self._sweep_locked(self._clock(), limit=limit)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._heap = []
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "name": self.name,
+                "items": len(self._data),
+                "bytes": self._bytes,
+                "max_items": self.max_items,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "hit_ratio": round(self._hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,197 @@
+# cache/refreshing.py
+"""
+MEI Robô — Valor de processo com refresh single-flight — V1.0
+
+Substitui o padrão "global dict + timestamp" dos caches de plataforma (platform_kb, aliases...),
+que no vencimento do TTL fazia todas as threads lerem o Firestore ao mesmo tempo.
+
+Uso:
+    from cache.refreshing import RefreshingValue
+    _KB = RefreshingValue(_load_kb, ttl=600, name="sales_kb", default={})
+    kb = _KB.get()
+
+Comportamento:
+  - cold start: single-flight (uma thread carrega, as demais esperam o mesmo resultado)
+  - vencido: stale-while-revalidate (devolve o valor antigo; uma thread em background recarrega)
+  - TTL com jitter (±jitter) para instâncias/chaves não vencerem juntas
+  - erro no loader: mantém o valor antigo e tenta de novo após error_ttl; sem valor → default
+  - stats(): loads, errors, latência do refresh, stale servidos; stats_all() agrega por nome
+"""
+
+from __future__ import annotations
+from typing import Any, Callable, Dict, Optional
+import logging
+import random
+import threading
+import time
+
+_REGISTRY: Dict[str, "RefreshingValue"] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+class RefreshingValue:
+    def __init__(
+        self,
+        loader: Callable[[], Any],
+        ttl: float,
+        name: str = "",
+        default: Any = None,
+        jitter: float = 0.1,
+        error_ttl: float = 10.0,
+        register: bool = True,
+    ):
+        self._loader = loader
+        self.ttl = float(ttl)
+        self.name = name or getattr(loader, "__name__", "value")
+        self._default = default
+        self._jitter = max(0.0, float(jitter))
+        self._error_ttl = max(0.0, float(error_ttl))
+        self._lock = threading.Lock()
+        self._cold_done = threading.Condition(self._lock)
+        self._has_value = False
+        self._value: Any = None
+        self._fresh_until = 0.0
+        self._loading = False
+        self._stats = {
+            "hits": 0,
+            "stale_served": 0,
+            "cold_waits": 0,
+            "loads": 0,
+            "errors": 0,
+            "last_latency_ms": 0.0,
+            "total_latency_ms": 0.0,
+            "last_error": "",
+        }
+        if register:
+            with _REGISTRY_LOCK:
+                _REGISTRY[self.name] = self
+
+    # ---------- internos ----------
+    def _next_deadline(self, now: float, ttl: Optional[float] = None) -> float:
+        ttl = self.ttl if ttl is None else ttl
+        if self._jitter and ttl > 0:
+            ttl = ttl * random.uniform(1.0 - self._jitter, 1.0 + self._jitter)
+        return now + max(0.0, ttl)
+
+    def _load(self) -> None:
+        """Executa o loader (fora do lock) e publica o resultado."""
+        t0 = time.monotonic()
+        ok, value, err = False, None, None
+        try:
+            value = self._loader()
+            ok = True
+        except Exception as e:
+            err = e
+        dt_ms = (time.monotonic() - t0) * 1000.0
+        with self._lock:
+            self._stats["loads"] += 1
+            self._stats["last_latency_ms"] = round(dt_ms, 2)
+            self._stats["total_latency_ms"] += dt_ms
+            now = time.monotonic()
+            if ok:
+                self._value = value
+                self._has_value = True
+                self._fresh_until = self._next_deadline(now)
+            else:
+                self._stats["errors"] += 1
+                self._stats["last_error"] = f"{type(err).__name__}:{str(err)[:120]}"
+                self._fresh_until = self._next_deadline(now, self._error_ttl)
+            self._loading = False
+            self._cold_done.notify_all()
+        if not ok:
+            logging.info("[refreshing][%s] loader falhou: %s", self.name, err)
+
+    # ---------- API ----------
+    def get(self) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            if self._has_value and now < self._fresh_until:
+                self._stats["hits"] += 1
+                return self._value
+
+            if self._has_value:
+                # stale-while-revalidate: só uma thread dispara o refresh
+                self._stats["stale_served"] += 1
+                if not self._loading and now >= self._fresh_until:
+                    self._loading = True
+                    threading.Thread(target=self._load, name=f"refresh-{self.name}", daemon=True).start()
+                return self._value
+
+            # cold: single-flight
+            if self._loading:
+                self._stats["cold_waits"] += 1
+                while self._loading:
+                    self._cold_done.wait()
+                return self._value if self._has_value else self._default
+            if now < self._fresh_until:
+                # erro recente sem valor: não martela o backend
+                return self._default
+            self._loading = True
+
+        self._load()
+        with self._lock:
+            return self._value if self._has_value else self._default
+
+    def invalidate(self) -> None:
+        """Força recarga no próximo get (mantém valor antigo para stale-while-revalidate)."""
+        with self._lock:
+            self._fresh_until = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._stats)
+            loads = out["loads"] or 0
+            out["avg_latency_ms"] = round(out.pop("total_latency_ms") / loads, 2) if loads else 0.0
+            out["has_value"] = self._has_value
+            return out
+
+
+class RefreshingMap:
+    """Um RefreshingValue por chave (ex.: doc_path + campos), criado sob demanda."""
+
+    def __init__(self, name: str, ttl: float, default: Any = None, jitter: float = 0.1, max_keys: int = 512):
+        self.name = name
+        self.ttl = float(ttl)
+        self._default = default
+        self._jitter = jitter
+        self._max_keys = max(1, int(max_keys))
+        self._lock = threading.Lock()
+        self._values: Dict[str, RefreshingValue] = {}
+        with _REGISTRY_LOCK:
+            _REGISTRY[name] = self  # type: ignore[assignment]
+
+    def get(self, key: str, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        with self._lock:
+            rv = self._values.get(key)
+            if rv is None:
+                if len(self._values) >= self._max_keys:
+                    self._values.pop(next(iter(self._values)), None)
+                rv = RefreshingValue(
+                    loader,
+                    ttl=self.ttl if ttl is None else ttl,
+                    name=f"{self.name}:{key}",
+                    default=self._default,
+                    jitter=self._jitter,
+                    register=False,
+                )
+                self._values[key] = rv
+        return rv.get()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            values = list(self._values.values())
+        agg: Dict[str, Any] = {"keys": len(values), "hits": 0, "stale_served": 0, "cold_waits": 0, "loads": 0, "errors": 0}
+        lat = 0.0
+        for rv in values:
+            st = rv.stats()
+            for k in ("hits", "stale_served", "cold_waits", "loads", "errors"):
+                agg[k] += st[k]
+            lat += st["avg_latency_ms"] * st["loads"]
+        agg["avg_latency_ms"] = round(lat / agg["loads"], 2) if agg["loads"] else 0.0
+        return agg
+
+
+def stats_all() -> Dict[str, Dict[str, Any]]:
+    with _REGISTRY_LOCK:
+        items = list(_REGISTRY.items())
+    return {name: v.stats() for name, v in items}
@@ -13,7 +13,7 @@
 #   {
 #     "answer": str | None,
 #     "usedDocs": [
-#       {"id": "...", "titulo": "...", "tags": [...], "prioridade": 1, ...}
+#       {"id": "...", "titulo": "...", "tags": [...], "prioridade": 1, "chunks": [3, 7]?, ...}
 #     ],
 #     "reason": "ok" | "no_docs" | "no_relevant_docs" | "no_llm_available" | "llm_error"
 #   }
@@ -23,6 +23,7 @@ from __future__ import annotations
 from typing import List, Dict, Any, Optional
 import logging
 import math
+import os
 import re
 
 # Firestore client compartilhado do projeto
@@ -43,16 +44,47 @@ try:
 except Exception:  # pragma: no cover
     get_mini_embedding = None  # type: ignore
 
+# Índice versionado por uid (matriz de embeddings + BM25) – opcional
+try:
+    from services import acervo_index  # type: ignore
+    from services import acervo_lexical as _lexical  # type: ignore
+except Exception:  # pragma: no cover
+    acervo_index = None  # type: ignore
+
 # Helper de leitura de texto do GCS (para .md em storageConsultaPath)
 try:
     from services.storage_gcs import download_text_by_gcs_path  # type: ignore
 except Exception:  # pragma: no cover
     download_text_by_gcs_path = None  # type: ignore
 
+# Cache do texto de consulta (memória + /tmp, chave path+geração) – opcional
+try:
+    from services import acervo_text_cache  # type: ignore
+except Exception:  # pragma: no cover
+    acervo_text_cache = None  # type: ignore
+
+# Cache de embedding da pergunta e de respostas por versão do acervo – opcional
+try:
+    from services import acervo_query_cache  # type: ignore
+except Exception:  # pragma: no cover
+    acervo_query_cache = None  # type: ignore
+
+# Chunks por doc (sidecar float16 no GCS, gravado por task_acervo_index) – opcional
+try:
+    from services import acervo_chunks  # type: ignore
+except Exception:  # pragma: no cover
+    acervo_chunks = None  # type: ignore
+
 
 # Limites de sanidade
 _MAX_DOCS = 50
 _MAX_CHARS_CONTEXT_PER_DOC = 900
+# Cosseno mínimo para um doc entrar no ranking só pela semântica (sem termo em comum)
+_MIN_COSINE = float(os.getenv("ACERVO_MIN_COSINE", "0.3") or 0.3)
+# Docs indexados em chunks: melhores N chunks por doc no contexto (em vez do começo do .md)
+_CHUNKS_PER_DOC = int(os.getenv("ACERVO_CHUNKS_PER_DOC", "2") or 2)
+_MAX_CHARS_CHUNK_CONTEXT = int(os.getenv("ACERVO_CHUNK_CONTEXT_CHARS", "1400") or 1400)
+_MAX_SIDECAR_BYTES = 16 * 1024 * 1024
 
 
 def _tokenize(text: str) -> List[str]:
@@ -95,6 +127,10 @@ def _score_candidate(pergunta: str, item: Dict[str, Any]) -> float:
     inter = q_tokens.intersection(b_tokens)
     base_score = float(len(inter))
 
+    return base_score * _prioridade_factor(item)
+
+
+def _prioridade_factor(item: Dict[str, Any]) -> float:
     # prioridade (1 = mais importante)
     try:
         prioridade = int(item.get("prioridade", 1))
@@ -102,11 +138,28 @@ def _score_candidate(pergunta: str, item: Dict[str, Any]) -> float:
         prioridade = 1
 
     if prioridade == 1:
-        base_score *= 1.4
-    elif prioridade >= 3:
-        base_score *= 0.8
+        return 1.4
+    if prioridade >= 3:
+        return 0.8
+    return 1.0
+
 
-    return base_score
+def _rank_hybrid(pergunta: str, index: Any, q_emb: Optional[List[float]]) -> List[tuple[float, Dict[str, Any]]]:
+    """
+    BM25 (titulo/tags/resumoCurto) + cosseno fundidos por reciprocal-rank fusion.
+    Entra no ranking quem tem algum termo em comum ou cosseno >= _MIN_COSINE;
+    o fator de prioridade é aplicado sobre o score fundido.
+    """
+    rankings = [_lexical.ranks(index.bm25.score(pergunta))]
+    if q_emb is not None:
+        rankings.append(_lexical.ranks(index.cosine(q_emb), _MIN_COSINE))
+    scored: List[tuple[float, Dict[str, Any]]] = []
+    for i, s in _lexical.rrf(rankings).items():
+        it = index.items[i]
+        if not it.get("habilitado", True):
+            continue
+        scored.append((s * _prioridade_factor(it), it))
+    return scored
 
 
 def _cosine(a: List[float], b: List[float]) -> float:
@@ -120,13 +173,113 @@ def _cosine(a: List[float], b: List[float]) -> float:
     return dot / (na * nb)
 
 
-def _build_magrinho_for_item(item: Dict[str, Any]) -> str:
+def _consulta_key(item: Dict[str, Any], version: Optional[int] = None) -> Optional[tuple]:
+    gcs_path = item.get("storageConsultaPath") or item.get("storageConsultaUrl")
+    if not gcs_path:
+        return None
+    gen = item.get("storageConsultaGeneration")
+    if not gen and version is not None:
+        gen = f"v{int(version)}"
+    return (str(gcs_path), gen or None)
+
+
+def _download_consulta(gcs_path: str, generation: Any) -> Optional[str]:
+    # max_bytes um pouco maior que o limite de contexto
+    kwargs: Dict[str, Any] = {"max_bytes": _MAX_CHARS_CONTEXT_PER_DOC * 2, "encoding": "utf-8"}
+    if isinstance(generation, int):
+        kwargs["generation"] = generation
+    return download_text_by_gcs_path(gcs_path, **kwargs)  # type: ignore[misc]
+
+
+def _consulta_texts(items: List[Dict[str, Any]], version: Optional[int] = None) -> Dict[tuple, Optional[str]]:
+    """
+    Texto de consulta (.md) dos itens, numa ida só: cache (memória/disco) e, nas faltas,
+    downloads em paralelo. Sem geração nem versão conhecidas, lê direto (sem cache).
+    """
+    if download_text_by_gcs_path is None:
+        return {}
+    keys = [k for k in (_consulta_key(it, version) for it in items) if k is not None]
+    cacheable = [k for k in keys if k[1] is not None]
+    out: Dict[tuple, Optional[str]] = {}
+    if acervo_text_cache is not None and cacheable:
+        try:
+            out.update(acervo_text_cache.get_many(cacheable, _download_consulta))
+        except Exception:
+            logging.exception("domain.acervo: cache de texto indisponível.")
+    for k in keys:
+        if k not in out:
+            try:
+                out[k] = _download_consulta(k[0], k[1])
+            except Exception:
+                logging.exception("domain.acervo: falha ao ler storageConsultaPath='%s'", k[0])
+                out[k] = None
+    return out
+
+
+def _download_sidecar(gcs_path: str, generation: Any) -> Optional[str]:
+    kwargs: Dict[str, Any] = {"max_bytes": _MAX_SIDECAR_BYTES, "encoding": "utf-8"}
+    if isinstance(generation, int):
+        kwargs["generation"] = generation
+    return download_text_by_gcs_path(gcs_path, **kwargs)  # type: ignore[misc]
+
+
+def _best_chunks(items: List[Dict[str, Any]], q_emb: Optional[List[float]], pergunta: str,
+                 version: Optional[int] = None) -> Dict[str, List[tuple]]:
+    """
+    id do doc -> [(score, índice, texto)] dos melhores chunks (cosseno com a pergunta;
+    sem embedding, overlap de termos). Só para docs com sidecar de chunks.
+    """
+    if acervo_chunks is None or download_text_by_gcs_path is None:
+        return {}
+    keys: Dict[str, tuple] = {}
+    for it in items:
+        if it.get("chunksPath") and it.get("chunkCount"):
+            gen = it.get("chunksGeneration") or (f"v{int(version)}" if version is not None else None)
+            if gen is not None:
+                keys[str(it["id"])] = (str(it["chunksPath"]), gen)
+    if not keys:
+        return {}
+    try:
+        sets = acervo_chunks.load_many(list(keys.values()), _download_sidecar)
+    except Exception:
+        logging.exception("domain.acervo: falha ao carregar chunks.")
+        return {}
+    out: Dict[str, List[tuple]] = {}
+    for doc_id, key in keys.items():
+        cs = sets.get(key)
+        if cs is not None and cs.texts:
+            out[doc_id] = [(sc, i, cs.texts[i]) for sc, i in cs.best(q_emb, pergunta, _CHUNKS_PER_DOC)]
+    return out
+
+
+def _chunks_context(best: List[tuple]) -> str:
+    # ordem do documento, não do score: trechos sobrepostos ficam legíveis
+    parts = [txt.strip() for _, _, txt in sorted(best, key=lambda x: x[1])]
+    return "\n[…]\n".join(p for p in parts if p)[:_MAX_CHARS_CHUNK_CONTEXT]
+
+
+def _used_doc_view(it: Dict[str, Any], chunks: Dict[str, List[tuple]]) -> Dict[str, Any]:
+    view = {
+        "id": it["id"],
+        "titulo": it.get("titulo"),
+        "tags": it.get("tags", []),
+        "prioridade": it.get("prioridade", 1),
+    }
+    best = chunks.get(str(it["id"]))
+    if best:
+        view["chunks"] = [i for _, i, _ in best]  # índices dos chunks usados no contexto
+    return view
+
+
+def _build_magrinho_for_item(item: Dict[str, Any], texts: Optional[Dict[tuple, Optional[str]]] = None,
+                             version: Optional[int] = None) -> str:
     """
     Versão "magrinha" do item em texto:
 
       Ordem de preferência:
         1) Conteúdo de consulta (.md) em storageConsultaPath, se disponível,
-           lendo direto do GCS (limitado em _MAX_CHARS_CONTEXT_PER_DOC * 2).
+           lendo do cache/GCS (limitado em _MAX_CHARS_CONTEXT_PER_DOC * 2).
+           texts: resultado de _consulta_texts já feito para o top-k.
         2) resumoCurto, se existir.
         3) Fallback com titulo + tags de forma simples.
 
@@ -134,23 +287,17 @@ def _build_magrinho_for_item(item: Dict[str, Any]) -> str:
       - versão "gorda" fica no Storage,
       - versão "magrinha" (consulta) é usada para IA.
     """
-    # 1) Tenta ler a versão de consulta (texto .md) do GCS, se houver
-    gcs_path = item.get("storageConsultaPath") or item.get("storageConsultaUrl")
-    if download_text_by_gcs_path is not None and gcs_path:
-        try:
-            # max_bytes um pouco maior que o limite de contexto
-            raw = download_text_by_gcs_path(
-                str(gcs_path),
-                max_bytes=_MAX_CHARS_CONTEXT_PER_DOC * 2,
-                encoding="utf-8",
-            )
-            if raw:
-                snippet = raw.strip()
-                if len(snippet) > _MAX_CHARS_CONTEXT_PER_DOC:
-                    snippet = snippet[:_MAX_CHARS_CONTEXT_PER_DOC]
-                return snippet
-        except Exception:
-            logging.exception("domain.acervo: falha ao ler storageConsultaPath='%s'", gcs_path)
+    # 1) Versão de consulta (texto .md) do GCS, se houver
+    key = _consulta_key(item, version)
+    if key is not None:
+        if texts is None:
+            texts = _consulta_texts([item], version)
+        raw = texts.get(key)
+        if raw:
+            snippet = raw.strip()
+            if len(snippet) > _MAX_CHARS_CONTEXT_PER_DOC:
+                snippet = snippet[:_MAX_CHARS_CONTEXT_PER_DOC]
+            return snippet
 
     # 2) Se não conseguiu ler do GCS, tenta resumoCurto
     resumo = str(item.get("resumoCurto") or "").strip()
@@ -178,16 +325,19 @@ def _build_magrinho_for_item(item: Dict[str, Any]) -> str:
     return texto
 
 
-def _load_acervo_docs(uid: str) -> List[Dict[str, Any]]:
+def _load_acervo_docs(uid: str, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
     """
     Carrega até _MAX_DOCS itens do acervo do MEI em:
       profissionais/{uid}/acervo
+    fields: projeção (select) — ex.: sem o array embedding quando a matriz vem do índice.
     """
     if db is None:
         logging.warning("domain.acervo: Firestore (db) não configurado.")
         return []
 
     col = db.collection("profissionais").document(uid).collection("acervo")
+    if fields:
+        col = col.select(fields)
 
     try:
         # Ordena por prioridade asc (1 primeiro), depois por criadoEm desc, quando existir
@@ -220,12 +370,16 @@ def query_acervo_for_uid(uid: str, pergunta: str, max_tokens: int = 120) -> Dict
     Mini-RAG em cima do acervo do MEI.
 
     Passos:
-      1) Carrega até N docs de profissionais/{uid}/acervo (habilitado=True).
-      2) Score simples por tokens (titulo, tags, resumoCurto).
-      3) Se houver embeddings, ajusta o score pelo coseno.
+      1) Carrega até N docs de profissionais/{uid}/acervo (habilitado=True) — via
+         services.acervo_index (cache por versão do acervo) quando disponível.
+      2) Com índice: BM25 (titulo, tags, resumoCurto; sem acento/stopwords) e coseno
+         (matriz·vetor) fundidos por RRF. Sem índice: overlap de tokens + coseno.
       4) Seleciona top K (até 4) relevantes.
       5) Monta contexto e chama GPT-mini com resposta curta.
 
+    Embedding da pergunta e resposta final passam por services.acervo_query_cache
+    (resposta por uid + pergunta normalizada + versão do acervo + max_tokens).
+
     Retorno:
       ver docstring do módulo.
     """
@@ -237,7 +391,33 @@ def query_acervo_for_uid(uid: str, pergunta: str, max_tokens: int = 120) -> Dict
             "reason": "empty_question",
         }
 
-    items = _load_acervo_docs(uid)
+    # Cache de respostas: chave inclui a versão do acervo (bump → chave nova)
+    version: Optional[int] = None
+    if acervo_query_cache is not None and acervo_index is not None and db is not None:
+        try:
+            version = acervo_index.get_version(uid, db)
+            cached = acervo_query_cache.get_answer(uid, pergunta, version, max_tokens)
+            if cached is not None:
+                return cached
+        except Exception:
+            logging.exception("domain.acervo: cache de respostas indisponível.")
+            version = None
+
+    result = _answer_from_acervo(uid, pergunta, max_tokens)
+    if version is not None:
+        acervo_query_cache.put_answer(uid, pergunta, version, max_tokens, result)
+    return result
+
+
+def _answer_from_acervo(uid: str, pergunta: str, max_tokens: int) -> Dict[str, Any]:
+    index = None
+    if acervo_index is not None and db is not None:
+        try:
+            index = acervo_index.get(uid, db, lambda fields=None: _load_acervo_docs(uid, fields))
+        except Exception:
+            logging.exception("domain.acervo: índice indisponível; lendo docs direto.")
+            index = None
+    items = index.items if index is not None else _load_acervo_docs(uid)
     if not items:
         return {
             "answer": None,
@@ -249,27 +429,34 @@ def query_acervo_for_uid(uid: str, pergunta: str, max_tokens: int = 120) -> Dict
     q_emb: Optional[List[float]] = None
     if get_mini_embedding is not None:
         try:
-            q_emb = get_mini_embedding(pergunta)
+            if acervo_query_cache is not None:
+                q_emb = acervo_query_cache.get_embedding(uid, pergunta, get_mini_embedding)
+            else:
+                q_emb = get_mini_embedding(pergunta)
         except Exception:
             logging.exception("domain.acervo: falha ao gerar embedding da pergunta.")
             q_emb = None
 
     scored: List[tuple[float, Dict[str, Any]]] = []
-    for it in items:
-        base_score = _score_candidate(pergunta, it)
-        if base_score <= 0:
-            scored.append((0.0, it))
-            continue
-
-        score = base_score
-        # Ajuste por embedding, se existir
-        if q_emb is not None and "embedding" in it and isinstance(it["embedding"], list):
-            try:
-                score += 2.0 * _cosine(q_emb, [float(x) for x in it["embedding"]])
-            except Exception:
-                pass
-
-        scored.append((score, it))
+    if index is not None:
+        # Índice: BM25 + cosseno (matriz·vetor) fundidos por RRF
+        scored = _rank_hybrid(pergunta, index, q_emb)
+    else:
+        for it in items:
+            base_score = _score_candidate(pergunta, it)
+            if base_score <= 0:
+                scored.append((0.0, it))
+                continue
+
+            score = base_score
+            # Ajuste por embedding, se existir
+            if q_emb is not None and "embedding" in it and isinstance(it["embedding"], list):
+                try:
+                    score += 2.0 * _cosine(q_emb, [float(x) for x in it["embedding"]])
+                except Exception:
+                    pass
+
+            scored.append((score, it))
 
     # Ordena por score desc e filtra quem tem score > 0
     scored.sort(key=lambda x: x[0], reverse=True)
@@ -285,12 +472,19 @@ def query_acervo_for_uid(uid: str, pergunta: str, max_tokens: int = 120) -> Dict
     top_k = scored[:4]
     used_docs = [it for _, it in top_k]
 
-    # Monta contexto magrinho
+    # Monta contexto: melhores chunks dos docs indexados em chunks; nos demais, magrinho
+    # (texto de consulta do top-k lido de uma vez, em paralelo)
+    version = index.version if index is not None else None
+    chunks = _best_chunks(used_docs, q_emb, pergunta, version)
+    texts = _consulta_texts([it for it in used_docs if str(it["id"]) not in chunks], version)
     context_parts: List[str] = []
     for it in used_docs:
         titulo = str(it.get("titulo") or "Item do acervo")
-        magrinho = _build_magrinho_for_item(it)
-        snippet = magrinho[:_MAX_CHARS_CONTEXT_PER_DOC]
+        best = chunks.get(str(it["id"]))
+        if best:
+            snippet = _chunks_context(best)
+        else:
+            snippet = _build_magrinho_for_item(it, texts, version)[:_MAX_CHARS_CONTEXT_PER_DOC]
         context_parts.append(f"# {titulo}\n\n{snippet}")
 
     context = "\n\n---\n\n".join(context_parts)
@@ -300,12 +494,7 @@ def query_acervo_for_uid(uid: str, pergunta: str, max_tokens: int = 120) -> Dict
         return {
             "answer": None,
             "usedDocs": [
-                {
-                    "id": it["id"],
-                    "titulo": it.get("titulo"),
-                    "tags": it.get("tags", []),
-                    "prioridade": it.get("prioridade", 1),
-                }
+                _used_doc_view(it, chunks)
                 for it in used_docs
             ],
             "context": context,
@@ -340,12 +529,7 @@ Responda em no máximo {max_tokens} tokens, em português simples, direto, sem c
     return {
         "answer": (answer or "").strip() or None,
         "usedDocs": [
-            {
-                "id": it["id"],
-                "titulo": it.get("titulo"),
-                "tags": it.get("tags", []),
-                "prioridade": it.get("prioridade", 1),
-            }
+            _used_doc_view(it, chunks)
             for it in used_docs
         ],
         "reason": "ok" if answer else "llm_error",
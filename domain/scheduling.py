@@ -29,8 +29,11 @@ from datetime import datetime, timedelta, time, timezone
 import logging
 import os
 import re
+import threading
 import unicodedata
 
+from cache.lru import LRUCache
+
 # ================== TZ ==================
 SP_TZ = timezone(timedelta(hours=-3))  # America/Sao_Paulo (sem DST)
 
@@ -132,6 +135,15 @@ def _list_col(path: str, limit: int = 500) -> List[Dict[str, Any]]:
 
 
 # ================== Config / Duração ==================
+# propose() roda a cada turno "tem horário?" e config/catálogo mudam raramente:
+# cache curto por uid (edições em qualquer instância aparecem ao expirar)
+_CFG_CACHE = LRUCache(
+    max_items=int(os.getenv("SCHEDULING_CONFIG_CACHE_MAX", "1000") or 1000),
+    default_ttl=float(os.getenv("SCHEDULING_CONFIG_TTL_SEC", "60") or 60),
+    name="scheduling.config",
+)
+
+
 def _load_agenda_config(uid: str) -> Dict[str, Any]:
     """
     Carrega configuração de agenda do profissional.
@@ -152,17 +164,22 @@ def _load_agenda_config(uid: str) -> Dict[str, Any]:
     base_cfg: Dict[str, Any] = {}
 
     if _db_ready():
-        # Novo caminho canônico
-        cfg_new = _get_doc(f"profissionais/{uid}/config/agendamento") or {}
-        # Caminho legado (provavelmente vazio, mas mantemos por segurança)
-        cfg_old = _get_doc(f"profissionais/{uid}/configAgendamento") or {}
-        base_cfg.update(cfg_new or cfg_old or {})
-
-        # Herda alguns campos do doc principal, se ainda não estiverem na config
-        prof = _get_doc(f"profissionais/{uid}") or {}
-        for k in ("atendimentoInicio", "atendimentoFim", "intervaloMin"):
-            if k not in base_cfg and k in prof:
-                base_cfg[k] = prof[k]
+        stored = _CFG_CACHE.get(("cfg", uid))
+        if stored is None:
+            stored = {}
+            # Novo caminho canônico
+            cfg_new = _get_doc(f"profissionais/{uid}/config/agendamento") or {}
+            # Caminho legado (provavelmente vazio, mas mantemos por segurança)
+            cfg_old = _get_doc(f"profissionais/{uid}/configAgendamento") or {}
+            stored.update(cfg_new or cfg_old or {})
+
+            # Herda alguns campos do doc principal, se ainda não estiverem na config
+            prof = _get_doc(f"profissionais/{uid}") or {}
+            for k in ("atendimentoInicio", "atendimentoFim", "intervaloMin"):
+                if k not in stored and k in prof:
+                    stored[k] = prof[k]
+            _CFG_CACHE.set(("cfg", uid), stored)
+        base_cfg.update(stored)
 
     # Defaults seguros
     if "atendimentoInicio" not in base_cfg:
@@ -195,7 +212,10 @@ def _load_agenda_config(uid: str) -> Dict[str, Any]:
 def _resolve_duration(uid: str, service_slug: Optional[str], default_min: int) -> int:
     if not service_slug or not _db_ready():
         return default_min
-    items = _list_col(f"profissionais/{uid}/produtosEServicos", limit=500)
+    items = _CFG_CACHE.get(("servicos", uid))
+    if items is None:
+        items = _list_col(f"profissionais/{uid}/produtosEServicos", limit=500)
+        _CFG_CACHE.set(("servicos", uid), items)
     t = _strip_accents_lower(service_slug)
     best = None
     for it in items:
@@ -221,6 +241,93 @@ def _resolve_duration(uid: str, service_slug: Optional[str], default_min: int) -
 
 
 # ================== Ocupação / Conflitos ==================
+# Cache curto por uid: propose() é chamado várias vezes na mesma conversa com janelas
+# quase iguais (earliest muda a cada minuto), então a chave usa a janela alinhada ao dia.
+# create_agendamento/atualizações de estado chamam invalidate_busy(uid) (geração por uid).
+_BUSY_ESTADOS = ["solicitado", "confirmado"]
+_BUSY_TTL_SEC = float(os.getenv("SCHEDULING_BUSY_TTL_SEC", "30") or 30)
+_BUSY_MAX_DUR_MIN = 600  # mesmo teto de duração aceito em propose()
+_BUSY_CACHE = LRUCache(
+    max_items=int(os.getenv("SCHEDULING_BUSY_CACHE_MAX", "2000") or 2000),
+    default_ttl=_BUSY_TTL_SEC,
+    name="scheduling.busy",
+)
+_BUSY_GEN: Dict[str, int] = {}
+_BUSY_GEN_LOCK = threading.Lock()
+
+
+def invalidate_busy(uid: str) -> None:
+    """Descarta a ocupação em cache do uid (chamar após criar/alterar agendamento)."""
+    uid = (uid or "").strip()
+    if not uid:
+        return
+    with _BUSY_GEN_LOCK:
+        _BUSY_GEN[uid] = _BUSY_GEN.get(uid, 0) + 1
+
+
+def busy_cache_stats() -> Dict[str, Any]:
+    return _BUSY_CACHE.stats()
+
+
+def _parse_busy_doc(obj: Dict[str, Any]) -> Optional[Tuple[datetime, datetime]]:
+    estado = (obj.get("estado") or "").lower()
+    if estado not in _BUSY_ESTADOS:
+        return None
+    ini_s = obj.get("inicio") or obj.get("dataHora")
+    if not ini_s:
+        return None
+    try:
+        ini = datetime.fromisoformat(str(ini_s).replace("Z", "+00:00")).astimezone(SP_TZ)
+    except Exception:
+        return None
+    dur = obj.get("duracaoMin") or 60
+    try:
+        dur = int(dur)
+    except Exception:
+        dur = 60
+    return ini, ini + timedelta(minutes=dur)
+
+
+def _query_busy_raw(col, lo: datetime, hi: datetime) -> List[Tuple[datetime, datetime]]:
+    """
+    Intervalos ativos com início em [lo, hi), via range query.
+
+    inicio/dataHora são strings ISO com offsets variados (-03:00, +00:00, Z), então a
+    comparação lexicográfica só é confiável por data: os limites usam "YYYY-MM-DD" com
+    1 dia de folga de cada lado e o filtro exato fica no Python.
+    Índice composto: agendamentos (estado ASC, inicio ASC) e (estado ASC, dataHora ASC).
+    """
+    lo_s = (lo - timedelta(days=1)).date().isoformat()
+    hi_s = (hi + timedelta(days=1)).date().isoformat()
+    seen = set()
+    out: List[Tuple[datetime, datetime]] = []
+    # docs do bot usam "inicio"; os do dashboard (services/schedule) usam "dataHora"
+    for field in ("inicio", "dataHora"):
+        q = (
+            col.where("estado", "in", _BUSY_ESTADOS)
+            .where(field, ">=", lo_s)
+            .where(field, "<", hi_s)
+        )
+        for d in q.stream():  # type: ignore
+            if d.id in seen:
+                continue
+            seen.add(d.id)
+            iv = _parse_busy_doc(d.to_dict() or {})
+            if iv is not None:
+                out.append(iv)
+    return out
+
+
+def _scan_busy_raw(col) -> List[Tuple[datetime, datetime]]:
+    """Caminho antigo (sem índice): varre até 1000 docs e filtra no Python."""
+    out: List[Tuple[datetime, datetime]] = []
+    for d in col.limit(1000).stream():  # type: ignore
+        iv = _parse_busy_doc(d.to_dict() or {})
+        if iv is not None:
+            out.append(iv)
+    return out
+
+
 def _load_busy(uid: str, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
     """Lê agendamentos ativos para marcar ocupação. Offline: lista vazia."""
     if not _db_ready():
@@ -229,31 +336,33 @@ def _load_busy(uid: str, start: datetime, end: datetime) -> List[Tuple[datetime,
     col = _get_col_ref(f"profissionais/{uid}/agendamentos")
     if col is None:
         return busy
-    try:
-        docs = col.limit(1000).stream()  # type: ignore
-        for d in docs:
-            obj = d.to_dict() or {}
-            estado = (obj.get("estado") or "").lower()
-            if estado not in ("solicitado", "confirmado"):
-                continue
-            ini_s = obj.get("inicio") or obj.get("dataHora")
-            if not ini_s:
-                continue
-            try:
-                ini = datetime.fromisoformat(str(ini_s).replace("Z", "+00:00")).astimezone(SP_TZ)
-            except Exception:
-                continue
-            dur = obj.get("duracaoMin") or 60
+
+    # janela alinhada ao dia (SP) + folga da maior duração, para reaproveitar o cache
+    day0 = start.astimezone(SP_TZ).replace(hour=0, minute=0, second=0, microsecond=0)
+    day1 = end.astimezone(SP_TZ).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    lo = day0 - timedelta(minutes=_BUSY_MAX_DUR_MIN)
+    with _BUSY_GEN_LOCK:
+        gen = _BUSY_GEN.get(uid, 0)
+    key = (uid, gen, day0.isoformat(), day1.isoformat())
+
+    raw = _BUSY_CACHE.get(key)
+    if raw is None:
+        try:
+            raw = _query_busy_raw(col, lo, day1)
+        except Exception as e:
+            logging.info("[scheduling] range query de agendamentos falhou (%s); usando varredura", e)
             try:
-                dur = int(dur)
-            except Exception:
-                dur = 60
-            fim = ini + timedelta(minutes=dur)
-            if fim <= start or ini >= end:
-                continue
-            busy.append((ini, fim))
-    except Exception as e:
-        logging.info("[scheduling] leitura de agendamentos falhou: %s", e)
+                raw = _scan_busy_raw(col)
+            except Exception as e2:
+                logging.info("[scheduling] leitura de agendamentos falhou: %s", e2)
+                raw = None
+        if raw is not None:
+            _BUSY_CACHE.set(key, raw)
+
+    for ini, fim in raw or []:
+        if fim <= start or ini >= end:
+            continue
+        busy.append((ini, fim))
     busy.sort(key=lambda x: x[0])
     merged: List[Tuple[datetime, datetime]] = []
     for iv in busy:
@@ -264,6 +373,31 @@ def _load_busy(uid: str, start: datetime, end: datetime) -> List[Tuple[datetime,
     return merged
 
 
+# Índice de disponibilidade (services/agenda_index, kind "bot"): mesma semântica de
+# _parse_busy_doc; confere agendaMeta.version a cada chamada (escritas de outras instâncias)
+_INDEX_TZ = "America/Sao_Paulo"
+
+
+def _availability_index(uid: str, start: datetime, end: datetime):
+    """Índice cobrindo [start, end] ou None (propose lê a ocupação com _load_busy)."""
+    if not _db_ready():
+        return None
+    try:
+        from services import agenda_index  # type: ignore
+    except Exception:
+        return None
+    if not agenda_index.enabled():
+        return None
+    try:
+        idx = agenda_index.get(uid, _INDEX_TZ, lambda: _DB, kind="bot")
+    except Exception as e:
+        logging.info("[scheduling] índice de disponibilidade indisponível (%s); lendo agendamentos", e)
+        return None
+    if idx is None or not (idx.covers(start.astimezone(SP_TZ).date()) and idx.covers(end.astimezone(SP_TZ).date())):
+        return None
+    return idx
+
+
 def _overlaps(a_start: datetime, a_end: datetime, b_start: datetime, b_end: datetime) -> bool:
     return not (a_end <= b_start or a_start >= b_end)
 
@@ -360,7 +494,10 @@ def propose(
     earliest = (base + timedelta(days=lead_days)).replace(second=0, microsecond=0)
     day_end = (earliest + timedelta(days=window_days)).replace(second=0, microsecond=0)
 
-    busy = _load_busy(uid, earliest, day_end)  # offline → []
+    # o laço abaixo vai até o fim do dia de day_end: a ocupação precisa cobrir o dia todo
+    busy_end = day_end.replace(hour=23, minute=59, second=59)
+    index = _availability_index(uid, earliest, day_end)
+    busy = [] if index is not None else _load_busy(uid, earliest, busy_end)  # offline → []
 
     slots: List[str] = []
     cursor = _ceil_dt(earliest, step_min)
@@ -402,7 +539,10 @@ def propose(
             )
             continue
 
-        conflict = any(_overlaps(slot_start, slot_end, b_ini, b_fim) for b_ini, b_fim in busy)
+        if index is not None:
+            conflict = index.busy(slot_start, slot_end)
+        else:
+            conflict = any(_overlaps(slot_start, slot_end, b_ini, b_fim) for b_ini, b_fim in busy)
         if not conflict:
             slots.append(_fmt_br(slot_start))
 
@@ -625,13 +765,20 @@ def create_agendamento(
             return False
 
         doc = col.document()
-        doc.set({
+        data = {
             "clienteWaKey": wa_key,
             "inicio": inicio_str,
             "duracaoMin": duracao_min,
             "estado": "confirmado",
             "origem": "whatsapp",
-        })
+        }
+        doc.set(data)
+        invalidate_busy(uid)
+        try:
+            from services import agenda_index  # type: ignore
+            agenda_index.on_event_written(uid, doc.id, data, _DB)
+        except Exception as e:
+            logging.info("[scheduling] agenda_index indisponível: %s", e)
 
         # 🔔 Enviar e-mail de confirmação para o profissional
         try:
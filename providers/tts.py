@@ -6,7 +6,6 @@
 from __future__ import annotations
 
 import os
-import json
 import logging
 from typing import Optional, Tuple
 
@@ -105,39 +104,15 @@ _google_tts_client = None
 _google_tts_cred_used = None  # "inline_json" | "adc" | None
 
 def _get_google_tts_client():
+    """Cliente Google TTS compartilhado (services.speech_clients): JSON inline (GOOGLE_APPLICATION_CREDENTIALS_JSON/FIREBASE_*) primeiro, depois ADC."""
     global _google_tts_client, _google_tts_cred_used
-    if _google_tts_client is not None:
-        return _google_tts_client
-    try:
-        from google.cloud import texttospeech  # type: ignore
-        from google.oauth2 import service_account  # type: ignore
-    except Exception as e:
-        log.info("[providers.tts] Google TTS libs indisponíveis: %s", e)
-        _google_tts_client = None
-        return None
-
-    creds_json = (
-        os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
-        or os.getenv("FIREBASE_SERVICE_ACCOUNT_JSON")
-        or os.getenv("FIREBASE_CREDENTIALS_JSON")
-    )
-    if creds_json:
-        try:
-            info = json.loads(creds_json)
-            creds = service_account.Credentials.from_service_account_info(info)
-            _google_tts_client = texttospeech.TextToSpeechClient(credentials=creds)
-            _google_tts_cred_used = "inline_json"
-            return _google_tts_client
-        except Exception as e:
-            log.info("[providers.tts] credenciais inline JSON falharam: %s", e)
-
     try:
-        from google.cloud import texttospeech  # reimport harmless
-        _google_tts_client = texttospeech.TextToSpeechClient()
-        _google_tts_cred_used = "adc"
+        from services import speech_clients  # type: ignore
+        _google_tts_client = speech_clients.get_tts_client(creds="inline_first")
+        _google_tts_cred_used = (speech_clients.stats().get("tts/inline_first") or {}).get("cred")
         return _google_tts_client
     except Exception as e:
-        log.info("[providers.tts] Google TTS ADC indisponível: %s", e)
+        log.info("[providers.tts] Google TTS indisponível: %s", e)
         _google_tts_client = None
         _google_tts_cred_used = None
         return None
@@ -229,6 +229,15 @@ def _update_acervo_meta(uid: str, delta_bytes: int) -> None:
     db.run_transaction(_txn)
 
 
+def _bump_acervo_version(uid: str) -> None:
+    """Invalida índice/caches do acervo do uid (services.acervo_index). Nunca quebra a rota."""
+    try:
+        from services.acervo_index import bump_version  # type: ignore
+        bump_version(uid, db)
+    except Exception:
+        logging.exception("Falha ao versionar acervo (uid=%s)", uid)
+
+
 # -------- endpoints --------
 
 @bp_acervo.route("/api/acervo", methods=["GET"])
@@ -382,6 +391,7 @@ def criar_acervo_upload():
         }
 
         doc_ref.set(doc_data)
+        _bump_acervo_version(uid)
 
         # Enfileira indexação (Cloud Tasks). Se falhar, não quebra upload.
         try:
@@ -518,6 +528,7 @@ def criar_acervo_texto():
         }
 
         doc_ref.set(doc_data)
+        _bump_acervo_version(uid)
 
         # atualiza meta de quota
         try:
@@ -605,6 +616,7 @@ def atualizar_acervo(acervo_id: str):
         updates["atualizadoEm"] = firestore.SERVER_TIMESTAMP
 
         doc_ref.update(updates)
+        _bump_acervo_version(uid)
 
         # devolve o doc reidratado
         snap = doc_ref.get()
@@ -667,3 +679,20 @@ def consultar_acervo():
     except Exception as e:
         logging.exception("Erro ao consultar acervo (mini-RAG)")
         return _no_store(jsonify({"error": "internal_error", "details": str(e)})), 500
+
+
+@bp_acervo.route("/api/acervo/query/cache", methods=["GET"])
+def cache_consulta_acervo():
+    """
+    Hit ratio dos caches de consulta do acervo para o MEI logado
+    (embedding da pergunta e respostas por versão do acervo).
+    """
+    uid = _get_uid()
+    if not uid:
+        return _no_store(jsonify({"error": "unauthenticated"})), 401
+    try:
+        from services import acervo_query_cache  # type: ignore
+        return _no_store(jsonify({"ok": True, **acervo_query_cache.stats(uid)["uid"]})), 200
+    except Exception as e:
+        logging.exception("Erro ao ler stats do cache do acervo")
+        return _no_store(jsonify({"error": "internal_error", "details": str(e)})), 500
@@ -10,7 +10,9 @@ from flask import Blueprint, request, jsonify
 from services.db import db  # LazyFirestore
 from services.gcs_handler import download_bytes  # já existe no teu projeto :contentReference[oaicite:0]{index=0}
 from services.storage_gcs import upload_acervo_bytes_and_get_url  # teu helper canônico
-from services.text_extract import extract_text_from_bytes
+from services.storage_gcs import get_blob_generation, upload_private_bytes
+from services import acervo_chunks
+from services.text_extract import extract_with_report
 
 logger = logging.getLogger("mei_robo.tasks.acervo")
 
@@ -72,15 +74,27 @@ def task_acervo_index():
 
     try:
         raw = download_bytes(orig_path) if orig_path else b""
-        text, kind = extract_text_from_bytes(raw, filename if "." in filename else f"{filename}.{tipo}")
+        # extração em streaming com orçamento (páginas/caracteres/tempo); PDF pode usar processos
+        max_chars = int(os.getenv("ACERVO_INDEX_MAX_CHARS", "300000") or 300000)
+        text, kind, extract = extract_with_report(
+            raw,
+            filename if "." in filename else f"{filename}.{tipo}",
+            max_pages=int(os.getenv("ACERVO_EXTRACT_MAX_PAGES", "300") or 300),
+            max_chars=max_chars,
+            time_budget_sec=float(os.getenv("ACERVO_EXTRACT_TIME_BUDGET_SEC", "20") or 20),
+            workers=int(os.getenv("ACERVO_EXTRACT_WORKERS", "0") or 0),
+        )
+        logger.info("[acervo-index] extração uid=%s id=%s %s", uid, acervo_id, extract.as_dict())
 
         if not text or len(text) < 80:
             raise RuntimeError("texto_extraido_vazio_ou_curto")
 
-        # magrinho: até 20k chars, com cabeçalho
+        # texto inteiro (até ACERVO_INDEX_MAX_CHARS) em chunks sobrepostos
         body = text.strip()
-        if len(body) > 20000:
-            body = body[:20000]
+        if len(body) > max_chars:
+            body = body[:max_chars]
+        spans = acervo_chunks.split_chunks(body)
+        body = body[:spans[-1][1]] if spans else body
 
         magrinho_md = f"# {item.get('titulo') or 'Acervo'}\n\n{body}\n"
 
@@ -92,6 +106,8 @@ def task_acervo_index():
             magrinho_md.encode("utf-8"),
             "text/markdown; charset=utf-8",
         )
+        # geração do .md: chave do cache de texto (services.acervo_text_cache)
+        consulta_gen = get_blob_generation(consulta_gcs_path)
 
         # resumo + tags + embedding
         resumo_curto = ""
@@ -101,7 +117,7 @@ def task_acervo_index():
             prompt = (
                 "Resuma em 2-4 bullets curtas (máx 400 caracteres) o conteúdo abaixo. "
                 "Sem floreio, direto. Conteúdo:\n\n"
-                + body[:6000]
+                + acervo_chunks.summary_source(body, spans, 6000)
             )
             resumo_curto = gpt_mini_complete(prompt, max_tokens=180)
         except Exception:
@@ -111,12 +127,25 @@ def task_acervo_index():
         if not tags:
             tags = _mk_tags(body)
 
+        # embeddings dos chunks em lote → sidecar float16 no GCS; doc = média dos chunks
         embedding = None
+        chunks_path = None
+        chunks_gen = None
         try:
-            from services.embeddings import get_mini_embedding  # novo
-            embedding = get_mini_embedding(body[:12000])
+            from services.embeddings import get_mini_embeddings  # novo
+            vectors = get_mini_embeddings([body[a:b] for a, b in spans])
+            if vectors:
+                embedding = acervo_chunks.mean_vector(vectors)
+                chunks_path = acervo_chunks.sidecar_path(uid, acervo_id)
+                model = (os.getenv("ACERVO_EMBEDDINGS_MODEL") or "text-embedding-3-small").strip()
+                chunks_gen = upload_private_bytes(
+                    chunks_path,
+                    acervo_chunks.build_sidecar(body, spans, vectors, model),
+                    "application/json",
+                )
         except Exception:
-            embedding = None
+            logger.exception("acervo-index: embeddings/sidecar dos chunks falharam")
+            chunks_path, chunks_gen = None, None
 
         from google.cloud import firestore  # type: ignore
         now = firestore.SERVER_TIMESTAMP
@@ -124,15 +153,27 @@ def task_acervo_index():
         ref.set({
             "storageConsultaPath": consulta_gcs_path,
             "storageConsultaUrl": consulta_url,
+            "storageConsultaGeneration": consulta_gen,
             "resumoCurto": resumo_curto,
             "tags": tags,
             "embedding": embedding,
+            "chunkCount": len(spans) if chunks_path else 0,
+            "chunksPath": chunks_path,
+            "chunksGeneration": chunks_gen,
+            "indexExtract": extract.as_dict(),
             "ultimaIndexacao": now,
             "indexStatus": "ready",
             "indexError": None,
             "atualizadoEm": now,
         }, merge=True)
 
+        # novo embedding/resumo: índice do acervo (services.acervo_index) expira
+        try:
+            from services.acervo_index import bump_version
+            bump_version(uid, db)
+        except Exception:
+            logger.exception("acervo-index: bump de versão falhou")
+
         return jsonify({"ok": True, "uid": uid, "acervoId": acervo_id, "status": "ready"}), 200
 
     except Exception as e:
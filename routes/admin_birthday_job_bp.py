@@ -2,10 +2,11 @@
 # Admin job: envio diário de aniversários (MVP)
 # Rota: POST /admin/jobs/birthday
 #
-# Regras:
+# Regras (execução em services/birthday_job):
 # - Usa template aprovado (YCloud) fora da janela de 24h.
 # - Dedup por: birthday.lastSentYear == ano atual OU log birthday_logs/YYYYMMDD_<contatoId>
 # - Só envia se consentimento.status == "consentido" (ou consentimento.status)
+# - collection group "clientes", pool de envio com rate limit, logs em batch, cursor por dia
 #
 from __future__ import annotations
 
@@ -13,12 +14,13 @@ import os
 import base64
 import json
 import logging
-from datetime import datetime, timezone
+from datetime import datetime
 from zoneinfo import ZoneInfo
 from flask import Blueprint, request, jsonify
 
 from services.db import db  # firestore client (projeto)
 from services.wa_send import send_template
+from services.birthday_job import run_birthday_job
 
 logger = logging.getLogger("mei_robo.birthday_job")
 
@@ -55,33 +57,6 @@ def _is_admin(req) -> tuple[bool, str | None]:
     return True, uid
 
 
-def _first_name(contact: dict) -> str:
-    # preferência: comoChama, senão nome (primeira palavra)
-    s = (contact.get("comoChama") or contact.get("nome") or "").strip()
-    if not s:
-        return "você"
-    return s.split()[0][:40]
-
-
-def _get_consent_status(contact: dict) -> str:
-    # compat: contato pode ter "consent.status" OU "consentimento.status"
-    c1 = ((contact.get("consent") or {}) if isinstance(contact.get("consent"), dict) else {})
-    c2 = ((contact.get("consentimento") or {}) if isinstance(contact.get("consentimento"), dict) else {})
-    st = (c1.get("status") or c2.get("status") or "").strip().lower()
-    return st or "pendente"
-
-
-def _get_phone(contact: dict) -> str:
-    # preferir telefone_v2.msisdn (canônico)
-    tv2 = contact.get("telefone_v2") or {}
-    if isinstance(tv2, dict):
-        msisdn = (tv2.get("msisdn") or "").strip()
-        if msisdn:
-            return msisdn
-    # fallback: telefone raw
-    return (contact.get("telefone") or "").strip()
-
-
 @admin_birthday_job_bp.route("/admin/jobs/birthday", methods=["POST", "OPTIONS"])
 def admin_jobs_birthday():
     if request.method == "OPTIONS":
@@ -104,13 +79,7 @@ def admin_jobs_birthday():
     if isinstance(body, dict) and "dry_run" in body:
         dry_run = bool(body.get("dry_run"))
 
-    now_sp = datetime.now(_TZ)
-    day = int(now_sp.day)
-    month = int(now_sp.month)
-    year = int(now_sp.year)
-    yyyymmdd = now_sp.strftime("%Y%m%d")
-
-    # allowlist de UIDs (MVP seguro)
+    # allowlist de UIDs (MVP seguro); sem allowlist → collection group "clientes"
     allow_uids = [x.strip() for x in (os.environ.get("BIRTHDAY_UID_ALLOWLIST") or "").split(",") if x.strip()]
     if isinstance(body, dict) and body.get("uid_allowlist"):
         # opcional via body
@@ -119,150 +88,19 @@ def admin_jobs_birthday():
         except Exception:
             pass
 
-    # lista de profissionais
-    prof_col = db.collection("profissionais")
-
-    uids: list[str] = []
-    if allow_uids:
-        uids = allow_uids
-    else:
-        # fallback: varrer tudo (não recomendado em escala, mas ok no MVP)
-        for snap in prof_col.stream():
-            if snap and snap.id:
-                uids.append(snap.id)
-
-    sent = 0
-    skipped = 0
-    errors = 0
-    checked = 0
-
-    for puid in uids:
-        try:
-            clientes_col = prof_col.document(puid).collection("clientes")
-
-            # query pelos campos indexáveis do birthday (sem OR de consentimento)
-            q = (
-                clientes_col
-                .where("birthday.month", "==", month)
-                .where("birthday.day", "==", day)
-                .where("birthday.enabled", "==", True)
-            )
-
-            for doc in q.stream():
-                checked += 1
-                cid = doc.id
-                c = doc.to_dict() or {}
-
-                # consentimento
-                if _get_consent_status(c) != "consentido":
-                    skipped += 1
-                    continue
-
-                bday = c.get("birthday") or {}
-                last_year = None
-                try:
-                    last_year = int(bday.get("lastSentYear")) if (isinstance(bday, dict) and bday.get("lastSentYear") is not None) else None
-                except Exception:
-                    last_year = None
-                if last_year == year:
-                    skipped += 1
-                    continue
-
-                log_id = f"{yyyymmdd}_{cid}"
-                log_ref = prof_col.document(puid).collection("birthday_logs").document(log_id)
-                if log_ref.get().exists:
-                    skipped += 1
-                    continue
-
-                phone = _get_phone(c)
-                if not phone:
-                    # sem telefone => não envia
-                    log_ref.set({
-                        "sentAt": datetime.now(timezone.utc),
-                        "template": template,
-                        "status": "skipped_no_phone",
-                        "error": "missing_phone",
-                        "contactId": cid,
-                        "uid": puid,
-                    }, merge=True)
-                    skipped += 1
-                    continue
-
-                name = _first_name(c)
-                params = [{"type": "text", "text": name}]
-
-                if dry_run:
-                    # só loga
-                    log_ref.set({
-                        "sentAt": datetime.now(timezone.utc),
-                        "template": template,
-                        "status": "dry_run",
-                        "error": "",
-                        "contactId": cid,
-                        "uid": puid,
-                        "to": phone,
-                        "param1": name,
-                    }, merge=True)
-                    # marca lastSentYear mesmo no dry_run? melhor NÃO.
-                    sent += 0
-                    continue
-
-                ok_send, resp = send_template(
-                    to=phone,
-                    template_name=template,
-                    params=params,
-                    language_code="pt_BR",
-                )
-
-                if ok_send:
-                    sent += 1
-                    log_ref.set({
-                        "sentAt": datetime.now(timezone.utc),
-                        "template": template,
-                        "status": "sent",
-                        "error": "",
-                        "contactId": cid,
-                        "uid": puid,
-                        "to": phone,
-                        "resp": resp,
-                    }, merge=True)
-
-                    # atualiza lastSentYear (merge)
-                    clientes_col.document(cid).set({
-                        "birthday": {
-                            "lastSentYear": year
-                        },
-                        "updatedAt": datetime.now(timezone.utc),
-                    }, merge=True)
-
-                else:
-                    errors += 1
-                    log_ref.set({
-                        "sentAt": datetime.now(timezone.utc),
-                        "template": template,
-                        "status": "error",
-                        "error": "send_failed",
-                        "contactId": cid,
-                        "uid": puid,
-                        "to": phone,
-                        "resp": resp,
-                    }, merge=True)
-
-        except Exception as e:
-            errors += 1
-            logger.exception("[birthday_job] uid=%s failed: %s", puid, e)
-
-    return jsonify({
-        "ok": True,
-        "day": day,
-        "month": month,
-        "year": year,
-        "date": yyyymmdd,
-        "template": template,
-        "dry_run": dry_run,
-        "uids": len(uids),
-        "checked": checked,
-        "sent": sent,
-        "skipped": skipped,
-        "errors": errors,
-    }), 200
+    try:
+        budget = float((body.get("budgetSec") if isinstance(body, dict) else None) or os.environ.get("BIRTHDAY_BUDGET_SEC") or 20)
+    except Exception:
+        budget = 20.0
+
+    # resumível: chamar de novo no mesmo dia continua do cursor (complete=false)
+    out = run_birthday_job(
+        db,
+        send_template,
+        now=datetime.now(_TZ),
+        template=template,
+        dry_run=dry_run,
+        uids=allow_uids or None,
+        time_budget_sec=max(1.0, min(budget, 25.0)),
+    )
+    return jsonify(out), 200
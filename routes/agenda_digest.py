@@ -280,13 +280,20 @@ def _is_workday(uid: str, date_str: str, tz: str) -> bool:
     Verifica se a data está em diasAtendimento.
     Mapeamento: 1=Seg ... 7=Dom.
     """
+    try:
+        return _is_workday_cfg(_load_agenda_cfg(uid), date_str, tz)
+    except Exception:
+        return True
+
+
+def _is_workday_cfg(cfg: dict, date_str: str, tz: str) -> bool:
+    """Mesma regra de _is_workday com a config já carregada (digest em lote)."""
     try:
         tzinfo = pytz.timezone(tz or "America/Sao_Paulo")
         dt = datetime.strptime(date_str, "%Y-%m-%d")
         dt = tzinfo.localize(dt)
         dow = dt.weekday() + 1  # Monday=0 -> 1
-        cfg = _load_agenda_cfg(uid)
-        dias = cfg.get("diasAtendimento") or [1, 2, 3, 4, 5]
+        dias = (cfg or {}).get("diasAtendimento") or [1, 2, 3, 4, 5]
         return int(dow) in set(int(x) for x in dias if str(x).isdigit() or isinstance(x, int))
     except Exception:
         # safe-by-default: se falhar, considera workday (pra não “silenciar” tudo)
@@ -1,13 +1,12 @@
 # routes/agenda_reminders.py
 # GET /api/agenda/reminders/run?kind=whatsapp&hours_before=2
-# Envia lembretes via WhatsApp para compromissos a T+hours_before
+# Envia lembretes via WhatsApp para compromissos a T+hours_before (janela com tolerância,
+# ledger idempotente — ver services/reminder_scheduler)
 # Auth: Bearer padrão OU X-Debug-UID quando ALLOW_DEBUG_UID=1
 
 import os
 import logging
-from datetime import datetime, timedelta
 
-import pytz
 from flask import Blueprint, request, jsonify
 
 agenda_rem_bp = Blueprint("agenda_rem_bp", __name__, url_prefix="/api/agenda")
@@ -34,12 +33,12 @@ def _require_uid(req):
     return None
 
 
-# -------- Repo & WhatsApp sender --------
-_list_events_for = None
+# -------- Scheduler & WhatsApp sender --------
+_run_reminders = None
 try:
-    from services.agenda_repo import list_events_for as _list_events_for
+    from services.reminder_scheduler import run_reminders as _run_reminders
 except Exception:
-    _list_events_for = None
+    _run_reminders = None
 
 _send_text = None
 try:
@@ -58,6 +57,10 @@ def _parse_int(val, default: int) -> int:
 
 @agenda_rem_bp.route("/reminders/run", methods=["GET"])
 def reminders_run():
+    """
+    Compat: roda o scheduler (services/reminder_scheduler) só para o uid autenticado.
+    O job multi-tenant é POST /tasks/reminders/run.
+    """
     uid = _require_uid(request)
     if not uid:
         return jsonify({"ok": False, "error": "unauthorized"}), 401
@@ -68,41 +71,25 @@ def reminders_run():
 
     if kind != "whatsapp":
         return jsonify({"ok": False, "error": "kind_not_supported"}), 400
-    if not _list_events_for:
+    if not _run_reminders:
         return jsonify({"ok": False, "error": "repo_unavailable"}), 500
     if not _send_text:
         return jsonify({"ok": False, "error": "wa_sender_unavailable"}), 501
 
-    # Agora → busca compromissos que acontecerão em T+hours_before
-    zone = pytz.timezone(tz_str)
-    now = datetime.now(zone)
-    target_dt = now + timedelta(hours=hours_before)
-    target_date = target_dt.strftime("%Y-%m-%d")
-    target_hhmm = target_dt.strftime("%H:%M")
-
     try:
-        events = _list_events_for(uid, target_date, tz_str) or []
-        to_remind = [e for e in events if e.get("hhmm") == target_hhmm and (e.get("status") or "agendado") == "agendado"]
+        from services.db import db  # LazyFirestore
+        out = _run_reminders(db, _send_text, lead_min=hours_before * 60, uid=uid, tz_str=tz_str)
     except Exception:
-        logging.exception("[agenda_reminders] falha ao listar eventos")
+        logging.exception("[agenda_reminders] falha ao rodar lembretes")
+        return jsonify({"ok": False, "error": "list_failed"}), 500
+    if not out.get("ok"):
         return jsonify({"ok": False, "error": "list_failed"}), 500
 
-    sent = []
-    errors = []
-    for ev in to_remind:
-        cli = ev.get("cliente") or {}
-        to = cli.get("whatsapp")
-        if not to:
-            continue
-        svc = ev.get("service_id") or "serviço"
-        date = ev.get("date") or target_date
-        hhmm = ev.get("hhmm") or target_hhmm
-        body = f"⏰ Lembrete: {svc} hoje às {hhmm}. Qualquer imprevisto, me avise por aqui. Até já!"
-        try:
-            _send_text(to, body)
-            sent.append({"to": to, "date": date, "hhmm": hhmm})
-        except Exception as e:
-            logging.exception("[agenda_reminders] send fail to=%s err=%s", to, e)
-            errors.append({"to": to, "error": str(e)})
-
-    return jsonify({"ok": True, "tz": tz_str, "hours_before": hours_before, "sent": sent, "errors": errors})
+    return jsonify({
+        "ok": True,
+        "tz": tz_str,
+        "hours_before": hours_before,
+        "sent": out.get("sentItems") or [],
+        "errors": out.get("errorItems") or [],
+        "duplicates": out.get("duplicates", 0),
+    })
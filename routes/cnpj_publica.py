@@ -5,7 +5,7 @@
 #   - GET /integracoes/cnpj/<cnpj>        (legado mantido)
 #
 # - Sem token (fonte pública), limite 3 req/min/IP na origem
-# - Cache em memória (TTL padrão 24h) — substituível por Redis
+# - Cache em memória (LRU limitado, TTL padrão 24h) — substituível por Redis
 # - Normaliza para o "esquema canônico" do MEI Robô
 # - Heurística por nome (?nome=...): EXATO | PROVAVEL | NAO_ENCONTRADO
 #
@@ -21,6 +21,8 @@ from typing import Any, Dict, Tuple, Optional, List
 
 from flask import Blueprint, request, jsonify, make_response
 
+from cache.lru import LRUCache
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Blueprint (sem prefixo para manter o legado) — expõe /api/cnpj e /integracoes/cnpj
 # ──────────────────────────────────────────────────────────────────────────────
@@ -31,7 +33,9 @@ CNPJWS_PUBLIC_BASE = "https://publica.cnpj.ws"
 HTTP_TIMEOUT = 8  # seconds
 CACHE_TTL_SECS = 24 * 60 * 60  # 24h
 
-_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}  # key: cnpj, val: (expiry_ts, payload)
+CACHE_MAX_ITEMS = int(os.getenv("CNPJ_CACHE_MAX_ITEMS", "5000") or "5000")
+
+_cache = LRUCache(max_items=CACHE_MAX_ITEMS, default_ttl=CACHE_TTL_SECS, name="cnpj_publica")  # key: cnpj
 
 # ====== CORS restrito somente para este blueprint ======
 _ALLOWED_ORIGINS = {
@@ -245,18 +249,10 @@ def _map_canonic(json_src: Dict[str, Any]) -> Dict[str, Any]:
     return canonic
 
 def _get_cached(cnpj: str) -> Optional[Dict[str, Any]]:
-    now = time.time()
-    item = _cache.get(cnpj)
-    if not item:
-        return None
-    exp, payload = item
-    if now > exp:
-        _cache.pop(cnpj, None)
-        return None
-    return payload
+    return _cache.get(cnpj)
 
 def _set_cache(cnpj: str, payload: Dict[str, Any]):
-    _cache[cnpj] = (time.time() + CACHE_TTL_SECS, payload)
+    _cache.set(cnpj, payload, ttl=CACHE_TTL_SECS)
 
 def _handle_cnpj_lookup(clean: str):
     # cache
@@ -13,3 +13,58 @@ def health():
         "ts": int(time.time()),
         "env": os.getenv("RENDER_SERVICE_NAME", "local")
     }), 200
+
+@health_bp.route("/health/cache", methods=["GET"])
+def health_cache():
+    # hit ratio por backend do cache.kv (só contadores em memória, sem tocar em Firestore)
+    try:
+        from cache import kv  # type: ignore
+        from cache.refreshing import stats_all  # type: ignore
+        return jsonify({
+            "ok": True,
+            "ts": int(time.time()),
+            "cache": kv.stats(),
+            "refreshing": stats_all(),
+        }), 200
+    except Exception as e:
+        return jsonify({"ok": False, "error": f"{type(e).__name__}"}), 200
+
+
+@health_bp.route("/health/cache/acervo", methods=["GET"])
+def health_cache_acervo():
+    # caches do acervo (índice, texto, chunks, embedding da pergunta, respostas) — agregados
+    try:
+        from services import acervo_index, acervo_text_cache, acervo_chunks, acervo_query_cache  # type: ignore
+        return jsonify({
+            "ok": True,
+            "ts": int(time.time()),
+            "index": acervo_index.stats(),
+            "text": acervo_text_cache.stats(),
+            "chunks": acervo_chunks.stats(),
+            "query": acervo_query_cache.stats(),
+        }), 200
+    except Exception as e:
+        return jsonify({"ok": False, "error": f"{type(e).__name__}"}), 200
+
+
+@health_bp.route("/health/cache/tts", methods=["GET"])
+def health_cache_tts():
+    # cache de áudio TTS (hits memória/GCS, misses, hit ratio, bytes poupados) + cache por frase
+    try:
+        from services import tts_cache, tts_sentences  # type: ignore
+        return jsonify({"ok": True, "ts": int(time.time()), "tts": tts_cache.stats(),
+                        "sentences": tts_sentences.stats()}), 200
+    except Exception as e:
+        return jsonify({"ok": False, "error": f"{type(e).__name__}"}), 200
+
+
+@health_bp.route("/health/speech", methods=["GET"])
+def health_speech():
+    # clientes Google Speech/TTS compartilhados (criado?, credencial, ms de criação, usos, falhas)
+    # + transcodificação de áudio recebido (backend, clipes, recusados, ms médio)
+    try:
+        from services import audio_transcode, speech_clients  # type: ignore
+        return jsonify({"ok": True, "ts": int(time.time()), "clients": speech_clients.stats(),
+                        "transcode": audio_transcode.stats()}), 200
+    except Exception as e:
+        return jsonify({"ok": False, "error": f"{type(e).__name__}"}), 200
@@ -0,0 +1,185 @@
+# routes/maintenance_tasks_bp.py
+# Jobs de manutenção (Cloud Scheduler / Cloud Tasks)
+# Rotas: POST /tasks/ttl-sweep, POST /tasks/agenda-index/verify, POST /tasks/reminders/run,
+#        POST /tasks/digest/run, POST /tasks/orcamentos/seed-counters
+#
+# - Auth: CLOUD_TASKS_SECRET (X-MR-Tasks-Secret), mesmo padrão de /tasks/acervo-index
+# - Body opcional: {"budgetSec": 20, "pageSize": 300, "targets": ["platform_wa_dedupe"], "dryRun": false}
+# - Resumível: cursor fica em platform_maintenance/ttl_sweeper; chamar de novo continua
+# - agenda-index/verify: {"uid": "...", "tz": "America/Sao_Paulo", "kind": "repo"|"bot", "rebuild": false}
+# - reminders/run: {"leadMin": 120, "holdSec": 0} — todos os tenants (Cloud Scheduler a cada 5–10 min)
+# - digest/run: {"kind": "agenda"|"orcamentos", "date": "YYYY-MM-DD", "tz": "...", "uids": [...],
+#   "dryRun": false, "budgetSec": 20} — resumível por cursor diário (platform_maintenance/digest_{kind})
+# - orcamentos/seed-counters: migração única do contador de numeração ({"uids": [...], "dryRun": false})
+from __future__ import annotations
+
+import os
+import logging
+
+from flask import Blueprint, request, jsonify
+
+from services.db import db  # LazyFirestore
+from services.ttl_sweeper import run_sweep
+from services import agenda_index
+from services.reminder_scheduler import run_reminders
+from services.digest_runner import run_digests, KINDS as DIGEST_KINDS
+from services.orcamento_counter import seed_counters
+
+logger = logging.getLogger("mei_robo.tasks.maintenance")
+
+maintenance_tasks_bp = Blueprint("maintenance_tasks_bp", __name__)
+
+
+def _auth_ok() -> bool:
+    secret = (os.environ.get("CLOUD_TASKS_SECRET") or "").strip()
+    got = (
+        (request.headers.get("X-MR-Tasks-Secret") or "").strip()
+        or (request.headers.get("X-CloudTasks-Secret") or "").strip()
+        or (request.headers.get("X-Cloudtasks-Secret") or "").strip()
+    )
+    return bool(secret and got and got == secret)
+
+
+@maintenance_tasks_bp.route("/tasks/ttl-sweep", methods=["GET", "POST"])
+def task_ttl_sweep():
+    if request.method == "GET":
+        return jsonify({"ok": True, "route": "/tasks/ttl-sweep", "methods": ["GET", "POST"]}), 200
+
+    if not _auth_ok():
+        logger.warning("[tasks] unauthorized ttl-sweep")
+        return jsonify({"ok": False, "error": "unauthorized"}), 401
+
+    data = request.get_json(silent=True) or {}
+    try:
+        budget = float(data.get("budgetSec") or os.environ.get("TTL_SWEEP_BUDGET_SEC") or 20)
+    except Exception:
+        budget = 20.0
+    try:
+        page_size = int(data.get("pageSize") or os.environ.get("TTL_SWEEP_PAGE_SIZE") or 300)
+    except Exception:
+        page_size = 300
+    only = data.get("targets") if isinstance(data.get("targets"), list) else None
+
+    # mantém folga para o timeout do gunicorn (30s)
+    budget = max(1.0, min(budget, 25.0))
+    try:
+        out = run_sweep(
+            db,
+            time_budget_sec=budget,
+            page_size=page_size,
+            only=only,
+            dry_run=bool(data.get("dryRun")),
+        )
+        return jsonify(out), 200
+    except Exception as e:
+        logger.exception("[tasks] ttl-sweep failed: %s", e)
+        return jsonify({"ok": False, "error": f"{type(e).__name__}"}), 500
+
+
+@maintenance_tasks_bp.route("/tasks/agenda-index/verify", methods=["POST"])
+def task_agenda_index_verify():
+    if not _auth_ok():
+        logger.warning("[tasks] unauthorized agenda-index/verify")
+        return jsonify({"ok": False, "error": "unauthorized"}), 401
+
+    data = request.get_json(silent=True) or {}
+    uid = (data.get("uid") or "").strip()
+    tz_str = (data.get("tz") or "America/Sao_Paulo").strip() or "America/Sao_Paulo"
+    kind = (data.get("kind") or "repo").strip().lower()
+    if not uid:
+        return jsonify({"ok": False, "error": "uid_required"}), 400
+    if kind not in agenda_index.KINDS:
+        return jsonify({"ok": False, "error": "invalid_kind"}), 400
+    try:
+        out = agenda_index.verify(uid, tz_str, db, kind=kind)
+        if data.get("rebuild") or not out.get("ok"):
+            out["rebuilt"] = agenda_index.rebuild(uid, tz_str, db, kind=kind).stats()
+        return jsonify(out), 200
+    except Exception as e:
+        logger.exception("[tasks] agenda-index/verify failed: %s", e)
+        return jsonify({"ok": False, "error": f"{type(e).__name__}"}), 500
+
+
+@maintenance_tasks_bp.route("/tasks/reminders/run", methods=["POST"])
+def task_reminders_run():
+    if not _auth_ok():
+        logger.warning("[tasks] unauthorized reminders/run")
+        return jsonify({"ok": False, "error": "unauthorized"}), 401
+
+    data = request.get_json(silent=True) or {}
+    try:
+        lead_min = int(data.get("leadMin") or os.environ.get("REMINDER_LEAD_MIN") or 120)
+    except Exception:
+        lead_min = 120
+    try:
+        hold = float(data.get("holdSec") or 0)
+    except Exception:
+        hold = 0.0
+    try:
+        from services.wa_send import send_text
+    except Exception as e:
+        logger.exception("[tasks] reminders/run sem sender: %s", e)
+        return jsonify({"ok": False, "error": "wa_sender_unavailable"}), 501
+    try:
+        # mesma folga do ttl-sweep para o timeout do gunicorn
+        out = run_reminders(db, send_text, lead_min=lead_min, hold_sec=max(0.0, min(hold, 20.0)))
+        return jsonify(out), (200 if out.get("ok") else 500)
+    except Exception as e:
+        logger.exception("[tasks] reminders/run failed: %s", e)
+        return jsonify({"ok": False, "error": f"{type(e).__name__}"}), 500
+
+
+@maintenance_tasks_bp.route("/tasks/digest/run", methods=["POST"])
+def task_digest_run():
+    if not _auth_ok():
+        logger.warning("[tasks] unauthorized digest/run")
+        return jsonify({"ok": False, "error": "unauthorized"}), 401
+
+    data = request.get_json(silent=True) or {}
+    kind = (data.get("kind") or "agenda").strip().lower()
+    if kind not in DIGEST_KINDS:
+        return jsonify({"ok": False, "error": "invalid_kind"}), 400
+    try:
+        budget = float(data.get("budgetSec") or os.environ.get("DIGEST_BUDGET_SEC") or 20)
+    except Exception:
+        budget = 20.0
+    uids = data.get("uids") if isinstance(data.get("uids"), list) else None
+    try:
+        out = run_digests(
+            db,
+            kind=kind,
+            date_str=(data.get("date") or "").strip() or None,
+            tz=(data.get("tz") or "America/Sao_Paulo").strip(),
+            dry_run=bool(data.get("dryRun")),
+            uids=[str(u) for u in uids] if uids else None,
+            time_budget_sec=max(1.0, min(budget, 25.0)),
+        )
+        return jsonify(out), (200 if out.get("ok") else 500)
+    except Exception as e:
+        logger.exception("[tasks] digest/run failed: %s", e)
+        return jsonify({"ok": False, "error": f"{type(e).__name__}"}), 500
+
+
+@maintenance_tasks_bp.route("/tasks/orcamentos/seed-counters", methods=["POST"])
+def task_orcamentos_seed_counters():
+    if not _auth_ok():
+        logger.warning("[tasks] unauthorized orcamentos/seed-counters")
+        return jsonify({"ok": False, "error": "unauthorized"}), 401
+
+    data = request.get_json(silent=True) or {}
+    try:
+        budget = float(data.get("budgetSec") or 20)
+    except Exception:
+        budget = 20.0
+    uids = data.get("uids") if isinstance(data.get("uids"), list) else None
+    try:
+        out = seed_counters(
+            db,
+            uids=[str(u) for u in uids] if uids else None,
+            dry_run=bool(data.get("dryRun")),
+            time_budget_sec=max(1.0, min(budget, 25.0)),
+        )
+        return jsonify(out), 200
+    except Exception as e:
+        logger.exception("[tasks] orcamentos/seed-counters failed: %s", e)
+        return jsonify({"ok": False, "error": f"{type(e).__name__}"}), 500
@@ -138,6 +138,53 @@ def _get_profissional_name(uid: str) -> str:
 
 
 # ---------------- Repo de orçamentos ----------------
+def _day_bounds_utc(date_str: str, tz: str):
+    """[início, fim) do dia local em UTC (createdAt é Timestamp UTC)."""
+    try:
+        zone = pytz.timezone(tz)
+    except Exception:
+        zone = pytz.timezone("America/Sao_Paulo")
+
+    try:
+        y, m, d = [int(x) for x in date_str.split("-")]
+        local_start = zone.localize(datetime(y, m, d, 0, 0, 0))
+    except Exception:
+        # fallback: hoje na tz
+        local_start = zone.localize(datetime.now(zone).replace(hour=0, minute=0, second=0, microsecond=0))
+
+    local_end = local_start + timedelta(days=1)
+    return local_start.astimezone(pytz.UTC), local_end.astimezone(pytz.UTC)
+
+
+def _item_from_doc(doc_id: str, d: dict) -> dict:
+    created = d.get("createdAt")
+    if hasattr(created, "isoformat"):
+        created_iso = created.isoformat()
+    else:
+        created_iso = str(created) if created else None
+
+    cliente_nome = d.get("clienteNome") or (d.get("cliente") or {}).get("nome") or ""
+    cliente_tipo = d.get("clienteTipo") or (d.get("cliente") or {}).get("tipo") or ""
+    canal = d.get("canalEnvio") or d.get("canal") or "whatsapp"
+    origem = d.get("origem") or "manual"
+    numero = d.get("numero") or doc_id
+    total = float(d.get("total") or 0.0)
+    moeda = d.get("moeda") or "BRL"
+
+    return {
+        "id": doc_id,
+        "numero": numero,
+        "clienteNome": cliente_nome,
+        "clienteTipo": cliente_tipo,
+        "canal": canal,
+        "origem": origem,
+        "total": total,
+        "total_fmt": _fmt_moeda(total, moeda),
+        "moeda": moeda,
+        "createdAt": created_iso,
+    }
+
+
 def _list_orcamentos_for(uid: str, date_str: str, tz: str):
     """
     Lista orçamentos do dia (janelinha do tz informado) em:
@@ -155,22 +202,7 @@ def _list_orcamentos_for(uid: str, date_str: str, tz: str):
         logging.warning("[orcamentos_digest] db ou uid ausente")
         return []
 
-    try:
-        zone = pytz.timezone(tz)
-    except Exception:
-        zone = pytz.timezone("America/Sao_Paulo")
-
-    try:
-        y, m, d = [int(x) for x in date_str.split("-")]
-        local_start = zone.localize(datetime(y, m, d, 0, 0, 0))
-    except Exception:
-        # fallback: hoje na tz
-        local_start = zone.localize(datetime.now(zone).replace(hour=0, minute=0, second=0, microsecond=0))
-
-    local_end = local_start + timedelta(days=1)
-
-    start_utc = local_start.astimezone(pytz.UTC)
-    end_utc = local_end.astimezone(pytz.UTC)
+    start_utc, end_utc = _day_bounds_utc(date_str, tz)
 
     col = (
         db.collection("profissionais")
@@ -195,37 +227,7 @@ def _list_orcamentos_for(uid: str, date_str: str, tz: str):
             logging.exception("[orcamentos_digest] fallback também falhou")
             return []
 
-    items = []
-    for doc in docs:
-        d = doc.to_dict() or {}
-        created = d.get("createdAt")
-        if hasattr(created, "isoformat"):
-            created_iso = created.isoformat()
-        else:
-            created_iso = str(created) if created else None
-
-        cliente_nome = d.get("clienteNome") or (d.get("cliente") or {}).get("nome") or ""
-        cliente_tipo = d.get("clienteTipo") or (d.get("cliente") or {}).get("tipo") or ""
-        canal = d.get("canalEnvio") or d.get("canal") or "whatsapp"
-        origem = d.get("origem") or "manual"
-        numero = d.get("numero") or doc.id
-        total = float(d.get("total") or 0.0)
-        moeda = d.get("moeda") or "BRL"
-
-        items.append({
-            "id": doc.id,
-            "numero": numero,
-            "clienteNome": cliente_nome,
-            "clienteTipo": cliente_tipo,
-            "canal": canal,
-            "origem": origem,
-            "total": total,
-            "total_fmt": _fmt_moeda(total, moeda),
-            "moeda": moeda,
-            "createdAt": created_iso,
-        })
-
-    return items
+    return [_item_from_doc(doc.id, doc.to_dict() or {}) for doc in docs]
 
 
 # ---------------- Formatação de linhas & preview ----------------
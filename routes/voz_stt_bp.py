@@ -9,12 +9,17 @@
 # - transcript vazio (mesmo com 200/ok) é tratado como falha real: empty_transcript
 # - retry leve para OGG_OPUS (WhatsApp): 2 tentativas com configs ligeiramente diferentes
 # - limiar mínimo de bytes configurável para evitar STT em áudio curto/silêncio
+# - SpeechClient compartilhado (services.speech_clients); OGG_OPUS curto (<= STT_SYNC_MAX_SEC)
+#   usa recognize síncrono em vez de long_running_recognize + polling
 #
 # Obs: Mantém compatibilidade com o worker. Se ok=false, worker faz fallback humano e (quando entrada é áudio) responde em áudio.
 
 from flask import Blueprint, request, jsonify
 import os
 
+from services.audio_transcode import ogg_duration_sec
+from services.speech_clients import get_speech_client
+
 voz_stt_bp = Blueprint("voz_stt_bp", __name__)
 
 
@@ -115,11 +120,15 @@ def perform_stt_logic(raw: bytes, ctype: str) -> tuple[dict, int]:
 
         return speech.RecognitionConfig(**cfg_kwargs)
 
+    # Clipe curto (duração lida do último granule Ogg) → recognize síncrono, sem polling
+    ogg_sec = ogg_duration_sec(raw) if encoding == "OGG_OPUS" else None
+    ogg_sync = ogg_sec is not None and ogg_sec <= _env_int("STT_SYNC_MAX_SEC", 55)
+
     def _run_once(config):
-        client = speech.SpeechClient()
+        client = get_speech_client()
         audio = speech.RecognitionAudio(content=raw)
 
-        if encoding == "OGG_OPUS":
+        if encoding == "OGG_OPUS" and not ogg_sync:
             op = client.long_running_recognize(config=config, audio=audio)
             resp = op.result(timeout=_env_int("STT_OP_TIMEOUT", 25))
         else:
@@ -199,6 +208,8 @@ def perform_stt_logic(raw: bytes, ctype: str) -> tuple[dict, int]:
                 payload["debug"] = {
                     "ctype": ctype,
                     "bytes": len(raw),
+                    "oggSec": ogg_sec,
+                    "sync": ogg_sync,
                     "attempts": attempts_meta,
                 }
             return payload, 200
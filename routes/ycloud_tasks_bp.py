@@ -184,6 +184,8 @@ import requests
 
 from flask import Blueprint, request, jsonify
 
+from cache.refreshing import RefreshingValue
+
 from services.phone_utils import digits_only as _digits_only_c, to_plus_e164 as _to_plus_e164_c
 
 logger = logging.getLogger("mei_robo.ycloud_tasks")
@@ -287,9 +289,7 @@ _SUPPORT_TTS_CONCEPT_KB_MAX_CHARS = int(os.environ.get("SUPPORT_TTS_CONCEPT_KB_M
 # Humanização (nome só de vez em quando)
 _SUPPORT_NAME_MIN_GAP_SECONDS = int(os.environ.get("SUPPORT_NAME_MIN_GAP_SECONDS", "600") or "600")  # 10min
 
-# Cache leve do "persona pack" do Firestore
-_SUPPORT_PERSONA_CACHE: Dict[str, Any] = {}
-_SUPPORT_PERSONA_CACHE_AT: float = 0.0
+# Cache leve do "persona pack" do Firestore (RefreshingValue, ver _get_support_persona)
 _SUPPORT_PERSONA_CACHE_TTL = int(os.environ.get("SUPPORT_PERSONA_TTL_SECONDS", "600") or "600")
 
 # Memória em-processo (não persistente) para evitar repetir nome
@@ -523,6 +523,19 @@ try:
 except Exception:
     _tts_institutional_bytes_native = None  # type: ignore
 
+try:
+    from services.tts_fallback import eleven_degraded as _tts_eleven_degraded  # type: ignore
+    from services.tts_fallback import institutional_voice_tag as _tts_institutional_voice_tag  # type: ignore
+except Exception:
+    _tts_eleven_degraded = None  # type: ignore
+    _tts_institutional_voice_tag = None  # type: ignore
+
+# Cache de áudio TTS endereçado por conteúdo (ACKs e respostas repetidas)
+try:
+    from services import tts_cache as _tts_cache  # type: ignore
+except Exception:
+    _tts_cache = None  # type: ignore
+
 
 def _native_institutional_tts_bytes(*, text: str, voice_id: str = "", tts_owner: str = "worker", audio_debug: dict | None = None) -> bytes:
     """
@@ -600,6 +613,67 @@ def _upload_audio_bytes_to_signed_url(*, b: bytes, audio_debug: dict, tag: str =
         return ""
 
 
+def _tts_audio_url_cached(*, text: str, voice_id: str, audio_debug: dict, tag: str = "ttsAck",
+                          institutional: bool = True, empty_reason: str = "empty_audio_from_native",
+                          cache: bool = True) -> str:
+    """
+    Síntese + URL assinada via services.tts_cache: mesmo (texto, voz, provider) → mesmo objeto
+    no GCS, então ACKs/frases repetidas só re-assinam a URL (sem TTS nem upload).
+    cache=False (resposta livre ao lead/cliente): sem consulta nem gravação no cache, só o
+    upload avulso datado de sempre.
+    Áudio de fallback degradado (fallbackReason institucional / ElevenLabs em cooldown) não é
+    gravado no cache; cai no upload avulso de sempre (_upload_audio_bytes_to_signed_url).
+    """
+    if _tts_cache is None:
+        if institutional:
+            b = _native_institutional_tts_bytes(text=text, voice_id=voice_id, tts_owner="worker", audio_debug=audio_debug)
+        else:
+            b = _tts_bytes_native(text=text, voice_id=voice_id)
+        if b and len(b) > 256:
+            return _upload_audio_bytes_to_signed_url(b=b, audio_debug=audio_debug, tag=tag, ext="mp3", content_type="audio/mpeg")
+        audio_debug[tag] = {"ok": False, "reason": empty_reason}
+        return ""
+
+    google_institutional = institutional and _tts_institutional_bytes_native is not None
+
+    def _synth():
+        if institutional:
+            b = _native_institutional_tts_bytes(text=text, voice_id=voice_id, tts_owner="worker", audio_debug=audio_debug)
+        else:
+            b = _tts_bytes_native(text=text, voice_id=voice_id)
+        if google_institutional:
+            cacheable = not ((audio_debug or {}).get("institutionalVoice") or {}).get("fallbackReason")
+        else:
+            cacheable = not (_tts_eleven_degraded is not None and _tts_eleven_degraded())
+        if not b or len(b) <= 256:
+            return None
+        return (b, "audio/mpeg", cacheable)
+
+    if google_institutional and _tts_institutional_voice_tag is not None:
+        provider = _tts_institutional_voice_tag()
+    else:
+        provider = "tts_fallback"
+    url, info = _tts_cache.get_or_create_url(
+        text=text,
+        voice_id=voice_id,
+        provider=provider,
+        mime="audio/mpeg",
+        mode="worker",
+        synth=_synth,
+        expires_seconds=int(os.environ.get("SIGNED_URL_EXPIRES_SECONDS", "900") or "900"),
+        upload=lambda b, ct: _upload_audio_bytes_to_signed_url(b=b, audio_debug=audio_debug, tag=tag, ext="mp3", content_type=ct),
+        cache=cache,
+    )
+    if info.get("reason") == "empty_audio":
+        audio_debug[tag] = {"ok": False, "reason": empty_reason}
+        return ""
+    if info.get("object") and url:
+        audio_debug[tag] = {"ok": True, "mode": "tts_cache", "ct": "audio/mpeg", **info}
+    elif isinstance(audio_debug.get(tag), dict):
+        audio_debug[tag]["ttsCache"] = info
+    return url
+
+
 def _db():
     """Firestore client canônico: sempre via firebase_admin.
     - Determinístico em Render e Cloud Run.
@@ -636,110 +710,103 @@ def _sha1(s: str) -> str:
 
 
 
+def _load_support_persona() -> Dict[str, Any]:
+    """Lê platform_kb/support (doc) e extrai persona/tom/taboos. Erro propaga (mantém valor antigo)."""
+    db = _db_admin() or _db()
+    snap = db.collection("platform_kb").document("support").get()
+    data = snap.to_dict() or {}
+    return {
+        "persona_description": str(data.get("persona_description") or "").strip(),
+        "tone_rules": data.get("tone_rules") or [],
+        "taboos": data.get("taboos") or [],
+        "persona_spice": data.get("persona_spice") or {},
+    }
+
+_SUPPORT_PERSONA = RefreshingValue(_load_support_persona, ttl=_SUPPORT_PERSONA_CACHE_TTL, name="support_persona", default={})
+
 def _get_support_persona() -> Dict[str, Any]:
     """
-    Lê platform_kb/support (doc) e extrai persona/tom/taboos.
-    Cache TTL em memória do processo.
+    Persona/tom/taboos de platform_kb/support.
+    Cache em processo com refresh single-flight (stale-while-revalidate).
     """
-    global _SUPPORT_PERSONA_CACHE_AT, _SUPPORT_PERSONA_CACHE
-    now = time.time()
-    if _SUPPORT_PERSONA_CACHE and (now - (_SUPPORT_PERSONA_CACHE_AT or 0.0)) < _SUPPORT_PERSONA_CACHE_TTL:
-        return _SUPPORT_PERSONA_CACHE
-    try:
-        db = _db_admin() or _db()
-        snap = db.collection("platform_kb").document("support").get()
-        data = snap.to_dict() or {}
-        out = {
-            "persona_description": str(data.get("persona_description") or "").strip(),
-            "tone_rules": data.get("tone_rules") or [],
-            "taboos": data.get("taboos") or [],
-            "persona_spice": data.get("persona_spice") or {},
-        }
-        _SUPPORT_PERSONA_CACHE = out
-        _SUPPORT_PERSONA_CACHE_AT = now
-        return out
-    except Exception:
-        return _SUPPORT_PERSONA_CACHE or {}
+    return _SUPPORT_PERSONA.get() or {}
 
-_SALES_KB_CACHE: Dict[str, Any] = {}
-_SALES_KB_CACHE_AT: float = 0.0
 _SALES_KB_TTL = int(os.environ.get("SALES_KB_TTL_SECONDS", "600") or "600")
 
-def _get_sales_kb() -> Dict[str, Any]:
+def _load_sales_kb() -> Dict[str, Any]:
     """
     Lê platform_kb/sales (doc) e extrai tom/regras/segmentos/objeções/preços.
-    Cache TTL em memória do processo.
+    Erro propaga (RefreshingValue mantém o valor antigo).
     """
-    global _SALES_KB_CACHE_AT, _SALES_KB_CACHE
-    now = time.time()
-    if _SALES_KB_CACHE and (now - (_SALES_KB_CACHE_AT or 0.0)) < _SALES_KB_TTL:
-        return _SALES_KB_CACHE
-    try:
-        db = _db_admin() or _db()
-        snap = db.collection("platform_kb").document("sales").get()
-        data = snap.to_dict() or {}
-        # Mantém shape simples (Firestore é a verdade; IA decide como usar)
-        out = {
-            # Núcleo (já usado hoje)
-            "tone_rules": data.get("tone_rules") or [],
-            "behavior_rules": data.get("behavior_rules") or [],
-            "ethical_guidelines": data.get("ethical_guidelines") or [],
-            "identity_positioning": str(data.get("identity_positioning") or "").strip(),
-            "value_props": data.get("value_props") or [],
-            "how_it_works": data.get("how_it_works") or [],
-            "qualifying_questions": data.get("qualifying_questions") or [],
-            "pricing_behavior": data.get("pricing_behavior") or [],
-            "pricing_facts": data.get("pricing_facts") or {},
-            "pricing_teasers": data.get("pricing_teasers") or [],
-            "plans": data.get("plans") or {},
-            "segments": data.get("segments") or {},
-            "objections": data.get("objections") or {},
-
-            # Expansão do KB (Firestore é a verdade — evita “capar” vendas no áudio)
-            "availability_policy": data.get("availability_policy") or {},
-            "brand_guardrails": data.get("brand_guardrails") or [],
-            "closing_behaviors": data.get("closing_behaviors") or [],
-            "closing_guidance": data.get("closing_guidance") or [],
-            "closing_styles": data.get("closing_styles") or {},
-            "commercial_positioning": data.get("commercial_positioning") or {},
-            "conversation_limits": str(data.get("conversation_limits") or "").strip(),
-            "cta_variations": data.get("cta_variations") or [],
-            "depth_policy": str(data.get("depth_policy") or "").strip(),
-            "discovery_policy": data.get("discovery_policy") or [],
-            "empathy_triggers": data.get("empathy_triggers") or [],
-            "example_templates": data.get("example_templates") or {},
-            "how_it_works_long": data.get("how_it_works_long") or [],
-            "how_it_works_rich": data.get("how_it_works_rich") or {},
-            "steps": data.get("steps") or [],
-            "how_to_get_started": str(data.get("how_to_get_started") or "").strip(),
-            "how_to_get_started_long": str(data.get("how_to_get_started_long") or "").strip(),
-            "identity_disclosure": data.get("identity_disclosure") or {},
-            "intent_guidelines": data.get("intent_guidelines") or {},
-            "kb_catalog": data.get("kb_catalog") or {},
-            "kb_need_allowed": data.get("kb_need_allowed") or [],
-            "kb_policy": data.get("kb_policy") or {},
-            "memory_positioning": data.get("memory_positioning") or {},
-            "operational_capabilities": data.get("operational_capabilities") or {},
-            "operational_examples": data.get("operational_examples") or {},
-            "operational_examples_long": data.get("operational_examples_long") or {},
-            "operational_flows": data.get("operational_flows") or {},
-            "operational_value_scenarios": data.get("operational_value_scenarios") or {},
-            "process_facts": data.get("process_facts") or {},
-            "product_boundaries": data.get("product_boundaries") or [],
-            "sales_audio_modes": data.get("sales_audio_modes") or {},
-            "sales_energy": str(data.get("sales_energy") or "").strip(),
-            "sales_pills": data.get("sales_pills") or {},
-            "segment_pills": data.get("segment_pills") or {},
-            "support_scope": data.get("support_scope") or [],
-            "tone_rules_full": data.get("tone_rules") or [],  # compat/clareza
-            "value_in_action_blocks": data.get("value_in_action_blocks") or {},
-            "voice_positioning": data.get("voice_positioning") or {},
-        }
-        _SALES_KB_CACHE = out
-        _SALES_KB_CACHE_AT = now
-        return out
-    except Exception:
-        return _SALES_KB_CACHE or {}
+    db = _db_admin() or _db()
+    snap = db.collection("platform_kb").document("sales").get()
+    data = snap.to_dict() or {}
+    # Mantém shape simples (Firestore é a verdade; IA decide como usar)
+    return {
+        # Núcleo (já usado hoje)
+        "tone_rules": data.get("tone_rules") or [],
+        "behavior_rules": data.get("behavior_rules") or [],
+        "ethical_guidelines": data.get("ethical_guidelines") or [],
+        "identity_positioning": str(data.get("identity_positioning") or "").strip(),
+        "value_props": data.get("value_props") or [],
+        "how_it_works": data.get("how_it_works") or [],
+        "qualifying_questions": data.get("qualifying_questions") or [],
+        "pricing_behavior": data.get("pricing_behavior") or [],
+        "pricing_facts": data.get("pricing_facts") or {},
+        "pricing_teasers": data.get("pricing_teasers") or [],
+        "plans": data.get("plans") or {},
+        "segments": data.get("segments") or {},
+        "objections": data.get("objections") or {},
+
+        # Expansão do KB (Firestore é a verdade — evita “capar” vendas no áudio)
+        "availability_policy": data.get("availability_policy") or {},
+        "brand_guardrails": data.get("brand_guardrails") or [],
+        "closing_behaviors": data.get("closing_behaviors") or [],
+        "closing_guidance": data.get("closing_guidance") or [],
+        "closing_styles": data.get("closing_styles") or {},
+        "commercial_positioning": data.get("commercial_positioning") or {},
+        "conversation_limits": str(data.get("conversation_limits") or "").strip(),
+        "cta_variations": data.get("cta_variations") or [],
+        "depth_policy": str(data.get("depth_policy") or "").strip(),
+        "discovery_policy": data.get("discovery_policy") or [],
+        "empathy_triggers": data.get("empathy_triggers") or [],
+        "example_templates": data.get("example_templates") or {},
+        "how_it_works_long": data.get("how_it_works_long") or [],
+        "how_it_works_rich": data.get("how_it_works_rich") or {},
+        "steps": data.get("steps") or [],
+        "how_to_get_started": str(data.get("how_to_get_started") or "").strip(),
+        "how_to_get_started_long": str(data.get("how_to_get_started_long") or "").strip(),
+        "identity_disclosure": data.get("identity_disclosure") or {},
+        "intent_guidelines": data.get("intent_guidelines") or {},
+        "kb_catalog": data.get("kb_catalog") or {},
+        "kb_need_allowed": data.get("kb_need_allowed") or [],
+        "kb_policy": data.get("kb_policy") or {},
+        "memory_positioning": data.get("memory_positioning") or {},
+        "operational_capabilities": data.get("operational_capabilities") or {},
+        "operational_examples": data.get("operational_examples") or {},
+        "operational_examples_long": data.get("operational_examples_long") or {},
+        "operational_flows": data.get("operational_flows") or {},
+        "operational_value_scenarios": data.get("operational_value_scenarios") or {},
+        "process_facts": data.get("process_facts") or {},
+        "product_boundaries": data.get("product_boundaries") or [],
+        "sales_audio_modes": data.get("sales_audio_modes") or {},
+        "sales_energy": str(data.get("sales_energy") or "").strip(),
+        "sales_pills": data.get("sales_pills") or {},
+        "segment_pills": data.get("segment_pills") or {},
+        "support_scope": data.get("support_scope") or [],
+        "tone_rules_full": data.get("tone_rules") or [],  # compat/clareza
+        "value_in_action_blocks": data.get("value_in_action_blocks") or {},
+        "voice_positioning": data.get("voice_positioning") or {},
+    }
+
+_SALES_KB = RefreshingValue(_load_sales_kb, ttl=_SALES_KB_TTL, name="ycloud_sales_kb", default={})
+
+def _get_sales_kb() -> Dict[str, Any]:
+    """
+    KB de vendas (platform_kb/sales).
+    Cache em processo com refresh single-flight (stale-while-revalidate).
+    """
+    return _SALES_KB.get() or {}
 
 def _strip_links_for_audio(text: str) -> str:
     t = (text or "").strip()
@@ -1560,6 +1627,10 @@ def _make_tts_text(reply_text: str, display_name: str, *, add_acervo_cta: bool =
     return base.strip()
 
 
+# TTL (s) dos docs de dedupe do worker em platform_tasks_dedup (expiresAt → /tasks/ttl-sweep)
+_TASKS_DEDUP_TTL = int(os.environ.get("TASKS_DEDUP_TTL_SECONDS", "86400") or "86400")  # 24h
+
+
 def _idempotency_once(event_key: str, ttl_seconds: int = 86400) -> bool:
     """
     Retorna True se é primeira vez. False se já processou.
@@ -1642,6 +1713,7 @@ def ycloud_inbound_worker():
                         "dedupeBasis": _dedupe_basis,
                         "wamid": _wm,
                         "createdAt": _fs_admin().SERVER_TIMESTAMP,
+                        "expiresAt": time.time() + _TASKS_DEDUP_TTL,
                     },
                     merge=True,
                 )
@@ -1789,24 +1861,14 @@ def ycloud_flush_worker():
                     provider = payload.get("provider") or "ycloud"
                     audio_bytes, mime = download_media_bytes(provider, media)
                     if audio_bytes and len(audio_bytes) > 200 and perform_stt_logic is not None:
-                        from subprocess import Popen, PIPE
-                        p = Popen(
-                            [
-                                "ffmpeg",
-                                "-i", "pipe:0",
-                                "-ac", "1",
-                                "-ar", "16000",
-                                "-f", "wav",
-                                "pipe:1",
-                            ],
-                            stdin=PIPE,
-                            stdout=PIPE,
-                            stderr=PIPE,
-                        )
-                        wav_bytes, _ = p.communicate(audio_bytes)
+                        from services.audio_transcode import transcode as _transcode  # type: ignore
+                        tr = _transcode(audio_bytes)
+                        if tr.reason in ("too_large", "too_long"):
+                            logger.info("[tasks][flush] audio_rejected waKey=%s %s", wa_key, tr.as_dict())
+                            continue
                         stt_payload, stt_status = perform_stt_logic(
-                            wav_bytes if wav_bytes else audio_bytes,
-                            "audio/wav",
+                            tr.wav or audio_bytes,
+                            "audio/wav" if tr.wav else (tr.mime if tr.kind else (mime or "audio/ogg").split(";")[0].strip()),
                         )
                         if stt_status == 200 and bool(stt_payload.get("ok")):
                             transcript = str(stt_payload.get("transcript") or "").strip()
@@ -2640,6 +2702,7 @@ def _ycloud_inbound_worker_impl(*, event_key: str, payload: dict, data: dict):
                                     "wamid": _wm,
                                     "kind": "voice_ack",
                                     "createdAt": _fs_admin().SERVER_TIMESTAMP,
+                                    "expiresAt": time.time() + _TASKS_DEDUP_TTL,
                                 },
                                 merge=True,
                             )
@@ -2777,32 +2840,23 @@ def _ycloud_inbound_worker_impl(*, event_key: str, payload: dict, data: dict):
                                 stt_url = f"{base}/api/voz/stt"
 
                                 headers = {"Content-Type": ctype or "audio/ogg"}
-                                from subprocess import Popen, PIPE
-
-                                def normalize_audio_for_stt(raw: bytes) -> bytes:
-                                    p = Popen(
-                                        [
-                                            "ffmpeg",
-                                            "-i", "pipe:0",
-                                            "-ac", "1",
-                                            "-ar", "16000",
-                                            "-f", "wav",
-                                            "pipe:1",
-                                        ],
-                                        stdin=PIPE,
-                                        stdout=PIPE,
-                                        stderr=PIPE,
-                                    )
-                                    out, _ = p.communicate(raw)
-                                    return out if out else raw
-
-                                audio_bytes = normalize_audio_for_stt(audio_bytes)
-                                headers = {"Content-Type": "audio/wav"}
 
-                                if perform_stt_logic is not None:
+                                # WAV 16k mono em processo (PyAV / pool de ffmpeg), com guardas
+                                from services.audio_transcode import transcode as _transcode  # type: ignore
+                                tr = _transcode(audio_bytes)
+                                audio_debug["transcode"] = tr.as_dict()
+                                if tr.wav:
+                                    audio_bytes = tr.wav
+                                    headers = {"Content-Type": "audio/wav"}
+                                elif tr.kind:
+                                    headers = {"Content-Type": tr.mime}
+
+                                if tr.reason in ("too_large", "too_long"):
+                                    stt_err = f"audio_rejected:{tr.reason}"
+                                elif perform_stt_logic is not None:
                                     stt_payload, stt_status = perform_stt_logic(
                                         audio_bytes,
-                                        "audio/wav",
+                                        headers["Content-Type"],
                                     )
 
                                     if stt_status == 200:
@@ -4192,26 +4246,12 @@ def _ycloud_inbound_worker_impl(*, event_key: str, payload: dict, data: dict):
                             if (_tts_institutional_bytes_native or _tts_bytes_native) and voice_id:
                                 nm = (display_name or "").strip()
                                 ack = _build_ack_audio(nm)
-                                b = _native_institutional_tts_bytes(
+                                audio_url = _tts_audio_url_cached(
                                     text=ack,
                                     voice_id=voice_id,
-                                    tts_owner="worker",
                                     audio_debug=audio_debug,
+                                    tag="ttsAck",
                                 )
-                                if b and len(b) > 256:
-                                    audio_url = _upload_audio_bytes_to_signed_url(
-                                        b=b,
-                                        audio_debug=audio_debug,
-                                        tag="ttsAck",
-                                        ext="mp3",
-                                        content_type="audio/mpeg",
-                                    )
-                                else:
-                                    audio_debug["ttsAck"] = {
-                                        "ok": False,
-                                        "reason": "empty_audio_from_native",
-                                    }
-                                    audio_url = ""
                             elif not _tts_bytes_native:
                                 audio_debug["ttsAck"] = {
                                     "ok": False,
@@ -4251,27 +4291,12 @@ def _ycloud_inbound_worker_impl(*, event_key: str, payload: dict, data: dict):
                                     pass
 
                                 ack = _build_ack_audio(nm)
-                                b = _native_institutional_tts_bytes(
+                                audio_url = _tts_audio_url_cached(
                                     text=ack,
                                     voice_id=voice_id,
-                                    tts_owner="worker",
                                     audio_debug=audio_debug,
+                                    tag="ttsAck",
                                 )
-
-                                if b and len(b) > 256:
-                                    audio_url = _upload_audio_bytes_to_signed_url(
-                                        b=b,
-                                        audio_debug=audio_debug,
-                                        tag="ttsAck",
-                                        ext="mp3",
-                                        content_type="audio/mpeg",
-                                    )
-                                else:
-                                    audio_debug["ttsAck"] = {
-                                        "ok": False,
-                                        "reason": "empty_audio_from_native",
-                                    }
-                                    audio_url = ""
                             elif not _tts_bytes_native:
                                 audio_debug["ttsAck"] = {
                                     "ok": False,
@@ -4299,16 +4324,13 @@ def _ycloud_inbound_worker_impl(*, event_key: str, payload: dict, data: dict):
             nome_a_usar = ""
     # ==========================================================
             # TTS automático (universal): se entrou por áudio, deve sair por áudio.
-            # Se o wa_bot não devolveu audioUrl, geramos via /api/voz/tts.
+            # Se o wa_bot não devolveu audioUrl, geramos via TTS nativo (em processo).
             #
             # - customer (uid): usa vozClonada.voiceId se existir
             # - sales (uid vazio): usa INSTITUTIONAL_VOICE_ID (ENV) se existir
             # ==========================================================
             if msg_type in ("audio", "voice", "ptt") and (not audio_url) and reply_text and (not prefers_text):
                 try:
-                    base = _backend_base(request)
-                    tts_url = f"{base}/api/voz/tts"
-
                     voice_id = ""
                     if uid:
                         # voz do próprio MEI (se existir)
@@ -4632,15 +4654,6 @@ def _ycloud_inbound_worker_impl(*, event_key: str, payload: dict, data: dict):
                         except Exception:
                             pass
 
-                        def _call_tts(payload_text: str):
-                            return _post_internal_with_retry(
-                                url=tts_url,
-                                headers={"Accept": "application/json"},
-                                json_payload={"text": payload_text, "voice_id": voice_id},
-                                timeout=45,
-                                max_attempts=3,
-                            )
-
                         # ✅ Texto canônico falado (o que realmente vai pro TTS)
 
                         # 🔒 Blindagem final: nunca começar com "Fala!"
@@ -4728,33 +4741,16 @@ def _ycloud_inbound_worker_impl(*, event_key: str, payload: dict, data: dict):
                                         "retryLen": len(retry_text),
                                     }
 
-                                if not bool(locals().get("uid")):
-                                    b = _native_institutional_tts_bytes(
-                                        text=tts_text_final_used,
-                                        voice_id=voice_id,
-                                        tts_owner="worker",
-                                        audio_debug=audio_debug,
-                                    )
-                                else:
-                                    b = _tts_bytes_native(
-                                        text=tts_text_final_used,
-                                        voice_id=voice_id,
-                                    )
-
-                                if b and len(b) > 256:
-                                    audio_url = _upload_audio_bytes_to_signed_url(
-                                        b=b,
-                                        audio_debug=audio_debug,
-                                        tag="tts",
-                                        ext="mp3",
-                                        content_type="audio/mpeg",
-                                    )
-                                else:
-                                    audio_debug = dict(audio_debug or {})
-                                    audio_debug["tts"] = {
-                                        "ok": False,
-                                        "reason": "empty_audio_from_native_tts",
-                                    }
+                                audio_debug = dict(audio_debug or {})
+                                audio_url = _tts_audio_url_cached(
+                                    text=tts_text_final_used,
+                                    voice_id=voice_id,
+                                    audio_debug=audio_debug,
+                                    tag="tts",
+                                    institutional=not bool(locals().get("uid")),
+                                    empty_reason="empty_audio_from_native_tts",
+                                    cache=False,  # resposta livre: não repete, não fica guardada
+                                )
 
                             except Exception as e2:
                                 audio_debug = dict(audio_debug or {})
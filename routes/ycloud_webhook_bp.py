@@ -57,7 +57,12 @@ def _dedupe_once(key: str, ttl_seconds: int = 3600) -> bool:
         ref = db.collection("platform_wa_dedupe").document(key)
         if ref.get().exists:
             return False
-        ref.set({"createdAt": _now_ts(), "ttlSeconds": int(ttl_seconds)})
+        # expiresAt (epoch) é o campo que o /tasks/ttl-sweep usa para apagar
+        ref.set({
+            "createdAt": _now_ts(),
+            "ttlSeconds": int(ttl_seconds),
+            "expiresAt": time.time() + int(ttl_seconds),
+        })
         return True
     except Exception:
         return False
@@ -319,6 +324,8 @@ def ycloud_webhook_ingress():
                     "waKey": wa_key,
                     "updatedAt": admin_fs.SERVER_TIMESTAMP,
                     "updatedAtEpoch": time.time(),
+                    # renovado a cada mensagem; buffer parado além disso é varrido pelo /tasks/ttl-sweep
+                    "expiresAt": time.time() + int(os.getenv("WA_BUFFER_TTL_SECONDS", "604800") or "604800"),
                     "messagesById": {
                         item_key: {
                             "eventKey": event_key,
@@ -0,0 +1,242 @@
+# services/acervo_chunks.py
+# Chunks do acervo: corte do texto extraído em janelas sobrepostas + vetores compactos (float16).
+#
+# - split_chunks: janelas de ACERVO_CHUNK_CHARS com ACERVO_CHUNK_OVERLAP de sobreposição,
+#   fechando em parágrafo/frase/espaço quando possível; no máximo ACERVO_MAX_CHUNKS
+# - Sidecar JSON no GCS (profissionais/{uid}/acervo/_chunks/{id}.json): textos, spans e
+#   vetores L2-normalizados em float16/base64 — nada de arrays de floats no Firestore
+# - ChunkSet.best(q_emb | pergunta): melhores chunks de um doc (cosseno; sem embedding,
+#   overlap de tokens via services.acervo_lexical)
+# - load_many: sidecars parseados em LRU por (path, generation); faltas baixadas em paralelo
+
+from __future__ import annotations
+
+import os
+import json
+import math
+import base64
+import struct
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from cache.lru import LRUCache
+from services.acervo_lexical import fold_tokens
+
+try:
+    import numpy as _np  # opcional: decodificação/cosseno vetorizados
+except Exception:
+    _np = None
+
+logger = logging.getLogger("mei_robo.acervo_chunks")
+
+SIDECAR_VERSION = 1
+_BREAKS = ("\n\n", "\n", ". ", "? ", "! ", "; ", " ")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)) or default)
+    except Exception:
+        return default
+
+
+def chunk_chars() -> int:
+    return max(200, _env_int("ACERVO_CHUNK_CHARS", 900))
+
+
+def chunk_overlap() -> int:
+    return max(0, min(chunk_chars() // 2, _env_int("ACERVO_CHUNK_OVERLAP", 150)))
+
+
+def max_chunks() -> int:
+    return max(1, _env_int("ACERVO_MAX_CHUNKS", 300))
+
+
+def sidecar_path(uid: str, acervo_id: str) -> str:
+    return f"profissionais/{uid}/acervo/_chunks/{acervo_id}.json"
+
+
+# ---------- corte ----------
+def split_chunks(text: str, size: Optional[int] = None, overlap: Optional[int] = None,
+                 limit: Optional[int] = None) -> List[Tuple[int, int]]:
+    """Spans (início, fim) de janelas sobrepostas sobre text."""
+    size = size or chunk_chars()
+    overlap = chunk_overlap() if overlap is None else overlap
+    limit = limit or max_chunks()
+    n = len(text or "")
+    spans: List[Tuple[int, int]] = []
+    start = 0
+    while start < n and len(spans) < limit:
+        end = min(n, start + size)
+        if end < n:
+            floor = start + int(size * 0.6)
+            for sep in _BREAKS:
+                cut = text.rfind(sep, floor, end)
+                if cut >= 0:
+                    end = cut + len(sep)
+                    break
+        spans.append((start, end))
+        if end >= n:
+            break
+        nxt = max(end - overlap, start + 1)
+        # recomeça no início de uma palavra (dentro da sobreposição)
+        space = text.find(" ", nxt, end)
+        start = space + 1 if 0 <= space < end - 1 else nxt
+    return spans
+
+
+def summary_source(text: str, spans: Sequence[Tuple[int, int]], max_chars: int = 6000) -> str:
+    """Amostra do documento inteiro para o resumo: chunks espaçados do começo ao fim."""
+    if len(text) <= max_chars or not spans:
+        return text[:max_chars]
+    per = max(1, max_chars // max(1, spans[0][1] - spans[0][0]))
+    step = max(1.0, len(spans) / per)
+    picked = sorted({int(i * step) for i in range(per)} | {0})
+    parts, total = [], 0
+    for i in picked:
+        s, e = spans[min(i, len(spans) - 1)]
+        piece = text[s:e].strip()
+        if total + len(piece) > max_chars:
+            break
+        parts.append(piece)
+        total += len(piece)
+    return "\n[…]\n".join(parts)
+
+
+# ---------- vetores ----------
+def _normalized(vec: Sequence[Any]) -> List[float]:
+    v = [float(x) for x in vec]
+    n = math.sqrt(sum(x * x for x in v)) or 1.0
+    return [x / n for x in v]
+
+
+def mean_vector(vectors: Sequence[Sequence[float]]) -> Optional[List[float]]:
+    """Vetor do documento = média dos chunks normalizados (entra no ranking por doc)."""
+    if not vectors:
+        return None
+    dim = len(vectors[0])
+    acc = [0.0] * dim
+    for v in vectors:
+        for j, x in enumerate(_normalized(v)):
+            acc[j] += x
+    return _normalized(acc)
+
+
+def encode_f16(vectors: Sequence[Sequence[float]]) -> str:
+    flat: List[float] = []
+    for v in vectors:
+        flat.extend(_normalized(v))
+    return base64.b64encode(struct.pack(f"<{len(flat)}e", *flat)).decode("ascii")
+
+
+def decode_f16(b64: str, dim: int) -> Any:
+    raw = base64.b64decode(b64)
+    if _np is not None:
+        return _np.frombuffer(raw, dtype="<f2").astype(_np.float32).reshape(-1, dim)
+    flat = struct.unpack(f"<{len(raw) // 2}e", raw)
+    return [list(flat[i:i + dim]) for i in range(0, len(flat), dim)]
+
+
+def build_sidecar(text: str, spans: Sequence[Tuple[int, int]], vectors: Sequence[Sequence[float]],
+                  model: str = "") -> bytes:
+    dim = len(vectors[0]) if vectors else 0
+    body = {
+        "v": SIDECAR_VERSION,
+        "model": model,
+        "dim": dim,
+        "dtype": "float16",
+        "spans": [list(s) for s in spans],
+        "texts": [text[s:e] for s, e in spans],
+        "vectors": encode_f16(vectors) if vectors else "",
+    }
+    return json.dumps(body, separators=(",", ":")).encode("utf-8")
+
+
+class ChunkSet:
+    """Chunks de um doc: textos + matriz (float32) de vetores normalizados."""
+
+    def __init__(self, texts: List[str], matrix: Any = None, dim: int = 0):
+        self.texts = texts
+        self.matrix = matrix
+        self.dim = dim
+        self._tokens: Optional[List[set]] = None
+
+    @classmethod
+    def parse(cls, raw: str) -> "ChunkSet":
+        body = json.loads(raw)
+        dim = int(body.get("dim") or 0)
+        texts = [str(t) for t in body.get("texts") or []]
+        matrix = decode_f16(body["vectors"], dim) if dim and body.get("vectors") else None
+        if matrix is not None and len(matrix) != len(texts):
+            matrix, dim = None, 0
+        return cls(texts, matrix, dim)
+
+    def nbytes(self) -> int:
+        vec = len(self.texts) * self.dim * (4 if _np is not None else 24)
+        return vec + sum(len(t) for t in self.texts) + 64
+
+    def _lexical(self, pergunta: str) -> List[float]:
+        if self._tokens is None:
+            self._tokens = [set(fold_tokens(t)) for t in self.texts]
+        q = set(fold_tokens(pergunta))
+        return [float(len(q & toks)) for toks in self._tokens]
+
+    def best(self, q_emb: Optional[Sequence[Any]], pergunta: str = "", k: int = 2) -> List[Tuple[float, int]]:
+        """Top-k (score, índice) — cosseno quando há vetor compatível, senão overlap de termos."""
+        if not self.texts:
+            return []
+        scores: List[float]
+        if q_emb and self.matrix is not None and len(q_emb) == self.dim:
+            q = _normalized(q_emb)
+            if _np is not None:
+                scores = (self.matrix @ _np.asarray(q, dtype=_np.float32)).tolist()
+            else:
+                scores = [sum(a * b for a, b in zip(row, q)) for row in self.matrix]
+        else:
+            scores = self._lexical(pergunta)
+        order = sorted(range(len(scores)), key=lambda i: (-scores[i], i))[:max(1, k)]
+        return [(scores[i], i) for i in order]
+
+
+# ---------- cache de sidecars ----------
+_SETS = LRUCache(
+    max_items=_env_int("ACERVO_CHUNKS_MEM_MAX_DOCS", 500),
+    max_bytes=_env_int("ACERVO_CHUNKS_MEM_MAX_MB", 64) * 1024 * 1024,
+    default_ttl=float(_env_int("ACERVO_CHUNKS_MEM_TTL_SEC", 21600)),
+    name="acervo_chunks",
+    sizeof=lambda cs: cs.nbytes(),
+)
+
+
+def load_many(keys: Sequence[Tuple[str, Any]],
+              fetch: Callable[[str, Any], Optional[str]]) -> Dict[Tuple[str, Any], Optional[ChunkSet]]:
+    """ChunkSet por (sidecar_path, generation); faltas baixadas e parseadas em paralelo."""
+    out: Dict[Tuple[str, Any], Optional[ChunkSet]] = {}
+    missing = []
+    for key in dict.fromkeys(keys):
+        cs = _SETS.get(key)
+        out[key] = cs
+        if cs is None:
+            missing.append(key)
+
+    def _one(key):
+        try:
+            raw = fetch(key[0], key[1])
+            return ChunkSet.parse(raw) if raw else None
+        except Exception as e:
+            logger.info("[acervo_chunks] sidecar indisponível %s: %s", key[0], e)
+            return None
+
+    if missing:
+        workers = max(1, min(len(missing), _env_int("ACERVO_TEXT_FETCH_WORKERS", 4)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for key, cs in zip(missing, pool.map(_one, missing)):
+                out[key] = cs
+                if cs is not None:
+                    _SETS.set(key, cs)
+    return out
+
+
+def stats() -> Dict[str, Any]:
+    return _SETS.stats()
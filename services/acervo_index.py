@@ -0,0 +1,255 @@
+# services/acervo_index.py
+# Índice em memória do acervo por uid, versionado (usado por domain.acervo.query_acervo_for_uid).
+#
+# - Versão do acervo em profissionais/{uid}/acervoMeta/meta.version; bump_version() é chamado
+#   por task_acervo_index e pelas rotas de upload/texto/PATCH do acervo
+# - Índice = itens (sem o array embedding) + matriz float32 contígua de embeddings
+#   L2-normalizados: cosseno de todos os docs num único produto matriz·vetor
+# - Cache por uid (LRU) válido enquanto a versão não muda; a versão lida do Firestore fica
+#   em cache por ACERVO_VERSION_TTL_SEC (outras instâncias também fazem bump)
+# - ACERVO_INDEX_GCS=1: matriz + ids persistidos em profissionais/{uid}/acervo/_index/v{N}.npz;
+#   cold start lê o .npz e só os campos leves dos docs (select sem embedding)
+# - Sem NumPy: mesmas linhas normalizadas em listas, cosseno em Python (resultado igual)
+# - BM25 (services.acervo_lexical) construído junto, na mesma versão (titulo/tags/resumoCurto)
+# - bump_version também descarta o texto de consulta (services.acervo_text_cache) e as
+#   respostas (services.acervo_query_cache) do uid em cache
+
+from __future__ import annotations
+
+import io
+import os
+import math
+import threading
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from cache.lru import LRUCache
+from services.acervo_lexical import Bm25Index
+
+try:
+    import numpy as _np  # opcional: matriz float32
+except Exception:
+    _np = None
+
+logger = logging.getLogger("mei_robo.acervo_index")
+
+META_FIELDS = [
+    "titulo", "tags", "resumoCurto", "prioridade", "habilitado",
+    "storageConsultaPath", "storageConsultaUrl", "storageConsultaGeneration", "criadoEm",
+    "chunkCount", "chunksPath", "chunksGeneration",
+]
+
+_INDEXES = LRUCache(
+    max_items=int(os.getenv("ACERVO_INDEX_MAX_UIDS", "300") or 300),
+    default_ttl=float(os.getenv("ACERVO_INDEX_TTL_SEC", "1800") or 1800),
+    name="acervo_index",
+)
+_VERSIONS = LRUCache(
+    max_items=int(os.getenv("ACERVO_INDEX_MAX_UIDS", "300") or 300) * 4,
+    default_ttl=float(os.getenv("ACERVO_VERSION_TTL_SEC", "10") or 10),
+    name="acervo_index.version",
+)
+_LOCKS: Dict[str, threading.Lock] = {}
+_LOCKS_LOCK = threading.Lock()
+
+
+def _gcs_enabled() -> bool:
+    return (os.getenv("ACERVO_INDEX_GCS", "0") or "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _meta_ref(db, uid: str):
+    return db.collection("profissionais").document(uid).collection("acervoMeta").document("meta")
+
+
+def _uid_lock(uid: str) -> threading.Lock:
+    with _LOCKS_LOCK:
+        lock = _LOCKS.get(uid)
+        if lock is None:
+            lock = _LOCKS[uid] = threading.Lock()
+        return lock
+
+
+# ---------- versão ----------
+def get_version(uid: str, db) -> int:
+    cached = _VERSIONS.get(uid)
+    if cached is not None:
+        return cached
+    version = 0
+    try:
+        snap = _meta_ref(db, uid).get()
+        if getattr(snap, "exists", False):
+            version = int((snap.to_dict() or {}).get("version") or 0)
+    except Exception as e:
+        logger.info("[acervo_index] versão indisponível uid=%s: %s", uid, e)
+    _VERSIONS.set(uid, version)
+    return version
+
+
+def bump_version(uid: str, db=None) -> None:
+    """Marca o acervo do uid como alterado (índices e caches derivados expiram). Nunca levanta."""
+    # Increment antes de limpar: um get_version concorrente não pode reler (e recachear)
+    # a versão antiga depois do pop
+    try:
+        if db is None:
+            from services.db import db  # type: ignore
+        from google.cloud import firestore  # type: ignore
+
+        _meta_ref(db, uid).set({"version": firestore.Increment(1)}, merge=True)
+    except Exception as e:
+        logger.info("[acervo_index] bump falhou uid=%s: %s", uid, e)
+    _VERSIONS.pop(uid)
+    _INDEXES.pop(uid)
+    try:
+        from services import acervo_text_cache, acervo_query_cache  # type: ignore
+
+        acervo_text_cache.invalidate_uid(uid)
+        acervo_query_cache.invalidate_uid(uid)
+    except Exception as e:
+        logger.info("[acervo_index] invalidação de caches derivados falhou uid=%s: %s", uid, e)
+
+
+# ---------- índice ----------
+def _normalized(vec: Sequence[Any]) -> Optional[List[float]]:
+    try:
+        v = [float(x) for x in vec]
+    except Exception:
+        return None
+    n = math.sqrt(sum(x * x for x in v))
+    if not v or n == 0.0:
+        return None
+    return [x / n for x in v]
+
+
+class AcervoIndex:
+    """Itens do acervo de um uid + embeddings normalizados (linha i ↔ rows[i])."""
+
+    def __init__(self, uid: str, version: int, items: List[Dict[str, Any]],
+                 matrix: Any = None, rows: Optional[List[int]] = None, source: str = "firestore"):
+        self.uid = uid
+        self.version = int(version)
+        self.items = items
+        self.matrix = matrix
+        self.rows = rows or []
+        self.dim = (len(matrix[0]) if len(self.rows) else 0) if matrix is not None else 0
+        self.source = source
+        self.bm25 = Bm25Index.from_items(items)
+
+    @classmethod
+    def from_items(cls, uid: str, version: int, docs: List[Dict[str, Any]]) -> "AcervoIndex":
+        vecs: List[List[float]] = []
+        rows: List[int] = []
+        items: List[Dict[str, Any]] = []
+        dims: Dict[int, int] = {}
+        for it in docs:
+            emb = it.get("embedding")
+            if isinstance(emb, list) and emb:
+                dims[len(emb)] = dims.get(len(emb), 0) + 1
+        dim = max(dims, key=dims.get) if dims else 0
+        for i, it in enumerate(docs):
+            emb = it.get("embedding")
+            items.append({k: v for k, v in it.items() if k != "embedding"})
+            if isinstance(emb, list) and len(emb) == dim:
+                nv = _normalized(emb)
+                if nv is not None:
+                    rows.append(i)
+                    vecs.append(nv)
+        matrix: Any = None
+        if vecs:
+            matrix = _np.asarray(vecs, dtype=_np.float32) if _np is not None else vecs
+        return cls(uid, version, items, matrix, rows)
+
+    def cosine(self, q_emb: Optional[Sequence[Any]]) -> List[float]:
+        """Cosseno da pergunta contra cada item (0.0 sem embedding ou dimensão diferente)."""
+        out = [0.0] * len(self.items)
+        if not q_emb or self.matrix is None or len(q_emb) != self.dim:
+            return out
+        q = _normalized(q_emb)
+        if q is None:
+            return out
+        if _np is not None:
+            scores = self.matrix @ _np.asarray(q, dtype=_np.float32)
+            for r, s in zip(self.rows, scores.tolist()):
+                out[r] = s
+            return out
+        for r, row in zip(self.rows, self.matrix):
+            out[r] = sum(a * b for a, b in zip(row, q))
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {"uid": self.uid, "version": self.version, "items": len(self.items),
+                "vectors": len(self.rows), "dim": self.dim, "source": self.source, "bm25": self.bm25.stats()}
+
+
+# ---------- persistência opcional (GCS .npz) ----------
+def _blob(uid: str, version: int):
+    from services.storage_gcs import _get_client  # type: ignore
+
+    bucket = _get_client().bucket(os.getenv("STORAGE_BUCKET"))
+    return bucket.blob(f"profissionais/{uid}/acervo/_index/v{int(version)}.npz")
+
+
+def _save_npz(idx: AcervoIndex) -> None:
+    if _np is None or idx.matrix is None or not os.getenv("STORAGE_BUCKET"):
+        return
+    ids = _np.asarray([str(idx.items[r].get("id")) for r in idx.rows])
+    buf = io.BytesIO()
+    _np.savez(buf, matrix=idx.matrix, ids=ids)
+    try:
+        _blob(idx.uid, idx.version).upload_from_string(buf.getvalue(), content_type="application/octet-stream")
+    except Exception as e:
+        logger.info("[acervo_index] upload .npz falhou uid=%s: %s", idx.uid, e)
+
+
+def _load_npz(uid: str, version: int):
+    if _np is None or not os.getenv("STORAGE_BUCKET"):
+        return None
+    try:
+        raw = _blob(uid, version).download_as_bytes()
+        with _np.load(io.BytesIO(raw), allow_pickle=False) as z:
+            return z["matrix"].astype(_np.float32, copy=False), [str(x) for x in z["ids"].tolist()]
+    except Exception as e:
+        logger.info("[acervo_index] .npz indisponível uid=%s v=%s: %s", uid, version, e)
+        return None
+
+
+def _from_npz(uid: str, version: int, docs: List[Dict[str, Any]], matrix, ids: List[str]) -> Optional[AcervoIndex]:
+    pos = {str(it.get("id")): i for i, it in enumerate(docs)}
+    if any(i not in pos for i in ids):
+        return None  # acervo mudou sem bump: reconstrói
+    return AcervoIndex(uid, version, [dict(it) for it in docs], matrix, [pos[i] for i in ids], source="gcs")
+
+
+def get(uid: str, db, load_docs: Callable[..., List[Dict[str, Any]]]) -> AcervoIndex:
+    """
+    Índice da versão atual. load_docs(fields=None) devolve os docs do acervo
+    (com fields, só esses campos — usado no cold start a partir do .npz).
+    """
+    version = get_version(uid, db)
+    idx = _INDEXES.get(uid)
+    if idx is not None and idx.version == version:
+        return idx
+    with _uid_lock(uid):
+        idx = _INDEXES.get(uid)
+        if idx is not None and idx.version == version:
+            return idx
+        idx = None
+        gcs = _gcs_enabled() and version > 0  # v0 = acervo nunca versionado: sem blob confiável
+        if gcs:
+            hit = _load_npz(uid, version)
+            if hit is not None:
+                idx = _from_npz(uid, version, load_docs(fields=META_FIELDS), *hit)
+        if idx is None:
+            idx = AcervoIndex.from_items(uid, version, load_docs())
+            if gcs:
+                _save_npz(idx)
+        _INDEXES.set(uid, idx)
+        return idx
+
+
+def invalidate(uid: str) -> None:
+    _INDEXES.pop(uid)
+    _VERSIONS.pop(uid)
+
+
+def stats() -> Dict[str, Any]:
+    return {"indexes": _INDEXES.stats(), "versions": _VERSIONS.stats()}
@@ -0,0 +1,112 @@
+# services/acervo_lexical.py
+# Ranking lexical do acervo: tokenizador PT (sem acento, stopwords) + BM25 + fusão RRF.
+#
+# - fold_tokens: minúsculas, remove acentos (NFKD), quebra em não-alfanumérico, descarta
+#   stopwords/tokens de 1 letra e reduz plural simples ("cortes" → "corte", "opções" → "opcao")
+# - Bm25Index: construído uma vez por versão do acervo (services.acervo_index) a partir de
+#   titulo (peso 2), tags e resumoCurto; consulta só percorre as postings dos termos da pergunta
+# - rrf: reciprocal-rank fusion de várias listas ranqueadas (BM25 + cosseno)
+
+from __future__ import annotations
+
+import math
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+K1 = 1.2
+B = 0.75
+RRF_K = 60
+TITLE_WEIGHT = 2
+
+STOPWORDS = frozenset("""
+a o as os um uma uns umas de do da dos das em no na nos nas por pelo pela pelos pelas para pra pro
+com sem sob sobre entre ate apos e ou mas se que qual quais quando como onde porque pois ja nao sim
+eu tu ele ela nos vos eles elas voce voces meu minha meus minhas seu sua seus suas teu tua
+me te lhe lhes isso isto aquilo esse essa este esta aquele aquela ao aos
+ser sou e era foi sao estar estou esta estao ter tenho tem tinha ha vai vou fazer faz
+mais menos muito muita muitos muitas tambem so ainda bem ola oi gostaria quero queria saber
+""".split())
+
+_SPLIT = re.compile(r"[^a-z0-9]+")
+
+
+def fold(text: str) -> str:
+    s = unicodedata.normalize("NFKD", str(text or "").lower())
+    return "".join(ch for ch in s if not unicodedata.combining(ch))
+
+
+def _stem(tok: str) -> str:
+    if len(tok) > 4 and tok.endswith(("oes", "aes")):
+        return tok[:-3] + "ao"
+    if len(tok) > 3 and tok.endswith("s") and not tok.endswith("ss"):
+        return tok[:-1]
+    return tok
+
+
+def fold_tokens(text: str) -> List[str]:
+    return [_stem(t) for t in _SPLIT.split(fold(text)) if len(t) > 1 and t not in STOPWORDS]
+
+
+def item_tokens(item: Dict[str, Any]) -> List[str]:
+    toks = fold_tokens(str(item.get("titulo") or "")) * TITLE_WEIGHT
+    tags = item.get("tags") or []
+    if isinstance(tags, list):
+        for t in tags:
+            toks.extend(fold_tokens(str(t)))
+    toks.extend(fold_tokens(str(item.get("resumoCurto") or "")))
+    return toks
+
+
+class Bm25Index:
+    """Postings term -> [(doc, tf)] e comprimentos; score(query) devolve um float por doc."""
+
+    def __init__(self, docs_tokens: Sequence[Sequence[str]], k1: float = K1, b: float = B):
+        self.k1, self.b = float(k1), float(b)
+        self.n = len(docs_tokens)
+        self.lengths = [len(t) for t in docs_tokens]
+        self.avgdl = (sum(self.lengths) / self.n) if self.n else 0.0
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        for i, toks in enumerate(docs_tokens):
+            tf: Dict[str, int] = {}
+            for t in toks:
+                tf[t] = tf.get(t, 0) + 1
+            for t, c in tf.items():
+                self.postings.setdefault(t, []).append((i, c))
+        # idf BM25 (Lucene: sempre positivo)
+        self.idf = {t: math.log(1.0 + (self.n - len(p) + 0.5) / (len(p) + 0.5)) for t, p in self.postings.items()}
+
+    @classmethod
+    def from_items(cls, items: Iterable[Dict[str, Any]]) -> "Bm25Index":
+        return cls([item_tokens(it) for it in items])
+
+    def score(self, query: str) -> List[float]:
+        out = [0.0] * self.n
+        if not self.n or not self.avgdl:
+            return out
+        for t in set(fold_tokens(query)):
+            post = self.postings.get(t)
+            if not post:
+                continue
+            idf = self.idf[t]
+            for i, tf in post:
+                norm = self.k1 * (1.0 - self.b + self.b * self.lengths[i] / self.avgdl)
+                out[i] += idf * tf * (self.k1 + 1.0) / (tf + norm)
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {"docs": self.n, "terms": len(self.postings), "avgdl": round(self.avgdl, 2)}
+
+
+def ranks(scores: Sequence[float], min_score: float = 0.0) -> Dict[int, int]:
+    """doc -> posição (1 = melhor) entre os docs com score > min_score."""
+    order = sorted((i for i, s in enumerate(scores) if s > min_score), key=lambda i: (-scores[i], i))
+    return {i: r for r, i in enumerate(order, start=1)}
+
+
+def rrf(rankings: Iterable[Dict[int, int]], k: int = RRF_K) -> Dict[int, float]:
+    out: Dict[int, float] = {}
+    for rk in rankings:
+        for i, r in rk.items():
+            out[i] = out.get(i, 0.0) + 1.0 / (k + r)
+    return out
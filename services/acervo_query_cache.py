@@ -0,0 +1,119 @@
+# services/acervo_query_cache.py
+# Caches das perguntas ao acervo (usados por domain.acervo.query_acervo_for_uid).
+#
+# - Embedding da pergunta: chave (pergunta normalizada, modelo) — compartilhado entre uids
+#   (mesmo texto → mesmo vetor); ACERVO_QEMB_CACHE_MAX / ACERVO_QEMB_CACHE_TTL_SEC
+# - Resposta: chave (uid, pergunta normalizada, versão do acervo, max_tokens). A versão vem de
+#   services.acervo_index: qualquer bump (upload/texto/PATCH/re-index) muda a chave, então a
+#   resposta antiga nunca mais é servida; bump_version ainda descarta as entradas do uid
+# - Só respostas determinísticas para a versão entram no cache (ok / no_docs / no_relevant_docs)
+# - Normalização: minúsculas, sem acento, pontuação/espaços colapsados ("Qual o preço?" ==
+#   "qual o preco")
+# - stats(uid): hit ratio por uid dos dois caches (contadores em LRU limitado)
+
+from __future__ import annotations
+
+import os
+import re
+import copy
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from cache.lru import LRUCache
+from services.acervo_lexical import fold
+
+CACHEABLE_REASONS = ("ok", "no_docs", "no_relevant_docs")
+
+_EMB = LRUCache(
+    max_items=int(os.getenv("ACERVO_QEMB_CACHE_MAX", "5000") or 5000),
+    default_ttl=float(os.getenv("ACERVO_QEMB_CACHE_TTL_SEC", "86400") or 86400),
+    name="acervo.qemb",
+)
+_ANS = LRUCache(
+    max_items=int(os.getenv("ACERVO_ANSWER_CACHE_MAX", "5000") or 5000),
+    max_bytes=int(float(os.getenv("ACERVO_ANSWER_CACHE_MAX_MB", "16") or 16) * 1024 * 1024),
+    default_ttl=float(os.getenv("ACERVO_ANSWER_CACHE_TTL_SEC", "21600") or 21600),
+    name="acervo.answer",
+)
+_UID_STATS = LRUCache(max_items=int(os.getenv("ACERVO_QCACHE_STATS_UIDS", "2000") or 2000),
+                      name="acervo.qcache.uids")
+_STATS_LOCK = threading.Lock()
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_question(text: str) -> str:
+    return " ".join(t for t in _NON_WORD.split(fold(text)) if t)
+
+
+def _model() -> str:
+    return (os.getenv("ACERVO_EMBEDDINGS_MODEL") or "text-embedding-3-small").strip()
+
+
+def _count(uid: str, name: str) -> None:
+    with _STATS_LOCK:
+        row = _UID_STATS.get(uid)
+        if row is None:
+            row = {"emb_hits": 0, "emb_misses": 0, "ans_hits": 0, "ans_misses": 0}
+            _UID_STATS.set(uid, row)
+        row[name] += 1
+
+
+# ---------- embedding da pergunta ----------
+def get_embedding(uid: str, pergunta: str, compute: Callable[[str], Optional[List[float]]]) -> Optional[List[float]]:
+    """Embedding da pergunta via cache; compute(pergunta) só na falta (None não é cacheado)."""
+    norm = normalize_question(pergunta)
+    if not norm:
+        return compute(pergunta)
+    key = (norm, _model())
+    vec = _EMB.get(key)
+    if vec is not None:
+        _count(uid, "emb_hits")
+        return vec
+    _count(uid, "emb_misses")
+    vec = compute(pergunta)
+    if vec:
+        _EMB.set(key, vec)
+    return vec
+
+
+# ---------- resposta ----------
+def _answer_key(uid: str, pergunta: str, version: int, max_tokens: int):
+    return (uid, normalize_question(pergunta), int(version), int(max_tokens))
+
+
+def get_answer(uid: str, pergunta: str, version: int, max_tokens: int) -> Optional[Dict[str, Any]]:
+    hit = _ANS.get(_answer_key(uid, pergunta, version, max_tokens))
+    _count(uid, "ans_hits" if hit is not None else "ans_misses")
+    return copy.deepcopy(hit) if hit is not None else None
+
+
+def put_answer(uid: str, pergunta: str, version: int, max_tokens: int, result: Dict[str, Any]) -> bool:
+    if (result or {}).get("reason") not in CACHEABLE_REASONS or not normalize_question(pergunta):
+        return False
+    _ANS.set(_answer_key(uid, pergunta, version, max_tokens), copy.deepcopy(result))
+    return True
+
+
+def invalidate_uid(uid: str) -> int:
+    return _ANS.pop_matching(lambda key: key[0] == uid)
+
+
+def _ratio(h: int, m: int) -> float:
+    return round(h / (h + m), 4) if (h + m) else 0.0
+
+
+def stats(uid: Optional[str] = None) -> Dict[str, Any]:
+    out: Dict[str, Any] = {"embeddings": _EMB.stats(), "answers": _ANS.stats(), "uids": len(_UID_STATS)}
+    if uid is not None:
+        with _STATS_LOCK:
+            row = dict(_UID_STATS.get(uid) or {"emb_hits": 0, "emb_misses": 0, "ans_hits": 0, "ans_misses": 0})
+        row["emb_hit_ratio"] = _ratio(row["emb_hits"], row["emb_misses"])
+        row["ans_hit_ratio"] = _ratio(row["ans_hits"], row["ans_misses"])
+        out["uid"] = row
+    return out
+
+
+def clear() -> None:
+    _EMB.clear()
+    _ANS.clear()
+    _UID_STATS.clear()
@@ -0,0 +1,208 @@
+# services/acervo_text_cache.py
+# Cache do texto de consulta do acervo (consulta/<id>.md no GCS) usado no contexto "magrinho".
+#
+# - Chave: (gcs_path, generation). generation = storageConsultaGeneration gravado por
+#   task_acervo_index (objeto lido fixado nessa geração); sem ela, "v{versão do acervo}"
+# - Memória: LRU limitado por itens/bytes (ACERVO_TEXT_MEM_MAX_ITEMS / _MAX_MB)
+# - Disco: /tmp (ACERVO_TEXT_DISK_DIR), um arquivo por chave, agrupado por uid; total limitado
+#   em ACERVO_TEXT_DISK_MAX_MB (remove os de mtime mais antigo; leitura renova o mtime)
+# - get_many: faltas em memória/disco são baixadas em paralelo (ACERVO_TEXT_FETCH_WORKERS)
+# - invalidate_uid: chamado por acervo_index.bump_version (re-index / upload / PATCH)
+# - Leitura sem sucesso (None) não é cacheada
+
+from __future__ import annotations
+
+import os
+import hashlib
+import logging
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from cache.lru import LRUCache
+
+logger = logging.getLogger("mei_robo.acervo_text_cache")
+
+Key = Tuple[str, Any]
+
+_MEM = LRUCache(
+    max_items=int(os.getenv("ACERVO_TEXT_MEM_MAX_ITEMS", "2000") or 2000),
+    max_bytes=int(float(os.getenv("ACERVO_TEXT_MEM_MAX_MB", "16") or 16) * 1024 * 1024),
+    default_ttl=float(os.getenv("ACERVO_TEXT_MEM_TTL_SEC", "21600") or 21600),
+    name="acervo_text.mem",
+)
+_LOCK = threading.Lock()
+_STATS = {"disk_hits": 0, "disk_misses": 0, "fetches": 0, "fetch_errors": 0, "disk_evictions": 0}
+_DISK_BYTES: Optional[int] = None  # total em disco (calculado na 1ª escrita)
+
+
+def _disk_dir() -> str:
+    return os.getenv("ACERVO_TEXT_DISK_DIR", "/tmp/mei_robo_acervo_text")
+
+
+def _disk_max_bytes() -> int:
+    return int(float(os.getenv("ACERVO_TEXT_DISK_MAX_MB", "128") or 0) * 1024 * 1024)
+
+
+def _incr(name: str, n: int = 1) -> None:
+    with _LOCK:
+        _STATS[name] += n
+
+
+def _uid_of(path: str) -> str:
+    # profissionais/{uid}/acervo/consulta/<id>.md
+    parts = str(path).split("/")
+    return parts[1] if len(parts) > 2 and parts[0] == "profissionais" else "_"
+
+
+def _file_for(key: Key) -> str:
+    uid_dir = hashlib.sha1(_uid_of(key[0]).encode("utf-8")).hexdigest()[:16]
+    name = hashlib.sha1(f"{key[0]}\n{key[1]}".encode("utf-8")).hexdigest()
+    return os.path.join(_disk_dir(), uid_dir, f"{name}.txt")
+
+
+# ---------- disco ----------
+def _disk_get(key: Key) -> Optional[str]:
+    fn = _file_for(key)
+    try:
+        with open(fn, "r", encoding="utf-8") as f:
+            text = f.read()
+        os.utime(fn, None)
+        return text
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.info("[acervo_text] leitura disco falhou %s: %s", fn, e)
+        return None
+
+
+def _scan_disk() -> List[Tuple[float, int, str]]:
+    out = []
+    for root, _, files in os.walk(_disk_dir()):
+        for name in files:
+            fn = os.path.join(root, name)
+            try:
+                st = os.stat(fn)
+                out.append((st.st_mtime, st.st_size, fn))
+            except OSError:
+                pass
+    return out
+
+
+def _disk_trim_locked(limit: int) -> None:
+    global _DISK_BYTES
+    files = sorted(_scan_disk())
+    _DISK_BYTES = sum(size for _, size, _ in files)
+    target = int(limit * 0.8)
+    for _, size, fn in files:
+        if _DISK_BYTES <= target:
+            break
+        try:
+            os.remove(fn)
+            _DISK_BYTES -= size
+            _STATS["disk_evictions"] += 1
+        except OSError:
+            pass
+
+
+def _disk_set(key: Key, text: str) -> None:
+    global _DISK_BYTES
+    limit = _disk_max_bytes()
+    if limit <= 0:
+        return
+    fn = _file_for(key)
+    data = text.encode("utf-8")
+    try:
+        os.makedirs(os.path.dirname(fn), exist_ok=True)
+        tmp = f"{fn}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, fn)
+    except Exception as e:
+        logger.info("[acervo_text] escrita disco falhou %s: %s", fn, e)
+        return
+    with _LOCK:
+        if _DISK_BYTES is None:
+            _DISK_BYTES = sum(size for _, size, _ in _scan_disk())
+        else:
+            _DISK_BYTES += len(data)
+        if _DISK_BYTES > limit:
+            _disk_trim_locked(limit)
+
+
+# ---------- API ----------
+def get_many(keys: Sequence[Key], fetch: Callable[[str, Any], Optional[str]]) -> Dict[Key, Optional[str]]:
+    """
+    Texto de cada (gcs_path, generation). Ordem: memória → disco → fetch(path, generation),
+    com as faltas baixadas em paralelo. Falha/ausência → None (não cacheado).
+    """
+    out: Dict[Key, Optional[str]] = {}
+    missing: List[Key] = []
+    for key in dict.fromkeys(keys):
+        text = _MEM.get(key)
+        if text is None:
+            text = _disk_get(key)
+            _incr("disk_hits" if text is not None else "disk_misses")
+            if text is not None:
+                _MEM.set(key, text)
+        if text is None:
+            missing.append(key)
+        out[key] = text
+    if not missing:
+        return out
+
+    def _one(key: Key) -> Optional[str]:
+        _incr("fetches")
+        try:
+            return fetch(key[0], key[1])
+        except Exception as e:
+            _incr("fetch_errors")
+            logger.info("[acervo_text] fetch falhou %s: %s", key[0], e)
+            return None
+
+    workers = max(1, min(len(missing), int(os.getenv("ACERVO_TEXT_FETCH_WORKERS", "4") or 4)))
+    if workers == 1:
+        fetched = [_one(k) for k in missing]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            fetched = list(pool.map(_one, missing))
+    for key, text in zip(missing, fetched):
+        out[key] = text
+        if text is not None:
+            _MEM.set(key, text)
+            _disk_set(key, text)
+    return out
+
+
+def get(path: str, generation: Any, fetch: Callable[[str, Any], Optional[str]]) -> Optional[str]:
+    return get_many([(path, generation)], fetch)[(path, generation)]
+
+
+def invalidate_uid(uid: str) -> int:
+    """Descarta as entradas do uid (memória e disco). Retorna quantas saíram da memória."""
+    prefix = f"profissionais/{uid}/"
+    n = _MEM.pop_matching(lambda key: isinstance(key, tuple) and str(key[0]).startswith(prefix))
+    uid_dir = os.path.dirname(_file_for((prefix + "x", None)))
+    with _LOCK:
+        global _DISK_BYTES
+        if os.path.isdir(uid_dir):
+            shutil.rmtree(uid_dir, ignore_errors=True)
+            _DISK_BYTES = None  # recalculado na próxima escrita
+    return n
+
+
+def clear() -> None:
+    global _DISK_BYTES
+    _MEM.clear()
+    with _LOCK:
+        shutil.rmtree(_disk_dir(), ignore_errors=True)
+        _DISK_BYTES = None
+        for k in _STATS:
+            _STATS[k] = 0
+
+
+def stats() -> Dict[str, Any]:
+    with _LOCK:
+        disk = dict(_STATS, bytes=_DISK_BYTES, max_bytes=_disk_max_bytes())
+    return {"mem": _MEM.stats(), "disk": disk}
@@ -0,0 +1,447 @@
+# services/agenda_index.py
+# Índice de disponibilidade por uid: bitmap dia × minuto das próximas N semanas.
+#
+# - Dois tipos (kind), mesmos docs de profissionais/{uid}/agendamentos:
+#   * "repo": semântica de agenda_repo.find_slots — date/hhmm e status "agendado"/"reagendar"
+#   * "bot": semântica de domain.scheduling.propose (WhatsApp) — inicio/dataHora ISO,
+#     estado "solicitado"/"confirmado", duracaoMin (default 60); começa 1 dia antes de
+#     hoje para pegar o que atravessa a meia-noite
+# - Cada linha do dia guarda contagem por minuto do relógio local (2 dias de largura,
+#   para eventos que atravessam a meia-noite); eventos "repo" sem duration_min ficam em
+#   open_starts, porque a duração usada é a do serviço consultado
+# - Atualização incremental: create_event/update_event/cancel_event/create_agendamento e
+#   services/schedule chamam on_event_written(uid, doc_id, data, db); remove a contribuição
+#   antiga do doc e aplica a nova em todos os índices do uid (cada kind lê os campos dele)
+# - Entre instâncias: cada escrita com hook incrementa profissionais/{uid}/agendaMeta/meta.version;
+#   get() lê essa versão (uma leitura pontual) a cada consulta e reconstrói se ela não for a
+#   esperada — um horário marcado em outra instância não é oferecido pelo índice antigo
+# - Escritas sem hook só aparecem no próximo build (TTL AGENDA_INDEX_TTL_SEC)
+# - Reconstruível (build) e verificável (verify: reconstrói do Firestore e compara);
+#   escrita durante o build descarta o resultado
+
+from __future__ import annotations
+
+import os
+import math
+import threading
+import logging
+from array import array
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from cache.lru import LRUCache
+
+try:
+    import numpy as _np  # opcional: linhas em ndarray
+except Exception:
+    _np = None
+
+logger = logging.getLogger("mei_robo.agenda_index")
+
+DAY_MIN = 1440
+ROW_MIN = 2 * DAY_MIN  # dia + transbordo após a meia-noite
+ACTIVE_STATUS = ("agendado", "reagendar")
+BOT_ESTADOS = ("solicitado", "confirmado")
+KINDS = ("repo", "bot")
+_LOOKBACK_DAYS = {"repo": 0, "bot": 1}
+
+INDEX_WEEKS = int(os.getenv("AGENDA_INDEX_WEEKS", "8") or 8)
+INDEX_TTL_SEC = float(os.getenv("AGENDA_INDEX_TTL_SEC", "60") or 60)
+
+_INDEXES = LRUCache(
+    max_items=int(os.getenv("AGENDA_INDEX_MAX_UIDS", "500") or 500),
+    default_ttl=INDEX_TTL_SEC,
+    name="agenda_index",
+)
+_GEN: Dict[str, int] = {}
+_GEN_LOCK = threading.Lock()
+
+
+def enabled() -> bool:
+    return (os.getenv("AGENDA_INDEX_ENABLED", "1") or "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def _tz(tz_str: str):
+    import pytz
+
+    try:
+        return pytz.timezone(tz_str)
+    except Exception:
+        return pytz.timezone("America/Sao_Paulo")
+
+
+def _hhmm_minutes(hhmm: Any) -> Optional[int]:
+    try:
+        t = datetime.strptime(str(hhmm), "%H:%M")
+    except Exception:
+        return None
+    return t.hour * 60 + t.minute
+
+
+def _normalize_bot(data: Dict[str, Any], tz_str: str) -> Optional[Tuple[str, int, Optional[int]]]:
+    """Mesmo critério de scheduling._parse_busy_doc, em minutos do relógio local."""
+    if (data.get("estado") or "").lower() not in BOT_ESTADOS:
+        return None
+    ini_s = data.get("inicio") or data.get("dataHora")
+    if not ini_s:
+        return None
+    try:
+        ini = datetime.fromisoformat(str(ini_s).replace("Z", "+00:00")).astimezone(_tz(tz_str))
+    except Exception:
+        return None
+    dur = data.get("duracaoMin") or 60
+    try:
+        dur = int(dur)
+    except Exception:
+        dur = 60
+    start = ini.hour * 60 + ini.minute
+    # minuto parcial conta como ocupado: [floor(início), ceil(fim))
+    end = start + dur + (1 if (ini.second or ini.microsecond) else 0)
+    return ini.strftime("%Y-%m-%d"), start, end
+
+
+def _normalize(
+    data: Dict[str, Any], kind: str = "repo", tz_str: str = "America/Sao_Paulo"
+) -> Optional[Tuple[str, int, Optional[int]]]:
+    """(date, início em minutos, fim em minutos | None se sem duração) ou None se não conflita."""
+    if not isinstance(data, dict):
+        return None
+    if kind == "bot":
+        return _normalize_bot(data, tz_str)
+    if data.get("status", "agendado") not in ACTIVE_STATUS:
+        return None
+    date_str = data.get("date")
+    start = _hhmm_minutes(data.get("hhmm"))
+    if not date_str or start is None:
+        return None
+    try:
+        datetime.strptime(str(date_str), "%Y-%m-%d")
+    except Exception:
+        return None
+    raw_dur = data.get("duration_min")
+    if not raw_dur:
+        return str(date_str), start, None
+    try:
+        dur = int(raw_dur)
+    except Exception:
+        return None
+    return str(date_str), start, start + dur
+
+
+def _new_row():
+    if _np is not None:
+        return _np.zeros(ROW_MIN, dtype=_np.int32)
+    return array("i", bytes(4 * ROW_MIN))
+
+
+class AvailabilityIndex:
+    """Ocupação por minuto de [first_day, first_day + days) para um uid/fuso/kind."""
+
+    def __init__(self, uid: str, tz_str: str, first_day: date, days: int, kind: str = "repo"):
+        self.uid = uid
+        self.tz_str = tz_str
+        self.kind = kind
+        self.first_day = first_day
+        self.today = first_day + timedelta(days=_LOOKBACK_DAYS.get(kind, 0))
+        self.days = int(days)
+        self.version: Optional[int] = None  # agendaMeta.version esperada (None = desconhecida)
+        self._lock = threading.Lock()
+        self._rows: Dict[str, Any] = {}
+        self._open: Dict[str, List[int]] = {}
+        self._events: Dict[str, Tuple[str, int, Optional[int]]] = {}
+        self.applied = 0
+
+    # ---------- escrita ----------
+    def covers(self, ddate: date) -> bool:
+        return self.first_day <= ddate < self.first_day + timedelta(days=self.days)
+
+    def _add_locked(self, ev: Tuple[str, int, Optional[int]], sign: int) -> None:
+        date_str, a, b = ev
+        if b is None:
+            starts = self._open.setdefault(date_str, [])
+            if sign > 0:
+                starts.append(a)
+            elif a in starts:
+                starts.remove(a)
+            return
+        a, b = max(a, 0), min(b, ROW_MIN)
+        if a >= b:
+            return
+        row = self._rows.get(date_str)
+        if row is None:
+            row = self._rows[date_str] = _new_row()
+        if _np is not None:
+            row[a:b] += sign
+        else:
+            for m in range(a, b):
+                row[m] += sign
+
+    def apply(self, doc_id: str, data: Optional[Dict[str, Any]]) -> None:
+        """Substitui a contribuição do doc (data=None → doc removido)."""
+        ev = _normalize(data, self.kind, self.tz_str) if data is not None else None
+        if ev is not None:
+            try:
+                if not self.covers(datetime.strptime(ev[0], "%Y-%m-%d").date()):
+                    ev = None
+            except Exception:
+                ev = None
+        with self._lock:
+            old = self._events.pop(doc_id, None)
+            if old is not None:
+                self._add_locked(old, -1)
+            if ev is not None:
+                self._events[doc_id] = ev
+                self._add_locked(ev, +1)
+            self.applied += 1
+
+    def expect_bump(self) -> None:
+        """Escrita local com hook: a versão no Firestore vai estar uma à frente."""
+        with self._lock:
+            if self.version is not None:
+                self.version += 1
+
+    # ---------- leitura ----------
+    def prefix(self, date_str: str, origin_min: int, length: int, pad: int, dur_min: int):
+        """
+        Mesmo contrato de agenda_repo._busy_prefix, com origem em origin_min
+        (minuto do relógio da abertura do dia): minutos [-pad, length + pad).
+        """
+        size = length + 2 * pad
+        if size <= 0:
+            return [0]
+        lo = origin_min - pad
+        with self._lock:
+            row = self._rows.get(date_str)
+            opens = list(self._open.get(date_str, ()))
+            if _np is not None:
+                seg = _np.zeros(size, dtype=_np.int32)
+                if row is not None:
+                    a, b = max(lo, 0), min(lo + size, ROW_MIN)
+                    if a < b:
+                        seg[a - lo:b - lo] = row[a:b]
+            else:
+                seg = [0] * size
+                if row is not None:
+                    for m in range(max(lo, 0), min(lo + size, ROW_MIN)):
+                        seg[m - lo] = row[m]
+        for st in opens:
+            a, b = max(st - lo, 0), min(st + dur_min - lo, size)
+            if _np is not None:
+                if a < b:
+                    seg[a:b] += 1
+            else:
+                for i in range(a, b):
+                    seg[i] += 1
+        if _np is not None:
+            prefix = _np.zeros(size + 1, dtype=_np.int32)
+            _np.cumsum(seg > 0, out=prefix[1:])
+            return prefix
+        prefix = [0] * (size + 1)
+        for i in range(size):
+            prefix[i + 1] = prefix[i] + (1 if seg[i] > 0 else 0)
+        return prefix
+
+    def busy(self, start: datetime, end: datetime) -> bool:
+        """Algum minuto de [start, end) ocupado? (kind "bot"; datetimes com fuso, mesmo dia)"""
+        tz = _tz(self.tz_str)
+        s = start.astimezone(tz)
+        a = s.hour * 60 + s.minute
+        b = a + int(math.ceil((end - start).total_seconds() / 60.0))
+        prev = (s.date() - timedelta(days=1)).strftime("%Y-%m-%d")
+        with self._lock:
+            for date_str, lo, hi in ((s.strftime("%Y-%m-%d"), a, b), (prev, a + DAY_MIN, b + DAY_MIN)):
+                row = self._rows.get(date_str)
+                lo, hi = max(lo, 0), min(hi, ROW_MIN)
+                if row is None or lo >= hi:
+                    continue
+                if _np is not None:
+                    if row[lo:hi].any():
+                        return True
+                elif any(row[m] for m in range(lo, hi)):
+                    return True
+        return False
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Forma canônica (para verify/testes): minutos ocupados e open_starts por dia."""
+        with self._lock:
+            out: Dict[str, Any] = {}
+            for d, row in self._rows.items():
+                occ = [(m, int(row[m])) for m in range(ROW_MIN) if row[m]]
+                if occ:
+                    out.setdefault(d, {})["occ"] = occ
+            for d, starts in self._open.items():
+                if starts:
+                    out.setdefault(d, {})["open"] = sorted(starts)
+            return out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "uid": self.uid,
+                "tz": self.tz_str,
+                "kind": self.kind,
+                "version": self.version,
+                "firstDay": self.first_day.isoformat(),
+                "days": self.days,
+                "events": len(self._events),
+                "applied": self.applied,
+            }
+
+
+# ---------- versão (entre instâncias) ----------
+def _meta_ref(db, uid: str):
+    return db.collection("profissionais").document(uid).collection("agendaMeta").document("meta")
+
+
+def get_version(uid: str, db) -> int:
+    """Versão atual da agenda do uid (levanta se o Firestore falhar: o chamador lê direto)."""
+    snap = _meta_ref(db, uid).get()
+    if not getattr(snap, "exists", False):
+        return 0
+    return int((snap.to_dict() or {}).get("version") or 0)
+
+
+def _bump_version(uid: str, db=None) -> None:
+    try:
+        if db is None:
+            from services.db import db  # type: ignore
+        from google.cloud import firestore  # type: ignore
+
+        _meta_ref(db, uid).set({"version": firestore.Increment(1)}, merge=True)
+    except Exception as e:
+        # índices locais ficam com a versão esperada à frente → reconstroem na próxima consulta
+        logger.info("[agenda_index] bump de versão falhou uid=%s: %s", uid, e)
+
+
+# ---------- build / cache ----------
+def _query_docs(col, kind: str, first: date, last: date):
+    if kind == "bot":
+        # inicio/dataHora são ISO com offsets variados: limites por data com 1 dia de folga
+        lo = (first - timedelta(days=1)).strftime("%Y-%m-%d")
+        hi = (last + timedelta(days=2)).strftime("%Y-%m-%d")
+        seen = set()
+        for field in ("inicio", "dataHora"):
+            q = col.where("estado", "in", list(BOT_ESTADOS)).where(field, ">=", lo).where(field, "<", hi)
+            for doc in q.stream():
+                if doc.id not in seen:
+                    seen.add(doc.id)
+                    yield doc
+        return
+    q = col.where("date", ">=", first.strftime("%Y-%m-%d")).where("date", "<=", last.strftime("%Y-%m-%d"))
+    yield from q.stream()
+
+
+def build(
+    uid: str,
+    tz_str: str,
+    db,
+    weeks: Optional[int] = None,
+    today: Optional[date] = None,
+    kind: str = "repo",
+) -> AvailabilityIndex:
+    """Reconstrói do Firestore (range query em date; no kind "bot", em inicio e dataHora)."""
+    weeks = INDEX_WEEKS if weeks is None else int(weeks)
+    if today is None:
+        today = datetime.now(_tz(tz_str)).date()
+    back = _LOOKBACK_DAYS.get(kind, 0)
+    idx = AvailabilityIndex(uid, tz_str, today - timedelta(days=back), weeks * 7 + back, kind=kind)
+    last = idx.first_day + timedelta(days=idx.days - 1)
+    col = db.collection("profissionais").document(uid).collection("agendamentos")
+    for doc in _query_docs(col, kind, idx.first_day, last):
+        idx.apply(doc.id, doc.to_dict() or {})
+    return idx
+
+
+def _gen(uid: str) -> int:
+    with _GEN_LOCK:
+        return _GEN.get(uid, 0)
+
+
+def get(uid: str, tz_str: str, db_factory: Callable[[], Any], kind: str = "repo") -> Optional[AvailabilityIndex]:
+    """
+    Índice em cache (ou recém-construído) cobrindo a partir de hoje no fuso pedido.
+    Lê agendaMeta.version a cada chamada; versão diferente da esperada → reconstrói.
+    """
+    db = db_factory()
+    version = get_version(uid, db)
+    key = (uid, tz_str, kind)
+    idx = _INDEXES.get(key)
+    today = datetime.now(_tz(tz_str)).date()
+    if idx is not None and idx.today == today and idx.version == version:
+        return idx
+    gen = _gen(uid)
+    idx = build(uid, tz_str, db, today=today, kind=kind)
+    idx.version = version  # lida antes do build: escrita no meio só força outro build
+    # escrita concorrente durante o build: usa o resultado só desta vez
+    if _gen(uid) == gen:
+        _store(idx)
+    return idx
+
+
+def on_event_written(uid: str, doc_id: str, data: Optional[Dict[str, Any]], db=None) -> None:
+    """Hook pós-escrita (data=None para doc apagado); também incrementa a versão. Nunca levanta."""
+    try:
+        with _GEN_LOCK:
+            _GEN[uid] = _GEN.get(uid, 0) + 1
+        for key in _cached_keys(uid):
+            idx = _INDEXES.get(key)
+            if idx is not None:
+                idx.apply(doc_id, data)
+                idx.expect_bump()
+    except Exception as e:
+        logger.info("[agenda_index] apply falhou uid=%s doc=%s: %s", uid, doc_id, e)
+        invalidate(uid)
+    _bump_version(uid, db)
+
+
+_KEYS: Dict[str, set] = {}  # uid -> (fuso, kind) com índice em cache
+_KEYS_LOCK = threading.Lock()
+
+
+def _store(idx: AvailabilityIndex) -> None:
+    with _KEYS_LOCK:
+        _KEYS.setdefault(idx.uid, set()).add((idx.tz_str, idx.kind))
+    _INDEXES.set((idx.uid, idx.tz_str, idx.kind), idx)
+
+
+def _cached_keys(uid: str) -> List[Tuple[str, str, str]]:
+    with _KEYS_LOCK:
+        return [(uid, tz, kind) for tz, kind in _KEYS.get(uid, ())]
+
+
+def invalidate(uid: str) -> None:
+    with _GEN_LOCK:
+        _GEN[uid] = _GEN.get(uid, 0) + 1
+    for key in _cached_keys(uid):
+        _INDEXES.pop(key)
+
+
+def rebuild(uid: str, tz_str: str, db, kind: str = "repo") -> AvailabilityIndex:
+    invalidate(uid)
+    try:
+        version: Optional[int] = get_version(uid, db)
+    except Exception as e:
+        logger.info("[agenda_index] versão indisponível uid=%s: %s", uid, e)
+        version = None
+    idx = build(uid, tz_str, db, kind=kind)
+    idx.version = version
+    _store(idx)
+    return idx
+
+
+def verify(uid: str, tz_str: str, db, kind: str = "repo") -> Dict[str, Any]:
+    """Compara o índice em cache com uma reconstrução do Firestore."""
+    cached = _INDEXES.get((uid, tz_str, kind))
+    fresh = build(uid, tz_str, db, weeks=((cached.days - _LOOKBACK_DAYS.get(kind, 0)) // 7) if cached else None,
+                  today=cached.today if cached else None, kind=kind)
+    if cached is None:
+        return {"ok": True, "cached": False, "events": fresh.stats()["events"], "diffDays": []}
+    a, b = cached.snapshot(), fresh.snapshot()
+    diff = sorted(d for d in set(a) | set(b) if a.get(d) != b.get(d))
+    if diff:
+        logger.warning("[agenda_index] divergência uid=%s dias=%s", uid, diff[:10])
+    return {"ok": not diff, "cached": True, "events": fresh.stats()["events"], "diffDays": diff}
+
+
+def stats() -> Dict[str, Any]:
+    return _INDEXES.stats()
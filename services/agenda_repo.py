@@ -3,6 +3,7 @@
 # Coleção padrão: profissionais/{uid}/agendamentos/{autoId}
 
 import os
+import math
 import logging
 from typing import Dict, Any, List
 from datetime import datetime, timedelta, time
@@ -11,6 +12,16 @@ import pytz
 import firebase_admin
 from firebase_admin import firestore as fb_firestore
 
+try:
+    import numpy as _np  # bitmaps de ocupação em find_slots (opcional)
+except Exception:
+    _np = None
+
+try:
+    from services import agenda_index as _agenda_index
+except Exception:
+    _agenda_index = None
+
 # Regras de agenda (com fallback seguro)
 try:
     from services.agenda_rules import get_rules_for as _get_rules_for
@@ -132,6 +143,77 @@ def _parse_date_str(date_str: str, tz: pytz.BaseTzInfo) -> datetime:
         now = datetime.now(tz)
         return tz.localize(datetime(now.year, now.month, now.day))
 
+def _load_conflicts_for_window(uid: str, first_date: str, last_date: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Uma query para a janela inteira (date entre first_date e last_date, inclusive),
+    agrupada por date. Mesmo filtro de status de _load_conflicts_for_day.
+    Levanta exceção se a query falhar (find_slots cai no caminho por dia).
+    """
+    db = _get_db()
+    col = db.collection("profissionais").document(uid).collection("agendamentos")
+    q = col.where("date", ">=", first_date).where("date", "<=", last_date).stream()
+    by_day: Dict[str, List[Dict[str, Any]]] = {}
+    for doc in q:
+        d = doc.to_dict() or {}
+        if d.get("status", "agendado") not in ("agendado", "reagendar"):
+            continue
+        by_day.setdefault(str(d.get("date") or ""), []).append(d)
+    return by_day
+
+def _conflict_minutes(
+    conflicts: List[Dict[str, Any]], tz: pytz.BaseTzInfo, day_start: datetime, dur_min: int
+) -> List[tuple]:
+    """Conflitos do dia como (início, fim) em minutos inteiros a partir de day_start."""
+    out = []
+    for c in conflicts:
+        try:
+            c_start = tz.localize(datetime.strptime(f"{c['date']} {c['hhmm']}", "%Y-%m-%d %H:%M"))
+            c_len = int(c.get("duration_min") or dur_min)
+        except Exception:
+            continue
+        a = (c_start - day_start).total_seconds() / 60.0
+        out.append((math.floor(a), math.ceil(a + c_len)))
+    return out
+
+def _fixed_offset_day(tz: pytz.BaseTzInfo, ddate) -> bool:
+    """Sem troca de offset entre o dia e o seguinte (o índice trabalha em minutos do relógio)."""
+    a = tz.localize(datetime.combine(ddate, time(0, 0))).utcoffset()
+    b = tz.localize(datetime.combine(ddate + timedelta(days=2), time(0, 0))).utcoffset()
+    return a == b
+
+def _busy_prefix(length: int, pad: int, intervals: List[tuple]) -> List[int]:
+    """
+    Bitmap de ocupação por minuto em [-pad, length + pad) (soma de prefixo).
+    prefix[i] = minutos ocupados antes do índice i; um trecho [s, e) está livre
+    se prefix[e + pad] == prefix[s + pad]. NumPy quando disponível.
+    """
+    size = length + 2 * pad
+    if size <= 0:
+        return [0]
+    if _np is not None:
+        delta = _np.zeros(size + 1, dtype=_np.int32)
+        for a, b in intervals:
+            a, b = max(a + pad, 0), min(b + pad, size)
+            if a < b:
+                delta[a] += 1
+                delta[b] -= 1
+        occ = (_np.cumsum(delta[:-1]) > 0).astype(_np.int32)
+        prefix = _np.zeros(size + 1, dtype=_np.int32)
+        _np.cumsum(occ, out=prefix[1:])
+        return prefix
+    delta = [0] * (size + 1)
+    for a, b in intervals:
+        a, b = max(a + pad, 0), min(b + pad, size)
+        if a < b:
+            delta[a] += 1
+            delta[b] -= 1
+    prefix = [0] * (size + 1)
+    cover = 0
+    for i in range(size):
+        cover += delta[i]
+        prefix[i + 1] = prefix[i] + (1 if cover > 0 else 0)
+    return prefix
+
 # -------------------------------------------------------------------
 # API principais
 # -------------------------------------------------------------------
@@ -157,7 +239,7 @@ def find_slots(req: Dict[str, Any]) -> List[Dict[str, str]]:
 
     rules = _safe_rules_for(uid)
     dur_min = _get_duration_min_for_service(uid, service_id)
-    step = timedelta(minutes=int(rules["step_minutes"]))
+    step_min = int(rules["step_minutes"])
     buffer_min = int(rules["buffer_minutes"])
     min_lead_days = int(rules["min_lead_days"])
     max_lead_days = int(rules["max_lead_days"])
@@ -174,8 +256,7 @@ def find_slots(req: Dict[str, Any]) -> List[Dict[str, str]]:
     first_ok_day = (now + timedelta(days=offset_days)).date()
     last_ok_day = (now + timedelta(days=max_lead_days)).date()
 
-    slots: List[Dict[str, str]] = []
-
+    days = []
     for day in _daterange_days(start_date, window_days):
         ddate = day.date()
         if ddate < first_ok_day or ddate > last_ok_day:
@@ -183,41 +264,71 @@ def find_slots(req: Dict[str, Any]) -> List[Dict[str, str]]:
         iso = _day_iso(day)
         if (iso not in working_days) and (not allow_weekend):
             continue
+        days.append(ddate)
+    if not days:
+        return []
 
-        date_str = ddate.strftime("%Y-%m-%d")
-        conflicts = _load_conflicts_for_day(uid, date_str, tz_str)
+    # Índice de disponibilidade em memória (services/agenda_index) quando cobre a janela;
+    # senão uma leitura para a janela toda e, se falhar, o caminho antigo (uma por dia)
+    index = None
+    if _agenda_index is not None and _agenda_index.enabled():
+        try:
+            index = _agenda_index.get(uid, tz_str, _get_db)
+        except Exception:
+            logging.exception("[agenda_repo] índice de disponibilidade indisponível; lendo Firestore")
+        if index is not None and not all(index.covers(d) for d in days):
+            index = None
 
-        cur_dt = tz.localize(datetime.combine(ddate, wh_start))
-        end_dt = tz.localize(datetime.combine(ddate, wh_end))
+    by_day = None
+    window_read = False
+    slots: List[Dict[str, str]] = []
+    pad = max(0, buffer_min)
+    wh_start_min = wh_start.hour * 60 + wh_start.minute
 
-        while cur_dt + timedelta(minutes=dur_min) <= end_dt:
-            # Se é hoje, não permitir horários passados
-            if ddate == now.date() and cur_dt <= now:
-                cur_dt += step
-                continue
+    for ddate in days:
+        date_str = ddate.strftime("%Y-%m-%d")
+        day_start = tz.localize(datetime.combine(ddate, wh_start))
+        end_dt = tz.localize(datetime.combine(ddate, wh_end))
+        length = int((end_dt - day_start).total_seconds() // 60)
+        if dur_min > length or step_min <= 0:
+            continue
 
-            start = cur_dt
-            end = cur_dt + timedelta(minutes=dur_min)
-            has_conflict = False
-            for c in conflicts:
+        # buffer = dilatação dos conflitos: o slot [s, s+dur) precisa de [s-buf, s+dur+buf) livre
+        if index is not None and _fixed_offset_day(tz, ddate):
+            prefix = index.prefix(date_str, wh_start_min, length, pad, dur_min)
+        else:
+            if not window_read:
+                window_read = True
                 try:
-                    c_start = tz.localize(datetime.strptime(f"{c['date']} {c['hhmm']}", "%Y-%m-%d %H:%M"))
-                    c_end = c_start + timedelta(minutes=int(c.get("duration_min") or dur_min))
-                    if buffer_min:
-                        c_start = c_start - timedelta(minutes=buffer_min)
-                        c_end = c_end + timedelta(minutes=buffer_min)
-                    if _overlaps(start, end, c_start, c_end):
-                        has_conflict = True
-                        break
+                    by_day = _load_conflicts_for_window(
+                        uid, days[0].strftime("%Y-%m-%d"), days[-1].strftime("%Y-%m-%d")
+                    )
                 except Exception:
-                    continue
-
-            if not has_conflict:
-                slots.append({"date": date_str, "hhmm": _time_to_hhmm(start.timetz())})
-            cur_dt += step
+                    logging.exception("[agenda_repo] falha ao ler agendamentos da janela; lendo por dia")
+            if by_day is not None:
+                conflicts = by_day.get(date_str, [])
+            else:
+                conflicts = _load_conflicts_for_day(uid, date_str, tz_str)
+            prefix = _busy_prefix(length, pad, _conflict_minutes(conflicts, tz, day_start, dur_min))
+        is_today = ddate == now.date()
+        # minutos até "agora" (hoje não oferece horários passados)
+        now_off = (now - day_start).total_seconds() / 60.0 if is_today else None
+
+        for s in range(0, length - dur_min + 1, step_min):
+            if now_off is not None and s <= now_off:
+                continue
+            lo = s - buffer_min + pad
+            hi = s + dur_min + buffer_min + pad
+            if prefix[max(lo, 0)] != prefix[min(hi, len(prefix) - 1)]:
+                continue
+            slots.append({"date": date_str, "hhmm": _time_to_hhmm((day_start + timedelta(minutes=s)).timetz())})
 
     return slots
 
+def _index_written(uid: str, doc_id: str, data: Dict[str, Any], db=None) -> None:
+    if _agenda_index is not None:
+        _agenda_index.on_event_written(uid, doc_id, data, db)
+
 def create_event(uid: str, event: Dict[str, Any]) -> Dict[str, Any]:
     try:
         db = _get_db()
@@ -240,6 +351,7 @@ def create_event(uid: str, event: Dict[str, Any]) -> Dict[str, Any]:
         echo = snap.to_dict() if snap and snap.exists else {
             k: v for k, v in payload.items() if k not in ("created_at", "updated_at")
         }
+        _index_written(uid, doc_ref.id, echo, db)
 
         return {"ok": True, "id": doc_ref.id, "echo": echo}
 
@@ -298,7 +410,9 @@ def update_event(event_id: str, data: Dict[str, Any], uid: str) -> Dict[str, Any
 
         doc_ref.update(update_payload)
         snap = doc_ref.get()
-        return {"ok": True, "event": snap.to_dict()}
+        event = snap.to_dict()
+        _index_written(uid, event_id, event, db)
+        return {"ok": True, "event": event}
     except Exception:
         logging.exception("[agenda_repo] falha ao atualizar evento %s", event_id)
         return {"ok": False, "error": "update_failed"}
@@ -322,6 +436,7 @@ def cancel_event(event_id: str, reason: str, uid: str) -> Dict[str, Any]:
 
         doc_ref.update(updates)
         updated = doc_ref.get().to_dict()
+        _index_written(uid, event_id, updated, db)
         return {"ok": True, "event": updated}
     except Exception:
         logging.exception("[agenda_repo] falha ao cancelar evento %s", event_id)
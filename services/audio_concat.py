@@ -0,0 +1,170 @@
+# services/audio_concat.py
+# Concatenação de áudios já codificados (MP3 / Ogg Opus) sem re-encode.
+#
+# - sniff(b): "mp3" | "ogg" | None pelos primeiros bytes (ID3/frame sync, "OggS")
+# - MP3: os frames são independentes → basta juntar os frames de cada segmento, tirando ID3v2
+#   (início), ID3v1 (fim) e o frame Xing/Info/VBRI (contagem de frames ficaria errada)
+# - Ogg Opus: vira UM stream lógico (não "chained"): mantém OpusHead/OpusTags do primeiro
+#   segmento, descarta os cabeçalhos dos demais, reescreve serial, nº de página, granule
+#   (acumulado) e flags BOS/EOS, e recalcula o CRC de cada página
+# - Só o pre-skip do primeiro OpusHead vale no stream final: o dos demais segmentos é
+#   descontado dos granules deles (senão a duração fica inflada em ~6,5 ms por frase)
+# - Formatos misturados ou estrutura inesperada → ValueError (chamador sintetiza o texto inteiro)
+
+from __future__ import annotations
+
+import struct
+from typing import List, Optional, Tuple
+
+# ---------- sniff ----------
+def sniff(data: bytes) -> Optional[str]:
+    if not data:
+        return None
+    if data[:4] == b"OggS":
+        return "ogg"
+    if data[:3] == b"ID3" or (len(data) > 1 and data[0] == 0xFF and (data[1] & 0xE0) == 0xE0):
+        return "mp3"
+    return None
+
+
+def concat(segments: List[bytes]) -> bytes:
+    segs = [s for s in segments if s]
+    if not segs:
+        return b""
+    kinds = {sniff(s) for s in segs}
+    if len(kinds) != 1:
+        raise ValueError(f"formatos diferentes: {sorted(str(k) for k in kinds)}")
+    kind = kinds.pop()
+    if kind == "mp3":
+        return b"".join(_mp3_frames(s) for s in segs)
+    if kind == "ogg":
+        return _ogg_concat(segs)
+    raise ValueError("formato desconhecido")
+
+
+# ---------- MP3 ----------
+_BR_V1 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+_BR_V2 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+_SR = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _mp3_frame_len(h: bytes) -> int:
+    """Tamanho do frame Layer III a partir do cabeçalho de 4 bytes (0 se não for um frame válido)."""
+    if len(h) < 4 or h[0] != 0xFF or (h[1] & 0xE0) != 0xE0:
+        return 0
+    version = (h[1] >> 3) & 3
+    layer = (h[1] >> 1) & 3
+    br_idx, sr_idx, pad = h[2] >> 4, (h[2] >> 2) & 3, (h[2] >> 1) & 1
+    if version == 1 or layer != 1 or br_idx in (0, 15) or sr_idx == 3:
+        return 0
+    sr = _SR[version][sr_idx]
+    if version == 3:
+        return 144000 * _BR_V1[br_idx] // sr + pad
+    return 72000 * _BR_V2[br_idx] // sr + pad
+
+
+def _mp3_frames(data: bytes) -> bytes:
+    start, end = 0, len(data)
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        start = 10 + size + (10 if data[5] & 0x10 else 0)
+    if end - start >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+    flen = _mp3_frame_len(data[start:start + 4])
+    if flen:
+        first = data[start:start + flen]
+        if b"Xing" in first[:64] or b"Info" in first[:64] or first[36:40] == b"VBRI":
+            start += flen
+    return data[start:end]
+
+
+# ---------- Ogg ----------
+_CRC_TABLE: List[int] = []
+for _i in range(256):
+    _r = _i << 24
+    for _ in range(8):
+        _r = ((_r << 1) ^ 0x04C11DB7) if _r & 0x80000000 else (_r << 1)
+    _CRC_TABLE.append(_r & 0xFFFFFFFF)
+
+
+def _ogg_crc(page: bytes) -> int:
+    crc = 0
+    for b in page:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ _CRC_TABLE[((crc >> 24) & 0xFF) ^ b]
+    return crc
+
+
+# página: (header_type, granule, serial, lacing, body)
+Page = Tuple[int, int, int, bytes, bytes]
+
+
+def _ogg_pages(data: bytes) -> List[Page]:
+    pages: List[Page] = []
+    pos = 0
+    while pos < len(data):
+        if data[pos:pos + 4] != b"OggS" or len(data) < pos + 27:
+            raise ValueError(f"página Ogg inválida em {pos}")
+        htype = data[pos + 5]
+        granule, serial = struct.unpack_from("<qI", data, pos + 6)
+        nsegs = data[pos + 26]
+        lacing = data[pos + 27:pos + 27 + nsegs]
+        body_start = pos + 27 + nsegs
+        body_end = body_start + sum(lacing)
+        if len(lacing) != nsegs or body_end > len(data):
+            raise ValueError("página Ogg truncada")
+        pages.append((htype, granule, serial, bytes(lacing), data[body_start:body_end]))
+        pos = body_end
+    return pages
+
+
+def build_page(htype: int, granule: int, serial: int, seq: int, lacing: bytes, body: bytes) -> bytes:
+    head = b"OggS" + bytes([0, htype]) + struct.pack("<qIII", granule, serial, seq, 0) + bytes([len(lacing)]) + lacing
+    page = head + body
+    return page[:22] + struct.pack("<I", _ogg_crc(page)) + page[26:]
+
+
+def _split_headers(pages: List[Page]) -> Tuple[List[Page], List[Page]]:
+    """(páginas de OpusHead/OpusTags, páginas de áudio) — o áudio começa numa página nova."""
+    if not pages or not pages[0][4].startswith(b"OpusHead"):
+        raise ValueError("não é Ogg Opus")
+    done = 0
+    for i, (_, _, _, lacing, _) in enumerate(pages):
+        ends = sum(1 for v in lacing if v < 255)
+        if done + ends >= 2:
+            if done + ends > 2 or lacing[-1] == 255:
+                raise ValueError("áudio na mesma página do OpusTags")
+            return pages[:i + 1], pages[i + 1:]
+        done += ends
+    raise ValueError("cabeçalhos Opus incompletos")
+
+
+def _preskip(headers: List[Page]) -> int:
+    body = headers[0][4]
+    return struct.unpack_from("<H", body, 10)[0] if len(body) >= 12 else 0
+
+
+def _ogg_concat(segs: List[bytes]) -> bytes:
+    out: List[bytes] = []
+    seq = 0
+    serial = None
+    offset = 0  # amostras (48 kHz) decodificadas dos segmentos anteriores
+    streams = [_split_headers(_ogg_pages(s)) for s in segs]
+    for n, (headers, audio) in enumerate(streams):
+        if serial is None:
+            serial = headers[0][2]
+            for htype, granule, _, lacing, body in headers:
+                out.append(build_page(htype & ~0x04, granule, serial, seq, lacing, body))
+                seq += 1
+        # o pre-skip do primeiro segmento continua declarado no OpusHead mantido
+        skip = _preskip(headers) if n else 0
+        last = skip
+        for k, (htype, granule, _, lacing, body) in enumerate(audio):
+            final = n == len(streams) - 1 and k == len(audio) - 1
+            htype = (htype & 0x01) | (0x04 if final else 0)
+            if granule != -1:
+                last = max(granule, skip)
+                granule = offset + last - skip
+            out.append(build_page(htype, granule, serial, seq, lacing, body))
+            seq += 1
+        offset += last - skip
+    return b"".join(out)
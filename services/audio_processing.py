@@ -1,5 +1,5 @@
 # services/audio_processing.py
-import os, io, json, logging, traceback
+import os, json, logging, traceback
 from typing import Optional
 from google.cloud import speech
 from google.oauth2 import service_account
@@ -29,17 +29,17 @@ _speech_client = _get_speech_client()
 # --- Utils: converter para WAV 16k mono (se possível) ---
 def _to_wav16k(audio_bytes: bytes, mime_type: str = "audio/ogg") -> Optional[bytes]:
     """
-    Converte com pydub/ffmpeg para WAV 16k mono. Se não der, retorna None.
+    Converte para WAV 16k mono via services.audio_transcode (PyAV em processo ou pool de
+    ffmpeg; formato detectado pelos bytes). Se não der, retorna None.
     """
     try:
-        from pydub import AudioSegment  # requer ffmpeg instalado na imagem
-        seg = AudioSegment.from_file(io.BytesIO(audio_bytes), format=None)  # deixa pydub detectar
-        seg = seg.set_frame_rate(16000).set_channels(1)
-        out = io.BytesIO()
-        seg.export(out, format="wav")
-        return out.getvalue()
+        from services.audio_transcode import transcode
+        res = transcode(audio_bytes)
+        if res.wav is None:
+            logging.info("[STT] _to_wav16k fallback (%s): %s", res.kind, res.reason)
+        return res.wav
     except Exception as e:
-        logging.info("[STT] _to_wav16k fallback (sem pydub/ffmpeg): %s", e)
+        logging.info("[STT] _to_wav16k fallback: %s", e)
         return None
 
 # --- STT principal (bytes) ---
@@ -0,0 +1,364 @@
+# services/audio_transcode.py
+# Transcodificação de áudio recebido (notas de voz do WhatsApp) para WAV 16 kHz mono (LINEAR16).
+#
+# - sniff(data): formato pelos bytes ("ogg" | "mp3" | "wav" | "mp4" | "webm" | "amr" | None) —
+#   o Content-Type do provedor nem sempre é confiável
+# - Guardas antes de decodificar: AUDIO_TRANSCODE_MAX_BYTES e AUDIO_TRANSCODE_MAX_SEC (duração
+#   lida do cabeçalho quando dá: granule Ogg / header WAV; senão conferida no PCM decodificado)
+# - WAV já 16 kHz mono s16 → devolvido como está
+# - Backends (AUDIO_TRANSCODE_BACKEND = auto | pyav | ffmpeg):
+#   * pyav: decodifica e reamostra em processo (libav via PyAV), sem fork/exec
+#   * ffmpeg: pool de processos ffmpeg já iniciados e parados no stdin
+#     (AUDIO_TRANSCODE_POOL_SIZE); cada clipe usa um e o pool repõe em segundo plano —
+#     o custo de spawn sai do caminho da mensagem
+#   auto = pyav se instalado, senão ffmpeg se houver binário
+# - transcode(): TranscodeResult com wav (ou None), formato detectado, backend, ms e motivo;
+#   to_wav16k(): só os bytes (None → chamador manda o original com o mime detectado)
+
+from __future__ import annotations
+
+import io
+import os
+import time
+import shutil
+import struct
+import logging
+import threading
+import subprocess
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger("mei_robo.audio_transcode")
+
+try:
+    import av  # type: ignore
+except Exception:
+    av = None
+
+SAMPLE_RATE = 16000
+
+MIME_BY_KIND = {
+    "ogg": "audio/ogg",
+    "mp3": "audio/mpeg",
+    "wav": "audio/wav",
+    "mp4": "audio/mp4",
+    "webm": "audio/webm",
+    "amr": "audio/amr",
+}
+
+
+def _env_num(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)) or default)
+    except Exception:
+        return default
+
+
+# ---------- detecção / duração ----------
+def sniff(data: bytes) -> Optional[str]:
+    if not data or len(data) < 12:
+        return None
+    if data[:4] == b"OggS":
+        return "ogg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        return "wav"
+    if data[4:8] == b"ftyp":
+        return "mp4"
+    if data[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    if data[:5] == b"#!AMR":
+        return "amr"
+    if data[:3] == b"ID3" or (data[0] == 0xFF and (data[1] & 0xE0) == 0xE0):
+        return "mp3"
+    return None
+
+
+_OGG_MAX_PAGE = 27 + 255 + 255 * 255
+
+
+def _ogg_last_page(data: bytes) -> Optional[int]:
+    """
+    Offset da última página Ogg válida: versão 0 e tabela de segmentos + corpo terminando
+    exatamente no fim dos dados ("OggS" também pode aparecer dentro de um pacote Opus).
+    """
+    floor = max(0, len(data) - _OGG_MAX_PAGE)
+    pos = data.rfind(b"OggS", floor)
+    while pos >= 0:
+        if pos + 27 <= len(data) and data[pos + 4] == 0:
+            nseg = data[pos + 26]
+            if pos + 27 + nseg <= len(data) and pos + 27 + nseg + sum(data[pos + 27:pos + 27 + nseg]) == len(data):
+                return pos
+        pos = data.rfind(b"OggS", floor, pos)
+    return None
+
+
+def ogg_duration_sec(data: bytes) -> Optional[float]:
+    """Duração de um Ogg Opus pelo granule da última página (48 kHz, menos o pre-skip)."""
+    if data[:4] != b"OggS" or data[28:36] != b"OpusHead":
+        return None
+    last = _ogg_last_page(data)
+    if last is None:
+        return None  # sem última página confiável: o chamador trata como duração desconhecida
+    granule = struct.unpack_from("<q", data, last + 6)[0]
+    if granule < 0:
+        return None
+    pre_skip = struct.unpack_from("<H", data, 38)[0] if len(data) >= 40 else 0
+    return max(0.0, (granule - pre_skip) / 48000.0)
+
+
+def _wav_format(data: bytes) -> Optional[Dict[str, int]]:
+    """fmt + tamanho do chunk data de um WAV PCM (None se o header não for o esperado)."""
+    pos, fmt = 12, None
+    while pos + 8 <= len(data):
+        cid, size = data[pos:pos + 4], struct.unpack_from("<I", data, pos + 4)[0]
+        if cid == b"fmt " and size >= 16:
+            audio_fmt, ch, rate, _, _, bits = struct.unpack_from("<HHIIHH", data, pos + 8)
+            fmt = {"format": audio_fmt, "channels": ch, "rate": rate, "bits": bits}
+        elif cid == b"data" and fmt:
+            fmt["data"] = min(size, len(data) - pos - 8)
+            return fmt
+        pos += 8 + size + (size & 1)
+    return None
+
+
+def duration_sec(data: bytes, kind: Optional[str] = None) -> Optional[float]:
+    kind = kind or sniff(data)
+    if kind == "ogg":
+        return ogg_duration_sec(data)
+    if kind == "wav":
+        f = _wav_format(data)
+        if f and f["rate"] and f["channels"] and f["bits"]:
+            return f["data"] / float(f["rate"] * f["channels"] * (f["bits"] // 8))
+    return None
+
+
+def wav_bytes(pcm: bytes, rate: int = SAMPLE_RATE) -> bytes:
+    """WAV PCM s16 mono com o header RIFF de 44 bytes."""
+    return b"RIFF" + struct.pack("<I", 36 + len(pcm)) + b"WAVEfmt " + struct.pack(
+        "<IHHIIHH", 16, 1, 1, rate, rate * 2, 2, 16
+    ) + b"data" + struct.pack("<I", len(pcm)) + pcm
+
+
+# ---------- backends ----------
+def _pyav_decode(data: bytes) -> bytes:
+    resampler = av.AudioResampler(format="s16", layout="mono", rate=SAMPLE_RATE)
+    out = bytearray()
+    with av.open(io.BytesIO(data), mode="r") as container:
+        stream = next(s for s in container.streams if s.type == "audio")
+        for frame in container.decode(stream):
+            for f in resampler.resample(frame):
+                out += f.to_ndarray().tobytes()
+    for f in resampler.resample(None):  # flush
+        out += f.to_ndarray().tobytes()
+    return bytes(out)
+
+
+_FFMPEG_ARGS = ["-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+                "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "pipe:1"]
+
+
+class FfmpegPool:
+    """Processos ffmpeg pré-iniciados (bloqueados lendo stdin); um por clipe, reposto em background."""
+
+    def __init__(self, size: int = 2, binary: str = "ffmpeg"):
+        self.size = max(0, int(size))
+        self.binary = binary
+        self._idle: Deque[subprocess.Popen] = deque()
+        self._lock = threading.Lock()
+        self._refilling = False
+        self.spawned = 0
+        self.cold = 0  # clipes que tiveram de esperar um spawn (pool vazio)
+
+    def _spawn(self) -> subprocess.Popen:
+        with self._lock:
+            self.spawned += 1
+        return subprocess.Popen([self.binary, *_FFMPEG_ARGS], stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def _refill(self) -> None:
+        try:
+            while True:
+                with self._lock:
+                    if len(self._idle) >= self.size:
+                        return
+                proc = self._spawn()
+                with self._lock:
+                    self._idle.append(proc)
+        except Exception as e:
+            logger.info("[audio_transcode] refill ffmpeg falhou: %s", e)
+        finally:
+            with self._lock:
+                self._refilling = False
+
+    def _schedule_refill(self) -> None:
+        with self._lock:
+            if self._refilling or len(self._idle) >= self.size:
+                return
+            self._refilling = True
+        threading.Thread(target=self._refill, name="ffmpeg-pool-refill", daemon=True).start()
+
+    def _take(self) -> subprocess.Popen:
+        with self._lock:
+            while self._idle:
+                proc = self._idle.popleft()
+                if proc.poll() is None:
+                    return proc
+            self.cold += 1
+        return self._spawn()
+
+    def decode(self, data: bytes, timeout: float = 30.0) -> bytes:
+        proc = self._take()
+        self._schedule_refill()
+        try:
+            out, err = proc.communicate(data, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            raise
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg rc={proc.returncode}: {(err or b'')[-160:].decode(errors='ignore')}")
+        return out
+
+    def warm(self) -> None:
+        self._schedule_refill()
+
+    def close(self) -> None:
+        with self._lock:
+            procs, self._idle = list(self._idle), deque()
+        for p in procs:
+            try:
+                p.kill()
+                p.communicate(timeout=2)
+            except Exception:
+                pass
+
+
+_POOL: Optional[FfmpegPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _pool() -> Optional[FfmpegPool]:
+    global _POOL
+    if _POOL is None:
+        binary = shutil.which(os.getenv("FFMPEG_BIN", "ffmpeg") or "ffmpeg")
+        if not binary:
+            return None
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = FfmpegPool(int(_env_num("AUDIO_TRANSCODE_POOL_SIZE", 2)), binary)
+                _POOL.warm()
+    return _POOL
+
+
+def backend() -> Optional[str]:
+    want = (os.getenv("AUDIO_TRANSCODE_BACKEND") or "auto").strip().lower()
+    if want in ("auto", "pyav") and av is not None:
+        return "pyav"
+    if want in ("auto", "ffmpeg") and _pool() is not None:
+        return "ffmpeg"
+    return None
+
+
+# ---------- API ----------
+_STATS_LOCK = threading.Lock()
+_STATS: Dict[str, Any] = {"clips": 0, "passthrough": 0, "rejected": 0, "errors": 0, "ms_total": 0.0,
+                          "by_backend": {}, "by_kind": {}}
+
+
+def _count(result: "TranscodeResult") -> None:
+    with _STATS_LOCK:
+        _STATS["clips"] += 1
+        _STATS["ms_total"] += result.ms
+        _STATS["by_kind"][result.kind or "unknown"] = _STATS["by_kind"].get(result.kind or "unknown", 0) + 1
+        if result.backend:
+            _STATS["by_backend"][result.backend] = _STATS["by_backend"].get(result.backend, 0) + 1
+        if result.reason in ("too_large", "too_long"):
+            _STATS["rejected"] += 1
+        elif result.reason == "passthrough":
+            _STATS["passthrough"] += 1
+        elif result.wav is None:
+            _STATS["errors"] += 1
+
+
+class TranscodeResult:
+    __slots__ = ("wav", "kind", "backend", "ms", "reason", "seconds")
+
+    def __init__(self, wav: Optional[bytes], kind: Optional[str], backend: Optional[str] = None,
+                 ms: float = 0.0, reason: str = "", seconds: Optional[float] = None):
+        self.wav = wav
+        self.kind = kind
+        self.backend = backend
+        self.ms = ms
+        self.reason = reason
+        self.seconds = seconds
+
+    @property
+    def mime(self) -> str:
+        return "audio/wav" if self.wav else MIME_BY_KIND.get(self.kind or "", "application/octet-stream")
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"kind": self.kind, "backend": self.backend, "ms": round(self.ms, 1), "reason": self.reason,
+                "seconds": round(self.seconds, 2) if self.seconds is not None else None}
+
+
+def transcode(data: bytes) -> TranscodeResult:
+    """WAV 16 kHz mono s16 para STT; wav=None quando recusado/impossível (reason explica)."""
+    t0 = time.perf_counter()
+    kind = sniff(data)
+
+    def done(wav: Optional[bytes], reason: str, used: Optional[str] = None,
+             seconds: Optional[float] = None) -> TranscodeResult:
+        res = TranscodeResult(wav, kind, used, (time.perf_counter() - t0) * 1000, reason, seconds)
+        _count(res)
+        return res
+
+    max_bytes = int(_env_num("AUDIO_TRANSCODE_MAX_BYTES", 16 * 1024 * 1024))
+    max_sec = _env_num("AUDIO_TRANSCODE_MAX_SEC", 600)
+    if not data:
+        return done(None, "empty")
+    if len(data) > max_bytes:
+        return done(None, "too_large")
+    seconds = duration_sec(data, kind)
+    if seconds is not None and seconds > max_sec:
+        return done(None, "too_long", seconds=seconds)
+
+    if kind == "wav":
+        f = _wav_format(data)
+        if f and f["format"] == 1 and f["channels"] == 1 and f["rate"] == SAMPLE_RATE and f["bits"] == 16:
+            return done(data, "passthrough", seconds=seconds)
+
+    used = backend()
+    if used is None:
+        return done(None, "no_backend", seconds=seconds)
+    try:
+        timeout = _env_num("AUDIO_TRANSCODE_TIMEOUT_SEC", 30)
+        pcm = _pyav_decode(data) if used == "pyav" else _pool().decode(data, timeout=timeout)  # type: ignore[union-attr]
+    except Exception as e:
+        logger.info("[audio_transcode] %s falhou (%s): %s", used, kind, e)
+        return done(None, f"decode_failed:{type(e).__name__}", used, seconds)
+    if not pcm:
+        return done(None, "empty_pcm", used, seconds)
+    pcm_sec = len(pcm) / (SAMPLE_RATE * 2.0)
+    if pcm_sec > max_sec:
+        return done(None, "too_long", used, pcm_sec)
+    return done(wav_bytes(pcm), "ok", used, pcm_sec)
+
+
+def to_wav16k(data: bytes) -> Optional[bytes]:
+    return transcode(data).wav
+
+
+def stats() -> Dict[str, Any]:
+    with _STATS_LOCK:
+        out = {k: (dict(v) if isinstance(v, dict) else v) for k, v in _STATS.items()}
+    done = out["clips"] - out["rejected"]
+    out["avg_ms"] = round(out.pop("ms_total") / done, 1) if done > 0 else 0.0
+    out["backend"] = "pyav" if av is not None else ("ffmpeg" if _POOL is not None else None)
+    pool = _POOL
+    out["pool"] = {"size": pool.size, "spawned": pool.spawned, "cold": pool.cold} if pool else None
+    return out
+
+
+def reset_stats() -> None:
+    with _STATS_LOCK:
+        _STATS.update(clips=0, passthrough=0, rejected=0, errors=0, ms_total=0.0, by_backend={}, by_kind={})
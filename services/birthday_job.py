@@ -0,0 +1,333 @@
+# services/birthday_job.py
+# Job diário de aniversários (usado por POST /admin/jobs/birthday).
+#
+# - Uma query em collection_group("clientes") com birthday.month/day/enabled (sem varrer
+#   profissionais); com allowlist de UIDs, a mesma query por uid
+# - Paginado; cursor (path do último cliente processado) em platform_maintenance/birthday_job
+#   por data → chamada repetida no mesmo dia continua de onde parou (orçamento de tempo)
+# - Dedupe de birthday_logs com get_all por página (um round-trip, não um get por contato)
+# - Falha na query ou no get_all: o cursor fica na última página concluída, o run para com
+#   complete=False e o erro vai para batchErrors → a próxima chamada refaz a mesma página
+# - Envio de template em pool limitado (BIRTHDAY_CONCURRENCY) com rate limit global
+#   (BIRTHDAY_RATE_PER_SEC, token bucket)
+# - Logs e lastSentYear gravados em WriteBatch por página
+#
+# Índice: collection group "clientes" (birthday.month, birthday.day, birthday.enabled).
+
+from __future__ import annotations
+
+import os
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("mei_robo.birthday_job")
+
+STATE_COLL = os.getenv("BIRTHDAY_STATE_COLL", "platform_maintenance")
+STATE_DOC = "birthday_job"
+BATCH_MAX = 400  # limite 500 por WriteBatch
+CONCURRENCY = int(os.getenv("BIRTHDAY_CONCURRENCY", "4") or 4)
+RATE_PER_SEC = float(os.getenv("BIRTHDAY_RATE_PER_SEC", "10") or 10)
+PAGE_SIZE = int(os.getenv("BIRTHDAY_PAGE_SIZE", "200") or 200)
+
+
+class RateLimiter:
+    """Token bucket thread-safe: acquire() bloqueia até haver ficha (rate/s, rajada = burst)."""
+
+    def __init__(self, rate_per_sec: float, burst: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.rate = max(0.0, float(rate_per_sec))
+        self.burst = max(1.0, float(burst if burst is not None else max(1.0, self.rate)))
+        self._clock, self._sleep = clock, sleep
+        self._tokens = self.burst
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+# ---------- helpers de contato (mesmas regras do MVP) ----------
+def first_name(contact: dict) -> str:
+    # preferência: comoChama, senão nome (primeira palavra)
+    s = (contact.get("comoChama") or contact.get("nome") or "").strip()
+    if not s:
+        return "você"
+    return s.split()[0][:40]
+
+
+def consent_status(contact: dict) -> str:
+    # compat: contato pode ter "consent.status" OU "consentimento.status"
+    c1 = ((contact.get("consent") or {}) if isinstance(contact.get("consent"), dict) else {})
+    c2 = ((contact.get("consentimento") or {}) if isinstance(contact.get("consentimento"), dict) else {})
+    st = (c1.get("status") or c2.get("status") or "").strip().lower()
+    return st or "pendente"
+
+
+def contact_phone(contact: dict) -> str:
+    # preferir telefone_v2.msisdn (canônico)
+    tv2 = contact.get("telefone_v2") or {}
+    if isinstance(tv2, dict):
+        msisdn = (tv2.get("msisdn") or "").strip()
+        if msisdn:
+            return msisdn
+    # fallback: telefone raw
+    return (contact.get("telefone") or "").strip()
+
+
+def _last_sent_year(contact: dict) -> Optional[int]:
+    bday = contact.get("birthday") or {}
+    try:
+        if isinstance(bday, dict) and bday.get("lastSentYear") is not None:
+            return int(bday.get("lastSentYear"))
+    except Exception:
+        pass
+    return None
+
+
+def _uid_from_path(path: str) -> str:
+    parts = (path or "").split("/")
+    if len(parts) == 4 and parts[0] == "profissionais" and parts[2] == "clientes":
+        return parts[1]
+    return ""
+
+
+def _after(q, db, last_path: str):
+    """Página seguinte ao contato last_path (cursor por __name__ se o contato foi apagado)."""
+    snap = db.document(last_path).get()
+    if getattr(snap, "exists", False):
+        return q.start_after(snap)
+    return q.order_by("__name__").start_after({"__name__": db.document(last_path)})
+
+
+# ---------- estado ----------
+def _load_state(db) -> Dict[str, Any]:
+    try:
+        snap = db.collection(STATE_COLL).document(STATE_DOC).get()
+        if getattr(snap, "exists", False):
+            return snap.to_dict() or {}
+    except Exception as e:
+        logger.info("[birthday_job] estado indisponível: %s", e)
+    return {}
+
+
+def _save_state(db, state: Dict[str, Any]) -> None:
+    try:
+        db.collection(STATE_COLL).document(STATE_DOC).set(state)
+    except Exception as e:
+        logger.info("[birthday_job] falha ao salvar cursor: %s", e)
+
+
+class _Writer:
+    """Acumula sets (merge) e comita em WriteBatch a cada BATCH_MAX operações."""
+
+    def __init__(self, db):
+        self.db = db
+        self._ops: List[Tuple[Any, Dict[str, Any]]] = []
+        self.commits = 0
+
+    def set(self, ref, body: Dict[str, Any]) -> None:
+        self._ops.append((ref, body))
+        if len(self._ops) >= BATCH_MAX:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._ops:
+            return
+        batch = self.db.batch()
+        for ref, body in self._ops:
+            batch.set(ref, body, merge=True)
+        batch.commit()
+        self.commits += 1
+        self._ops = []
+
+
+def _queries(db, month: int, day: int, uids: Optional[List[str]]):
+    def _filter(col):
+        return (
+            col.where("birthday.month", "==", month)
+            .where("birthday.day", "==", day)
+            .where("birthday.enabled", "==", True)
+        )
+
+    if uids:
+        return [(f"uid:{u}", _filter(db.collection("profissionais").document(u).collection("clientes"))) for u in uids]
+    return [("group", _filter(db.collection_group("clientes")))]
+
+
+def run_birthday_job(
+    db,
+    send_template: Callable[..., Any],
+    *,
+    now: Optional[datetime] = None,
+    tz=None,
+    template: str = "mei_robo_aniversario_v1",
+    dry_run: bool = False,
+    uids: Optional[List[str]] = None,
+    time_budget_sec: float = 20.0,
+    page_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    limiter: Optional[RateLimiter] = None,
+) -> Dict[str, Any]:
+    t0 = time.monotonic()
+    now_local = now or datetime.now(tz)
+    day, month, year = int(now_local.day), int(now_local.month), int(now_local.year)
+    yyyymmdd = now_local.strftime("%Y%m%d")
+    page = max(1, int(page_size or PAGE_SIZE))
+    workers = max(1, int(concurrency or CONCURRENCY))
+    limiter = limiter or RateLimiter(RATE_PER_SEC)
+
+    state = _load_state(db)
+    if state.get("date") != yyyymmdd:
+        state = {"date": yyyymmdd, "cursors": {}, "done": []}
+    cursors: Dict[str, str] = dict(state.get("cursors") or {})
+    done: List[str] = list(state.get("done") or [])
+
+    stats = {"checked": 0, "sent": 0, "skipped": 0, "errors": 0}
+    batch_errors: List[Dict[str, Any]] = []
+    tenants = set()
+    writer = _Writer(db)
+    complete = True
+
+    def _send(item) -> Tuple[Any, bool, Any]:
+        limiter.acquire()
+        try:
+            ok, resp = send_template(
+                to=item["phone"],
+                template_name=template,
+                params=[{"type": "text", "text": item["name"]}],
+                language_code="pt_BR",
+            )
+        except Exception as e:
+            ok, resp = False, {"error": f"{type(e).__name__}:{str(e)[:200]}"}
+        return item, bool(ok), resp
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for key, q in _queries(db, month, day, uids):
+            if key in done:
+                continue
+            while True:
+                if time.monotonic() - t0 >= time_budget_sec:
+                    complete = False
+                    break
+                last_path = cursors.get(key)
+                try:
+                    page_q = _after(q, db, last_path) if last_path else q
+                    snaps = list(page_q.limit(page).stream())
+                except Exception as e:
+                    # erro transitório ou índice ausente: não marca a chave como concluída
+                    logger.exception("[birthday_job] query falhou (%s): %s", key, e)
+                    stats["errors"] += 1
+                    batch_errors.append({"key": key, "after": last_path or "", "stage": "query",
+                                         "error": f"{type(e).__name__}:{str(e)[:200]}"})
+                    complete = False
+                    break
+                if not snaps:
+                    done.append(key)
+                    cursors.pop(key, None)
+                    break
+
+                # elegíveis antes do dedupe por log
+                cands = []
+                for snap in snaps:
+                    stats["checked"] += 1
+                    path = snap.reference.path
+                    puid = _uid_from_path(path)
+                    c = snap.to_dict() or {}
+                    if not puid or consent_status(c) != "consentido" or _last_sent_year(c) == year:
+                        stats["skipped"] += 1
+                        continue
+                    tenants.add(puid)
+                    log_ref = db.collection("profissionais").document(puid).collection("birthday_logs").document(f"{yyyymmdd}_{snap.id}")
+                    cands.append({"uid": puid, "cid": snap.id, "ref": snap.reference, "log_ref": log_ref, "contact": c})
+
+                existing = set()
+                if cands:
+                    try:
+                        for s in db.get_all([it["log_ref"] for it in cands]):
+                            if getattr(s, "exists", False):
+                                existing.add(s.reference.path)
+                    except Exception as e:
+                        # sem dedupe não envia; cursor fica antes da página → próxima chamada refaz
+                        logger.exception("[birthday_job] get_all falhou (%s): %s", key, e)
+                        stats["errors"] += 1
+                        batch_errors.append({"key": key, "after": last_path or "", "stage": "dedupe",
+                                             "contacts": len(cands), "error": f"{type(e).__name__}:{str(e)[:200]}"})
+                        complete = False
+                        break
+
+                to_send = []
+                for it in cands:
+                    if it["log_ref"].path in existing:
+                        stats["skipped"] += 1
+                        continue
+                    base = {"sentAt": datetime.now(timezone.utc), "template": template, "contactId": it["cid"], "uid": it["uid"]}
+                    phone = contact_phone(it["contact"])
+                    if not phone:
+                        # sem telefone => não envia
+                        writer.set(it["log_ref"], {**base, "status": "skipped_no_phone", "error": "missing_phone"})
+                        stats["skipped"] += 1
+                        continue
+                    it["phone"], it["name"] = phone, first_name(it["contact"])
+                    if dry_run:
+                        # só loga; lastSentYear não é marcado no dry_run
+                        writer.set(it["log_ref"], {**base, "status": "dry_run", "error": "", "to": phone, "param1": it["name"]})
+                        continue
+                    to_send.append(it)
+
+                for it, ok_send, resp in pool.map(_send, to_send):
+                    base = {"sentAt": datetime.now(timezone.utc), "template": template, "contactId": it["cid"],
+                            "uid": it["uid"], "to": it["phone"], "resp": resp}
+                    if ok_send:
+                        stats["sent"] += 1
+                        writer.set(it["log_ref"], {**base, "status": "sent", "error": ""})
+                        writer.set(it["ref"], {"birthday": {"lastSentYear": year}, "updatedAt": datetime.now(timezone.utc)})
+                    else:
+                        stats["errors"] += 1
+                        writer.set(it["log_ref"], {**base, "status": "error", "error": "send_failed"})
+
+                # logs da página antes do cursor: retomada nunca pula um envio sem log
+                writer.flush()
+                cursors[key] = snaps[-1].reference.path
+                _save_state(db, {"date": yyyymmdd, "cursors": cursors, "done": done, "updatedAt": datetime.now(timezone.utc)})
+                if len(snaps) < page:
+                    done.append(key)
+                    cursors.pop(key, None)
+                    break
+            if not complete:
+                break
+
+    writer.flush()
+    _save_state(db, {"date": yyyymmdd, "cursors": cursors, "done": done, "complete": complete,
+                     "updatedAt": datetime.now(timezone.utc)})
+    out = {
+        "ok": True,
+        "complete": complete,
+        "day": day,
+        "month": month,
+        "year": year,
+        "date": yyyymmdd,
+        "template": template,
+        "dry_run": dry_run,
+        "uids": len(uids) if uids else len(tenants),
+        **stats,
+        "batchErrors": batch_errors,
+        "batches": writer.commits,
+        "elapsedMs": int((time.monotonic() - t0) * 1000),
+    }
+    logger.info("[birthday_job] %s", {k: out[k] for k in ("date", "checked", "sent", "skipped", "errors", "complete")})
+    return out
@@ -20,6 +20,8 @@ import hashlib
 import requests
 import unicodedata
 from typing import Any, Dict, Optional, Tuple
+
+from cache.refreshing import RefreshingMap, RefreshingValue
 # ==========================================================
 # Firestore client (credencial consistente)
 # - Evita 403 "Missing or insufficient permissions" quando o client pega credencial errada (ADC).
@@ -561,8 +563,6 @@ SPOKENIZER_MODE = str(os.getenv("SPOKENIZER_MODE", "v1") or "v1").strip().lower(
 # Fonte de verdade: platform_kb/sales (doc único)
 # =========================
 
-_SALES_KB_CACHE: Optional[Dict[str, Any]] = None
-_SALES_KB_CACHE_AT: float = 0.0
 _SALES_KB_TTL_SECONDS: int = int(os.getenv("SALES_KB_TTL_SECONDS", "600"))
 
 
@@ -661,13 +661,8 @@ def _merge_platform_pricing_into_kb(kb: Dict[str, Any]) -> Dict[str, Any]:
         return kb
 
 
-def _get_sales_kb() -> Dict[str, Any]:
-    """Carrega KB de vendas do Firestore com cache/TTL. Best-effort."""
-    global _SALES_KB_CACHE, _SALES_KB_CACHE_AT
-    now = time.time()
-    if _SALES_KB_CACHE and (now - _SALES_KB_CACHE_AT) < _SALES_KB_TTL_SECONDS:
-        return _SALES_KB_CACHE
-
+def _load_sales_kb() -> Dict[str, Any]:
+    """Carrega KB de vendas do Firestore. Best-effort (sem Firestore → KB mínimo)."""
     kb: Dict[str, Any] = {}
     try:
         # Lazy import para não quebrar em ambientes sem Firestore libs
@@ -704,22 +699,27 @@ def _get_sales_kb() -> Dict[str, Any]:
     
     # Preço vem do doc canônico (platform_pricing/current) via pricing_ref
     kb = _merge_platform_pricing_into_kb(kb)
-
-    _SALES_KB_CACHE = kb
-    _SALES_KB_CACHE_AT = now
     return kb
 
 
+_SALES_KB = RefreshingValue(_load_sales_kb, ttl=_SALES_KB_TTL_SECONDS, name="sales_lead_kb", default={})
+
+
+def _get_sales_kb() -> Dict[str, Any]:
+    """KB de vendas com cache em processo (refresh single-flight, stale-while-revalidate)."""
+    return _SALES_KB.get() or {}
+
+
 # =========================
 # Firestore: leitura mínima (1 caixa/turno)
 # =========================
 
-_SALES_SLICE_CACHE: Dict[str, Any] = {}
-_SALES_SLICE_CACHE_AT: Dict[str, float] = {}
+_SALES_SLICE_CACHE = RefreshingMap("sales_doc_fields", ttl=180, default={})
 
 def _get_doc_fields(doc_path: str, field_paths: list, *, ttl_seconds: int = 180) -> Dict[str, Any]:
     """Busca apenas campos específicos de um doc no Firestore.
     Best-effort: se não suportar field_paths no ambiente, cai em get() normal e filtra em memória.
+    Cache em processo por (doc, campos) com refresh single-flight.
     """
     doc_path = (doc_path or "").strip().strip("/")
     if not doc_path:
@@ -729,68 +729,56 @@ def _get_doc_fields(doc_path: str, field_paths: list, *, ttl_seconds: int = 180)
     except Exception:
         fp = []
     cache_key = f"doc:{doc_path}|" + ",".join(fp)
-    now = time.time()
-    try:
-        at = float(_SALES_SLICE_CACHE_AT.get(cache_key) or 0.0)
-        if cache_key in _SALES_SLICE_CACHE and (now - at) < float(ttl_seconds or 0):
-            v = _SALES_SLICE_CACHE.get(cache_key)
-            return v if isinstance(v, dict) else {}
-    except Exception:
-        pass
+    v = _SALES_SLICE_CACHE.get(cache_key, lambda: _read_doc_fields(doc_path, fp), ttl=float(ttl_seconds or 0))
+    return v if isinstance(v, dict) else {}
 
+
+def _read_doc_fields(doc_path: str, fp: list) -> Dict[str, Any]:
+    """Leitura crua para _get_doc_fields. Erro de Firestore propaga (mantém valor antigo no cache)."""
     out: Dict[str, Any] = {}
-    try:
-        from firebase_admin import firestore as fb_firestore  # type: ignore
-        client = _fs_client()
-        parts = [p for p in doc_path.split("/") if p]
-        if len(parts) < 2:
-            return {}
-        ref = client.collection(parts[0]).document(parts[1])
+    from firebase_admin import firestore as fb_firestore  # type: ignore
+    client = _fs_client()
+    parts = [p for p in doc_path.split("/") if p]
+    if len(parts) < 2:
+        return {}
+    ref = client.collection(parts[0]).document(parts[1])
 
-        doc = None
-        if fp:
-            try:
-                doc = ref.get(field_paths=fp)
-            except Exception:
-                doc = ref.get()
-        else:
+    doc = None
+    if fp:
+        try:
+            doc = ref.get(field_paths=fp)
+        except Exception:
             doc = ref.get()
+    else:
+        doc = ref.get()
 
-        if not doc or not getattr(doc, "exists", False):
-            return {}
-
-        data = doc.to_dict() or {}
-        if not isinstance(data, dict):
-            return {}
+    if not doc or not getattr(doc, "exists", False):
+        return {}
 
-        if not fp:
-            out = data
-        else:
-            # Filtra em memória (resiliente a field_paths não suportado)
-            for p in fp:
-                cur = data
-                ok = True
-                for seg in p.split("."):
-                    if not isinstance(cur, dict) or seg not in cur:
-                        ok = False
-                        break
-                    cur = cur.get(seg)
-                if ok:
-                    tgt = out
-                    segs = p.split(".")
-                    for seg in segs[:-1]:
-                        if seg not in tgt or not isinstance(tgt.get(seg), dict):
-                            tgt[seg] = {}
-                        tgt = tgt[seg]
-                    tgt[segs[-1]] = cur
-    except Exception:
-        out = {}
+    data = doc.to_dict() or {}
+    if not isinstance(data, dict):
+        return {}
 
-    try:
-        _SALES_SLICE_CACHE[cache_key] = out
-        _SALES_SLICE_CACHE_AT[cache_key] = now
-    except Exception:
-        pass
+    if not fp:
+        out = data
+    else:
+        # Filtra em memória (resiliente a field_paths não suportado)
+        for p in fp:
+            cur = data
+            ok = True
+            for seg in p.split("."):
+                if not isinstance(cur, dict) or seg not in cur:
+                    ok = False
+                    break
+                cur = cur.get(seg)
+            if ok:
+                tgt = out
+                segs = p.split(".")
+                for seg in segs[:-1]:
+                    if seg not in tgt or not isinstance(tgt.get(seg), dict):
+                        tgt[seg] = {}
+                    tgt = tgt[seg]
+                tgt[segs[-1]] = cur
     return out
 
 
@@ -2415,60 +2403,55 @@ def _kb_slice_cache_key(intent: str, segment: str = "") -> str:
     seg = (segment or "").strip().lower()[:32]
     return f"kb_slice:{i}:{seg or 'na'}"
 
-_ALIAS_MEM_CACHE: Dict[str, Any] = {}
-_ALIAS_MEM_AT: float = 0.0
 _ALIAS_MEM_TTL: int = int(os.getenv("SALES_ALIAS_MEM_TTL_SECONDS", "60") or "60")
 
-def _load_alias_config_and_enabled_items() -> Tuple[Dict[str, Any], list]:
-    """
-    Lê platform_kb_action_maps/aliases_sales e lista items enabled=true.
-    Cache curto em memória pra reduzir custo.
-    """
-    global _ALIAS_MEM_CACHE, _ALIAS_MEM_AT
-    now = time.time()
-    if isinstance(_ALIAS_MEM_CACHE, dict) and _ALIAS_MEM_CACHE and (now - float(_ALIAS_MEM_AT or 0.0)) < float(_ALIAS_MEM_TTL or 0):
-        cfg = _ALIAS_MEM_CACHE.get("cfg") or {}
-        items = _ALIAS_MEM_CACHE.get("items") or []
-        return (cfg if isinstance(cfg, dict) else {}, items if isinstance(items, list) else [])
-
+def _read_alias_config_and_enabled_items() -> Dict[str, Any]:
+    """Leitura crua de aliases_sales (+ items enabled). Erro propaga (mantém valor antigo no cache)."""
     cfg: Dict[str, Any] = {}
     items: list = []
+    from firebase_admin import firestore as fb_firestore  # type: ignore
+    client = _fs_client()
+    parts = [p for p in PLATFORM_ALIAS_DOC.split("/") if p]
+    if len(parts) >= 2:
+        doc = client.collection(parts[0]).document(parts[1]).get()
+        if doc and doc.exists:
+            cfg = doc.to_dict() or {}
+    # items enabled
+    col = client.collection(parts[0]).document(parts[1]).collection("items")
     try:
-        from firebase_admin import firestore as fb_firestore  # type: ignore
-        client = _fs_client()
-        parts = [p for p in PLATFORM_ALIAS_DOC.split("/") if p]
-        if len(parts) >= 2:
-            doc = client.collection(parts[0]).document(parts[1]).get()
-            if doc and doc.exists:
-                cfg = doc.to_dict() or {}
-        # items enabled
-        col = client.collection(parts[0]).document(parts[1]).collection("items")
+        qs = col.where("enabled", "==", True).stream()
+    except Exception:
+        qs = col.stream()
+    for d in qs:
         try:
-            qs = col.where("enabled", "==", True).stream()
-        except Exception:
-            qs = col.stream()
-        for d in qs:
-            try:
-                dd = d.to_dict() or {}
-                if not isinstance(dd, dict):
-                    continue
-                if dd.get("enabled") is not True:
-                    continue
-                phrase = str(dd.get("phrase") or "").strip()
-                if not phrase:
-                    continue
-                items.append(dd)
-            except Exception:
+            dd = d.to_dict() or {}
+            if not isinstance(dd, dict):
                 continue
-    except Exception:
-        cfg = {}
-        items = []
+            if dd.get("enabled") is not True:
+                continue
+            phrase = str(dd.get("phrase") or "").strip()
+            if not phrase:
+                continue
+            items.append(dd)
+        except Exception:
+            continue
+    return {"cfg": cfg, "items": items}
 
-    try:
-        _ALIAS_MEM_CACHE = {"cfg": cfg, "items": items}
-        _ALIAS_MEM_AT = now
-    except Exception:
-        pass
+_ALIAS_MEM_CACHE = RefreshingValue(
+    _read_alias_config_and_enabled_items,
+    ttl=_ALIAS_MEM_TTL,
+    name="sales_alias_config",
+    default={"cfg": {}, "items": []},
+)
+
+def _load_alias_config_and_enabled_items() -> Tuple[Dict[str, Any], list]:
+    """
+    Lê platform_kb_action_maps/aliases_sales e lista items enabled=true.
+    Cache curto em memória (refresh single-flight) pra reduzir custo.
+    """
+    row = _ALIAS_MEM_CACHE.get() or {}
+    cfg = row.get("cfg") or {}
+    items = row.get("items") or []
     return (cfg if isinstance(cfg, dict) else {}, items if isinstance(items, list) else [])
 
 def _alias_lookup(text_in: str) -> Optional[Dict[str, Any]]:
@@ -2,10 +2,11 @@
 # Guardião de orçamento/custos para o MEI Robô
 # - Contabiliza custos por operação (STT, NLU mini, GPT-4o etc.)
 # - Gating de recursos caros (áudio, GPT-4o) com base no orçamento mensal
-# - Persistência leve em cache.kv (TTL até fim do mês/dia); fallback em memória
+# - Persistência: contadores atômicos em shards no Firestore (Increment) com acumulador
+#   local; sem Firestore, cache.kv (TTL até fim do mês/dia) / memória
 
 from __future__ import annotations
-import os, json, time, logging
+import os, json, time, random, atexit, logging, threading
 from datetime import datetime, timedelta, timezone
 from typing import Dict, Optional, Tuple
 
@@ -60,7 +61,7 @@ COSTS: Dict[str, float] = {**_DEFAULT_COSTS, **_COSTS}
 # Persistência (cache.kv)
 # =========================
 try:
-    from cache.kv import make_key as kv_make_key, get as kv_get, put as kv_put  # type: ignore
+    from cache.kv import make_key as kv_make_key, get as kv_get, put as kv_put, incr as kv_incr  # type: ignore
     _KV_OK = True
 except Exception as e:
     logging.info("[budget_guard] cache.kv indisponível: %s", e)
@@ -84,6 +85,12 @@ except Exception as e:
         _kv_mem[key] = (value, time.time() + max(1, int(ttl_sec)))
         return True
 
+    def kv_incr(uid: str, key: str, delta=1, ttl_sec: int = 3600):
+        cur = kv_get(uid, key) or 0
+        new = cur + delta
+        kv_put(uid, key, new, ttl_sec=ttl_sec)
+        return new
+
 # =========================
 # Helpers de tempo / keys
 # =========================
@@ -122,47 +129,239 @@ def _spent_key_month(month_key: str) -> str:
 def _gpt4o_day_counter_key(day_key: str) -> str:
     return kv_make_key(_UID, "gpt4o_count", day_key)
 
-def _get_spent_usd(month_key: Optional[str] = None) -> float:
-    mk = month_key or _month_key()
-    val = kv_get(_UID, _spent_key_month(mk))
+# =========================
+# Contadores atômicos (Firestore Increment em shards)
+# =========================
+# - charge() só acumula localmente; um flusher envia Increment(delta) para um shard
+#   aleatório a cada BUDGET_FLUSH_MS (sem read-modify-write, sem perder incrementos
+#   entre threads/instâncias).
+# - Leituras (can_use_*, fingerprint) usam total em cache, renovado a cada
+#   BUDGET_TOTAL_REFRESH_SEC, somado ao pendente local ainda não enviado.
+# - Sem Firestore: cai no cache.kv.incr (INCRBY atômico no Redis; memória com lock).
+# - Migração: na primeira leitura de um período no processo, o total que já estava no
+#   cache.kv (gasto do mês antes dos shards) vira o shard "seed", criado uma vez só
+#   (create falha se outra instância já criou) — o orçamento não zera no deploy.
+BUDGET_COUNTERS_COLL = os.getenv("BUDGET_COUNTERS_COLL", "platform_budget_counters")
+BUDGET_COUNTER_SHARDS = max(1, int(os.getenv("BUDGET_COUNTER_SHARDS", "8") or "8"))
+BUDGET_FLUSH_MS = max(50, int(os.getenv("BUDGET_FLUSH_MS", "2000") or "2000"))
+BUDGET_TOTAL_REFRESH_SEC = float(os.getenv("BUDGET_TOTAL_REFRESH_SEC", "15") or "15")
+
+_ctr_lock = threading.Lock()
+_ctr_pending: Dict[str, float] = {}                 # counter_id -> delta ainda não enviado
+_ctr_exp: Dict[str, datetime] = {}                  # counter_id -> expAt (fim do mês/dia)
+_ctr_totals: Dict[str, Tuple[float, float]] = {}    # counter_id -> (total remoto, lido_em)
+_ctr_seeded: set = set()                            # counter_ids já conferidos contra o cache.kv
+_ctr_flusher: Optional[threading.Thread] = None
+
+try:
+    from google.api_core.exceptions import AlreadyExists, Conflict  # type: ignore
+    _SEED_EXISTS: tuple = (AlreadyExists, Conflict)
+except Exception:
+    _SEED_EXISTS = ()
+
+def _counters_db():
+    """Firestore para contadores: mesmo critério do cache.kv (client + FIREBASE_PROJECT_ID)."""
+    if not _KV_OK:
+        return None
+    try:
+        from cache import kv as _kv  # type: ignore
+        if _kv._db_ready():
+            return _kv._DB
+    except Exception:
+        pass
+    return None
+
+def _increment(delta: float):
+    from firebase_admin import firestore as fb_firestore  # type: ignore
+    return fb_firestore.Increment(delta)
+
+def _counter_id(name: str, period: str) -> str:
+    return f"{_UID}__{name}__{period}"
+
+def _shards_ref(db, counter_id: str):
+    return db.collection(BUDGET_COUNTERS_COLL).document(counter_id).collection("shards")
+
+def _read_remote_total(db, counter_id: str) -> float:
+    total = 0.0
+    for snap in _shards_ref(db, counter_id).stream():
+        try:
+            total += float((snap.to_dict() or {}).get("value") or 0.0)
+        except Exception:
+            continue
+    return total
+
+def flush_counters() -> int:
+    """
+    Envia os deltas pendentes (um Increment por contador, shard aleatório, num único batch).
+    Retorna quantos contadores foram enviados. Em erro, devolve os deltas ao acumulador.
+    """
+    db = _counters_db()
+    if db is None:
+        return 0  # pendente fica no acumulador até o Firestore voltar
+    with _ctr_lock:
+        if not _ctr_pending:
+            return 0
+        pending = dict(_ctr_pending)
+        _ctr_pending.clear()
+    try:
+        batch = db.batch()
+        for cid, delta in pending.items():
+            shard = random.randrange(BUDGET_COUNTER_SHARDS)
+            exp = _ctr_exp.get(cid)
+            body = {"value": _increment(delta), "updatedAt": _now().isoformat()}
+            if exp is not None:
+                body["expAt"] = exp.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+            batch.set(_shards_ref(db, cid).document(str(shard)), body, merge=True)
+        batch.commit()
+    except Exception as e:
+        logging.info("[budget_guard] flush falhou; deltas devolvidos: %s", e)
+        with _ctr_lock:
+            for cid, delta in pending.items():
+                _ctr_pending[cid] = _ctr_pending.get(cid, 0.0) + delta
+        return 0
+    with _ctr_lock:
+        for cid, delta in pending.items():
+            row = _ctr_totals.get(cid)
+            if row is not None:
+                _ctr_totals[cid] = (row[0] + delta, row[1])
+    return len(pending)
+
+def _flusher_loop():
+    while True:
+        time.sleep(BUDGET_FLUSH_MS / 1000.0)
+        try:
+            flush_counters()
+        except Exception:
+            pass
+
+def _ensure_flusher():
+    global _ctr_flusher
+    if _ctr_flusher is not None:
+        return
+    with _ctr_lock:
+        if _ctr_flusher is not None:
+            return
+        t = threading.Thread(target=_flusher_loop, name="budget-guard-flush", daemon=True)
+        t.start()
+        _ctr_flusher = t
+        atexit.register(flush_counters)
+
+def _counter_add(name: str, period: str, delta: float, exp_at: datetime) -> float:
+    """Incremento atômico; retorna o total estimado (cache remoto + pendente)."""
+    db = _counters_db()
+    cid = _counter_id(name, period)
+    if db is None:
+        return _kv_counter_add(name, period, delta, exp_at)
+    with _ctr_lock:
+        _ctr_pending[cid] = _ctr_pending.get(cid, 0.0) + float(delta)
+        _ctr_exp[cid] = exp_at
+    _ensure_flusher()
+    return _counter_total(name, period)
+
+def _seed_from_kv(db, name: str, period: str, cid: str) -> None:
+    """Leva o total do cache.kv para o shard "seed" (uma vez por contador). Nunca levanta."""
+    try:
+        legacy = _kv_counter_get(name, period)
+        if legacy > 0:
+            exp = _end_of_day() if name == "gpt4o_count" else _end_of_month()
+            _shards_ref(db, cid).document("seed").create({
+                "value": legacy,
+                "source": "cache.kv",
+                "updatedAt": _now().isoformat(),
+                "expAt": exp.astimezone(timezone.utc).isoformat().replace("+00:00", "Z"),
+            })
+            logging.info("[budget_guard] contador %s semeado do cache.kv: %s", cid, legacy)
+    except _SEED_EXISTS:
+        pass  # outra instância já semeou
+    except Exception as e:
+        logging.info("[budget_guard] seed do cache.kv falhou (%s): %s", cid, e)
+        return  # tenta de novo na próxima leitura
+    with _ctr_lock:
+        _ctr_seeded.add(cid)
+
+def _counter_total(name: str, period: str) -> float:
+    db = _counters_db()
+    if db is None:
+        return _kv_counter_get(name, period)
+    cid = _counter_id(name, period)
+    now_ts = time.time()
+    with _ctr_lock:
+        row = _ctr_totals.get(cid)
+        pending = _ctr_pending.get(cid, 0.0)
+    if row is None or (now_ts - row[1]) >= BUDGET_TOTAL_REFRESH_SEC:
+        if cid not in _ctr_seeded:
+            _seed_from_kv(db, name, period, cid)
+        try:
+            remote = _read_remote_total(db, cid)
+        except Exception as e:
+            logging.info("[budget_guard] leitura de shards falhou: %s", e)
+            if row is None:
+                # cold start sem leitura: 0.0 abriria os gates; usa o cache.kv e não guarda
+                return _kv_counter_get(name, period) + pending
+            remote = row[0]
+        with _ctr_lock:
+            _ctr_totals[cid] = (remote, now_ts)
+            pending = _ctr_pending.get(cid, 0.0)
+        return remote + pending
+    return row[0] + pending
+
+# ---- fallback cache.kv (Redis INCRBY / memória): kv.incr, serializado por lock no processo ----
+_kv_rmw_lock = threading.Lock()
+
+def _kv_counter_key(name: str, period: str) -> str:
+    if name == "gpt4o_count":
+        return _gpt4o_day_counter_key(period)
+    return _spent_key_month(period)
+
+def _kv_counter_get(name: str, period: str) -> float:
+    val = kv_get(_UID, _kv_counter_key(name, period))
     try:
         return float(val or 0.0)
     except Exception:
         return 0.0
 
+def _kv_counter_add(name: str, period: str, delta: float, exp_at: datetime) -> float:
+    ttl = max(1, int((exp_at - _now()).total_seconds()))
+    try:
+        with _kv_rmw_lock:
+            new = kv_incr(_UID, _kv_counter_key(name, period), delta, ttl_sec=ttl)
+    except Exception as e:
+        logging.warning("[budget_guard] incremento no cache.kv falhou (%s/%s): %s", name, period, e)
+        return _kv_counter_get(name, period)
+    try:
+        return max(0.0, float(new))
+    except Exception:
+        return 0.0
+
+def _end_of_month(dt: Optional[datetime] = None) -> datetime:
+    dt = dt or _now()
+    return dt + timedelta(seconds=_seconds_until_end_of_month(dt))
+
+def _end_of_day(dt: Optional[datetime] = None) -> datetime:
+    dt = dt or _now()
+    return dt + timedelta(seconds=_seconds_until_end_of_day(dt))
+
+def _get_spent_usd(month_key: Optional[str] = None) -> float:
+    mk = month_key or _month_key()
+    return max(0.0, _counter_total("budget_spent_usd", mk))
+
 def _set_spent_usd(amount: float, month_key: Optional[str] = None):
+    """Define o gasto absoluto (ajuste manual): aplica a diferença como incremento."""
     mk = month_key or _month_key()
-    ttl = _seconds_until_end_of_month()
-    kv_put(_UID, _spent_key_month(mk), float(amount), ttl_sec=ttl)
+    cur = _get_spent_usd(mk)
+    _counter_add("budget_spent_usd", mk, float(amount) - cur, _end_of_month())
 
 def _inc_spent_usd(amount: float, month_key: Optional[str] = None) -> float:
     mk = month_key or _month_key()
-    cur = _get_spent_usd(mk)
-    new = max(0.0, cur + float(amount))
-    _set_spent_usd(new, mk)
-    return new
+    return max(0.0, _counter_add("budget_spent_usd", mk, float(amount), _end_of_month()))
 
 def _inc_gpt4o_day_count(delta: int = 1) -> int:
     dk = _day_key()
-    key = _gpt4o_day_counter_key(dk)
-    cur = kv_get(_UID, key) or 0
-    try:
-        cur = int(cur)
-    except Exception:
-        cur = 0
-    new = max(0, cur + int(delta))
-    ttl = _seconds_until_end_of_day()
-    kv_put(_UID, key, new, ttl_sec=ttl)
-    return new
+    return max(0, int(_counter_add("gpt4o_count", dk, int(delta), _end_of_day())))
 
 def _get_gpt4o_day_count() -> int:
     dk = _day_key()
-    key = _gpt4o_day_counter_key(dk)
-    val = kv_get(_UID, key) or 0
-    try:
-        return int(val)
-    except Exception:
-        return 0
+    return max(0, int(_counter_total("gpt4o_count", dk)))
 
 # =========================
 # API pública
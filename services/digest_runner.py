@@ -0,0 +1,323 @@
+# services/digest_runner.py
+# Digest diário multi-tenant (agenda / orçamentos) — substitui chamar /api/*/digest por uid.
+#
+# - Itens do dia numa query em collection_group ("agendamentos" por date, "orcamentos" por
+#   createdAt na janela UTC do dia), agrupados por uid — sem uma query por tenant
+# - Profissionais paginados; cursor (último uid) em platform_maintenance/digest_{kind} por
+#   data → chamada repetida no mesmo dia continua de onde parou (orçamento de tempo)
+# - Config de agenda (diasAtendimento) da página inteira via get_all (um round-trip)
+# - Corpos renderizados em pool (DIGEST_RENDER_CONCURRENCY) com os mesmos templates das rotas
+# - Envio em lote por services.mailer.send_many: uma conexão SMTP para a página inteira
+# - Opt-out: profissionais/{uid}.digest.{kind} == false
+#
+# Índices: collection group "agendamentos" (date) e "orcamentos" (createdAt).
+
+from __future__ import annotations
+
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("mei_robo.digest_runner")
+
+KINDS = ("agenda", "orcamentos")
+STATE_COLL = os.getenv("DIGEST_STATE_COLL", "platform_maintenance")
+PAGE_SIZE = int(os.getenv("DIGEST_PAGE_SIZE", "100") or 100)
+RENDER_CONCURRENCY = int(os.getenv("DIGEST_RENDER_CONCURRENCY", "4") or 4)
+ACTIVE_STATUS = ("agendado", "reagendar")
+
+
+def _env_bool(name: str, default: bool = False) -> bool:
+    raw = (os.getenv(name) or "").strip().lower()
+    if not raw:
+        return default
+    return raw in ("1", "true", "yes", "on")
+
+
+def _uid_from_path(path: str, coll: str) -> str:
+    parts = (path or "").split("/")
+    if len(parts) >= 4 and parts[0] == "profissionais" and parts[2] == coll:
+        return parts[1]
+    return ""
+
+
+def _zero_uids() -> set:
+    # mesmo ZERO_UIDS_EMPTY de agenda_repo.list_events_for
+    raw = (os.getenv("ZERO_UIDS_EMPTY") or "").strip()
+    return {u.strip() for u in raw.split(",") if u.strip()}
+
+
+# ---------- itens do dia (uma query para todos os tenants) ----------
+def _items_by_uid(db, kind: str, date_str: str, tz: str) -> Dict[str, List[Dict[str, Any]]]:
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    if kind == "agenda":
+        q = db.collection_group("agendamentos").where("date", "==", date_str)
+        zero = _zero_uids()
+        for doc in q.stream():
+            uid = _uid_from_path(doc.reference.path, "agendamentos")
+            d = doc.to_dict() or {}
+            if not uid or uid in zero or d.get("status", "agendado") not in ACTIVE_STATUS:
+                continue
+            out.setdefault(uid, []).append(d)
+        return out
+
+    from routes.orcamentos_digest import _day_bounds_utc, _item_from_doc
+
+    start_utc, end_utc = _day_bounds_utc(date_str, tz)
+    q = (
+        db.collection_group("orcamentos")
+        .where("createdAt", ">=", start_utc)
+        .where("createdAt", "<", end_utc)
+        .order_by("createdAt")
+    )
+    for doc in q.stream():
+        uid = _uid_from_path(doc.reference.path, "orcamentos")
+        if uid:
+            out.setdefault(uid, []).append(_item_from_doc(doc.id, doc.to_dict() or {}))
+    return out
+
+
+def _agenda_cfgs(db, uids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Config canônica (config/agendamento) com fallback no legado (configAgendamento)."""
+    refs = []
+    for uid in uids:
+        refs.append(db.document(f"profissionais/{uid}/config/agendamento"))
+        refs.append(db.document(f"profissionais/{uid}/configAgendamento"))
+    found: Dict[str, Dict[str, Any]] = {}
+    for snap in db.get_all(refs):
+        if getattr(snap, "exists", False):
+            found[snap.reference.path] = snap.to_dict() or {}
+    out = {}
+    for uid in uids:
+        cfg = found.get(f"profissionais/{uid}/config/agendamento")
+        if cfg is None:
+            cfg = found.get(f"profissionais/{uid}/configAgendamento") or {}
+        out[uid] = cfg
+    return out
+
+
+# ---------- renderização ----------
+def _renderer(kind: str) -> Callable[[str, List[Dict[str, Any]], str, str], Tuple[str, str, str]]:
+    if kind == "agenda":
+        from routes.agenda_digest import _build_email_bodies
+
+        url = os.getenv("DIGEST_AGENDA_URL", "https://meirobo.com.br/pages/agenda.html?source=email-digest")
+
+        def _render(nome, items, date_str, tz):
+            return _build_email_bodies(nome, url, items, date_str, tz)
+    else:
+        from routes.orcamentos_digest import _build_email_bodies
+
+        url = os.getenv("DIGEST_ORCAMENTOS_URL", "https://meirobo.com.br/pages/orcamentos.html?source=email-digest")
+
+        def _render(nome, items, date_str, tz):
+            return _build_email_bodies(nome, url, items, date_str, tz)[:3]
+    return _render
+
+
+# ---------- estado ----------
+def _state_ref(db, kind: str):
+    return db.collection(STATE_COLL).document(f"digest_{kind}")
+
+
+def _load_state(db, kind: str) -> Dict[str, Any]:
+    try:
+        snap = _state_ref(db, kind).get()
+        if getattr(snap, "exists", False):
+            return snap.to_dict() or {}
+    except Exception as e:
+        logger.info("[digest_runner] estado indisponível: %s", e)
+    return {}
+
+
+def _save_state(db, kind: str, state: Dict[str, Any]) -> None:
+    try:
+        _state_ref(db, kind).set(state)
+    except Exception as e:
+        logger.info("[digest_runner] falha ao salvar cursor: %s", e)
+
+
+def _pages(db, uids: Optional[List[str]], last_uid: str, page: int):
+    if uids:
+        todo = list(dict.fromkeys(u for u in uids if u))
+        col = db.collection("profissionais")
+        for i in range(0, len(todo), page):
+            yield list(db.get_all([col.document(u) for u in todo[i:i + page]]))
+        return
+    q = db.collection("profissionais").order_by("__name__")
+    cursor = db.collection("profissionais").document(last_uid).get() if last_uid else None
+    while True:
+        page_q = q.start_after(cursor) if cursor is not None else q
+        snaps = list(page_q.limit(page).stream())
+        if snaps:
+            yield snaps
+        if len(snaps) < page:
+            return
+        cursor = snaps[-1]
+
+
+def run_digests(
+    db,
+    send_many: Optional[Callable[[List[Dict[str, Any]]], List[Tuple[bool, str]]]] = None,
+    *,
+    kind: str = "agenda",
+    date_str: Optional[str] = None,
+    tz: str = "America/Sao_Paulo",
+    dry_run: bool = False,
+    uids: Optional[List[str]] = None,
+    time_budget_sec: float = 20.0,
+    page_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    skip_empty: Optional[bool] = None,
+) -> Dict[str, Any]:
+    """
+    Envia o digest `kind` do dia para todos os profissionais (ou allowlist `uids`).
+    Retorna {"ok", "complete", "tenants", "eligible", "rendered", "sent", "failed", "skipped", ...}.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"kind inválido: {kind!r}")
+    t0 = time.monotonic()
+    if not date_str:
+        import pytz
+
+        date_str = datetime.now(pytz.timezone(tz)).strftime("%Y-%m-%d")
+    page = max(1, int(page_size or PAGE_SIZE))
+    workers = max(1, int(concurrency or RENDER_CONCURRENCY))
+    skip_empty = _env_bool("DIGEST_SKIP_EMPTY") if skip_empty is None else bool(skip_empty)
+    if send_many is None and not dry_run:
+        from services.mailer import send_many
+
+    stats: Dict[str, Any] = {
+        "ok": True,
+        "kind": kind,
+        "date": date_str,
+        "tz": tz,
+        "dry_run": dry_run,
+        "complete": True,
+        "tenants": 0,
+        "eligible": 0,
+        "rendered": 0,
+        "sent": 0,
+        "failed": 0,
+        "skipped": {},
+        "queries": 0,
+        "renderMs": 0,
+        "sendMs": 0,
+        "errorItems": [],
+    }
+
+    def _skip(reason: str) -> None:
+        stats["skipped"][reason] = stats["skipped"].get(reason, 0) + 1
+
+    # allowlist/dry-run não lêem nem movem o cursor da execução diária
+    persist = not dry_run and not uids
+    state = _load_state(db, kind) if persist else {}
+    if state.get("date") != date_str:
+        state = {"date": date_str, "lastUid": "", "done": False}
+    if state.get("done"):
+        stats["alreadyDone"] = True
+        stats["elapsedMs"] = int((time.monotonic() - t0) * 1000)
+        return stats
+    last_uid = str(state.get("lastUid") or "")
+
+    try:
+        items = _items_by_uid(db, kind, date_str, tz)
+        stats["queries"] += 1
+    except Exception as e:
+        logger.exception("[digest_runner] query de itens falhou (%s): %s", kind, e)
+        stats.update(ok=False, error=f"{type(e).__name__}")
+        return stats
+
+    render = _renderer(kind)
+    email_from = os.environ.get("EMAIL_SENDER") or os.environ.get("EMAIL_FROM") or ""
+    reply_to = os.getenv("EMAIL_REPLY_TO", "").strip() or None
+    bcc = [p.strip() for p in os.getenv("DIGEST_BCC", "").split(",") if p.strip()] or None
+    if kind == "agenda":
+        from routes.agenda_digest import _is_workday_cfg
+
+    def _render_one(job):
+        uid, nome, to, its = job
+        subject, text, html = render(nome, its, date_str, tz)
+        return uid, {
+            "to": to,
+            "subject": subject,
+            "text": text,
+            "html": html,
+            "from_email": email_from,
+            "bcc": bcc,
+            "reply_to": reply_to,
+            "disable_click_tracking": True,
+        }
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for snaps in _pages(db, uids, last_uid, page):
+            stats["queries"] += 1
+            if time.monotonic() - t0 >= time_budget_sec:
+                stats["complete"] = False
+                break
+            page_uids = [s.id for s in snaps if getattr(s, "exists", True)]
+            cfgs = {}
+            if kind == "agenda" and page_uids:
+                cfgs = _agenda_cfgs(db, page_uids)
+                stats["queries"] += 1
+
+            jobs = []
+            for snap in snaps:
+                if not getattr(snap, "exists", True):
+                    continue
+                stats["tenants"] += 1
+                uid = snap.id
+                prof = snap.to_dict() or {}
+                if (prof.get("digest") or {}).get(kind) is False:
+                    _skip("opt_out")
+                    continue
+                to = (prof.get("email") or "").strip()
+                if not to:
+                    _skip("no_email")
+                    continue
+                if kind == "agenda" and not _is_workday_cfg(cfgs.get(uid) or {}, date_str, tz):
+                    _skip("not_workday")
+                    continue
+                its = items.get(uid) or []
+                if skip_empty and not its:
+                    _skip("empty")
+                    continue
+                nome = (prof.get("nome") or "").strip() or "MEI"
+                jobs.append((uid, nome, to, its))
+            stats["eligible"] += len(jobs)
+
+            r0 = time.monotonic()
+            rendered = list(pool.map(_render_one, jobs))
+            stats["renderMs"] += int((time.monotonic() - r0) * 1000)
+            stats["rendered"] += len(rendered)
+
+            if rendered and not dry_run:
+                s0 = time.monotonic()
+                results = send_many([msg for _, msg in rendered])
+                stats["sendMs"] += int((time.monotonic() - s0) * 1000)
+                for (uid, msg), (ok, err) in zip(rendered, results):
+                    if ok:
+                        stats["sent"] += 1
+                    else:
+                        stats["failed"] += 1
+                        if len(stats["errorItems"]) < 50:
+                            stats["errorItems"].append({"uid": uid, "error": err})
+
+            if snaps and persist:
+                last_uid = snaps[-1].id
+                _save_state(db, kind, {"date": date_str, "lastUid": last_uid, "done": False,
+                                       "updatedAt": datetime.now(timezone.utc)})
+
+    if stats["complete"] and persist:
+        _save_state(db, kind, {"date": date_str, "lastUid": last_uid, "done": True,
+                               "updatedAt": datetime.now(timezone.utc)})
+    stats["elapsedMs"] = int((time.monotonic() - t0) * 1000)
+    logger.info(
+        "[digest_runner] kind=%s date=%s tenants=%s eligible=%s sent=%s failed=%s skipped=%s complete=%s",
+        kind, date_str, stats["tenants"], stats["eligible"], stats["sent"], stats["failed"],
+        stats["skipped"], stats["complete"],
+    )
+    return stats
@@ -22,3 +22,34 @@ def get_mini_embedding(text: str) -> List[float]:
 
     resp = openai.Embedding.create(model=model, input=t)
     return resp["data"][0]["embedding"]
+
+
+def get_mini_embeddings(texts: List[str]) -> List[List[float]]:
+    """
+    Vários embeddings em poucas chamadas (input = lista). Lotes de até
+    ACERVO_EMBED_BATCH entradas / ACERVO_EMBED_BATCH_CHARS caracteres; a ordem de
+    saída segue a de entrada (resposta reordenada por "index").
+    """
+    api_key = (os.getenv("OPENAI_API_KEY") or "").strip()
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY ausente")
+    openai.api_key = api_key
+
+    model = (os.getenv("ACERVO_EMBEDDINGS_MODEL") or "text-embedding-3-small").strip()
+    max_n = max(1, int(os.getenv("ACERVO_EMBED_BATCH", "96") or 96))
+    max_chars = max(12000, int(os.getenv("ACERVO_EMBED_BATCH_CHARS", "200000") or 200000))
+
+    items = [((t or "").strip() or " ")[:12000] for t in texts]
+    out: List[List[float]] = []
+    batch: List[str] = []
+    size = 0
+    for t in items + [None]:  # type: ignore[list-item]
+        if batch and (t is None or len(batch) >= max_n or size + len(t) > max_chars):
+            resp = openai.Embedding.create(model=model, input=batch)
+            rows = sorted(resp["data"], key=lambda r: r["index"])
+            out.extend(r["embedding"] for r in rows)
+            batch, size = [], 0
+        if t is not None:
+            batch.append(t)
+            size += len(t)
+    return out
@@ -5,9 +5,14 @@
 import os
 import io
 import re
+import time
+import bisect
+import threading
 import traceback
 from datetime import timedelta
 
+from cache.lru import LRUCache
+
 # ---- Back-compat: manter o nome que outros módulos esperam ----
 def get_storage_client():
     """Compatibilidade: delega para o provider centralizado."""
@@ -116,6 +121,11 @@ def _ensure_bucket():
     return _bucket
 
 
+def get_bucket():
+    """Bucket GCS resolvido (mesma resolução de upload/download deste módulo)."""
+    return _ensure_bucket()
+
+
 def upload_fileobj(file_obj, dest_path: str, content_type: str = None, public: bool = True,
                    cache_control: str = "public, max-age=3600", signed_url_minutes: int = 15) -> str:
     """
@@ -127,6 +137,8 @@ def upload_fileobj(file_obj, dest_path: str, content_type: str = None, public: b
     try:
         blob.cache_control = cache_control
         blob.upload_from_file(file_obj, content_type=content_type)
+        if dest_path.lower().endswith(".docx"):
+            invalidate_docx_index()
 
         if public:
             try:
@@ -152,6 +164,8 @@ def upload_bytes(data: bytes, dest_path: str, content_type: str = None, public:
     try:
         blob.cache_control = cache_control
         blob.upload_from_string(data, content_type=content_type)
+        if dest_path.lower().endswith(".docx"):
+            invalidate_docx_index()
 
         if public:
             try:
@@ -183,26 +197,155 @@ def download_bytes(path: str) -> bytes:
 # ----------------------------
 # Funções DOCX (opcionais)
 # ----------------------------
-_arquivo_cache = {}
-
-def ler_arquivo_docx_especifico(caminho: str):
+# Índice de nomes dos .docx (em vez de list_blobs() no bucket inteiro a cada pergunta):
+#   - listagem só nos prefixos de GCS_DOCX_PREFIXES (vírgula; padrão "docx/"; "*" = bucket
+#     todo, só para buckets pequenos), pedindo apenas name/generation
+#   - relistagem em thread de fundo a cada GCS_DOCX_INDEX_TTL_SEC ou após upload de .docx;
+#     a pergunta nunca espera a listagem: usa o índice anterior (no cold start espera no
+#     máximo GCS_DOCX_COLD_WAIT_SEC e segue sem contexto DOCX se ainda não houver índice)
+#   - nomes tokenizados (sem acento, quebra em / _ - . espaço); pergunta casa por prefixo de
+#     token (busca binária na lista ordenada de tokens) → custo independe do tamanho do bucket
+# Texto dos DOCX: LRU limitado (itens/bytes) com chave (path, generation).
+_DOCX_TOKEN = re.compile(r"[^a-z0-9]+")
+
+
+def _fold_tokens(text: str) -> list:
+    from services.acervo_lexical import STOPWORDS, fold
+    return [t for t in _DOCX_TOKEN.split(fold(text)) if len(t) >= 3 and t not in STOPWORDS]
+
+
+class _DocxNameIndex:
+    def __init__(self, blobs):
+        # blobs: [(name, generation)]
+        self.generation = {}
+        self.postings = {}
+        for name, gen in blobs:
+            self.generation[name] = gen
+            for tok in set(_fold_tokens(name)):
+                self.postings.setdefault(tok, []).append(name)
+        self.tokens = sorted(self.postings)
+        self.built_at = time.monotonic()
+
+    def match(self, pergunta: str, limit: int = 3) -> list:
+        score = {}
+        for q in set(_fold_tokens(pergunta)):
+            i = bisect.bisect_left(self.tokens, q)
+            hit = set()
+            while i < len(self.tokens) and self.tokens[i].startswith(q):
+                hit.update(self.postings[self.tokens[i]])
+                i += 1
+            for name in hit:
+                score[name] = score.get(name, 0) + 1
+        return [n for n, _ in sorted(score.items(), key=lambda kv: (-kv[1], kv[0]))[:limit]]
+
+    def stats(self) -> dict:
+        return {"docs": len(self.generation), "tokens": len(self.tokens),
+                "age_sec": round(time.monotonic() - self.built_at, 1)}
+
+
+_docx_index = None
+_docx_index_lock = threading.Lock()
+_docx_index_stale = False
+_docx_index_ready = threading.Event()
+_docx_refresh_thread = None
+_DOCX_DEFAULT_PREFIX = "docx/"
+
+_docx_cache = LRUCache(
+    max_items=int(os.getenv("GCS_DOCX_CACHE_MAX", "64") or 64),
+    max_bytes=int(float(os.getenv("GCS_DOCX_CACHE_MAX_MB", "16") or 16) * 1024 * 1024),
+    name="gcs.docx",
+)
+
+
+def _docx_prefixes() -> list:
+    raw = os.getenv("GCS_DOCX_PREFIXES", "") or _DOCX_DEFAULT_PREFIX
+    prefixes = [p.strip() for p in raw.split(",") if p.strip()]
+    return [""] if "*" in prefixes else prefixes
+
+
+def _list_docx(bucket) -> list:
+    out = []
+    for prefix in _docx_prefixes():
+        kwargs = {"fields": "items(name,generation),nextPageToken"}
+        if prefix:
+            kwargs["prefix"] = prefix
+        for blob in bucket.list_blobs(**kwargs):
+            name = blob.name
+            base = name.rsplit("/", 1)[-1]
+            if name.lower().endswith(".docx") and not base.startswith("~$") and not name.startswith("~$"):
+                out.append((name, getattr(blob, "generation", None)))
+    return out
+
+
+def _refresh_docx_index() -> None:
+    global _docx_index, _docx_index_stale, _docx_refresh_thread
+    try:
+        _docx_index_stale = False  # upload durante a listagem volta a marcar
+        fresh = _DocxNameIndex(_list_docx(_ensure_bucket()))
+        _docx_index = fresh
+    except Exception as e:
+        print(f"[DOCX][WARN] relistagem falhou, mantendo índice anterior: {e}")
+        if _docx_index is not None:
+            _docx_index.built_at = time.monotonic()  # nova tentativa só depois de outro TTL
+    finally:
+        with _docx_index_lock:
+            _docx_refresh_thread = None
+        _docx_index_ready.set()
+
+
+def _start_docx_refresh() -> None:
+    global _docx_refresh_thread
+    with _docx_index_lock:
+        if _docx_refresh_thread is not None:
+            return
+        _docx_refresh_thread = threading.Thread(target=_refresh_docx_index, name="docx-index", daemon=True)
+        _docx_refresh_thread.start()
+
+
+def _get_docx_index():
+    """Índice atual; vencido → relista em background e devolve o anterior (ou vazio no cold start)."""
+    idx = _docx_index
+    ttl = float(os.getenv("GCS_DOCX_INDEX_TTL_SEC", "300") or 300)
+    if idx is not None and not _docx_index_stale and time.monotonic() - idx.built_at < ttl:
+        return idx
+    _start_docx_refresh()
+    if idx is None:
+        _docx_index_ready.wait(float(os.getenv("GCS_DOCX_COLD_WAIT_SEC", "0.5") or 0))
+        idx = _docx_index
+    return idx if idx is not None else _DocxNameIndex([])
+
+
+def invalidate_docx_index() -> None:
+    """Marca o índice de nomes para relistagem (novo .docx no bucket)."""
+    global _docx_index_stale
+    _docx_index_stale = True
+
+
+def ler_arquivo_docx_especifico(caminho: str, generation=None):
     """
     Lê um arquivo .docx do GCS e retorna seu conteúdo como string.
     Mantida por compatibilidade com seu fluxo atual.
+    generation: geração do blob (vinda do índice de nomes) — chave do cache.
     """
     if not _DOCX_OK:
         print("[DOCX][WARN] 'python-docx' não disponível. Adicione 'python-docx' ao requirements.txt se precisar.")
         return None
 
     try:
-        if caminho in _arquivo_cache:
-            return _arquivo_cache[caminho]
-
-        data = download_bytes(caminho)
+        key = (caminho, generation)
+        conteudo = _docx_cache.get(key)
+        if conteudo is not None:
+            return conteudo
+
+        if generation:
+            data = _ensure_bucket().blob(caminho, generation=generation).download_as_bytes()
+        else:
+            data = download_bytes(caminho)
         doc = Document(io.BytesIO(data))
         texto = "\n".join(p.text for p in doc.paragraphs)
         conteudo = f"\n\n### Conteúdo do arquivo: {caminho}\n{texto}"
-        _arquivo_cache[caminho] = conteudo
+        # sem geração conhecida o conteúdo pode mudar: expira
+        _docx_cache.set(key, conteudo, ttl=None if generation else 300)
         return conteudo
     except Exception as e:
         print(f"[DOCX][ERR] Erro ao ler DOCX '{caminho}': {e}")
@@ -212,21 +355,11 @@ def ler_arquivo_docx_especifico(caminho: str):
 
 def detectar_arquivos_relevantes(pergunta: str):
     """
-    Busca simples por palavras da pergunta nos nomes dos .docx do bucket.
-    Retorna até 3 caminhos.
+    Busca por palavras da pergunta nos nomes dos .docx do bucket (índice de nomes).
+    Retorna até 3 caminhos, os que casam mais palavras primeiro.
     """
-    bucket = _ensure_bucket()
     try:
-        caminhos_relevantes = []
-        pergunta_lower = (pergunta or "").lower().split()
-
-        for blob in bucket.list_blobs():
-            name = blob.name.lower()
-            if name.endswith(".docx") and not name.startswith("~$"):
-                if any(p in name for p in pergunta_lower):
-                    caminhos_relevantes.append(blob.name)
-
-        return caminhos_relevantes[:3]
+        return _get_docx_index().match(pergunta, limit=3)
     except Exception as e:
         print(f"[DOCX][ERR] Erro ao detectar arquivos relevantes: {e}")
         traceback.print_exc()
@@ -242,9 +375,10 @@ def montar_contexto_para_pergunta(pergunta: str):
         if not caminhos:
             return ""
 
+        generations = _docx_index.generation if _docx_index is not None else {}
         contexto = ""
         for caminho in caminhos:
-            conteudo = ler_arquivo_docx_especifico(caminho)
+            conteudo = ler_arquivo_docx_especifico(caminho, generations.get(caminho))
             if conteudo:
                 contexto += conteudo
 
@@ -266,4 +400,7 @@ def debug_bucket_config() -> dict:
         "FIREBASE_STORAGE_BUCKET": os.getenv("FIREBASE_STORAGE_BUCKET"),
         "GCS_BUCKET": os.getenv("GCS_BUCKET"),
         "resolved": _resolve_gcs_bucket_name(),
+        "docx_prefixes": _docx_prefixes(),
+        "docx_index": _docx_index.stats() if _docx_index is not None else None,
+        "docx_cache": _docx_cache.stats(),
     }
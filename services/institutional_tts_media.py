@@ -1,14 +1,13 @@
 # services/institutional_tts_media.py
 from __future__ import annotations
 
-import json
 import math
 import os
 import uuid
-import urllib.request
 from datetime import datetime
 from typing import Optional, Tuple
 
+from services import tts_cache, voz_tts_service
 from services.gcs_handler import upload_bytes
 
 
@@ -45,52 +44,19 @@ def _signed_url_minutes() -> int:
         return 15
 
 
-def _tts_base_url_local() -> str:
-    """
-    Chama o próprio backend localmente (evita sair pro Cloudflare/YCloud).
-    Render normalmente expõe PORT.
-    """
-    port = _env("PORT", "10000") or "10000"
-    return f"http://127.0.0.1:{port}".rstrip("/")
-
-
 def _call_internal_tts(text: str, voice_id: str, mime: str) -> Optional[Tuple[bytes, str]]:
     """
-    Usa o endpoint /api/voz/tts que você já provou que gera audio/mpeg quando recebe voice_id.
+    Mesma síntese do endpoint /api/voz/tts, só que em processo (services.voz_tts_service):
+    sem loopback HTTP segurando uma segunda thread do servidor durante o TTS.
     Retorna (audio_bytes, mime_type) ou None (fail-safe).
     """
-    base = _tts_base_url_local()
-    url = f"{base}/api/voz/tts"
-
-    payload = {
-        "text": text,
-        "voice_id": voice_id,
-        "mime": mime,
-    }
-
-    data = json.dumps(payload).encode("utf-8")
-    req = urllib.request.Request(
-        url,
-        data=data,
-        headers={"Content-Type": "application/json"},
-        method="POST",
-    )
-
     try:
-        # timeout curto pra não travar o lead
-        with urllib.request.urlopen(req, timeout=15) as resp:
-            status = getattr(resp, "status", 200)
-            if int(status) != 200:
-                return None
-
-            audio_bytes = resp.read() or b""
-            if not audio_bytes:
-                return None
-
-            content_type = resp.headers.get("Content-Type") or mime or "audio/mpeg"
-            return (audio_bytes, content_type)
+        audio_bytes, content_type = voz_tts_service.synthesize(text, voice_id=voice_id)
     except Exception:
         return None
+    if not audio_bytes:
+        return None
+    return (audio_bytes, content_type or mime or "audio/mpeg")
 
 
 def generate_institutional_audio_url(text: str) -> Optional[str]:
@@ -110,22 +76,59 @@ def generate_institutional_audio_url(text: str) -> Optional[str]:
     # compat: aceita INSTITUTIONAL_TTS_MIME (novo) e INSTITUTIONAL_TTS_FORMAT (antigo)
     out_mime = _env("INSTITUTIONAL_TTS_MIME", "") or _env("INSTITUTIONAL_TTS_FORMAT", "audio/mpeg") or "audio/mpeg"
 
-    spoken = _call_internal_tts(text=text, voice_id=voice_id, mime=out_mime)
-    if not spoken:
-        return None
+    return generate_voice_audio_url(text, voice_id, mime=out_mime, mode="institutional")
 
-    audio_bytes, mime_type = spoken
 
-    now = datetime.utcnow()
-    ext = "mp3" if "mpeg" in (mime_type or "").lower() else "bin"
-    obj = f"sandbox/institutional_tts/{now:%Y/%m/%d}/{uuid.uuid4().hex}.{ext}"
+def generate_voice_audio_url(text: str, voice_id: str, *, mime: str = "audio/mpeg", mode: str = "voice") -> Optional[str]:
+    """
+    Signed URL do áudio de `text` na voz `voice_id` (TTS em processo + services.tts_cache).
+    Também usado para a voz do MEI (mode="voice": respostas livres, fora do cache). Fail-safe: None.
+    """
+    text = (text or "").strip()
+    if not text or not voice_id:
+        return None
+
+    def _synth():
+        spoken = _call_internal_tts(text=text, voice_id=voice_id, mime=mime)
+        if not spoken:
+            return None
+        # ElevenLabs em cooldown → a síntese caiu no Google: não grava no cache
+        return (spoken[0], spoken[1], not _eleven_degraded())
+
+    def _upload(audio_bytes: bytes, mime_type: str) -> str:
+        now = datetime.utcnow()
+        ext = "mp3" if "mpeg" in (mime_type or "").lower() else "bin"
+        folder = "institutional_tts" if mode == "institutional" else "voice_tts"
+        obj = f"sandbox/{folder}/{now:%Y/%m/%d}/{uuid.uuid4().hex}.{ext}"
+        return upload_bytes(
+            data=audio_bytes,
+            dest_path=obj,
+            content_type=mime_type or "audio/mpeg",
+            public=False,
+            cache_control="private, max-age=0",
+            signed_url_minutes=_signed_url_minutes(),
+        )
 
-    url = upload_bytes(
-        data=audio_bytes,
-        dest_path=obj,
-        content_type=mime_type or "audio/mpeg",
-        public=False,
-        cache_control="private, max-age=0",
-        signed_url_minutes=_signed_url_minutes(),
-    )
+    try:
+        url, _info = tts_cache.get_or_create_url(
+            text=text,
+            voice_id=voice_id,
+            provider="voz_tts",
+            mime=mime,
+            mode=mode,
+            synth=_synth,
+            expires_seconds=_signed_url_minutes() * 60,
+            upload=_upload,
+            cache=(mode == "institutional"),
+        )
+    except Exception:
+        return None
     return (url or None)
+
+
+def _eleven_degraded() -> bool:
+    try:
+        from services.tts_fallback import eleven_degraded  # type: ignore
+        return bool(eleven_degraded())
+    except Exception:
+        return False
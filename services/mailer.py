@@ -79,7 +79,7 @@ def _parse_from(s: str) -> tuple[str | None, str]:
 # -----------------------
 # SMTP sender (fallback)
 # -----------------------
-def _send_smtp(
+def _smtp_message(
     *,
     to_list: list[str],
     subject: str,
@@ -88,17 +88,8 @@ def _send_smtp(
     from_env: str,
     bcc_list: list[str],
     reply_to: str | None,
-) -> bool:
-    host = (os.getenv("SMTP_HOST") or "smtp.gmail.com").strip()
-    port_raw = (os.getenv("SMTP_PORT") or "587").strip()
-    try:
-        port = int(port_raw)
-    except Exception:
-        port = 587
-
-    user = (os.getenv("SMTP_USER") or "").strip()
-    password = (os.getenv("SMTP_PASS") or "").strip()
-
+) -> tuple[str, list[str], str]:
+    """Monta (from_addr, destinatários do envelope, mensagem serializada)."""
     from_name, from_addr = _parse_from(from_env)
     if "@" not in (from_addr or ""):
         raise MissingConfig("Remetente inválido; verifique EMAIL_SENDER/EMAIL_FROM")
@@ -129,36 +120,112 @@ def _send_smtp(
         # BCC não vai no header (pra não vazar); só no envelope
         recipients.extend([e for e in bcc_list if e and e.lower() not in {x.lower() for x in to_list}])
 
-    timeout = _smtp_timeout()
+    return from_addr, recipients, msg.as_string()
+
+
+class SmtpSession:
+    """
+    Conexão SMTP aberta uma vez e reaproveitada entre envios (digest em lote).
+    Servidor derrubou a conexão no meio → reconecta uma vez e reenvia.
+    """
+
+    def __init__(self):
+        self._server = None
+        self.sent = 0
+        self.connects = 0
+
+    def _connect(self):
+        host = (os.getenv("SMTP_HOST") or "smtp.gmail.com").strip()
+        port_raw = (os.getenv("SMTP_PORT") or "587").strip()
+        try:
+            port = int(port_raw)
+        except Exception:
+            port = 587
+
+        user = (os.getenv("SMTP_USER") or "").strip()
+        password = (os.getenv("SMTP_PASS") or "").strip()
+        timeout = _smtp_timeout()
 
-    try:
         if port == 465:
-            with smtplib.SMTP_SSL(host, port, timeout=timeout) as server:
-                if user and password:
-                    server.login(user, password)
-                server.sendmail(from_addr, recipients, msg.as_string())
+            server = smtplib.SMTP_SSL(host, port, timeout=timeout)
         else:
-            with smtplib.SMTP(host, port, timeout=timeout) as server:
+            server = smtplib.SMTP(host, port, timeout=timeout)
+            try:
+                server.ehlo()
+            except Exception:
+                pass
+            try:
+                server.starttls()
                 try:
                     server.ehlo()
                 except Exception:
                     pass
-                try:
-                    server.starttls()
-                    try:
-                        server.ehlo()
-                    except Exception:
-                        pass
-                except Exception:
-                    # alguns relays podem estar sem TLS; se for o caso, segue (ou configure corretamente)
-                    pass
-                if user and password:
-                    server.login(user, password)
-                server.sendmail(from_addr, recipients, msg.as_string())
-    except Exception as e:
-        raise MailerError(f"smtp_failed: {e}") from e
+            except Exception:
+                # alguns relays podem estar sem TLS; se for o caso, segue (ou configure corretamente)
+                pass
+        if user and password:
+            server.login(user, password)
+        self._server = server
+        self.connects += 1
+
+    def send(self, **message) -> bool:
+        from_addr, recipients, raw = _smtp_message(**message)
+        for attempt in (0, 1):
+            try:
+                if self._server is None:
+                    self._connect()
+                self._server.sendmail(from_addr, recipients, raw)
+                self.sent += 1
+                return True
+            except (smtplib.SMTPServerDisconnected, ConnectionError) as e:
+                self.close()
+                if attempt:
+                    raise MailerError(f"smtp_failed: {e}") from e
+            except Exception as e:
+                self.close()
+                raise MailerError(f"smtp_failed: {e}") from e
+        return False
 
-    return True
+    def close(self) -> None:
+        server, self._server = self._server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def _send_smtp(
+    *,
+    to_list: list[str],
+    subject: str,
+    text: str | None,
+    html: str | None,
+    from_env: str,
+    bcc_list: list[str],
+    reply_to: str | None,
+) -> bool:
+    with SmtpSession() as session:
+        return session.send(
+            to_list=to_list,
+            subject=subject,
+            text=text,
+            html=html,
+            from_env=from_env,
+            bcc_list=bcc_list,
+            reply_to=reply_to,
+        )
 
 # -----------------------
 # SendGrid sender (primary)
@@ -246,7 +313,7 @@ def _send_sendgrid(
 # -----------------------
 # Envio genérico (mantido)
 # -----------------------
-def send_email(
+def _prepare_message(
     *,
     to=None,
     subject: str = "",
@@ -255,13 +322,9 @@ def send_email(
     html: str | None = None,
     bcc=None,
     reply_to: str | None = None,
-    disable_click_tracking: bool = False,  # << ideal p/ verificação
+    disable_click_tracking: bool = False,
     **kw,
-):
-    """
-    Envia e-mail via SendGrid HTTP API.
-    Aceita aliases: body_text/body_html e ignora kwargs extras.
-    """
+) -> dict:
     if text is None:
         text = kw.pop("body_text", None)
     if html is None:
@@ -281,21 +344,33 @@ def send_email(
     to_lower = {e.lower() for e in to_list}
     bcc_list = [e for e in bcc_list if e.lower() not in to_lower]
 
-    reply_to = reply_to or os.environ.get("EMAIL_REPLY_TO")
+    return {
+        "to_list": to_list,
+        "subject": subject,
+        "text": text,
+        "html": html,
+        "from_env": from_env,
+        "bcc_list": bcc_list,
+        "reply_to": reply_to or os.environ.get("EMAIL_REPLY_TO"),
+        "disable_click_tracking": disable_click_tracking,
+    }
+
+
+def _deliver(msg: dict, smtp: "SmtpSession | None" = None) -> bool:
+    """Provider + failover de send_email; com `smtp`, reaproveita a conexão aberta."""
+    disable_click_tracking = msg["disable_click_tracking"]
+    smtp_msg = {k: v for k, v in msg.items() if k != "disable_click_tracking"}
     provider = (os.environ.get("EMAIL_PROVIDER") or "sendgrid").strip().lower()
     fallback_provider = (os.environ.get("EMAIL_FALLBACK_PROVIDER") or "smtp").strip().lower()
 
+    def _smtp_send() -> bool:
+        if smtp is not None:
+            return smtp.send(**smtp_msg)
+        return _send_smtp(**smtp_msg)
+
     # Se o modo principal for SMTP, envia direto por SMTP (sem tentar SendGrid)
     if provider == "smtp":
-        return _send_smtp(
-            to_list=to_list,
-            subject=subject,
-            text=text,
-            html=html,
-            from_env=from_env,
-            bcc_list=bcc_list,
-            reply_to=reply_to,
-        )
+        return _smtp_send()
 
     if provider != "sendgrid":
         raise ProviderNotSupported(f"unsupported provider: {provider!r}")
@@ -304,17 +379,7 @@ def send_email(
     api_key = os.environ.get("SENDGRID_API_KEY")
     if api_key and not _is_sendgrid_in_cooldown():
         try:
-            ok = _send_sendgrid(
-                api_key=api_key,
-                to_list=to_list,
-                subject=subject,
-                text=text,
-                html=html,
-                from_env=from_env,
-                bcc_list=bcc_list,
-                reply_to=reply_to,
-                disable_click_tracking=disable_click_tracking,
-            )
+            ok = _send_sendgrid(api_key=api_key, disable_click_tracking=disable_click_tracking, **smtp_msg)
             if ok:
                 _clear_sendgrid_cooldown()
                 return True
@@ -328,19 +393,58 @@ def send_email(
 
     # 2) FALLBACK: SMTP (catch-all) — não quebra o fluxo se SendGrid caiu (fatura/cartão/etc.)
     if _failover_enabled() and fallback_provider == "smtp":
-        return _send_smtp(
-            to_list=to_list,
-            subject=subject,
-            text=text,
-            html=html,
-            from_env=from_env,
-            bcc_list=bcc_list,
-            reply_to=reply_to,
-        )
+        return _smtp_send()
 
     # Se fallback estiver desabilitado, mantém comportamento “falha”
     raise MailerError("sendgrid_unavailable_and_failover_disabled")
 
+
+def send_email(
+    *,
+    to=None,
+    subject: str = "",
+    text: str | None = None,
+    from_email: str | None = None,
+    html: str | None = None,
+    bcc=None,
+    reply_to: str | None = None,
+    disable_click_tracking: bool = False,  # << ideal p/ verificação
+    **kw,
+):
+    """
+    Envia e-mail via SendGrid HTTP API.
+    Aceita aliases: body_text/body_html e ignora kwargs extras.
+    """
+    msg = _prepare_message(
+        to=to,
+        subject=subject,
+        text=text,
+        from_email=from_email,
+        html=html,
+        bcc=bcc,
+        reply_to=reply_to,
+        disable_click_tracking=disable_click_tracking,
+        **kw,
+    )
+    return _deliver(msg)
+
+
+def send_many(messages: Iterable[dict]) -> list[tuple[bool, str]]:
+    """
+    Envia vários e-mails (kwargs de send_email cada) reaproveitando uma conexão SMTP
+    para todo o lote (SMTP primário ou fallback do SendGrid).
+    Retorna [(ok, erro)] na mesma ordem; uma falha não interrompe o lote.
+    """
+    out: list[tuple[bool, str]] = []
+    with SmtpSession() as smtp:
+        for kwargs in messages:
+            try:
+                ok = _deliver(_prepare_message(**kwargs), smtp=smtp)
+                out.append((bool(ok), ""))
+            except Exception as e:
+                out.append((False, f"{type(e).__name__}: {str(e)[:200]}"))
+    return out
+
 # -----------------------
 # Verificação de e-mail
 # -----------------------
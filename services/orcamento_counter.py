@@ -0,0 +1,190 @@
+# services/orcamento_counter.py
+# Numeração sequencial de orçamentos por uid (substitui contar a coleção a cada orçamento).
+#
+# - Contador em profissionais/{uid}/config/orcamentoCounter {seq, updatedAt}
+# - next_numero: uma transação (get + set do contador) → ORC-YYYY-NNNNN sem corrida entre
+#   instâncias; mesma sequência contínua de antes (não zera na virada do ano)
+# - ORCAMENTO_NUMERO_BLOCK > 1: cada processo reserva um bloco de números de uma vez e
+#   distribui em memória (menos transações; blocos não usados viram lacunas na numeração)
+# - Contador ausente: semeia com count() da coleção (aggregation, não lê os docs) — a
+#   migração seed_counters faz isso para todos os profissionais de uma vez
+#
+# Migração: POST /tasks/orcamentos/seed-counters (resumível, cursor em platform_maintenance).
+
+from __future__ import annotations
+
+import os
+import time
+import threading
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from google.cloud import firestore as gcfs  # type: ignore
+    _transactional = gcfs.transactional
+except Exception:  # pragma: no cover
+    gcfs = None
+    _transactional = None
+
+logger = logging.getLogger("mei_robo.orcamento_counter")
+
+COUNTER_DOC = ("config", "orcamentoCounter")
+STATE_COLL = os.getenv("ORCAMENTO_COUNTER_STATE_COLL", "platform_maintenance")
+STATE_DOC = "orcamento_counter_seed"
+
+_BLOCKS: Dict[str, Tuple[int, int]] = {}  # uid -> (próximo, fim exclusivo) reservados neste processo
+_BLOCKS_LOCK = threading.Lock()
+
+
+def _block_size() -> int:
+    try:
+        return max(1, int(os.getenv("ORCAMENTO_NUMERO_BLOCK", "1") or 1))
+    except Exception:
+        return 1
+
+
+def format_numero(seq: int, year: Optional[int] = None) -> str:
+    return f"ORC-{year or datetime.utcnow().year}-{str(int(seq)).zfill(5)}"
+
+
+def _counter_ref(db, uid: str):
+    return db.collection("profissionais").document(uid).collection(COUNTER_DOC[0]).document(COUNTER_DOC[1])
+
+
+def count_orcamentos(db, uid: str) -> int:
+    """Total de docs em profissionais/{uid}/orcamentos (aggregation; fallback: stream)."""
+    col = db.collection("profissionais").document(uid).collection("orcamentos")
+    try:
+        res = col.count().get()
+        # google-cloud-firestore: [[AggregationResult(value=N)]]
+        return int(res[0][0].value)
+    except Exception:
+        return sum(1 for _ in col.stream())
+
+
+class _NeedsSeed(Exception):
+    pass
+
+
+def _reserve(db, uid: str, n: int) -> int:
+    """Reserva n números na transação; devolve o primeiro."""
+    ref = _counter_ref(db, uid)
+    seed: List[Optional[int]] = [None]
+
+    def _txn(txn):
+        snap = ref.get(transaction=txn)
+        d = (snap.to_dict() or {}) if snap.exists else {}
+        if d.get("seq") is None and seed[0] is None:
+            raise _NeedsSeed()
+        cur = int(d.get("seq") if d.get("seq") is not None else seed[0])
+        txn.set(ref, {"seq": cur + n, "updatedAt": datetime.now(timezone.utc)}, merge=True)
+        return cur + 1
+
+    for _ in range(2):
+        try:
+            return _transactional(_txn)(db.transaction())
+        except _NeedsSeed:
+            # primeira vez deste uid sem migração: semeia fora da transação
+            seed[0] = count_orcamentos(db, uid)
+    raise RuntimeError("orcamento_counter: seed não aplicado")
+
+
+def _seed_one(db, uid: str, total: int) -> bool:
+    """seq = max(seq atual, total) na transação; True se mudou."""
+    ref = _counter_ref(db, uid)
+
+    def _txn(txn):
+        snap = ref.get(transaction=txn)
+        cur = ((snap.to_dict() or {}) if snap.exists else {}).get("seq")
+        if cur is not None and int(cur) >= total:
+            return False
+        txn.set(ref, {"seq": int(total), "seededAt": datetime.now(timezone.utc)}, merge=True)
+        return True
+
+    return _transactional(_txn)(db.transaction())
+
+
+def next_seq(uid: str, db=None) -> int:
+    if db is None:
+        from services.db import db  # type: ignore
+    block = _block_size()
+    if block > 1:
+        with _BLOCKS_LOCK:
+            nxt, end = _BLOCKS.get(uid, (0, 0))
+            if nxt < end:
+                _BLOCKS[uid] = (nxt + 1, end)
+                return nxt
+    first = _reserve(db, uid, block)
+    if block > 1:
+        with _BLOCKS_LOCK:
+            _BLOCKS[uid] = (first + 1, first + block)
+    return first
+
+
+def next_numero(uid: str, db=None) -> str:
+    return format_numero(next_seq(uid, db))
+
+
+# ---------- migração ----------
+def seed_counters(
+    db,
+    *,
+    uids: Optional[List[str]] = None,
+    dry_run: bool = False,
+    time_budget_sec: float = 20.0,
+    page_size: int = 200,
+) -> Dict[str, Any]:
+    """
+    Semeia config/orcamentoCounter.seq = count(orcamentos) de cada profissional.
+    Nunca diminui um contador existente. Resumível por cursor (último uid).
+    """
+    t0 = time.monotonic()
+    state_ref = db.collection(STATE_COLL).document(STATE_DOC)
+    last = ""
+    if not uids and not dry_run:
+        try:
+            snap = state_ref.get()
+            if getattr(snap, "exists", False):
+                last = str((snap.to_dict() or {}).get("lastUid") or "")
+        except Exception:
+            last = ""
+
+    out: Dict[str, Any] = {"ok": True, "dry_run": dry_run, "complete": True, "scanned": 0, "seeded": 0, "kept": 0}
+
+    def _pages():
+        if uids:
+            yield list(uids)
+            return
+        q = db.collection("profissionais").order_by("__name__")
+        cursor = db.collection("profissionais").document(last).get() if last else None
+        while True:
+            page_q = q.start_after(cursor) if cursor is not None else q
+            snaps = list(page_q.limit(page_size).stream())
+            yield [s.id for s in snaps]
+            if len(snaps) < page_size:
+                return
+            cursor = snaps[-1]
+
+    persist = not uids and not dry_run
+    for batch_uids in _pages():
+        if time.monotonic() - t0 >= time_budget_sec:
+            out["complete"] = False
+            break
+        for uid in batch_uids:
+            out["scanned"] += 1
+            total = count_orcamentos(db, uid)
+            if dry_run:
+                cur = (_counter_ref(db, uid).get().to_dict() or {}).get("seq")
+                changed = cur is None or int(cur) < total
+            else:
+                changed = _seed_one(db, uid, total)
+            out["seeded" if changed else "kept"] += 1
+        if persist and batch_uids:
+            state_ref.set({"lastUid": batch_uids[-1], "updatedAt": datetime.now(timezone.utc)})
+
+    if persist and out["complete"]:
+        state_ref.set({"lastUid": "", "done": True, "updatedAt": datetime.now(timezone.utc)})
+    out["elapsedMs"] = int((time.monotonic() - t0) * 1000)
+    logger.info("[orcamento_counter] seed %s", out)
+    return out
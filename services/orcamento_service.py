@@ -11,6 +11,7 @@ from typing import Any, Dict, Optional
 
 from services.db import db  # type: ignore
 from services.mailer import send_email  # type: ignore
+from services.orcamento_counter import next_numero
 
 
 # ==========================================================
@@ -48,12 +49,9 @@ def _get_config(uid: str) -> Dict[str, Any]:
 
 def _get_next_numero(uid: str) -> str:
     """
-    Gera número sequencial simples (pode evoluir depois).
+    Próximo número sequencial do uid (contador transacional em config/orcamentoCounter).
     """
-    col = db.collection("profissionais").document(uid).collection("orcamentos")
-    count = col.stream()
-    total = sum(1 for _ in count) + 1
-    return f"ORC-{datetime.utcnow().year}-{str(total).zfill(5)}"
+    return next_numero(uid, db)
 
 
 def _parse_created_at(v: Any) -> float:
@@ -81,31 +79,30 @@ def _find_last_by_conversation(uid: str, wa_key: str) -> Optional[Dict[str, Any]
     Safe-by-default: retorna None se falhar.
     """
     try:
-# Sem order_by para NÃO depender de índice composto.
-# Busca poucos docs e resolve "mais recente" em memória.
-q = (
-    db.collection("profissionais").document(uid)
-    .collection("orcamentos")
-    .where("conversationKey", "==", wa_key)
-    .limit(5)
-)
-docs = list(q.stream())
-if not docs:
-    return None
-best = None
-best_ts = -1.0
-for d in docs:
-    data = d.to_dict() or {}
-    ts = _parse_created_at(data.get("createdAt"))
-    if ts >= best_ts:
-        best_ts = ts
-        best = (d, data)
-if not best:
-    return None
-d0, data0 = best
-data0["id"] = d0.id
-return data0
-
+        # Sem order_by para NÃO depender de índice composto.
+        # Busca poucos docs e resolve "mais recente" em memória.
+        q = (
+            db.collection("profissionais").document(uid)
+            .collection("orcamentos")
+            .where("conversationKey", "==", wa_key)
+            .limit(5)
+        )
+        docs = list(q.stream())
+        if not docs:
+            return None
+        best = None
+        best_ts = -1.0
+        for d in docs:
+            data = d.to_dict() or {}
+            ts = _parse_created_at(data.get("createdAt"))
+            if ts >= best_ts:
+                best_ts = ts
+                best = (d, data)
+        if not best:
+            return None
+        d0, data0 = best
+        data0["id"] = d0.id
+        return data0
     except Exception:
         return None
 
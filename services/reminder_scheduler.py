@@ -0,0 +1,282 @@
+# services/reminder_scheduler.py
+# Lembretes de agenda multi-tenant (substitui o laço por uid de /api/agenda/reminders/run).
+#
+# - Uma range query em collection_group("agendamentos"): status == "agendado" e
+#   date na janela (strings YYYY-MM-DD), paginada com start_after
+# - Lembrete vence em (date hhmm no fuso do evento) - lead; entra na roda de tempo
+#   (TimeWheel, slot de 60s) se venceu há até REMINDER_GRACE_SEC ou vence dentro do
+#   orçamento da execução — não depende mais de bater o minuto exato
+# - Ledger idempotente (platform_reminder_ledger/{hash(path|date|hhmm|lead)}): create()
+#   reserva antes de enviar; duplicado → pula; falha de envio → apaga a reserva
+#   para a próxima execução tentar de novo. expiresAt é varrido pelo ttl_sweeper
+# - Envio com concorrência limitada (REMINDER_CONCURRENCY)
+#
+# Índice: collection group "agendamentos" (status ASC, date ASC).
+
+from __future__ import annotations
+
+import os
+import time
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("mei_robo.reminders")
+
+LEDGER_COLL = os.getenv("REMINDER_LEDGER_COLL", "platform_reminder_ledger")
+DEFAULT_TZ = os.getenv("REMINDER_DEFAULT_TZ", "America/Sao_Paulo")
+GRACE_SEC = int(os.getenv("REMINDER_GRACE_SEC", "900") or 900)
+CONCURRENCY = int(os.getenv("REMINDER_CONCURRENCY", "8") or 8)
+PAGE_SIZE = int(os.getenv("REMINDER_PAGE_SIZE", "300") or 300)
+LEDGER_TTL_SEC = 3 * 86400
+
+
+class TimeWheel:
+    """
+    Roda de tempo com hash por slot: add(due_ts, item) e pop_due(now) em O(itens vencidos).
+    Itens além de uma volta completa ficam no balde até vencerem de fato.
+    """
+
+    def __init__(self, slot_sec: float = 60.0, slots: int = 512):
+        self.slot_sec = float(slot_sec)
+        self.slots = max(1, int(slots))
+        self._buckets: List[List[Tuple[float, Any]]] = [[] for _ in range(self.slots)]
+        self._tick: Optional[int] = None  # próximo slot ainda não drenado
+        self._size = 0
+
+    def _slot(self, ts: float) -> int:
+        return int(ts // self.slot_sec)
+
+    def add(self, due_ts: float, item: Any) -> None:
+        s = self._slot(due_ts)
+        if self._tick is None or s < self._tick:
+            self._tick = s
+        self._buckets[s % self.slots].append((due_ts, item))
+        self._size += 1
+
+    def __len__(self) -> int:
+        return self._size
+
+    def next_due(self) -> Optional[float]:
+        if not self._size:
+            return None
+        return min(due for b in self._buckets for due, _ in b)
+
+    def pop_due(self, now: float) -> List[Any]:
+        """Remove e devolve (em ordem de vencimento) os itens com due_ts <= now."""
+        if not self._size or self._tick is None:
+            return []
+        out: List[Tuple[float, Any]] = []
+        end = self._slot(now)
+        # no máximo uma volta: depois disso os mesmos baldes se repetiriam
+        last = min(end, self._tick + self.slots - 1)
+        for s in range(self._tick, last + 1):
+            bucket = self._buckets[s % self.slots]
+            if not bucket:
+                continue
+            keep = []
+            for due, item in bucket:
+                (out if due <= now else keep).append((due, item))
+            self._buckets[s % self.slots] = keep
+        self._size -= len(out)
+        self._tick = end  # o balde de `end` pode ter itens que vencem mais adiante no mesmo slot
+        out.sort(key=lambda x: x[0])
+        return [item for _, item in out]
+
+
+def _tz(tz_str: str):
+    import pytz
+
+    try:
+        return pytz.timezone(tz_str or DEFAULT_TZ)
+    except Exception:
+        return pytz.timezone(DEFAULT_TZ)
+
+
+def _uid_from_path(path: str) -> str:
+    parts = (path or "").split("/")
+    if len(parts) >= 4 and parts[0] == "profissionais" and parts[2] == "agendamentos":
+        return parts[1]
+    return ""
+
+
+def _iter_candidates(db, first_date: str, last_date: str, uid: Optional[str], page_size: int) -> Iterable[Any]:
+    if uid:
+        base = db.collection("profissionais").document(uid).collection("agendamentos")
+    else:
+        base = db.collection_group("agendamentos")
+    q = (
+        base.where("status", "==", "agendado")
+        .where("date", ">=", first_date)
+        .where("date", "<=", last_date)
+        .order_by("date")
+    )
+    last = None
+    while True:
+        page_q = q.start_after(last) if last is not None else q
+        snaps = list(page_q.limit(page_size).stream())
+        for snap in snaps:
+            yield snap
+        if len(snaps) < page_size:
+            return
+        last = snaps[-1]
+
+
+def _ledger_key(path: str, date: str, hhmm: str, lead_min: int) -> str:
+    return hashlib.sha1(f"{path}|{date}|{hhmm}|{lead_min}".encode("utf-8")).hexdigest()
+
+
+def _is_already_exists(e: Exception) -> bool:
+    name = type(e).__name__
+    return name in ("AlreadyExists", "Conflict") or "already exists" in str(e).lower()
+
+
+def default_body(ev: Dict[str, Any]) -> str:
+    svc = ev.get("service_id") or "serviço"
+    hhmm = ev.get("hhmm") or ""
+    return f"⏰ Lembrete: {svc} hoje às {hhmm}. Qualquer imprevisto, me avise por aqui. Até já!"
+
+
+def run_reminders(
+    db,
+    send_text: Callable[[str, str], Any],
+    *,
+    lead_min: int = 120,
+    uid: Optional[str] = None,
+    tz_str: Optional[str] = None,
+    now: Optional[float] = None,
+    grace_sec: Optional[int] = None,
+    hold_sec: float = 0.0,
+    concurrency: Optional[int] = None,
+    page_size: Optional[int] = None,
+    body_fn: Callable[[Dict[str, Any]], str] = default_body,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Dict[str, Any]:
+    """
+    Envia os lembretes vencidos de todos os tenants (ou de um uid).
+    hold_sec > 0 mantém a execução viva para enviar também o que vence nesse intervalo.
+    Retorna {"ok", "scanned", "due", "sent", "duplicates", "errors", "skippedNoPhone", ...}.
+    """
+    t0 = time.monotonic()
+    now = float(now if now is not None else time.time())
+    grace = GRACE_SEC if grace_sec is None else int(grace_sec)
+    workers = max(1, int(concurrency or CONCURRENCY))
+    page = max(1, int(page_size or PAGE_SIZE))
+    default_zone = _tz(tz_str or DEFAULT_TZ)
+
+    # janela de datas (fuso padrão, ±1 dia para eventos em outros fusos)
+    lo_dt = datetime.fromtimestamp(now - grace, default_zone) + timedelta(minutes=lead_min)
+    hi_dt = datetime.fromtimestamp(now + hold_sec, default_zone) + timedelta(minutes=lead_min)
+    first_date = (lo_dt - timedelta(days=1)).strftime("%Y-%m-%d")
+    last_date = (hi_dt + timedelta(days=1)).strftime("%Y-%m-%d")
+
+    wheel = TimeWheel(slot_sec=60)
+    report: Dict[str, Any] = {
+        "ok": True,
+        "leadMin": lead_min,
+        "scanned": 0,
+        "due": 0,
+        "sent": 0,
+        "duplicates": 0,
+        "errors": 0,
+        "skippedNoPhone": 0,
+        "sentItems": [],
+        "errorItems": [],
+    }
+
+    try:
+        for snap in _iter_candidates(db, first_date, last_date, uid, page):
+            report["scanned"] += 1
+            ev = snap.to_dict() or {}
+            path = str(getattr(getattr(snap, "reference", None), "path", "") or "")
+            ev_uid = uid or _uid_from_path(path)
+            if not ev_uid:
+                continue
+            try:
+                zone = _tz(ev.get("tz") or tz_str or DEFAULT_TZ)
+                start = zone.localize(datetime.strptime(f"{ev['date']} {ev['hhmm']}", "%Y-%m-%d %H:%M"))
+            except Exception:
+                continue
+            due = start.timestamp() - lead_min * 60
+            if due <= now - grace or due > now + hold_sec:
+                continue
+            wheel.add(due, (ev_uid, path, ev, start.timestamp()))
+    except Exception as e:
+        logger.exception("[reminders] query falhou: %s", e)
+        report["ok"] = False
+        report["error"] = f"{type(e).__name__}"
+        return report
+
+    report["due"] = len(wheel)
+
+    def _send_one(item) -> Tuple[str, Dict[str, Any]]:
+        ev_uid, path, ev, start_ts = item
+        to = (ev.get("cliente") or {}).get("whatsapp")
+        if not to:
+            return "no_phone", {}
+        ref = db.collection(LEDGER_COLL).document(_ledger_key(path, ev["date"], ev["hhmm"], lead_min))
+        try:
+            ref.create({
+                "uid": ev_uid,
+                "path": path,
+                "date": ev["date"],
+                "hhmm": ev["hhmm"],
+                "leadMin": lead_min,
+                "status": "sending",
+                "claimedAtEpoch": time.time(),
+                "expiresAt": start_ts + LEDGER_TTL_SEC,
+            })
+        except Exception as e:
+            if _is_already_exists(e):
+                return "duplicate", {}
+            return "error", {"to": to, "error": f"ledger:{type(e).__name__}"}
+        try:
+            res = send_text(to, body_fn(ev))
+            ok = res[0] if isinstance(res, tuple) else res is not False
+        except Exception as e:
+            ok, res = False, e
+        if ok:
+            try:
+                ref.update({"status": "sent", "sentAtEpoch": time.time()})
+            except Exception:
+                pass
+            return "sent", {"uid": ev_uid, "to": to, "date": ev["date"], "hhmm": ev["hhmm"]}
+        try:
+            ref.delete()  # libera para a próxima execução tentar de novo
+        except Exception:
+            pass
+        return "error", {"uid": ev_uid, "to": to, "error": str(res)[:200]}
+
+    deadline = now + hold_sec
+    clock_offset = now - time.time()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            cur = time.time() + clock_offset
+            batch = wheel.pop_due(cur)
+            for status, info in pool.map(_send_one, batch):
+                if status == "sent":
+                    report["sent"] += 1
+                    if len(report["sentItems"]) < 200:
+                        report["sentItems"].append(info)
+                elif status == "duplicate":
+                    report["duplicates"] += 1
+                elif status == "no_phone":
+                    report["skippedNoPhone"] += 1
+                else:
+                    report["errors"] += 1
+                    if len(report["errorItems"]) < 50:
+                        report["errorItems"].append(info)
+            nxt = wheel.next_due()
+            if nxt is None or nxt > deadline:
+                break
+            sleep(max(0.0, min(nxt - (time.time() + clock_offset), deadline - cur)))
+
+    report["pendingBeyondBudget"] = len(wheel)
+    report["elapsedMs"] = int((time.monotonic() - t0) * 1000)
+    logger.info(
+        "[reminders] scanned=%s due=%s sent=%s dup=%s err=%s elapsedMs=%s",
+        report["scanned"], report["due"], report["sent"], report["duplicates"], report["errors"], report["elapsedMs"],
+    )
+    return report
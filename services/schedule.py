@@ -54,9 +54,23 @@ def validar_agendamento_v1(uid: str, data: dict):
     }
     return True, "ok", novo
 
+def _invalidate_busy(uid: str, ag_id: str, ag: dict) -> None:
+    # ocupação em cache usada pelo propose() do bot (cache curto + índice de disponibilidade)
+    try:
+        from domain.scheduling import invalidate_busy
+        invalidate_busy(uid)
+    except Exception:
+        pass
+    try:
+        from services import agenda_index
+        agenda_index.on_event_written(uid, ag_id, ag, db)
+    except Exception:
+        pass
+
 def salvar_agendamento(uid: str, ag: dict):
     ref = db.collection(f"profissionais/{uid}/agendamentos").document()
     ref.set(ag)
+    _invalidate_busy(uid, ref.id, ag)
     ag["id"] = ref.id
     return ag
 
@@ -82,6 +96,7 @@ def atualizar_estado_agendamento(uid: str, ag_id: str, body: dict):
         raise ValueError("Ação inválida")
 
     ref.set(ag, merge=True)
+    _invalidate_busy(uid, ag_id, ag)
     ag["id"] = ag_id
     return ag
 # -------------------------------------------------------------------
@@ -8,7 +8,9 @@ from __future__ import annotations
 import os
 import time
 import logging
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, Optional
+
+from cache.lru import LRUCache
 
 _SPEAKER_COLL = (os.environ.get("SPEAKER_STATE_COLL") or "platform_speaker_state").strip()
 _TTL_SECONDS = int(os.environ.get("SPEAKER_STATE_TTL_SECONDS") or "21600")  # 6h
@@ -19,7 +21,14 @@ _TTL_SECONDS = int(os.environ.get("SPEAKER_STATE_TTL_SECONDS") or "21600")  # 6h
 _LEAD_RESET_SECONDS = int(os.environ.get("LEAD_AI_TURNS_RESET_SECONDS") or "86400")
 _CUSTOMER_RESET_SECONDS = int(os.environ.get("CUSTOMER_AI_TURNS_RESET_SECONDS") or "604800")
 
-_mem: Dict[str, Tuple[Dict[str, Any], float]] = {}
+# Cache local (processo): LRU limitado com TTL, em vez de dict sem limite
+_MEM_MAX = int(os.environ.get("SPEAKER_STATE_MEM_MAX") or "20000")
+_MEM_MAX_BYTES = int(os.environ.get("SPEAKER_STATE_MEM_MAX_BYTES") or str(32 * 1024 * 1024))
+_mem = LRUCache(max_items=_MEM_MAX, max_bytes=_MEM_MAX_BYTES, default_ttl=_TTL_SECONDS, name="speaker_state")
+
+
+def _mem_set(did: str, row: Dict[str, Any]) -> None:
+    _mem.set(did, dict(row), ttl=_TTL_SECONDS)
 
 
 def _sanitize_name_candidate(value: Any) -> str:
@@ -162,12 +171,12 @@ def get_speaker_state(wa_key: str, uid_owner: Optional[str] = None) -> Dict[str,
 
     # 1) memória
     try:
-        row, exp = _mem.get(did, ({}, 0.0))
-        if exp and exp > now and isinstance(row, dict):
+        row = _mem.get(did)
+        if isinstance(row, dict):
             out = dict(row)
             db = _fs_client()
             out = _apply_inactivity_reset(did, out, now, uid_owner, db)
-            _mem[did] = (dict(out), now + _TTL_SECONDS)
+            _mem_set(did, out)
             return dict(out)
     except Exception:
         pass
@@ -221,7 +230,7 @@ def get_speaker_state(wa_key: str, uid_owner: Optional[str] = None) -> Dict[str,
                 pass
 
             # cache local
-            _mem[did] = (dict(data), now + _TTL_SECONDS)
+            _mem_set(did, data)
             return dict(data)
         except Exception as e:
             logging.debug("[speaker_state] firestore get falhou: %s", e)
@@ -250,7 +259,7 @@ def bump_ai_turns(wa_key: str, uid_owner: Optional[str] = None) -> int:
         new_row["createdAtEpoch"] = now
 
     # 1) memória
-    _mem[did] = (dict(new_row), now + _TTL_SECONDS)
+    _mem_set(did, new_row)
 
     # 2) Firestore (best-effort)
     db = _fs_client()
@@ -290,7 +299,7 @@ def set_force_operational(wa_key: str, value: bool = True, reason: str = "", uid
     if "createdAtEpoch" not in row:
         row["createdAtEpoch"] = now
 
-    _mem[did] = (dict(row), now + _TTL_SECONDS)
+    _mem_set(did, row)
 
     db = _fs_client()
     if _db_ready(db):
@@ -318,7 +327,7 @@ def set_pending_booking(wa_key: str, data: Dict[str, Any], uid_owner: Optional[s
     state = get_speaker_state(wa_key, uid_owner=uid_owner) or {}
     state["pending_booking"] = data
     did = _doc_id(wa_key, uid_owner=uid_owner)
-    _mem[did] = (dict(state), _now() + _TTL_SECONDS)
+    _mem_set(did, state)
 
     db = _fs_client()
     if _db_ready(db):
@@ -358,7 +367,7 @@ def set_last_quote(wa_key: str, data: Dict[str, Any], uid_owner: Optional[str] =
 
     row["last_quote"] = q
     did = _doc_id(wa_key, uid_owner=uid_owner)
-    _mem[did] = (dict(row), now + _TTL_SECONDS)
+    _mem_set(did, row)
 
     db = _fs_client()
     if _db_ready(db):
@@ -0,0 +1,157 @@
+# services/speech_clients.py
+# Registro único (por processo) dos clientes Google Speech-to-Text e Text-to-Speech.
+#
+# - get_client(kind, creds): criação preguiçosa e thread-safe (lock por chave, double-check);
+#   o canal gRPC é aberto uma vez e reaproveitado por todas as threads
+# - kind: "speech" | "tts" | "tts_beta" (v1beta1 — voice clone; cai para v1 se não existir)
+# - creds: "adc" (Application Default Credentials — como STT/tts_fallback já faziam) ou
+#   "inline_first" (GOOGLE_APPLICATION_CREDENTIALS_JSON / FIREBASE_* e depois ADC — como
+#   providers/tts e services/text_to_speech); cada consumidor mantém a credencial de antes
+# - warm_up(): cria os clientes no boot do worker, em thread de fundo (SPEECH_CLIENTS_WARMUP)
+# - stats(): por cliente — criado?, credencial usada, ms de criação, usos, falhas
+
+from __future__ import annotations
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger("mei_robo.speech_clients")
+
+KINDS = ("speech", "tts", "tts_beta")
+
+_CLIENTS: Dict[Tuple[str, str], Any] = {}
+_LOCKS: Dict[Tuple[str, str], threading.Lock] = {}
+_REGISTRY_LOCK = threading.Lock()
+_STATS: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+
+def _module(kind: str):
+    if kind == "speech":
+        from google.cloud import speech  # type: ignore
+        return speech
+    if kind == "tts_beta":
+        try:
+            from google.cloud import texttospeech_v1beta1 as texttospeech  # type: ignore
+        except Exception:
+            from google.cloud import texttospeech  # type: ignore
+        return texttospeech
+    if kind == "tts":
+        from google.cloud import texttospeech  # type: ignore
+        return texttospeech
+    raise ValueError(f"kind desconhecido: {kind}")
+
+
+def _client_class(kind: str):
+    mod = _module(kind)
+    return mod.SpeechClient if kind == "speech" else mod.TextToSpeechClient
+
+
+def _inline_credentials():
+    creds_json = (
+        os.getenv("GOOGLE_APPLICATION_CREDENTIALS_JSON")
+        or os.getenv("FIREBASE_SERVICE_ACCOUNT_JSON")
+        or os.getenv("FIREBASE_CREDENTIALS_JSON")
+    )
+    if not creds_json:
+        return None
+    from google.oauth2 import service_account  # type: ignore
+    return service_account.Credentials.from_service_account_info(json.loads(creds_json))
+
+
+def _create(kind: str, creds: str) -> Tuple[Any, str]:
+    cls = _client_class(kind)
+    if creds == "inline_first":
+        try:
+            inline = _inline_credentials()
+            if inline is not None:
+                return cls(credentials=inline), "inline_json"
+        except Exception as e:
+            logger.info("[speech_clients] credenciais inline JSON falharam (%s): %s", kind, e)
+    return cls(), "adc"
+
+
+def _row(key: Tuple[str, str]) -> Dict[str, Any]:
+    row = _STATS.get(key)
+    if row is None:
+        row = {"created": False, "cred": None, "create_ms": None, "uses": 0, "failures": 0, "last_error": None}
+        _STATS[key] = row
+    return row
+
+
+def get_client(kind: str = "speech", creds: str = "adc"):
+    """Cliente compartilhado; levanta a exceção da lib/credencial (o chamador já trata)."""
+    key = (kind, creds)
+    client = _CLIENTS.get(key)
+    if client is None:
+        with _REGISTRY_LOCK:
+            lock = _LOCKS.setdefault(key, threading.Lock())
+        with lock:
+            client = _CLIENTS.get(key)
+            if client is None:
+                t0 = time.perf_counter()
+                try:
+                    client, cred_used = _create(kind, creds)
+                except Exception as e:
+                    with _REGISTRY_LOCK:
+                        row = _row(key)
+                        row["failures"] += 1
+                        row["last_error"] = f"{type(e).__name__}: {str(e)[:160]}"
+                    raise
+                with _REGISTRY_LOCK:
+                    row = _row(key)
+                    row.update(created=True, cred=cred_used, create_ms=round((time.perf_counter() - t0) * 1000, 1))
+                _CLIENTS[key] = client
+    with _REGISTRY_LOCK:
+        _row(key)["uses"] += 1
+    return client
+
+
+def get_speech_client(creds: str = "adc"):
+    return get_client("speech", creds)
+
+
+def get_tts_client(creds: str = "adc", beta: bool = False):
+    return get_client("tts_beta" if beta else "tts", creds)
+
+
+def warm_up(clients: Optional[Iterable[Tuple[str, str]]] = None, background: bool = True) -> Optional[threading.Thread]:
+    """Cria os clientes antes da primeira mensagem (falhas só vão para stats/log)."""
+    wanted = list(clients or [("speech", "adc"), ("tts", "adc")])
+
+    def _run():
+        for kind, creds in wanted:
+            try:
+                get_client(kind, creds)
+                with _REGISTRY_LOCK:
+                    _row((kind, creds))["uses"] -= 1  # aquecimento não conta como uso
+            except Exception as e:
+                logger.info("[speech_clients] warm-up %s/%s falhou: %s", kind, creds, e)
+
+    if not background:
+        _run()
+        return None
+    t = threading.Thread(target=_run, name="speech-clients-warmup", daemon=True)
+    t.start()
+    return t
+
+
+def warm_up_from_env() -> Optional[threading.Thread]:
+    """SPEECH_CLIENTS_WARMUP=1 (default) → aquece speech/tts em ADC; 0 desliga."""
+    if (os.getenv("SPEECH_CLIENTS_WARMUP", "1") or "1").strip().lower() not in ("1", "true", "yes", "on"):
+        return None
+    return warm_up()
+
+
+def stats() -> Dict[str, Any]:
+    with _REGISTRY_LOCK:
+        return {f"{k}/{c}": dict(row) for (k, c), row in _STATS.items()}
+
+
+def reset() -> None:
+    with _REGISTRY_LOCK:
+        _CLIENTS.clear()
+        _STATS.clear()
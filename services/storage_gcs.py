@@ -168,13 +168,15 @@ def upload_acervo_bytes_and_get_url(uid: str, rel_path: str, buf: bytes, mimetyp
 
 
 # === NOVO HELPER: leitura de texto por gcs_path (para .md do acervo, etc.) ===
-def download_text_by_gcs_path(gcs_path: str, max_bytes: int = 8192, encoding: str = "utf-8") -> str | None:
+def download_text_by_gcs_path(gcs_path: str, max_bytes: int = 8192, encoding: str = "utf-8",
+                              generation: int | None = None) -> str | None:
     """
     Lê conteúdo de texto de um objeto no GCS dado o caminho interno (gcs_path).
 
     - gcs_path: ex.: 'profissionais/<uid>/acervo/consulta/<id>.md'
     - max_bytes: limite de bytes a ler (para não explodir o contexto da IA)
     - encoding: encoding usado para decodificar o texto (default: 'utf-8')
+    - generation: lê exatamente essa geração do objeto (cache por path+geração)
 
     Retorna:
       - string com o conteúdo (possivelmente truncado a max_bytes)
@@ -191,7 +193,7 @@ def download_text_by_gcs_path(gcs_path: str, max_bytes: int = 8192, encoding: st
     try:
         client = _get_client()
         bucket = client.bucket(bucket_name)
-        blob = bucket.blob(gcs_path)
+        blob = bucket.blob(gcs_path, generation=generation) if generation else bucket.blob(gcs_path)
 
         # Faz download limitado em bytes
         # (download_as_bytes já pode ser limitado via offset/length; aqui usamos length=max_bytes)
@@ -222,6 +224,32 @@ def download_text_by_gcs_path(gcs_path: str, max_bytes: int = 8192, encoding: st
         return None
 
 
+def upload_private_bytes(gcs_path: str, buf: bytes, mimetype: str) -> int | None:
+    """
+    Sobe bytes em gs://<STORAGE_BUCKET>/<gcs_path> sem tornar público nem assinar
+    (arquivos internos, ex.: sidecar de chunks do acervo). Retorna a geração gravada.
+    """
+    bucket_name = os.getenv("STORAGE_BUCKET")
+    if not bucket_name:
+        raise RuntimeError("STORAGE_BUCKET ausente nas variáveis de ambiente")
+    blob = _get_client().bucket(bucket_name).blob(gcs_path)
+    blob.upload_from_file(io.BytesIO(buf), size=len(buf), content_type=mimetype, rewind=True)
+    return int(blob.generation) if blob.generation else None
+
+
+def get_blob_generation(gcs_path: str) -> int | None:
+    """Geração atual do objeto (None se não existir ou sem STORAGE_BUCKET)."""
+    bucket_name = os.getenv("STORAGE_BUCKET")
+    if not bucket_name or not gcs_path:
+        return None
+    try:
+        blob = _get_client().bucket(bucket_name).get_blob(gcs_path)
+        return int(blob.generation) if blob is not None and blob.generation else None
+    except Exception as e:
+        logging.warning("[gcs] get_blob_generation('%s') falhou: %s", gcs_path, e)
+        return None
+
+
 # === NOVO HELPER: assinatura V4 on-demand para leitura ===
 def sign_v4_read_url(bucket_name: str, object_key: str, expires_seconds: int = None, inline: bool = True) -> str:
     """
@@ -1,45 +1,271 @@
 # services/text_extract.py
+# Extração de texto (PDF/DOCX/TXT/MD) em streaming, com orçamentos.
+#
+# - iter_pages(data, filename, ...): gerador de Page(index, text, ms) — PDF página a página,
+#   DOCX em blocos de parágrafos, texto em blocos de linhas (mesma interface para os três)
+# - Orçamentos: max_pages, max_chars (última página cortada no limite) e time_budget_sec
+#   (checado entre páginas; com processos, também na espera do resultado)
+# - workers > 0 (PDF): páginas extraídas num ProcessPoolExecutor (cada processo abre o PDF
+#   uma vez no initializer); a ordem de saída é preservada. Contexto "spawn" (o worker do
+#   gunicorn tem threads; fork herdaria locks presos) e, ao estourar o orçamento ou o
+#   consumidor parar, os processos são terminados — lotes em execução não seguem gastando CPU
+# - ExtractReport: kind, páginas lidas/total, chars, motivo do corte e ms por página
+# - extract_text_from_bytes: contrato antigo (texto, kind), agora com orçamentos via env
 from __future__ import annotations
 import io
-from typing import Tuple
+import os
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as _FutTimeout
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("mei_robo.text_extract")
+
+_BLOCK_CHARS = 4000  # DOCX/texto: tamanho do "pedaço" equivalente a uma página
+_POOL_BATCH = 8      # páginas por tarefa no pool de processos
+
+
+class Page:
+    __slots__ = ("index", "text", "ms")
+
+    def __init__(self, index: int, text: str, ms: float = 0.0):
+        self.index = index
+        self.text = text
+        self.ms = ms
+
+    def __repr__(self) -> str:
+        return f"Page({self.index}, {len(self.text)} chars, {self.ms:.1f} ms)"
+
+
+class ExtractReport:
+    def __init__(self, kind: str = "unknown"):
+        self.kind = kind
+        self.pages_total: Optional[int] = None
+        self.pages = 0
+        self.chars = 0
+        self.truncated: Optional[str] = None  # "max_pages" | "max_chars" | "time_budget" | "error"
+        self.page_ms: List[float] = []
+        self.ms = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        slow = max(range(len(self.page_ms)), key=self.page_ms.__getitem__) if self.page_ms else None
+        return {
+            "kind": self.kind,
+            "pages": self.pages,
+            "pagesTotal": self.pages_total,
+            "chars": self.chars,
+            "truncated": self.truncated,
+            "ms": round(self.ms, 1),
+            "slowestPage": slow,
+            "slowestPageMs": round(self.page_ms[slow], 1) if slow is not None else None,
+        }
+
+
+def _kind_of(filename: str) -> str:
+    name = (filename or "").lower().strip()
+    if name.endswith(".pdf"):
+        return "pdf"
+    if name.endswith(".docx"):
+        return "docx"
+    if name.endswith(".txt") or name.endswith(".md"):
+        return "text"
+    return "unknown"
+
+
+def _env_num(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)) or default)
+    except Exception:
+        return default
+
+
+# ---------- PDF ----------
+_PDF_READER = None  # por processo do pool
+
+
+def _pdf_init(data: bytes) -> None:
+    global _PDF_READER
+    from pypdf import PdfReader  # type: ignore
+    _PDF_READER = PdfReader(io.BytesIO(data))
+
+
+def _pdf_page(reader, i: int) -> Tuple[str, float]:
+    t0 = time.perf_counter()
+    try:
+        text = (reader.pages[i].extract_text() or "").strip()
+    except Exception:
+        text = ""
+    return text, (time.perf_counter() - t0) * 1000
+
+
+def _pdf_batch(indexes: List[int]) -> List[Tuple[int, str, float]]:
+    return [(i, *_pdf_page(_PDF_READER, i)) for i in indexes]
+
+
+def _stop_pool(pool: ProcessPoolExecutor, kill: bool) -> None:
+    procs = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    if not kill:
+        return
+    for p in procs:
+        if p.is_alive():
+            p.terminate()
+    for p in procs:
+        p.join(0.5)
+
+
+def _pdf_pages(data: bytes, max_pages: int, deadline: Optional[float], workers: int,
+               report: ExtractReport) -> Iterator[Page]:
+    from pypdf import PdfReader  # type: ignore
+    reader = PdfReader(io.BytesIO(data))
+    total = len(reader.pages)
+    report.pages_total = total
+    n = min(total, max_pages) if max_pages else total
+    if n < total:
+        report.truncated = "max_pages"
+
+    if workers <= 1 or n <= _POOL_BATCH:
+        for i in range(n):
+            if deadline is not None and time.monotonic() >= deadline:
+                report.truncated = "time_budget"
+                return
+            text, ms = _pdf_page(reader, i)
+            yield Page(i, text, ms)
+        return
+
+    batches = [list(range(s, min(n, s + _POOL_BATCH))) for s in range(0, n, _POOL_BATCH)]
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_pdf_init, initargs=(data,),
+                               mp_context=multiprocessing.get_context("spawn"))
+    futures = []
+    try:
+        futures = [pool.submit(_pdf_batch, b) for b in batches]
+        for fut in futures:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                rows = fut.result(timeout=timeout)
+            except _FutTimeout:
+                report.truncated = "time_budget"
+                return
+            for i, text, ms in rows:
+                yield Page(i, text, ms)
+    finally:
+        # orçamento estourado / consumidor parou: mata os lotes ainda em execução
+        _stop_pool(pool, kill=not all(f.done() for f in futures))
+
+
+# ---------- DOCX / texto ----------
+def _blocks(lines: Iterator[str], deadline: Optional[float], report: ExtractReport) -> Iterator[Page]:
+    buf: List[str] = []
+    size = 0
+    idx = 0
+    t0 = time.perf_counter()
+    for line in lines:
+        if not line or not line.strip():
+            continue
+        buf.append(line.rstrip())
+        size += len(line) + 1
+        if size >= _BLOCK_CHARS:
+            yield Page(idx, "\n".join(buf), (time.perf_counter() - t0) * 1000)
+            idx, buf, size = idx + 1, [], 0
+            if deadline is not None and time.monotonic() >= deadline:
+                report.truncated = "time_budget"
+                return
+            t0 = time.perf_counter()
+    if buf:
+        yield Page(idx, "\n".join(buf), (time.perf_counter() - t0) * 1000)
+
+
+def _docx_pages(data: bytes, deadline: Optional[float], report: ExtractReport) -> Iterator[Page]:
+    from docx import Document  # type: ignore
+    doc = Document(io.BytesIO(data))
+    yield from _blocks((p.text for p in doc.paragraphs), deadline, report)
+
+
+def _text_pages(data: bytes, deadline: Optional[float], report: ExtractReport) -> Iterator[Page]:
+    text = data.decode("utf-8", errors="ignore")
+    yield from _blocks(iter(text.splitlines()), deadline, report)
+
+
+# ---------- API ----------
+def iter_pages(
+    data: bytes,
+    filename: str,
+    *,
+    max_pages: Optional[int] = None,
+    max_chars: Optional[int] = None,
+    time_budget_sec: Optional[float] = None,
+    workers: int = 0,
+    report: Optional[ExtractReport] = None,
+) -> Iterator[Page]:
+    """
+    Páginas (ou blocos, em DOCX/texto) com texto, na ordem do documento.
+    Orçamentos None/0 = sem limite. Erros de leitura encerram o gerador (report.truncated="error").
+    """
+    report = report if report is not None else ExtractReport()
+    report.kind = _kind_of(filename)
+    t_start = time.perf_counter()
+    deadline = (time.monotonic() + float(time_budget_sec)) if time_budget_sec else None
+    if report.kind == "pdf":
+        src = _pdf_pages(data, int(max_pages or 0), deadline, int(workers or 0), report)
+    elif report.kind == "docx":
+        src = _docx_pages(data, deadline, report)
+    elif report.kind == "text":
+        src = _text_pages(data, deadline, report)
+    else:
+        return
+
+    try:
+        for page in src:
+            report.pages += 1
+            report.page_ms.append(page.ms)
+            if not page.text:
+                continue
+            text = page.text
+            sep = 1 if report.chars else 0  # "\n" entre páginas no texto final
+            if max_chars and report.chars + sep + len(text) >= max_chars:
+                text = text[: max(0, int(max_chars) - report.chars - sep)]
+                report.chars += sep + len(text) if text else 0
+                report.truncated = "max_chars"
+                if text:
+                    yield Page(page.index, text, page.ms)
+                return
+            report.chars += sep + len(text)
+            yield page
+            if report.kind != "pdf" and max_pages and report.pages >= max_pages:
+                report.truncated = "max_pages"
+                return
+    except Exception as e:
+        logger.warning("[text_extract] leitura interrompida (%s): %s", report.kind, e)
+        report.truncated = "error"
+    finally:
+        close = getattr(src, "close", None)
+        if close is not None:
+            close()
+        report.ms = (time.perf_counter() - t_start) * 1000
+
+
+def extract_with_report(data: bytes, filename: str, **budgets: Any) -> Tuple[str, str, ExtractReport]:
+    """Texto completo (dentro dos orçamentos), kind e o relatório da extração."""
+    report = ExtractReport()
+    parts = [p.text for p in iter_pages(data, filename, report=report, **budgets)]
+    return "\n".join(parts).strip(), report.kind, report
+
 
 def extract_text_from_bytes(data: bytes, filename: str) -> Tuple[str, str]:
     """
     Retorna (texto, kind) onde kind ∈ {"pdf","docx","text","unknown"}.
+    Orçamentos: TEXT_EXTRACT_MAX_PAGES, TEXT_EXTRACT_MAX_CHARS, TEXT_EXTRACT_TIME_BUDGET_SEC,
+    TEXT_EXTRACT_WORKERS (processos para PDF; 0 = mesma thread).
     """
-    name = (filename or "").lower().strip()
+    text, kind, _ = extract_with_report(data, filename, **default_budgets())
+    return text, kind
 
-    # PDF
-    if name.endswith(".pdf"):
-        try:
-            from pypdf import PdfReader  # type: ignore
-            reader = PdfReader(io.BytesIO(data))
-            parts = []
-            for page in reader.pages:
-                try:
-                    parts.append(page.extract_text() or "")
-                except Exception:
-                    pass
-            text = "\n".join([p.strip() for p in parts if p and p.strip()])
-            return (text, "pdf")
-        except Exception:
-            return ("", "pdf")
-
-    # DOCX
-    if name.endswith(".docx"):
-        try:
-            from docx import Document  # type: ignore
-            doc = Document(io.BytesIO(data))
-            text = "\n".join([p.text for p in doc.paragraphs if p.text and p.text.strip()])
-            return (text.strip(), "docx")
-        except Exception:
-            return ("", "docx")
-
-    # TXT/MD
-    if name.endswith(".txt") or name.endswith(".md"):
-        try:
-            return (data.decode("utf-8", errors="ignore").strip(), "text")
-        except Exception:
-            return ("", "text")
 
-    return ("", "unknown")
+def default_budgets() -> Dict[str, Any]:
+    return {
+        "max_pages": int(_env_num("TEXT_EXTRACT_MAX_PAGES", 500)),
+        "max_chars": int(_env_num("TEXT_EXTRACT_MAX_CHARS", 2_000_000)),
+        "time_budget_sec": _env_num("TEXT_EXTRACT_TIME_BUDGET_SEC", 60),
+        "workers": int(_env_num("TEXT_EXTRACT_WORKERS", 0)),
+    }
@@ -0,0 +1,195 @@
+# services/ttl_sweeper.py
+# Varredura de TTL (Firestore) para coleções de dedupe/cache/buffer que só crescem.
+#
+# - Cada alvo tem um campo de expiração indexado (expiresAt epoch, ou expAt ISO no cache.kv)
+# - Query: where(campo < agora).order_by(campo).limit(page) → delete em WriteBatch
+# - Orçamento de tempo por execução; cursor persistido em platform_maintenance/ttl_sweeper
+#   (alvo corrente + último valor e path vistos; ordem (campo, __name__), então docs com o
+#   mesmo valor no limite da página não são pulados) — a próxima chamada continua de onde parou
+# - Retorna relatório com docs lidos/apagados por alvo
+# - Alvos "legacy": docs de dedupe gravados antes de existir expiresAt (só createdAt
+#   SERVER_TIMESTAMP) — varridos por createdAt < agora - max_age; quem já tem expiresAt fica
+#   para o alvo normal. Some sozinho quando não houver mais docs antigos
+#
+# Índices: campo simples (expiresAt / expAt) já é indexado por padrão; para o collection
+# group "cache" é preciso habilitar a isenção de índice de collection group em expAt.
+
+from __future__ import annotations
+
+import os
+import time
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("mei_robo.ttl_sweeper")
+
+STATE_COLL = os.getenv("TTL_SWEEPER_STATE_COLL", "platform_maintenance")
+STATE_DOC = "ttl_sweeper"
+BATCH_MAX = 400  # limite 500 por WriteBatch; 400 dá folga
+
+LEGACY_MAX_AGE_SEC = int(os.getenv("TTL_SWEEPER_LEGACY_MAX_AGE_SEC", "604800") or "604800")  # 7d
+
+# kind: "epoch" (número em segundos) | "iso" (string ISO UTC com Z, ordenável)
+#       | "timestamp" (Timestamp do Firestore; cutoff = agora - max_age)
+TARGETS: List[Dict[str, Any]] = [
+    {"name": "platform_tasks_dedup", "collection": "platform_tasks_dedup", "field": "expiresAt", "kind": "epoch"},
+    {"name": "platform_wa_dedupe", "collection": "platform_wa_dedupe", "field": "expiresAt", "kind": "epoch"},
+    {"name": "platform_tasks_dedup_legacy", "collection": "platform_tasks_dedup", "field": "createdAt",
+     "kind": "timestamp", "max_age": LEGACY_MAX_AGE_SEC, "skip_if": "expiresAt"},
+    {"name": "platform_wa_dedupe_legacy", "collection": "platform_wa_dedupe", "field": "createdAt",
+     "kind": "timestamp", "max_age": LEGACY_MAX_AGE_SEC, "skip_if": "expiresAt"},
+    {"name": "platform_response_cache", "collection": "platform_response_cache", "field": "expiresAt", "kind": "epoch"},
+    {"name": "platform_wa_buffers", "collection": "platform_wa_buffers", "field": "expiresAt", "kind": "epoch"},
+    {"name": "platform_reminder_ledger", "collection": "platform_reminder_ledger", "field": "expiresAt", "kind": "epoch"},
+    {"name": "profissionais_cache", "group": "cache", "field": "expAt", "kind": "iso", "parent_prefix": "profissionais/"},
+]
+
+
+def _now_value(kind: str, now: float, max_age: float = 0) -> Any:
+    if kind == "timestamp":
+        return datetime.fromtimestamp(now - max_age, timezone.utc)
+    if kind == "iso":
+        return datetime.fromtimestamp(now, timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+    return now
+
+
+def _base_query(db, target: Dict[str, Any]):
+    if target.get("group"):
+        return db.collection_group(target["group"])
+    return db.collection(target["collection"])
+
+
+def _doc_path(snap) -> str:
+    ref = getattr(snap, "reference", None)
+    return str(getattr(ref, "path", "") or "")
+
+
+def _load_state(db) -> Dict[str, Any]:
+    try:
+        snap = db.collection(STATE_COLL).document(STATE_DOC).get()
+        if getattr(snap, "exists", False):
+            return snap.to_dict() or {}
+    except Exception as e:
+        logger.info("[ttl_sweeper] estado indisponível: %s", e)
+    return {}
+
+
+def _save_state(db, state: Dict[str, Any]) -> None:
+    try:
+        db.collection(STATE_COLL).document(STATE_DOC).set(state)
+    except Exception as e:
+        logger.info("[ttl_sweeper] falha ao salvar cursor: %s", e)
+
+
+def run_sweep(
+    db,
+    *,
+    time_budget_sec: float = 20.0,
+    page_size: int = 300,
+    only: Optional[List[str]] = None,
+    dry_run: bool = False,
+    now: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Apaga documentos expirados dentro do orçamento de tempo.
+    Retorna {"ok", "complete", "scanned", "deleted", "elapsedMs", "targets": {...}, "cursor": {...}}.
+    Em dry_run nada é apagado: targets[*].expired conta o que seria removido.
+    """
+    t0 = time.monotonic()
+    now = float(now if now is not None else time.time())
+    page_size = max(1, min(BATCH_MAX, int(page_size or 300)))
+    targets = [t for t in TARGETS if not only or t["name"] in set(only)]
+    names = [t["name"] for t in targets]
+
+    state = _load_state(db)
+    cursors: Dict[str, Any] = dict(state.get("cursors") or {})
+    start_name = state.get("target") if state.get("target") in names else (names[0] if names else None)
+    order = names[names.index(start_name):] + names[: names.index(start_name)] if start_name else []
+
+    report: Dict[str, Dict[str, Any]] = {}
+    scanned_total = 0
+    deleted_total = 0
+    current: Optional[str] = None
+
+    for name in order:
+        target = next(t for t in targets if t["name"] == name)
+        field, kind = target["field"], target["kind"]
+        row = report.setdefault(name, {"scanned": 0, "expired": 0, "deleted": 0, "done": False})
+        current = name
+        cutoff = _now_value(kind, now, target.get("max_age") or 0)
+
+        while True:
+            if time.monotonic() - t0 >= time_budget_sec:
+                break
+            q = _base_query(db, target).where(field, "<", cutoff).order_by(field).order_by("__name__")
+            last = cursors.get(name)
+            if isinstance(last, dict) and last.get("path"):
+                q = q.start_after({field: last.get("value"), "__name__": db.document(last["path"])})
+            elif last is not None:
+                q = q.start_after({field: last})  # cursor antigo (só valor)
+            try:
+                snaps = list(q.limit(page_size).stream())
+            except Exception as e:
+                logger.warning("[ttl_sweeper] query falhou alvo=%s: %s", name, e)
+                row["error"] = f"{type(e).__name__}"
+                snaps = []
+
+            if not snaps:
+                row["done"] = True
+                cursors.pop(name, None)
+                break
+
+            batch = None if dry_run else db.batch()
+            n_del = 0
+            for snap in snaps:
+                row["scanned"] += 1
+                prefix = target.get("parent_prefix")
+                if prefix and not _doc_path(snap).startswith(prefix):
+                    continue
+                if target.get("skip_if") and (snap.to_dict() or {}).get(target["skip_if"]) is not None:
+                    continue
+                if batch is not None:
+                    batch.delete(snap.reference)
+                n_del += 1
+            if batch is not None and n_del:
+                batch.commit()
+                row["deleted"] += n_del
+            row["expired"] += n_del
+
+            # cursor: só avança sobre docs que ficaram (dry_run/filtrados); apagados somem da query
+            if dry_run or n_del < len(snaps):
+                cursors[name] = {"value": (snaps[-1].to_dict() or {}).get(field), "path": _doc_path(snaps[-1])}
+            if len(snaps) < page_size:
+                row["done"] = True
+                cursors.pop(name, None)
+                break
+
+        scanned_total += row["scanned"]
+        deleted_total += row["deleted"]
+        if not row["done"]:
+            break
+
+    complete = bool(order) and all(report.get(n, {}).get("done") for n in order)
+    if complete:
+        next_target = names[0] if names else None
+    else:
+        next_target = current
+    if not dry_run:
+        _save_state(db, {"target": next_target, "cursors": cursors, "updatedAtEpoch": now})
+
+    out = {
+        "ok": True,
+        "complete": complete,
+        "dryRun": bool(dry_run),
+        "scanned": scanned_total,
+        "deleted": deleted_total,
+        "elapsedMs": int((time.monotonic() - t0) * 1000),
+        "targets": report,
+        "cursor": {"target": next_target, "cursors": cursors},
+    }
+    logger.info(
+        "[ttl_sweeper] scanned=%s deleted=%s complete=%s elapsedMs=%s",
+        scanned_total, deleted_total, complete, out["elapsedMs"],
+    )
+    return out
@@ -0,0 +1,212 @@
+# services/tts_cache.py
+# Cache endereçado por conteúdo dos áudios de TTS (institucional/worker).
+#
+# - Chave = sha256(texto normalizado, voice_id, provider, mime, mode); objeto determinístico
+#   em tts_cache/{mode}/{kk}/{chave}.{ext} — o próprio bucket é o índice persistente
+# - Só textos curtos (TTS_CACHE_MAX_CHARS) e chamadores com cache=True: ACKs e frases
+#   institucionais, que se repetem; respostas livres (lead/cliente, voz do MEI) vão direto para o
+#   upload avulso do chamador — nada de conteúdo de conversa guardado sem prazo em tts_cache/
+# - Ordem: índice em memória → miss recente em memória → get_blob no GCS → sintetiza + sobe
+#   (if_generation_match=0); o miss fica lembrado por TTS_CACHE_MISS_TTL_SEC, então texto
+#   novo não paga o get_blob de novo até ser gravado
+# - Hit: só re-assina a URL (URLs assinadas reaproveitadas até metade da validade)
+# - synth() pode marcar o áudio como não-cacheável (ex.: fallback de voz degradado)
+# - stats(): hits (memória/GCS), misses, hit ratio e bytes poupados (síntese + upload)
+
+from __future__ import annotations
+
+import os
+import re
+import hashlib
+import logging
+import threading
+from datetime import timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from cache.lru import LRUCache
+
+logger = logging.getLogger("mei_robo.tts_cache")
+
+_WS = re.compile(r"\s+")
+
+_INDEX = LRUCache(
+    max_items=int(os.getenv("TTS_CACHE_INDEX_MAX", "5000") or 5000),
+    default_ttl=float(os.getenv("TTS_CACHE_INDEX_TTL_SEC", "86400") or 86400),
+    name="tts_cache.index",
+)
+_URLS = LRUCache(max_items=int(os.getenv("TTS_CACHE_INDEX_MAX", "5000") or 5000), name="tts_cache.urls")
+_MISSES = LRUCache(
+    max_items=int(os.getenv("TTS_CACHE_INDEX_MAX", "5000") or 5000),
+    default_ttl=float(os.getenv("TTS_CACHE_MISS_TTL_SEC", "300") or 300),
+    name="tts_cache.misses",
+)
+_LOCK = threading.Lock()
+_STATS = {"hits_mem": 0, "hits_gcs": 0, "misses": 0, "misses_mem": 0, "stored": 0, "not_cacheable": 0,
+          "bypass": 0, "errors": 0, "bytes_saved": 0, "bytes_stored": 0}
+
+# synth() -> (audio_bytes, content_type, cacheable) | None
+Synth = Callable[[], Optional[Tuple[bytes, str, bool]]]
+
+
+def enabled() -> bool:
+    return (os.getenv("TTS_CACHE_ENABLED", "1") or "1").strip().lower() in ("1", "true", "yes", "on")
+
+
+def normalize_text(text: str) -> str:
+    return _WS.sub(" ", (text or "").strip())
+
+
+def cacheable_text(text: str) -> bool:
+    """Textos curtos (ACK, frase institucional) se repetem; resposta longa é única."""
+    max_chars = int(os.getenv("TTS_CACHE_MAX_CHARS", "160") or 160)
+    return 0 < len(normalize_text(text)) <= max_chars
+
+
+def cache_key(text: str, voice_id: str, provider: str, mime: str, mode: str) -> str:
+    raw = "\n".join([normalize_text(text), voice_id or "", provider or "", (mime or "").lower(), mode or ""])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _ext(mime: str) -> str:
+    m = (mime or "").lower()
+    if "mpeg" in m or "mp3" in m:
+        return "mp3"
+    if "ogg" in m or "opus" in m:
+        return "ogg"
+    if "wav" in m:
+        return "wav"
+    return "bin"
+
+
+def object_path(key: str, mode: str, mime: str) -> str:
+    safe_mode = re.sub(r"[^a-z0-9_-]+", "_", (mode or "default").lower())
+    return f"tts_cache/{safe_mode}/{key[:2]}/{key}.{_ext(mime)}"
+
+
+def _bucket():
+    from services.gcs_handler import get_bucket  # type: ignore
+    return get_bucket()
+
+
+def _incr(name: str, n: int = 1) -> None:
+    with _LOCK:
+        _STATS[name] += n
+
+
+def _sign(obj: str, expires_seconds: int) -> str:
+    cached = _URLS.get((obj, expires_seconds))
+    if cached is not None:
+        return cached
+    url = _bucket().blob(obj).generate_signed_url(
+        version="v4", expiration=timedelta(seconds=expires_seconds), method="GET",
+    )
+    _URLS.set((obj, expires_seconds), url, ttl=expires_seconds * 0.5)
+    return url
+
+
+def _lookup(key: str, obj: str) -> Optional[Dict[str, Any]]:
+    entry = _INDEX.get(key)
+    if entry is not None:
+        _incr("hits_mem")
+        return entry
+    if _MISSES.get(key) is not None:
+        _incr("misses_mem")
+        return None
+    blob = _bucket().get_blob(obj)
+    if blob is None:
+        _MISSES.set(key, True)
+        return None
+    entry = {"object": obj, "bytes": int(getattr(blob, "size", 0) or 0), "ct": getattr(blob, "content_type", "")}
+    _INDEX.set(key, entry)
+    _incr("hits_gcs")
+    return entry
+
+
+def get_or_create_url(
+    *,
+    text: str,
+    voice_id: str,
+    provider: str,
+    mime: str,
+    mode: str,
+    synth: Synth,
+    expires_seconds: int = 900,
+    upload: Optional[Callable[[bytes, str], str]] = None,
+    cache: bool = True,
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    URL assinada do áudio de (texto, voz, provider, mime, mode).
+    Em miss chama synth(); cacheável → sobe no caminho determinístico; senão usa upload(b, ct)
+    (upload avulso do chamador). cache=False ou texto longo → nem consulta o cache (bypass).
+    Retorna (url | "", info) — info vai para o audio_debug.
+    """
+    key = cache_key(text, voice_id, provider, mime, mode)
+    obj = object_path(key, mode, mime)
+    info: Dict[str, Any] = {"cache": "off", "key": key[:16]}
+    if enabled() and not (cache and cacheable_text(text)):
+        _incr("bypass")
+        info["cache"] = "bypass"
+    elif enabled():
+        try:
+            entry = _lookup(key, obj)
+            if entry is not None:
+                _incr("bytes_saved", entry["bytes"])
+                info.update(cache="hit", object=obj, bytes=entry["bytes"])
+                return _sign(obj, int(expires_seconds)), info
+            info["cache"] = "miss"
+        except Exception as e:
+            _incr("errors")
+            info["cache"] = "error"
+            logger.info("[tts_cache] lookup falhou %s: %s", obj, e)
+
+    spoken = synth()
+    if not spoken or not spoken[0]:
+        info["reason"] = "empty_audio"
+        return "", info
+    audio, ct, cacheable = spoken
+    info["bytes"] = len(audio)
+    if info["cache"] == "miss":
+        _incr("misses")
+        if cacheable:
+            try:
+                blob = _bucket().blob(obj)
+                try:
+                    blob.upload_from_string(audio, content_type=ct or mime, if_generation_match=0)
+                except Exception as e:
+                    # outra instância gravou o mesmo conteúdo antes: reaproveita
+                    if "412" not in str(e) and "Precondition" not in type(e).__name__:
+                        raise
+                _INDEX.set(key, {"object": obj, "bytes": len(audio), "ct": ct or mime})
+                _MISSES.pop(key)
+                _incr("stored")
+                _incr("bytes_stored", len(audio))
+                info["object"] = obj
+                return _sign(obj, int(expires_seconds)), info
+            except Exception as e:
+                _incr("errors")
+                logger.info("[tts_cache] store falhou %s: %s", obj, e)
+        else:
+            _incr("not_cacheable")
+            info["cache"] = "skip"
+    if upload is None:
+        return "", info
+    return upload(audio, ct or mime) or "", info
+
+
+def stats() -> Dict[str, Any]:
+    with _LOCK:
+        out = dict(_STATS)
+    hits = out["hits_mem"] + out["hits_gcs"]
+    total = hits + out["misses"]
+    out["hit_ratio"] = round(hits / total, 4) if total else 0.0
+    out["index"] = _INDEX.stats()
+    return out
+
+
+def clear() -> None:
+    _INDEX.clear()
+    _URLS.clear()
+    _MISSES.clear()
+    with _LOCK:
+        for k in _STATS:
+            _STATS[k] = 0
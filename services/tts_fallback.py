@@ -38,6 +38,10 @@ def _clear_eleven_cooldown() -> None:
     _ELEVEN_DISABLED_UNTIL_TS = 0.0
     _persist_cooldown(until_ts=0.0, reason="recovered")
 
+def eleven_degraded() -> bool:
+    """True quando tts_bytes está caindo direto no Google (ElevenLabs em cooldown)."""
+    return _is_eleven_in_cooldown()
+
 def _persist_cooldown(*, until_ts: float, reason: str) -> None:
     """
     Best-effort: salva cooldown num doc global pra sincronizar entre instâncias.
@@ -133,8 +137,9 @@ def _tts_google(*, text: str, lang: str = "pt-BR") -> bytes:
     Google Cloud Text-to-Speech. Saída MP3.
     """
     from google.cloud import texttospeech  # type: ignore
+    from services.speech_clients import get_tts_client
 
-    client = texttospeech.TextToSpeechClient()
+    client = get_tts_client()
 
     synthesis_input = texttospeech.SynthesisInput(text=text)
     # Preferir voz explícita (ex.: pt-BR-Neural2-B / pt-BR-Wavenet-B).
@@ -178,8 +183,9 @@ def _tts_google_owner_clone(*, text: str, voice_cloning_key: str, lang: str = "p
         from google.cloud import texttospeech_v1beta1 as texttospeech  # type: ignore
     except Exception:
         from google.cloud import texttospeech  # type: ignore
+    from services.speech_clients import get_tts_client
 
-    client = texttospeech.TextToSpeechClient()
+    client = get_tts_client(beta=True)
 
     synthesis_input = texttospeech.SynthesisInput(text=text)
     language_code = (os.getenv("TTS_LANGUAGE_CODE") or lang or "pt-BR").strip()
@@ -203,6 +209,63 @@ def _tts_google_owner_clone(*, text: str, voice_cloning_key: str, lang: str = "p
     return bytes(resp.audio_content or b"")
 
 
+def _institutional_mode() -> str:
+    raw_mode = (os.getenv("INSTITUTIONAL_GOOGLE_TTS_MODE") or "standard").strip().lower()
+    if raw_mode in ("", "default", "google", "google_standard"):
+        return "standard"
+    return raw_mode
+
+
+def institutional_voice_tag() -> str:
+    """
+    Identifica a voz que tts_institutional_bytes usaria agora (modo + voz Google + chave do
+    clone em hash) — entra na chave do cache de áudio, então trocar a configuração não
+    reaproveita áudio antigo. Nunca expõe a voice_cloning_key.
+    """
+    mode = _institutional_mode()
+    voice = (os.getenv("GOOGLE_TTS_VOICE") or "").strip()
+    lang = (os.getenv("TTS_LANGUAGE_CODE") or "pt-BR").strip()
+    if mode == "owner_clone":
+        import hashlib
+        key = (os.getenv("INSTITUTIONAL_GOOGLE_TTS_OWNER_CLONE_KEY") or "").strip()
+        return f"google_owner_clone:{lang}:{hashlib.sha256(key.encode()).hexdigest()[:12]}"
+    return f"google_{mode}:{lang}:{voice}"
+
+
+def _institutional_by_sentence(*, text: str, lang: str, mode: str, tel: Optional[dict]) -> bytes:
+    """
+    Caminho opcional (TTS_SENTENCE_CACHE=1): frases já faladas vêm do cache, só as novas vão
+    ao Google (em paralelo) e os segmentos são concatenados sem re-encode.
+    b"" → segue o fluxo normal (texto inteiro, com os fallbacks de sempre).
+    """
+    try:
+        from services import tts_sentences  # type: ignore
+    except Exception:
+        return b""
+    if not tts_sentences.enabled():
+        return b""
+
+    if mode == "owner_clone":
+        clone_key = (os.getenv("INSTITUTIONAL_GOOGLE_TTS_OWNER_CLONE_KEY") or "").strip()
+        if not clone_key:
+            return b""
+
+        def synth_one(sentence: str) -> bytes:
+            return _tts_google_owner_clone(text=sentence, voice_cloning_key=clone_key, lang=lang)
+    else:
+        def synth_one(sentence: str) -> bytes:
+            return _tts_google(text=sentence, lang=lang)
+
+    audio, info = tts_sentences.synthesize(
+        text,
+        voice_tag=f"{institutional_voice_tag()}|{lang}",
+        synth_one=synth_one,
+    )
+    if tel is not None:
+        tel["sentenceCache"] = info
+    return audio
+
+
 def tts_institutional_bytes(
     *,
     text: str,
@@ -228,11 +291,7 @@ def tts_institutional_bytes(
 
     tel = telemetry if isinstance(telemetry, dict) else None
 
-    raw_mode = (os.getenv("INSTITUTIONAL_GOOGLE_TTS_MODE") or "standard").strip().lower()
-    if raw_mode in ("", "default", "google", "google_standard"):
-        mode = "standard"
-    else:
-        mode = raw_mode
+    mode = _institutional_mode()
 
     fallback_reason = ""
 
@@ -253,6 +312,17 @@ def tts_institutional_bytes(
             except Exception:
                 pass
 
+    if mode in ("standard", "owner_clone"):
+        audio = _institutional_by_sentence(text=text, lang=lang, mode=mode, tel=tel)
+        if audio:
+            _record(
+                voice_mode=mode,
+                provider_effective="google_owner_clone" if mode == "owner_clone" else "google",
+                reason="",
+                ok=True,
+            )
+            return audio
+
     if mode not in ("standard", "owner_clone"):
         fallback_reason = "invalid_mode"
         audio = _tts_google(text=text, lang=lang)
@@ -0,0 +1,135 @@
+# services/tts_sentences.py
+# TTS por frase com cache (usado por tts_fallback.tts_institutional_bytes).
+#
+# - split_sentences: quebra em . ! ? … (e quebras de linha); fragmentos curtos
+#   (< TTS_SENTENCE_MIN_CHARS) são colados no vizinho para não picotar a entonação
+# - Cache em memória por (voz, frase normalizada): micro-cenas, CTAs e linhas de preço se
+#   repetem entre respostas → só as frases novas vão para o provedor
+# - Frases faltantes sintetizadas em paralelo (TTS_SENTENCE_WORKERS); segmentos juntados
+#   por services.audio_concat (MP3/Ogg sem re-encode)
+# - Qualquer frase vazia/erro ou concat impossível → b"" (chamador sintetiza o texto inteiro)
+
+from __future__ import annotations
+
+import os
+import re
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+
+from cache.lru import LRUCache
+from services import audio_concat
+from services.tts_cache import normalize_text
+
+logger = logging.getLogger("mei_robo.tts_sentences")
+
+_BOUNDARY = re.compile(r"(?<=[.!?…])\s+|\n+")
+
+_CACHE = LRUCache(
+    max_items=int(os.getenv("TTS_SENTENCE_CACHE_MAX", "4000") or 4000),
+    max_bytes=int(float(os.getenv("TTS_SENTENCE_CACHE_MAX_MB", "64") or 64) * 1024 * 1024),
+    default_ttl=float(os.getenv("TTS_SENTENCE_CACHE_TTL_SEC", "604800") or 604800),
+    name="tts.sentences",
+)
+_LOCK = threading.Lock()
+_STATS = {"requests": 0, "sentences": 0, "hits": 0, "synth": 0, "fallbacks": 0, "bytes_saved": 0}
+
+
+def enabled() -> bool:
+    return (os.getenv("TTS_SENTENCE_CACHE", "0") or "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _incr(name: str, n: int = 1) -> None:
+    with _LOCK:
+        _STATS[name] += n
+
+
+def split_sentences(text: str, min_chars: int = 0) -> List[str]:
+    min_chars = min_chars or int(os.getenv("TTS_SENTENCE_MIN_CHARS", "24") or 24)
+    out: List[str] = []
+    for part in _BOUNDARY.split(text or ""):
+        part = normalize_text(part)
+        if not part:
+            continue
+        if out and len(out[-1]) < min_chars:
+            out[-1] = f"{out[-1]} {part}"
+        else:
+            out.append(part)
+    if len(out) > 1 and len(out[-1]) < min_chars:
+        tail = out.pop()
+        out[-1] = f"{out[-1]} {tail}"
+    return out
+
+
+def _key(voice_tag: str, sentence: str) -> str:
+    return hashlib.sha256(f"{voice_tag}\n{sentence}".encode("utf-8")).hexdigest()
+
+
+def synthesize(text: str, *, voice_tag: str, synth_one: Callable[[str], bytes],
+               workers: int = 0) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Áudio do texto montado frase a frase. Retorna (bytes, info); bytes vazio quando o texto
+    tem uma frase só ou algo falhou — nesse caso nada novo entra no cache.
+    """
+    sentences = split_sentences(text)
+    info: Dict[str, Any] = {"sentences": len(sentences), "hits": 0, "synth": 0}
+    if len(sentences) < 2:
+        return b"", info
+    _incr("requests")
+    _incr("sentences", len(sentences))
+
+    keys = [_key(voice_tag, s) for s in sentences]
+    segs: Dict[str, bytes] = {}
+    for k in keys:
+        hit = _CACHE.get(k)
+        if hit is not None:
+            segs[k] = hit
+    missing = {k: s for k, s in zip(keys, sentences) if k not in segs}
+    info["hits"] = sum(1 for k in keys if k not in missing)
+    info["synth"] = len(missing)
+
+    if missing:
+        n = max(1, min(len(missing), workers or int(os.getenv("TTS_SENTENCE_WORKERS", "4") or 4)))
+        try:
+            with ThreadPoolExecutor(max_workers=n, thread_name_prefix="tts-sent") as ex:
+                fresh = dict(zip(missing.keys(), ex.map(synth_one, missing.values())))
+        except Exception as e:
+            logger.info("[tts_sentences] síntese falhou: %s", e)
+            fresh = {}
+        if len(fresh) != len(missing) or not all(fresh.values()):
+            _incr("fallbacks")
+            info["reason"] = "sentence_synth_failed"
+            return b"", info
+        segs.update(fresh)
+
+    try:
+        audio = audio_concat.concat([segs[k] for k in keys])
+    except ValueError as e:
+        _incr("fallbacks")
+        info["reason"] = f"concat_failed:{e}"
+        return b"", info
+
+    for k in missing:
+        _CACHE.set(k, segs[k])
+    _incr("hits", info["hits"])
+    _incr("synth", info["synth"])
+    _incr("bytes_saved", sum(len(segs[k]) for k in keys if k not in missing))
+    return audio, info
+
+
+def stats() -> Dict[str, Any]:
+    with _LOCK:
+        out = dict(_STATS)
+    total = out["hits"] + out["synth"]
+    out["hit_ratio"] = round(out["hits"] / total, 4) if total else 0.0
+    out["cache"] = _CACHE.stats()
+    return out
+
+
+def clear() -> None:
+    _CACHE.clear()
+    with _LOCK:
+        for k in _STATS:
+            _STATS[k] = 0
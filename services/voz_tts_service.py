@@ -0,0 +1,144 @@
+# services/voz_tts_service.py
+# TTS em processo (mesma semântica do POST /api/voz/tts, sem HTTP de loopback).
+#
+# - synthesize(text, voice_id): valida (VOZ_V2_ENABLED, texto vazio, VOZ_TTS_MAX_CHARS), resolve
+#   a voz (argumento → ELEVEN_VOICE_ID) e chama services.tts_fallback.tts_bytes
+#   (ElevenLabs → Google com cooldown). Saída sempre audio/mpeg, como a rota
+# - Falhas viram TTSError(error, status) com o mesmo código/HTTP status que a rota devolvia
+# - Limite de concorrência (VOZ_TTS_MAX_CONCURRENCY): síntese ocupa uma vaga; quem esperar mais
+#   que VOZ_TTS_QUEUE_TIMEOUT_SEC recebe "tts_busy" (503) em vez de prender a thread do gunicorn
+# - stats(): em andamento, fila, rejeitados, erros e latência média
+
+from __future__ import annotations
+
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from services.tts_fallback import tts_bytes as _tts_bytes  # type: ignore
+except Exception:
+    _tts_bytes = None
+
+logger = logging.getLogger("mei_robo.voz_tts_service")
+
+AUDIO_MIME = "audio/mpeg"
+
+
+class TTSError(Exception):
+    def __init__(self, error: str, status: int = 502, detail: str = "", **extra: Any):
+        super().__init__(detail or error)
+        self.error = error
+        self.status = int(status)
+        self.detail = detail
+        self.extra = extra
+
+    def to_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"ok": False, "error": self.error}
+        if self.detail:
+            out["detail"] = self.detail
+        out.update(self.extra)
+        return out
+
+
+def _env_true(v: str) -> bool:
+    return str(v or "").strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, str(default)) or default)
+    except Exception:
+        return default
+
+
+def enabled() -> bool:
+    return _env_true(os.environ.get("VOZ_V2_ENABLED", "true"))
+
+
+def max_chars() -> int:
+    return _env_int("VOZ_TTS_MAX_CHARS", 1000)
+
+
+# ---------- limitador ----------
+_LIMIT = max(1, _env_int("VOZ_TTS_MAX_CONCURRENCY", 4))
+_SLOTS = threading.BoundedSemaphore(_LIMIT)
+_LOCK = threading.Lock()
+_STATS = {"calls": 0, "ok": 0, "errors": 0, "rejected": 0, "in_flight": 0, "waiting": 0, "ms_total": 0.0}
+
+
+def _incr(name: str, n: float = 1) -> None:
+    with _LOCK:
+        _STATS[name] += n
+
+
+def _acquire() -> None:
+    timeout = float(os.environ.get("VOZ_TTS_QUEUE_TIMEOUT_SEC", "10") or 10)
+    _incr("waiting")
+    try:
+        got = _SLOTS.acquire(timeout=max(0.0, timeout))
+    finally:
+        _incr("waiting", -1)
+    if not got:
+        _incr("rejected")
+        raise TTSError("tts_busy", 503, limit=_LIMIT)
+    _incr("in_flight")
+
+
+def _release() -> None:
+    _incr("in_flight", -1)
+    _SLOTS.release()
+
+
+# ---------- API ----------
+def resolve_voice(voice_id: Optional[str]) -> Optional[str]:
+    v = (voice_id or os.environ.get("ELEVEN_VOICE_ID") or "").strip()
+    return v or None
+
+
+def synthesize(text: str, voice_id: Optional[str] = None) -> Tuple[bytes, str]:
+    """
+    (audio_bytes, "audio/mpeg") para o texto, ou TTSError com o código da rota:
+    feature_disabled 403 · missing_text 400 · text_too_long 413 · tts_fallback_unavailable 500 ·
+    tts_busy 503 · tts_failed / empty_audio 502.
+    """
+    if not enabled():
+        raise TTSError("feature_disabled", 403)
+    text = (text or "").strip()
+    if not text:
+        raise TTSError("missing_text", 400)
+    limit = max_chars()
+    if len(text) > limit:
+        raise TTSError("text_too_long", 413, limit=limit)
+    if _tts_bytes is None:
+        raise TTSError("tts_fallback_unavailable", 500)
+
+    _incr("calls")
+    _acquire()
+    t0 = time.perf_counter()
+    try:
+        audio = _tts_bytes(text=text, voice_id=resolve_voice(voice_id))
+    except Exception as e:
+        _incr("errors")
+        logger.exception("TTS fallback failed: %s", e)
+        raise TTSError("tts_failed", 502, detail=str(e))
+    finally:
+        _incr("ms_total", (time.perf_counter() - t0) * 1000)
+        _release()
+
+    if not audio:
+        _incr("errors")
+        raise TTSError("empty_audio", 502)
+    _incr("ok")
+    return bytes(audio), AUDIO_MIME
+
+
+def stats() -> Dict[str, Any]:
+    with _LOCK:
+        out = dict(_STATS)
+    done = out["ok"] + out["errors"]
+    out["avg_ms"] = round(out.pop("ms_total") / done, 1) if done else 0.0
+    out["limit"] = _LIMIT
+    return out
@@ -3551,7 +3551,7 @@ def reply_to_text(uid: str, text: str, ctx: Optional[Dict[str, Any]] = None) ->
         """
         Regra de produto: inbound em áudio => responder em áudio (best-effort).
         - Se já existe audioUrl, não mexe.
-        - Tenta voz do MEI (uid) via /api/voz/tts (se voiceId existir).
+        - Tenta voz do MEI (uid) via TTS em processo (se voiceId existir).
         - Fallback: TTS institucional (gera signed URL).
         """
         # 🔴 REGRA SOBERANA: fechamento comercial nunca vira áudio
@@ -3588,31 +3588,14 @@ def reply_to_text(uid: str, text: str, ctx: Optional[Dict[str, Any]] = None) ->
 
             if voice_id:
                 try:
-                    import requests  # local import (não quebra se faltar)
-                    base = (os.environ.get("BACKEND_BASE_URL") or os.environ.get("BACKEND_BASE") or "").strip().rstrip("/")
-                    if not base:
-                        base = (os.environ.get("RENDER_EXTERNAL_URL") or "").strip().rstrip("/")
-                    if not base:
-                        try:
-                            from flask import request  # type: ignore
-                            base = (request.host_url or "").strip().rstrip("/")
-                        except Exception:
-                            base = ""
-
-                    if base:
-                        r = requests.post(
-                            f"{base}/api/voz/tts",
-                            json={"text": t, "voice_id": voice_id, "reason": "inbound_audio"},
-                            timeout=25,
-                        )
-                        if r.status_code == 200:
-                            j = r.json() or {}
-                            url = (j.get("audioUrl") or j.get("url") or "").strip()
-                            if url:
-                                out["audioUrl"] = url
-                                out.setdefault("audioDebug", {})
-                                out["audioDebug"].update({"ok": True, "mode": "mei"})
-                                return
+                    # TTS em processo (sem loopback HTTP para /api/voz/tts)
+                    from services.institutional_tts_media import generate_voice_audio_url
+                    url = (generate_voice_audio_url(t, voice_id, mode="voice") or "").strip()
+                    if url:
+                        out["audioUrl"] = url
+                        out.setdefault("audioDebug", {})
+                        out["audioDebug"].update({"ok": True, "mode": "mei"})
+                        return
                 except Exception:
                     # cai pro institucional
                     pass
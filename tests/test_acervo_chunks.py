@@ -0,0 +1,99 @@
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from services import acervo_chunks as ch  # noqa: E402
+from domain import acervo as dom  # noqa: E402
+
+
+def _text(n_par=40, seed=3):
+    rnd = random.Random(seed)
+    words = ["corte", "barba", "preço", "horário", "pacote", "escova", "unha", "cliente", "agenda"]
+    return "\n\n".join(
+        ". ".join(" ".join(rnd.choice(words) for _ in range(rnd.randint(5, 12))) for _ in range(4)) + "."
+        for _ in range(n_par)
+    )
+
+
+def test_split_chunks_covers_text_with_overlap_on_boundaries():
+    text = _text()
+    spans = ch.split_chunks(text, size=500, overlap=100)
+    assert spans[0][0] == 0 and spans[-1][1] == len(text)
+    for (s0, e0), (s1, e1) in zip(spans, spans[1:]):
+        assert s1 < e0 and e0 - s1 <= 100  # sobreposição limitada
+        assert e0 - s0 <= 500
+        assert text[e0 - 1] in " \n." or e0 == len(text)  # fecha em espaço/frase
+        assert s1 == 0 or text[s1 - 1] in " \n"  # começa numa palavra
+    assert len(ch.split_chunks(text, size=500, overlap=100, limit=3)) == 3
+    src = ch.summary_source(text, spans, 1500)
+    assert len(src) <= 1500 + 20 and text[spans[0][0]:spans[0][1]].strip() in src
+
+
+def test_sidecar_roundtrip_float16_and_best_chunks(monkeypatch):
+    rnd = random.Random(5)
+    text = _text(12)
+    spans = ch.split_chunks(text, size=300, overlap=50)
+    vecs = [[rnd.gauss(0, 1) for _ in range(16)] for _ in spans]
+    raw = ch.build_sidecar(text, spans, vecs, "m").decode("utf-8")
+    assert '"embedding"' not in raw and len(raw) < len(text) * 2 + len(spans) * 16 * 3
+    cs = ch.ChunkSet.parse(raw)
+    target = len(spans) // 2
+    best = cs.best(vecs[target], k=2)
+    assert best[0][1] == target and abs(best[0][0] - 1.0) < 2e-3
+    monkeypatch.setattr(ch, "_np", None)  # sem NumPy: mesmo resultado
+    assert ch.ChunkSet.parse(raw).best(vecs[target], k=2)[0][1] == target
+    lex = cs.best(None, "qual o preco da escova?", k=1)  # sem embedding: termos
+    assert lex and lex[0][0] >= 1
+
+
+def test_query_returns_best_chunks_for_chunked_docs(monkeypatch):
+    ch._SETS.clear()
+    text = "Intro sobre o salão. " * 30 + "A tabela de preços: corte custa 40 reais. " + "Outros assuntos gerais. " * 30
+    spans = ch.split_chunks(text, size=300, overlap=60)
+    hit = next(i for i, (s, e) in enumerate(spans) if "corte custa" in text[s:e])
+    vecs = [[1.0, 0.0] if i == hit else [0.0, 1.0] for i in range(len(spans))]
+    store = {"profissionais/u1/acervo/_chunks/a.json": ch.build_sidecar(text, spans, vecs).decode()}
+    fetched = []
+
+    def download(path, max_bytes=0, encoding="utf-8", generation=None):
+        fetched.append((path, generation))
+        return store.get(path)
+
+    items = [{"id": "a", "titulo": "Tabela", "tags": ["corte"], "prioridade": 1, "habilitado": True,
+              "chunkCount": len(spans), "chunksPath": "profissionais/u1/acervo/_chunks/a.json",
+              "chunksGeneration": 9, "storageConsultaPath": "profissionais/u1/acervo/consulta/a.md"}]
+    monkeypatch.setattr(dom, "acervo_index", None)
+    monkeypatch.setattr(dom, "_load_acervo_docs", lambda uid, fields=None: [dict(it) for it in items])
+    monkeypatch.setattr(dom, "get_mini_embedding", lambda text: [0.9, 0.1])
+    monkeypatch.setattr(dom, "gpt_mini_complete", None)
+    monkeypatch.setattr(dom, "download_text_by_gcs_path", download)
+    out = dom.query_acervo_for_uid("u1", "preço do corte")
+    assert out["usedDocs"][0]["chunks"][0] in (hit, hit - 1, hit + 1) and hit in out["usedDocs"][0]["chunks"]
+    assert "corte custa 40 reais" in out["context"]
+    assert fetched == [("profissionais/u1/acervo/_chunks/a.json", 9)]  # .md do doc não é baixado
+    dom.query_acervo_for_uid("u1", "preço do corte")
+    assert len(fetched) == 1  # sidecar parseado em cache
+
+
+def test_embeddings_are_batched(monkeypatch):
+    emb = pytest.importorskip("services.embeddings")
+    calls = []
+
+    class _Embedding:
+        @staticmethod
+        def create(model, input):
+            calls.append(list(input))
+            return {"data": [{"index": i, "embedding": [float(len(t))]} for i, t in reversed(list(enumerate(input)))]}
+
+    monkeypatch.setenv("OPENAI_API_KEY", "k")
+    monkeypatch.setenv("ACERVO_EMBED_BATCH", "4")
+    monkeypatch.setattr(emb.openai, "Embedding", _Embedding)
+    texts = ["x" * (i + 1) for i in range(10)]
+    assert emb.get_mini_embeddings(texts) == [[float(i + 1)] for i in range(10)]
+    assert [len(c) for c in calls] == [4, 4, 2]
@@ -0,0 +1,185 @@
+import random
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from services import acervo_index as ai  # noqa: E402
+from domain import acervo as dom  # noqa: E402
+
+
+class _Snap:
+    def __init__(self, doc_id, data):
+        self.id, self._data = doc_id, data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class _Ref:
+    def __init__(self, db, path):
+        self.db, self.path = db, path
+
+    def get(self):
+        return _Snap(self.path.rsplit("/", 1)[-1], self.db.docs.get(self.path))
+
+    def set(self, body, merge=False):
+        if self.db.on_set:
+            self.db.on_set()
+        cur = self.db.docs.setdefault(self.path, {})
+        for k, v in body.items():
+            cur[k] = (cur.get(k) or 0) + v.value if hasattr(v, "value") else v
+
+    def collection(self, name):
+        return _Col(self.db, f"{self.path}/{name}")
+
+
+class _Col:
+    def __init__(self, db, prefix, fields=None):
+        self.db, self.prefix, self.fields = db, prefix, fields
+
+    def document(self, doc_id):
+        return _Ref(self.db, f"{self.prefix}/{doc_id}")
+
+    def select(self, fields):
+        return _Col(self.db, self.prefix, list(fields))
+
+    def order_by(self, *a, **kw):
+        return self
+
+    def limit(self, n):
+        return self
+
+    def stream(self):
+        self.db.streams += 1
+        out = []
+        for path in sorted(self.db.docs):
+            if path.rsplit("/", 1)[0] == self.prefix:
+                data = self.db.docs[path]
+                if self.fields:
+                    data = {k: v for k, v in data.items() if k in self.fields}
+                out.append(_Snap(path.rsplit("/", 1)[-1], data))
+        return out
+
+
+class FakeDb:
+    def __init__(self):
+        self.docs, self.streams = {}, 0
+        self.on_set = None
+
+    def collection(self, name):
+        return _Col(self, name)
+
+
+def _seed(n=30, dim=8, seed=7):
+    rnd = random.Random(seed)
+    db = FakeDb()
+    words = ["corte", "barba", "preço", "horário", "endereço", "pacote", "escova", "unha"]
+    for i in range(n):
+        doc = {"titulo": f"{rnd.choice(words)} {rnd.choice(words)}", "tags": [rnd.choice(words)], "prioridade": rnd.randint(1, 3)}
+        if i % 5 != 4:  # alguns sem embedding, um com dimensão errada
+            doc["embedding"] = [rnd.uniform(-1, 1) for _ in range(dim if i != 3 else dim + 1)]
+        db.docs[f"profissionais/u1/acervo/d{i:02d}"] = doc
+    db.docs["profissionais/u1/acervoMeta/meta"] = {"version": 1}
+    return db, rnd
+
+
+def _fresh():
+    ai._INDEXES.clear()
+    ai._VERSIONS.clear()
+
+
+def test_matrix_cosine_matches_pure_python():
+    db, rnd = _seed()
+    docs = [dict(d, id=p.rsplit("/", 1)[-1]) for p, d in sorted(db.docs.items()) if "/acervo/" in p]
+    idx = ai.AcervoIndex.from_items("u1", 1, docs)
+    q = [rnd.uniform(-1, 1) for _ in range(8)]
+    got = idx.cosine(q)
+    for g, d in zip(got, docs):
+        assert abs(g - dom._cosine(q, d.get("embedding") or [])) < 1e-5
+    assert idx.stats()["vectors"] == 23 and all("embedding" not in it for it in idx.items)
+    assert idx.cosine([1.0, 2.0]) == [0.0] * len(docs)  # dimensão diferente
+
+
+def test_index_cached_per_version(monkeypatch):
+    _fresh()
+    db, _ = _seed()
+    load = lambda fields=None: dom._load_acervo_docs("u1", fields)  # noqa: E731
+    monkeypatch.setattr(dom, "db", db)
+    a = ai.get("u1", db, load)
+    assert ai.get("u1", db, load) is a and db.streams == 1
+    db.docs["profissionais/u1/acervoMeta/meta"] = {"version": 2}
+    ai._VERSIONS.clear()  # TTL da versão vencido
+    b = ai.get("u1", db, load)
+    assert b is not a and b.version == 2 and db.streams == 2
+
+
+def test_npz_cold_load_skips_embeddings(monkeypatch):
+    _fresh()
+    db, rnd = _seed()
+    store = {}
+
+    class _Blob:
+        def __init__(self, key):
+            self.key = key
+
+        def upload_from_string(self, data, content_type=None):
+            store[self.key] = data
+
+        def download_as_bytes(self):
+            return store[self.key]
+
+    monkeypatch.setenv("ACERVO_INDEX_GCS", "1")
+    monkeypatch.setenv("STORAGE_BUCKET", "b")
+    monkeypatch.setattr(ai, "_blob", lambda uid, v: _Blob((uid, v)))
+    monkeypatch.setattr(dom, "db", db)
+    seen = []
+
+    def load(fields=None):
+        seen.append(fields)
+        return dom._load_acervo_docs("u1", fields)
+
+    warm = ai.get("u1", db, load)
+    assert ("u1", 1) in store and seen == [None]
+    _fresh()
+    cold = ai.get("u1", db, load)
+    assert cold.source == "gcs" and seen[-1] == ai.META_FIELDS
+    q = [rnd.uniform(-1, 1) for _ in range(8)]
+    assert max(abs(a - b) for a, b in zip(cold.cosine(q), warm.cosine(q))) < 1e-6
+
+
+def test_query_uses_index_and_hybrid_ranking(monkeypatch):
+    _fresh()
+    db = FakeDb()
+    db.docs["profissionais/u1/acervoMeta/meta"] = {"version": 1}
+    db.docs["profissionais/u1/acervo/a"] = {"titulo": "Preços de corte", "tags": ["corte"], "prioridade": 2,
+                                            "embedding": [1.0, 0.0]}
+    db.docs["profissionais/u1/acervo/b"] = {"titulo": "Horário de atendimento", "tags": [], "prioridade": 2,
+                                            "embedding": [0.0, 1.0]}
+    db.docs["profissionais/u1/acervo/c"] = {"titulo": "Tabela", "tags": ["valores"], "prioridade": 2,
+                                            "embedding": [0.9, 0.1]}
+    db.docs["profissionais/u1/acervo/d"] = {"titulo": "Preço antigo", "habilitado": False, "embedding": [1.0, 0.0]}
+    monkeypatch.setattr(dom, "db", db)
+    monkeypatch.setattr(dom, "get_mini_embedding", lambda text: [1.0, 0.05])
+    monkeypatch.setattr(dom, "gpt_mini_complete", None)
+    monkeypatch.setattr(dom, "download_text_by_gcs_path", None)
+    out = dom.query_acervo_for_uid("u1", "qual o preco do corte?")
+    # a: termo + semântica; c: só semântica (sem termo em comum); b e d ficam de fora
+    assert [d["id"] for d in out["usedDocs"]] == ["a", "c"]
+    streams = db.streams
+    dom.query_acervo_for_uid("u1", "corte")
+    assert db.streams == streams  # segunda pergunta não relê o acervo
+
+
+def test_bump_increments_before_dropping_cached_version():
+    ai._VERSIONS.clear()
+    db = FakeDb()
+    db.docs["profissionais/u9/acervoMeta/meta"] = {"version": 4}
+    assert ai.get_version("u9", db) == 4
+    # leitura concorrente enquanto o Increment está em voo: vê (e cacheia) a versão antiga
+    db.on_set = lambda: ai.get_version("u9", db)
+    ai.bump_version("u9", db)
+    assert ai.get_version("u9", db) == 5
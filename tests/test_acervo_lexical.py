@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from services import acervo_lexical as lx  # noqa: E402
+
+
+def test_fold_tokens_strips_accents_stopwords_and_plurals():
+    assert lx.fold_tokens("Quais são as OPÇÕES de pagamento do Salão?") == ["opcao", "pagamento", "salao"]
+    assert lx.fold_tokens("cortes e escovas") == ["corte", "escova"]
+    assert lx.fold_tokens("") == []
+
+
+def test_bm25_prefers_rare_terms_and_shorter_docs():
+    items = [
+        {"titulo": "Corte masculino", "tags": ["corte"], "resumoCurto": "corte degradê e navalhado"},
+        {"titulo": "Corte feminino", "tags": [], "resumoCurto": "corte, escova e hidratação"},
+        {"titulo": "Estacionamento", "tags": ["endereço"], "resumoCurto": "estacionamento conveniado ao lado"},
+    ]
+    idx = lx.Bm25Index.from_items(items)
+    s = idx.score("tem estacionamento para o corte?")
+    assert s[2] > s[0] > 0 and s[2] > s[1] > 0  # termo raro vale mais que termo comum
+    assert lx.Bm25Index.from_items([]).score("corte") == []
+
+
+def test_ranks_and_rrf():
+    a = lx.ranks([0.0, 3.0, 1.0])
+    b = lx.ranks([0.9, 0.2, 0.5], min_score=0.3)
+    assert a == {1: 1, 2: 2} and b == {0: 1, 2: 2}
+    fused = lx.rrf([a, b], k=60)
+    assert max(fused, key=fused.get) == 2  # segundo lugar nas duas listas vence primeiro lugar em uma só
@@ -0,0 +1,114 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from services import acervo_index as ai  # noqa: E402
+from services import acervo_query_cache as qc  # noqa: E402
+from domain import acervo as dom  # noqa: E402
+
+
+class _Snap:
+    def __init__(self, doc_id, data):
+        self.id, self._data = doc_id, data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class _Ref:
+    def __init__(self, db, path):
+        self.db, self.path = db, path
+
+    def get(self):
+        return _Snap(self.path.rsplit("/", 1)[-1], self.db.docs.get(self.path))
+
+    def set(self, body, merge=False):
+        pass  # Increment do bump: versão controlada pelo teste
+
+    def collection(self, name):
+        return _Col(self.db, f"{self.path}/{name}")
+
+
+class _Col:
+    def __init__(self, db, prefix):
+        self.db, self.prefix = db, prefix
+
+    def document(self, doc_id):
+        return _Ref(self.db, f"{self.prefix}/{doc_id}")
+
+    def order_by(self, *a, **kw):
+        return self
+
+    def limit(self, n):
+        return self
+
+    def stream(self):
+        return [_Snap(p.rsplit("/", 1)[-1], d) for p, d in sorted(self.db.docs.items())
+                if p.rsplit("/", 1)[0] == self.prefix]
+
+
+class FakeDb:
+    def __init__(self):
+        self.docs = {}
+
+    def collection(self, name):
+        return _Col(self, name)
+
+
+def _setup(monkeypatch):
+    qc.clear()
+    ai._INDEXES.clear()
+    ai._VERSIONS.clear()
+    db = FakeDb()
+    db.docs["profissionais/u1/acervoMeta/meta"] = {"version": 1}
+    db.docs["profissionais/u1/acervo/a"] = {"titulo": "Preço do corte", "tags": ["corte"], "resumoCurto": "Corte R$ 40",
+                                            "prioridade": 1, "embedding": [1.0, 0.0]}
+    calls = {"emb": 0, "llm": 0}
+
+    def emb(text):
+        calls["emb"] += 1
+        return [1.0, 0.1]
+
+    def llm(prompt, max_tokens=120):
+        calls["llm"] += 1
+        return f"resposta {calls['llm']}"
+
+    monkeypatch.setattr(dom, "db", db)
+    monkeypatch.setattr(dom, "get_mini_embedding", emb)
+    monkeypatch.setattr(dom, "gpt_mini_complete", llm)
+    monkeypatch.setattr(dom, "download_text_by_gcs_path", None)
+    return db, calls
+
+
+def test_repeated_question_served_from_cache_until_version_changes(monkeypatch):
+    db, calls = _setup(monkeypatch)
+    first = dom.query_acervo_for_uid("u1", "Qual o preço do corte?")
+    assert first["answer"] == "resposta 1" and calls == {"emb": 1, "llm": 1}
+    again = dom.query_acervo_for_uid("u1", "  qual o PRECO do corte ")
+    assert again == first and calls == {"emb": 1, "llm": 1}
+    again["usedDocs"].clear()  # cópia: não corrompe o cache
+    assert dom.query_acervo_for_uid("u1", "qual o preço do corte")["usedDocs"]
+    dom.query_acervo_for_uid("u1", "qual o preço do corte", max_tokens=60)
+    assert calls["llm"] == 2 and calls["emb"] == 1  # max_tokens na chave; embedding reaproveitado
+
+    db.docs["profissionais/u1/acervoMeta/meta"] = {"version": 2}
+    ai._VERSIONS.clear()  # outra instância fez bump; TTL da versão vencido
+    assert dom.query_acervo_for_uid("u1", "qual o preço do corte")["answer"] == "resposta 3"
+    st = qc.stats("u1")["uid"]
+    assert st["ans_hits"] == 2 and st["ans_misses"] == 3 and st["ans_hit_ratio"] == 0.4
+    assert st["emb_hits"] == 2 and st["emb_misses"] == 1
+
+
+def test_llm_errors_are_not_cached_and_bump_drops_uid_entries(monkeypatch):
+    db, calls = _setup(monkeypatch)
+    monkeypatch.setattr(dom, "gpt_mini_complete", lambda prompt, max_tokens=120: "")
+    assert dom.query_acervo_for_uid("u1", "preço do corte")["reason"] == "llm_error"
+    assert qc.stats()["answers"]["items"] == 0
+    qc.put_answer("u1", "x", 1, 120, {"reason": "ok", "answer": "a", "usedDocs": []})
+    qc.put_answer("u2", "x", 1, 120, {"reason": "ok", "answer": "b", "usedDocs": []})
+    ai.bump_version("u1", db)
+    assert qc.get_answer("u1", "x", 1, 120) is None and qc.get_answer("u2", "x", 1, 120)["answer"] == "b"
@@ -0,0 +1,84 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from services import acervo_text_cache as tc  # noqa: E402
+from domain import acervo as dom  # noqa: E402
+
+
+def _setup(monkeypatch, tmp_path, max_mb="1"):
+    monkeypatch.setenv("ACERVO_TEXT_DISK_DIR", str(tmp_path))
+    monkeypatch.setenv("ACERVO_TEXT_DISK_MAX_MB", max_mb)
+    tc.clear()
+
+
+def test_misses_fetched_in_parallel_then_memory_then_disk(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path)
+    calls, active, peak, lock = [], [0], [0], threading.Lock()
+
+    def fetch(path, gen):
+        with lock:
+            calls.append((path, gen))
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return f"texto {path}@{gen}" if "x" not in path else None
+
+    keys = [(f"profissionais/u1/acervo/consulta/d{i}.md", 7) for i in range(4)]
+    out = tc.get_many(keys + [("profissionais/u1/acervo/consulta/x.md", 7)], fetch)
+    assert out[keys[0]] == "texto profissionais/u1/acervo/consulta/d0.md@7"
+    assert len(calls) == 5 and peak[0] > 1
+    tc.get_many(keys, fetch)
+    assert len(calls) == 5  # memória
+    tc._MEM.clear()
+    assert tc.get(*keys[1], fetch) == "texto profissionais/u1/acervo/consulta/d1.md@7"
+    assert len(calls) == 5 and tc.stats()["disk"]["disk_hits"] == 1
+    tc.get(keys[1][0], 8, fetch)  # nova geração → nova leitura
+    assert calls[-1] == (keys[1][0], 8)
+    tc.get("profissionais/u1/acervo/consulta/x.md", 7, fetch)  # None não é cacheado
+    assert calls[-1][0].endswith("x.md")
+
+
+def test_invalidate_uid_and_disk_bound(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path, max_mb="0.01")  # ~10 KB
+    fetch = lambda path, gen: "a" * 3000  # noqa: E731
+    for i in range(6):
+        tc.get(f"profissionais/u1/acervo/consulta/d{i}.md", 1, fetch)
+    tc.get("profissionais/u2/acervo/consulta/d0.md", 1, fetch)
+    total = sum(f.stat().st_size for f in tmp_path.rglob("*.txt"))
+    assert total <= 10486 and tc.stats()["disk"]["disk_evictions"] > 0
+    assert tc.invalidate_uid("u1") == 6
+    assert tc._MEM.get(("profissionais/u2/acervo/consulta/d0.md", 1)) is not None
+    tc._MEM.clear()
+    seen = []
+    tc.get("profissionais/u1/acervo/consulta/d5.md", 1, lambda p, g: seen.append(p) or "novo")
+    assert seen  # nem memória nem disco depois da invalidação
+
+
+def test_magrinho_uses_generation_then_version(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path)
+    got = []
+
+    def download(path, max_bytes=0, encoding="utf-8", generation=None):
+        got.append((path, generation))
+        return f"  conteúdo de {path}  "
+
+    monkeypatch.setattr(dom, "download_text_by_gcs_path", download)
+    items = [
+        {"id": "a", "storageConsultaPath": "profissionais/u1/acervo/consulta/a.md", "storageConsultaGeneration": 11},
+        {"id": "b", "storageConsultaPath": "profissionais/u1/acervo/consulta/b.md"},
+    ]
+    texts = dom._consulta_texts(items, version=3)
+    assert sorted(got) == [("profissionais/u1/acervo/consulta/a.md", 11), ("profissionais/u1/acervo/consulta/b.md", None)]
+    assert dom._build_magrinho_for_item(items[1], texts, 3) == "conteúdo de profissionais/u1/acervo/consulta/b.md"
+    dom._consulta_texts(items, version=3)
+    assert len(got) == 2
+    dom._consulta_texts(items[1:], version=4)  # bump da versão → chave nova
+    assert len(got) == 3
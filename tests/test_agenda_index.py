@@ -0,0 +1,259 @@
+import random
+import sys
+import types
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+repo = pytest.importorskip("services.agenda_repo")
+from services import agenda_index  # noqa: E402
+
+_OPS = {
+    ">=": lambda a, b: a >= b,
+    "<=": lambda a, b: a <= b,
+    "<": lambda a, b: a < b,
+    "in": lambda a, b: a in b,
+}
+
+
+class _Snap:
+    def __init__(self, doc_id, data):
+        self.id, self._data = doc_id, data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class _Col:
+    def __init__(self, db, filters=()):
+        self.db, self.filters = db, list(filters)
+
+    def where(self, field, op, value):
+        return _Col(self.db, self.filters + [(field, op, value)])
+
+    def stream(self):
+        self.db.queries += 1
+        return [
+            _Snap(k, d) for k, d in self.db.events.items()
+            if all(f in d and _OPS[op](d[f], v) for f, op, v in self.filters)
+        ]
+
+
+class _Meta:
+    """profissionais/{uid}/agendaMeta/meta (versão compartilhada entre instâncias)."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def document(self, _name):
+        return self
+
+    def get(self):
+        self.db.meta_reads += 1
+        return types.SimpleNamespace(exists=True, to_dict=lambda: {"version": self.db.version})
+
+    def set(self, body, merge=False):
+        self.db.version += body["version"].value
+
+
+class _Db:
+    def __init__(self, events):
+        self.events, self.queries = events, 0
+        self.version, self.meta_reads = 0, 0
+
+    def collection(self, name):
+        if name == "agendaMeta":
+            return _Meta(self)
+        return self if name == "profissionais" else _Col(self)
+
+    def document(self, _uid):
+        return self
+
+
+def _random_event(rnd, today):
+    d = today + timedelta(days=rnd.randint(-1, 12))
+    ev = {
+        "date": d.strftime("%Y-%m-%d"),
+        "hhmm": f"{rnd.randint(6, 23):02d}:{rnd.choice([0, 5, 15, 30, 50]):02d}",
+        "status": rnd.choice(["agendado", "agendado", "reagendar", "cancelado"]),
+    }
+    if rnd.random() < 0.7:
+        ev["duration_min"] = rnd.choice([15, 30, 60, 120])
+    return ev
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+@pytest.mark.parametrize("seed", range(10))
+def test_incremental_index_matches_rebuild_and_find_slots(monkeypatch, seed, use_numpy):
+    rnd = random.Random(seed)
+    tz = repo._tz("America/Sao_Paulo")
+    now = tz.localize(datetime(2026, 3, 2, 8, 0))
+    today = now.date()
+
+    class _Dt(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now
+
+    events = {f"e{i}": _random_event(rnd, today) for i in range(30)}
+    db = _Db(events)
+    if not use_numpy:
+        monkeypatch.setattr(agenda_index, "_np", None)
+        monkeypatch.setattr(repo, "_np", None)
+    monkeypatch.setattr(repo, "datetime", _Dt)
+    monkeypatch.setattr(agenda_index, "datetime", _Dt)
+    monkeypatch.setattr(repo, "_get_db", lambda: db)
+    buffer_min = rnd.choice([0, 10])
+    monkeypatch.setattr(repo, "_safe_rules_for", lambda uid: {
+        "step_minutes": 15, "buffer_minutes": buffer_min, "min_lead_days": 0, "max_lead_days": 30,
+        "allow_same_day": True, "allow_weekend": True, "working_days": [1, 2, 3, 4, 5, 6, 7],
+        "working_hours": {"start": "08:00", "end": "23:30"},
+    })
+    monkeypatch.setattr(repo, "_get_duration_min_for_service", lambda uid, sid: 45)
+    uid = f"u{seed}{use_numpy}"
+    agenda_index.invalidate(uid)
+
+    req = {"uid": uid, "service_id": "s", "window_start": today.strftime("%Y-%m-%d"), "window_days": 10}
+    repo.find_slots(req)  # constrói o índice
+    assert agenda_index.get(uid, "America/Sao_Paulo", lambda: db) is not None
+
+    # escritas incrementais (create/update/cancel), sem rebuild
+    for i in range(40):
+        op = rnd.choice(["create", "update", "cancel"])
+        if op == "create" or not events:
+            doc_id = f"n{i}"
+        else:
+            doc_id = rnd.choice(sorted(events))
+        if op == "cancel":
+            events[doc_id] = dict(events.get(doc_id) or _random_event(rnd, today), status="cancelado")
+        else:
+            events[doc_id] = _random_event(rnd, today)
+        agenda_index.on_event_written(uid, doc_id, events[doc_id], db)
+
+    assert agenda_index.verify(uid, "America/Sao_Paulo", db)["ok"]
+
+    queries = db.queries
+    with_index = repo.find_slots(req)
+    assert db.queries == queries  # servido pelo índice
+
+    monkeypatch.setenv("AGENDA_INDEX_ENABLED", "0")
+    assert with_index == repo.find_slots(req)
+
+
+def test_verify_reports_divergence(monkeypatch):
+    today = datetime(2026, 3, 2).date()
+    events = {"a": {"date": "2026-03-03", "hhmm": "10:00", "duration_min": 30}}
+    db = _Db(events)
+    idx = agenda_index.build("uv", "America/Sao_Paulo", db, today=today)
+    agenda_index._store(idx)
+    events["b"] = {"date": "2026-03-04", "hhmm": "11:00", "duration_min": 30}  # escrita sem hook
+    out = agenda_index.verify("uv", "America/Sao_Paulo", db)
+    assert not out["ok"] and out["diffDays"] == ["2026-03-04"]
+    agenda_index.rebuild("uv", "America/Sao_Paulo", db)
+    agenda_index.invalidate("uv")
+
+
+def test_foreign_write_bumps_version_and_forces_rebuild(monkeypatch):
+    tz_str = "America/Sao_Paulo"
+    now = repo._tz(tz_str).localize(datetime(2026, 3, 2, 8, 0))
+
+    class _Dt(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now
+
+    monkeypatch.setattr(agenda_index, "datetime", _Dt)
+    events = {"a": {"date": "2026-03-03", "hhmm": "10:00", "duration_min": 30}}
+    db = _Db(events)
+    agenda_index.invalidate("uw")
+    idx = agenda_index.get("uw", tz_str, lambda: db)
+    queries = db.queries
+
+    # escrita local com hook: índice atualizado sem rebuild, versão acompanha
+    events["b"] = {"date": "2026-03-04", "hhmm": "11:00", "duration_min": 30}
+    agenda_index.on_event_written("uw", "b", events["b"], db)
+    assert agenda_index.get("uw", tz_str, lambda: db) is idx and db.queries == queries
+    assert db.version == 1 and idx.version == 1
+
+    # outra instância grava (incrementa a versão): a próxima consulta reconstrói
+    events["c"] = {"date": "2026-03-05", "hhmm": "09:00", "duration_min": 60}
+    db.version += 1
+    fresh = agenda_index.get("uw", tz_str, lambda: db)
+    assert fresh is not idx and db.queries == queries + 1
+    assert "2026-03-05" in fresh.snapshot()
+    agenda_index.invalidate("uw")
+
+
+def _bot_doc(rnd, base):
+    ini = base + timedelta(days=rnd.randint(-1, 14), minutes=rnd.randint(0, 14 * 60), seconds=rnd.choice([0, 0, 30]))
+    iso = ini.isoformat() if rnd.random() < 0.7 else ini.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+    doc = {"estado": rnd.choice(["confirmado", "solicitado", "cancelado"]), "duracaoMin": rnd.choice([30, 60, 90, 240])}
+    doc["inicio" if rnd.random() < 0.7 else "dataHora"] = iso
+    return doc
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+@pytest.mark.parametrize("seed", range(5))
+def test_propose_with_bot_index_matches_busy_read(monkeypatch, seed, use_numpy):
+    from domain import scheduling as sched
+
+    rnd = random.Random(seed)
+    now = datetime(2026, 3, 2, 8, 0, tzinfo=sched.SP_TZ)
+
+    class _Dt(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now
+
+    base = now.replace(hour=7)
+    events = {f"b{i}": _bot_doc(rnd, base) for i in range(40)}
+    db = _Db(events)
+    if not use_numpy:
+        monkeypatch.setattr(agenda_index, "_np", None)
+    monkeypatch.setattr(agenda_index, "datetime", _Dt)
+    monkeypatch.setattr(sched, "_db_ready", lambda: True)
+    monkeypatch.setattr(sched, "_DB", db)
+    monkeypatch.setattr(sched, "_get_col_ref", lambda path: _Col(db))
+    monkeypatch.setattr(sched, "_get_doc", lambda path: {"diasAtendimento": [1, 2, 3, 4, 5, 6], "intervaloMin": 15,
+                                                         "antecedenciaMinDias": 0} if path.endswith("agendamento") else None)
+    uid = f"ub{seed}{use_numpy}"
+    agenda_index.invalidate(uid)
+    sched._BUSY_CACHE.clear()
+    sched._CFG_CACHE.clear()
+
+    def both():
+        monkeypatch.setenv("AGENDA_INDEX_ENABLED", "1")
+        with_index = sched.propose(uid, duration_min=60, start_dt=now, max_slots=200)
+        monkeypatch.setenv("AGENDA_INDEX_ENABLED", "0")
+        sched._BUSY_CACHE.clear()
+        return with_index, sched.propose(uid, duration_min=60, start_dt=now, max_slots=200)
+
+    with_index, direct = both()
+    assert with_index == direct and with_index["slots"]
+
+    # agendamento criado pelo bot entra no índice pelo hook (sem rebuild)
+    taken = with_index["slots"][3]
+    day, hhmm = taken.split(" ")
+    ini = datetime.strptime(f"2026/{day} {hhmm}", "%Y/%d/%m %H:%M").replace(tzinfo=sched.SP_TZ)
+    monkeypatch.setattr(sched, "_get_col_ref", lambda path: types.SimpleNamespace(document=lambda: _NewDoc(db)))
+    assert sched.create_agendamento(uid, "wa", ini.isoformat(), duracao_min=30)
+    monkeypatch.setattr(sched, "_get_col_ref", lambda path: _Col(db))
+    queries = db.queries
+    monkeypatch.setenv("AGENDA_INDEX_ENABLED", "1")
+    again = sched.propose(uid, duration_min=60, start_dt=now, max_slots=200)
+    assert db.queries == queries and taken not in again["slots"]
+    assert again == both()[1]
+    agenda_index.invalidate(uid)
+
+
+class _NewDoc:
+    def __init__(self, db):
+        self.db, self.id = db, f"new{len(db.events)}"
+
+    def set(self, data):
+        self.db.events[self.id] = dict(data)
@@ -0,0 +1,155 @@
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+repo = pytest.importorskip("services.agenda_repo")
+
+_OPS = {
+    "==": lambda a, b: a == b,
+    ">=": lambda a, b: a >= b,
+    "<=": lambda a, b: a <= b,
+}
+
+
+class _Snap:
+    def __init__(self, data):
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class _Col:
+    def __init__(self, db, filters=()):
+        self.db, self.filters = db, list(filters)
+
+    def where(self, field, op, value):
+        return _Col(self.db, self.filters + [(field, op, value)])
+
+    def stream(self):
+        self.db.queries += 1
+        return [
+            _Snap(d) for d in self.db.events
+            if all(f in d and _OPS[op](d[f], v) for f, op, v in self.filters)
+        ]
+
+
+class _Db:
+    def __init__(self, events):
+        self.events, self.queries = events, 0
+
+    def collection(self, _name):
+        return self
+
+    def document(self, _uid):
+        return self
+
+
+def _fake_db(events):
+    db = _Db(events)
+    db.collection = lambda name: db if name == "profissionais" else _Col(db)
+    return db
+
+
+def _reference_slots(req, rules, dur_min, events, now):
+    """Algoritmo anterior (um laço por slot x conflito), usado como oráculo."""
+    tz = repo._tz(req["tz"])
+    start_date = repo._parse_date_str(req["window_start"], tz)
+    step = timedelta(minutes=rules["step_minutes"])
+    buffer_min = rules["buffer_minutes"]
+    offset_days = rules["min_lead_days"] if rules["allow_same_day"] else max(1, rules["min_lead_days"])
+    first_ok_day = (now + timedelta(days=offset_days)).date()
+    last_ok_day = (now + timedelta(days=rules["max_lead_days"])).date()
+    wh_start = repo._hhmm_to_time(rules["working_hours"]["start"])
+    wh_end = repo._hhmm_to_time(rules["working_hours"]["end"])
+    out = []
+    for day in repo._daterange_days(start_date, req["window_days"]):
+        ddate = day.date()
+        if ddate < first_ok_day or ddate > last_ok_day:
+            continue
+        if repo._day_iso(day) not in rules["working_days"] and not rules["allow_weekend"]:
+            continue
+        date_str = ddate.strftime("%Y-%m-%d")
+        conflicts = [e for e in events if e.get("date") == date_str and e.get("status", "agendado") in ("agendado", "reagendar")]
+        cur_dt = tz.localize(datetime.combine(ddate, wh_start))
+        end_dt = tz.localize(datetime.combine(ddate, wh_end))
+        while cur_dt + timedelta(minutes=dur_min) <= end_dt:
+            if ddate == now.date() and cur_dt <= now:
+                cur_dt += step
+                continue
+            start, end = cur_dt, cur_dt + timedelta(minutes=dur_min)
+            hit = False
+            for c in conflicts:
+                try:
+                    c_start = tz.localize(datetime.strptime(f"{c['date']} {c['hhmm']}", "%Y-%m-%d %H:%M"))
+                    c_end = c_start + timedelta(minutes=int(c.get("duration_min") or dur_min))
+                except Exception:
+                    continue
+                if buffer_min:
+                    c_start -= timedelta(minutes=buffer_min)
+                    c_end += timedelta(minutes=buffer_min)
+                if repo._overlaps(start, end, c_start, c_end):
+                    hit = True
+                    break
+            if not hit:
+                out.append({"date": date_str, "hhmm": repo._time_to_hhmm(start.timetz())})
+            cur_dt += step
+    return out
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+@pytest.mark.parametrize("seed", range(25))
+def test_find_slots_matches_reference(monkeypatch, seed, use_numpy):
+    rnd = random.Random(seed)
+    tz = repo._tz("America/Sao_Paulo")
+    now = tz.localize(datetime(2026, 3, 2, rnd.randint(7, 19), rnd.choice([0, 10, 30, 45])))
+    rules = {
+        "step_minutes": rnd.choice([10, 15, 30, 60]),
+        "buffer_minutes": rnd.choice([0, 0, 5, 15]),
+        "min_lead_days": rnd.choice([0, 0, 1]),
+        "max_lead_days": rnd.choice([5, 30]),
+        "allow_same_day": rnd.choice([True, False]),
+        "allow_weekend": rnd.choice([True, False]),
+        "working_days": [1, 2, 3, 4, 5],
+        "working_hours": {"start": rnd.choice(["08:00", "09:30"]), "end": rnd.choice(["12:00", "18:30"])},
+    }
+    dur_min = rnd.choice([20, 30, 45, 90])
+    events = []
+    for _ in range(rnd.randint(0, 40)):
+        d = now.date() + timedelta(days=rnd.randint(-2, 10))
+        ev = {
+            "date": d.strftime("%Y-%m-%d"),
+            "hhmm": f"{rnd.randint(6, 20):02d}:{rnd.choice([0, 5, 15, 30, 50]):02d}",
+            "status": rnd.choice(["agendado", "agendado", "reagendar", "cancelado"]),
+        }
+        if rnd.random() < 0.7:
+            ev["duration_min"] = rnd.choice([15, 30, 60, 120])
+        if rnd.random() < 0.05:
+            ev.pop("hhmm")
+        events.append(ev)
+
+    class _Dt(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now
+
+    db = _fake_db(events)
+    monkeypatch.setenv("AGENDA_INDEX_ENABLED", "0")
+    if not use_numpy:
+        monkeypatch.setattr(repo, "_np", None)
+    monkeypatch.setattr(repo, "datetime", _Dt)
+    monkeypatch.setattr(repo, "_get_db", lambda: db)
+    monkeypatch.setattr(repo, "_safe_rules_for", lambda uid: dict(rules))
+    monkeypatch.setattr(repo, "_get_duration_min_for_service", lambda uid, sid: dur_min)
+
+    req = {"uid": "u1", "service_id": "s", "window_start": now.strftime("%Y-%m-%d"), "window_days": 7, "tz": "America/Sao_Paulo"}
+    got = repo.find_slots(req)
+    assert got == _reference_slots(req, rules, dur_min, events, now)
+    assert db.queries <= 1
@@ -0,0 +1,78 @@
+import os
+import struct
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from services import audio_transcode as at  # noqa: E402
+
+
+def _ogg(seconds: float) -> bytes:
+    head = b"OggS" + bytes([0, 2]) + struct.pack("<qIII", 0, 1, 0, 0) + bytes([1, 19])
+    head += b"OpusHead" + bytes([1, 1]) + struct.pack("<HIhB", 312, 48000, 0, 0)
+    tail = b"OggS" + bytes([0, 4]) + struct.pack("<qIII", 312 + int(seconds * 48000), 1, 2, 0) + bytes([0])
+    return head + b"\0" * 500 + tail
+
+
+def test_ogg_duration_ignores_oggs_bytes_inside_packet_data():
+    clip = _ogg(90)
+    # "OggS" dentro do corpo da última página (granule lixo logo depois): não é cabeçalho
+    fake = b"OggS" + bytes([0, 4]) + struct.pack("<q", 48000 * 5)
+    tail = b"OggS" + bytes([0, 4]) + struct.pack("<qIII", 312 + 90 * 48000, 1, 3, 0) + bytes([1, len(fake) + 4])
+    with_fake = clip + tail + fake + b"\0" * 4
+    assert at.ogg_duration_sec(with_fake) == 90.0
+    assert at.ogg_duration_sec(clip + fake) is None  # última página não termina no fim dos dados
+    assert at.ogg_duration_sec(clip[:-1]) is None  # truncado
+
+
+def _fake_ffmpeg(tmp_path) -> str:
+    # "ffmpeg" que devolve o stdin como PCM (ignora os argumentos)
+    path = tmp_path / "ffmpeg"
+    path.write_text("#!/bin/sh\nexec cat\n")
+    os.chmod(path, 0o755)
+    return str(path)
+
+
+def test_sniff_duration_and_guards(monkeypatch):
+    at.reset_stats()
+    assert at.sniff(_ogg(1)) == "ogg" and at.sniff(b"ID3\x04" + b"\0" * 20) == "mp3"
+    assert at.sniff(b"\0\0\0\x18ftypM4A " + b"\0" * 8) == "mp4" and at.sniff(b"#!AMR\n" + b"\0" * 10) == "amr"
+    assert at.duration_sec(_ogg(7.5)) == 7.5
+
+    wav = at.wav_bytes(b"\1\0" * 16000)
+    assert at.duration_sec(wav) == 1.0
+    res = at.transcode(wav)
+    assert res.wav is wav and res.reason == "passthrough"
+
+    monkeypatch.setenv("AUDIO_TRANSCODE_MAX_SEC", "60")
+    res = at.transcode(_ogg(90))
+    assert res.wav is None and res.reason == "too_long" and res.mime == "audio/ogg"
+    monkeypatch.setenv("AUDIO_TRANSCODE_MAX_BYTES", "100")
+    assert at.transcode(_ogg(5)).reason == "too_large"
+    st = at.stats()
+    assert st["rejected"] == 2 and st["passthrough"] == 1 and st["by_kind"] == {"wav": 1, "ogg": 2}
+
+
+def test_ffmpeg_pool_reuses_prespawned_processes(monkeypatch, tmp_path):
+    pool = at.FfmpegPool(2, _fake_ffmpeg(tmp_path))
+    pool.warm()
+    deadline = time.time() + 5
+    while len(pool._idle) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    try:
+        monkeypatch.setattr(at, "_POOL", pool)
+        monkeypatch.setattr(at, "av", None)
+        monkeypatch.setenv("AUDIO_TRANSCODE_BACKEND", "ffmpeg")
+        clip = _ogg(3)
+        res = at.transcode(clip)
+        assert res.backend == "ffmpeg" and res.reason == "ok"
+        assert res.wav == at.wav_bytes(clip) and pool.cold == 0
+        for _ in range(3):
+            assert at.to_wav16k(clip)
+        assert pool.spawned >= 4
+    finally:
+        pool.close()
@@ -0,0 +1,264 @@
+import sys
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from services import birthday_job as bj  # noqa: E402
+
+
+def _get(data, dotted):
+    cur = data
+    for part in dotted.split("."):
+        if not isinstance(cur, dict) or part not in cur:
+            return None
+        cur = cur[part]
+    return cur
+
+
+def _merge(dst, src):
+    for k, v in src.items():
+        if isinstance(v, dict) and isinstance(dst.get(k), dict):
+            _merge(dst[k], v)
+        else:
+            dst[k] = v
+
+
+class _Ref:
+    def __init__(self, db, path):
+        self.db, self.path = db, path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def get(self):
+        return _Snap(self, self.db.docs.get(self.path))
+
+    def set(self, body, merge=False):
+        self.db.docs[self.path] = dict(body)
+
+    def collection(self, name):
+        return _Query(self.db, prefix=f"{self.path}/{name}")
+
+
+class _Snap:
+    def __init__(self, ref, data):
+        self.reference, self._data, self.id = ref, data, ref.id
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data or {})
+
+
+class _Query:
+    def __init__(self, db, prefix=None, group=None, filters=(), after=None, lim=None):
+        self.db, self.prefix, self.group = db, prefix, group
+        self.filters, self.after, self.lim = list(filters), after, lim
+
+    def _clone(self, **kw):
+        args = dict(prefix=self.prefix, group=self.group, filters=self.filters, after=self.after, lim=self.lim)
+        args.update(kw)
+        return _Query(self.db, **args)
+
+    def where(self, field, op, value):
+        assert op == "=="
+        return self._clone(filters=self.filters + [(field, value)])
+
+    def order_by(self, field):
+        assert field == "__name__"
+        return self._clone()
+
+    def start_after(self, cursor):
+        # snapshot ou {"__name__": ref} (contato do cursor apagado)
+        return self._clone(after=cursor["__name__"].path if isinstance(cursor, dict) else cursor.reference.path)
+
+    def limit(self, n):
+        return self._clone(lim=n)
+
+    def document(self, doc_id):
+        return _Ref(self.db, f"{self.prefix}/{doc_id}")
+
+    def stream(self):
+        rows = []
+        for path in sorted(self.db.docs):
+            parts = path.split("/")
+            if self.prefix is not None and "/".join(parts[:-1]) != self.prefix:
+                continue
+            if self.group is not None and parts[-2] != self.group:
+                continue
+            if self.after is not None and path <= self.after:
+                continue
+            data = self.db.docs[path]
+            if all(_get(data, f) == v for f, v in self.filters):
+                rows.append(_Snap(_Ref(self.db, path), data))
+        return rows[: self.lim] if self.lim else rows
+
+
+class _Batch:
+    def __init__(self, db):
+        self.db, self.ops = db, []
+
+    def set(self, ref, body, merge=False):
+        self.ops.append((ref.path, body))
+
+    def commit(self):
+        self.db.commits += 1
+        for path, body in self.ops:
+            _merge(self.db.docs.setdefault(path, {}), body)
+
+
+class FakeDb:
+    def __init__(self):
+        self.docs, self.commits, self.get_all_calls = {}, 0, 0
+
+    def collection(self, name):
+        return _Query(self, prefix=name)
+
+    def collection_group(self, name):
+        return _Query(self, group=name)
+
+    def document(self, path):
+        return _Ref(self, path)
+
+    def get_all(self, refs):
+        self.get_all_calls += 1
+        return [r.get() for r in refs]
+
+    def batch(self):
+        return _Batch(self)
+
+
+NOW = datetime(2026, 5, 17, 9, 0)
+
+
+def _cliente(db, uid, cid, consent="consentido", phone="5511999990000", **bday):
+    db.docs[f"profissionais/{uid}/clientes/{cid}"] = {
+        "nome": f"{cid} Silva",
+        "consentimento": {"status": consent},
+        "telefone": phone,
+        "birthday": {"month": 5, "day": 17, "enabled": True, **bday},
+    }
+
+
+def _seed():
+    db = FakeDb()
+    for i in range(7):
+        _cliente(db, "u1", f"c{i}")
+    _cliente(db, "u2", "x1")
+    _cliente(db, "u2", "x2", consent="pendente")
+    _cliente(db, "u2", "x3", lastSentYear=2026)
+    _cliente(db, "u2", "x4", phone="")
+    _cliente(db, "u3", "y1", day=18)
+    return db
+
+
+def _sender(calls, fail=()):
+    def send(to, template_name, params, language_code):
+        calls.append(params[0]["text"])
+        return (params[0]["text"] not in fail), {"id": "m"}
+    return send
+
+
+def test_group_query_sends_logs_in_batches_and_marks_year():
+    db = _seed()
+    calls = []
+    out = bj.run_birthday_job(db, _sender(calls), now=NOW, page_size=3, limiter=bj.RateLimiter(0))
+    assert out["complete"] and out["sent"] == 8 and out["errors"] == 0
+    assert out["skipped"] == 3  # consentimento, lastSentYear, sem telefone
+    assert out["uids"] == 2
+    assert db.docs["profissionais/u1/birthday_logs/20260517_c0"]["status"] == "sent"
+    assert db.docs["profissionais/u2/birthday_logs/20260517_x4"]["status"] == "skipped_no_phone"
+    assert db.docs["profissionais/u1/clientes/c3"]["birthday"] == {"month": 5, "day": 17, "enabled": True, "lastSentYear": 2026}
+    assert db.commits <= 5  # um batch por página, não um write por contato
+
+    again = bj.run_birthday_job(db, _sender(calls), now=NOW, limiter=bj.RateLimiter(0))
+    assert again["complete"] and again["sent"] == 0 and len(calls) == 8
+
+
+def test_budget_exhaustion_resumes_from_cursor(monkeypatch):
+    db = _seed()
+    calls = []
+    limiter = bj.RateLimiter(0)
+    clock = iter([0.0, 0.0] + [99.0] * 50)  # t0, 1ª página; depois estoura o orçamento
+    monkeypatch.setattr(bj.time, "monotonic", lambda: next(clock))
+    out = bj.run_birthday_job(db, _sender(calls), now=NOW, page_size=3, time_budget_sec=10, limiter=limiter)
+    monkeypatch.undo()
+    assert not out["complete"] and out["sent"] == 3
+    state = db.docs[f"{bj.STATE_COLL}/{bj.STATE_DOC}"]
+    assert state["date"] == "20260517" and state["cursors"]["group"].endswith("/c2")
+
+    out = bj.run_birthday_job(db, _sender(calls), now=NOW, page_size=3, limiter=bj.RateLimiter(0))
+    assert out["complete"] and out["sent"] == 5
+    assert len(calls) == len(set(calls)) == 8
+
+
+def test_failed_send_is_logged_as_error():
+    db = _seed()
+    out = bj.run_birthday_job(db, _sender([], fail=("x1",)), now=NOW, uids=["u2"], limiter=bj.RateLimiter(0))
+    assert out["errors"] == 1 and out["sent"] == 0
+    assert db.docs["profissionais/u2/birthday_logs/20260517_x1"]["status"] == "error"
+    assert "lastSentYear" not in db.docs["profissionais/u2/clientes/x1"]["birthday"]
+
+
+def test_failed_dedupe_read_keeps_cursor_and_next_call_sends():
+    db = _seed()
+    calls = []
+    real = db.get_all
+
+    def flaky(refs):
+        if db.get_all_calls == 1:
+            db.get_all_calls += 1
+            raise RuntimeError("deadline exceeded")
+        return real(refs)
+
+    db.get_all = flaky
+    out = bj.run_birthday_job(db, _sender(calls), now=NOW, page_size=3, limiter=bj.RateLimiter(0))
+    assert out["ok"] and not out["complete"]
+    assert out["errors"] == 1 and out["sent"] == 3  # 1ª página ok, 2ª falhou no dedupe
+    assert out["batchErrors"][0]["stage"] == "dedupe" and out["batchErrors"][0]["after"].endswith("/c2")
+    assert db.docs[f"{bj.STATE_COLL}/{bj.STATE_DOC}"]["cursors"]["group"].endswith("/c2")
+
+    out = bj.run_birthday_job(db, _sender(calls), now=NOW, page_size=3, limiter=bj.RateLimiter(0))
+    assert out["complete"] and out["sent"] == 5
+    assert len(calls) == len(set(calls)) == 8
+    assert db.docs["profissionais/u1/birthday_logs/20260517_c3"]["status"] == "sent"
+
+
+def test_query_error_is_not_marked_done_and_deleted_cursor_resumes(monkeypatch):
+    db = _seed()
+    calls = []
+    monkeypatch.setattr(bj, "_queries", lambda *a: [("group", _Broken())])
+    out = bj.run_birthday_job(db, _sender(calls), now=NOW, page_size=3, limiter=bj.RateLimiter(0))
+    monkeypatch.undo()
+    assert not out["complete"] and out["errors"] == 1 and out["batchErrors"][0]["stage"] == "query"
+    state = db.docs[f"{bj.STATE_COLL}/{bj.STATE_DOC}"]
+    assert state["done"] == [] and not state["complete"]
+
+    # cursor aponta para um contato que foi apagado: continua pelo __name__
+    state["cursors"] = {"group": "profissionais/u1/clientes/c2"}
+    for i in range(3):
+        del db.docs[f"profissionais/u1/clientes/c{i}"]
+    out = bj.run_birthday_job(db, _sender(calls), now=NOW, page_size=3, limiter=bj.RateLimiter(0))
+    assert out["complete"] and out["sent"] == 5 and out["errors"] == 0
+
+
+class _Broken:
+    def limit(self, n):
+        return self
+
+    def stream(self):
+        raise RuntimeError("FAILED_PRECONDITION: index")
+
+
+def test_rate_limiter_spaces_acquires():
+    t = [0.0]
+    sleeps = []
+
+    def sleep(s):
+        sleeps.append(s)
+        t[0] += s
+
+    rl = bj.RateLimiter(2, burst=1, clock=lambda: t[0], sleep=sleep)
+    for _ in range(3):
+        rl.acquire()
+    assert abs(t[0] - 1.0) < 1e-9 and len(sleeps) == 2
@@ -0,0 +1,194 @@
+import sys
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import services.budget_guard as bg
+
+
+class _Inc:
+    def __init__(self, delta):
+        self.delta = delta
+
+
+class AlreadyExists(Exception):
+    pass
+
+
+class _Snap:
+    def __init__(self, data):
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class _FakeDb:
+    """Firestore mínimo: collection/document/collection('shards'), batch e stream."""
+
+    def __init__(self):
+        self.docs = {}
+        self.reads = 0
+        self.commits = 0
+
+    def collection(self, path):
+        return _Coll(self, path)
+
+    def batch(self):
+        return _Batch(self)
+
+
+class _Coll:
+    def __init__(self, db, path):
+        self.db, self.path = db, path
+
+    def document(self, doc_id):
+        return _Doc(self.db, f"{self.path}/{doc_id}")
+
+    def stream(self):
+        self.db.reads += 1
+        prefix = self.path + "/"
+        return [_Snap(v) for k, v in self.db.docs.items() if k.startswith(prefix) and "/" not in k[len(prefix):]]
+
+
+class _Doc:
+    def __init__(self, db, path):
+        self.db, self.path = db, path
+
+    def collection(self, name):
+        return _Coll(self.db, f"{self.path}/{name}")
+
+    def create(self, body):
+        if self.path in self.db.docs:
+            raise AlreadyExists("409")
+        self.db.docs[self.path] = dict(body)
+
+
+class _Batch:
+    def __init__(self, db):
+        self.db, self.ops = db, []
+
+    def set(self, ref, body, merge=False):
+        self.ops.append((ref.path, body))
+
+    def commit(self):
+        self.db.commits += 1
+        for path, body in self.ops:
+            cur = self.db.docs.setdefault(path, {})
+            for k, v in body.items():
+                cur[k] = (cur.get(k) or 0) + v.delta if isinstance(v, _Inc) else v
+
+
+@contextmanager
+def fake_firestore(db):
+    old = (bg._counters_db, bg._increment, bg._ensure_flusher, bg._SEED_EXISTS)
+    bg._counters_db = lambda: db
+    bg._increment = _Inc
+    bg._ensure_flusher = lambda: None
+    bg._SEED_EXISTS = (AlreadyExists,)
+    bg._ctr_pending.clear()
+    bg._ctr_totals.clear()
+    bg._ctr_seeded.clear()
+    try:
+        yield
+    finally:
+        bg._counters_db, bg._increment, bg._ensure_flusher, bg._SEED_EXISTS = old
+        bg._ctr_pending.clear()
+        bg._ctr_totals.clear()
+        bg._ctr_seeded.clear()
+
+
+def test_concurrent_charges_do_not_lose_increments_in_firestore():
+    db = _FakeDb()
+    with fake_firestore(db):
+        threads = [threading.Thread(target=lambda: [bg._inc_spent_usd(0.5) for _ in range(50)]) for _ in range(16)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        assert round(bg._get_spent_usd(), 4) == 400.0
+        assert bg.flush_counters() == 1
+        assert db.commits == 1
+        bg._ctr_totals.clear()
+        assert round(bg._get_spent_usd(), 4) == 400.0
+        shards = [k for k in db.docs if "/shards/" in k]
+        assert 1 <= len(shards) <= bg.BUDGET_COUNTER_SHARDS
+
+
+def test_gates_read_cached_total_without_hitting_storage():
+    db = _FakeDb()
+    with fake_firestore(db):
+        bg._get_gpt4o_day_count()
+        reads = db.reads
+        for _ in range(20):
+            bg._get_gpt4o_day_count()
+        assert db.reads == reads
+        bg.note_gpt4o_used(3)
+        assert bg._get_gpt4o_day_count() == 3
+
+
+def test_failed_flush_keeps_pending_deltas():
+    db = _FakeDb()
+
+    def boom():
+        raise RuntimeError("offline")
+
+    with fake_firestore(db):
+        bg._inc_spent_usd(1.25)
+        db.batch = boom
+        assert bg.flush_counters() == 0
+        assert round(sum(bg._ctr_pending.values()), 4) == 1.25
+
+
+def test_memory_fallback_is_atomic_across_threads():
+    old = bg._counters_db
+    bg._counters_db = lambda: None
+    try:
+        start = bg._get_gpt4o_day_count()
+        threads = [threading.Thread(target=lambda: [bg._inc_gpt4o_day_count(1) for _ in range(25)]) for _ in range(16)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        assert bg._get_gpt4o_day_count() == start + 400
+    finally:
+        bg._counters_db = old
+
+
+def test_flush_without_firestore_keeps_pending_deltas():
+    db = _FakeDb()
+    with fake_firestore(db):
+        bg._inc_spent_usd(0.75)
+        bg._counters_db = lambda: None
+        assert bg.flush_counters() == 0
+        assert round(sum(bg._ctr_pending.values()), 4) == 0.75
+
+
+def test_month_spend_in_kv_seeds_shards_once(monkeypatch):
+    db = _FakeDb()
+    monkeypatch.setattr(bg, "_kv_counter_get", lambda name, period: 7.5 if name == "budget_spent_usd" else 0.0)
+    with fake_firestore(db):
+        assert round(bg._get_spent_usd(), 4) == 7.5
+        bg._inc_spent_usd(0.5)
+        bg.flush_counters()
+        # outra instância / restart: seed já existe, não soma de novo
+        bg._ctr_totals.clear()
+        bg._ctr_seeded.clear()
+        assert round(bg._get_spent_usd(), 4) == 8.0
+        assert len([k for k in db.docs if k.endswith("/shards/seed")]) == 1
+
+
+def test_failed_cold_read_falls_back_to_kv_without_caching_zero(monkeypatch):
+    db = _FakeDb()
+    monkeypatch.setattr(bg, "_kv_counter_get", lambda name, period: 42.0 if name == "budget_spent_usd" else 0.0)
+    with fake_firestore(db):
+        bg._ctr_seeded.add(bg._counter_id("budget_spent_usd", bg._month_key()))
+        monkeypatch.setattr(bg, "_read_remote_total", lambda db, cid: (_ for _ in ()).throw(RuntimeError("unavailable")))
+        assert bg._get_spent_usd() == 42.0
+        assert not bg._ctr_totals
+        monkeypatch.setattr(bg, "_read_remote_total", lambda db, cid: 50.0)
+        assert bg._get_spent_usd() == 50.0
@@ -0,0 +1,165 @@
+import os
+import sys
+import time
+from pathlib import Path
+from contextlib import contextmanager
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import pytest  # noqa: E402
+
+import cache.kv as kv
+import services.budget_guard as bg
+
+
+class ResponseError(Exception):
+    pass
+
+
+class FakeRedis:
+    """Subconjunto do redis-py usado pelo cache.kv (decode_responses=True)."""
+
+    def __init__(self):
+        self.data = {}
+        self.exp = {}
+        self.calls = 0
+        self.down = False
+
+    def _check(self):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("redis down")
+
+    def _alive(self, k):
+        e = self.exp.get(k)
+        if e is not None and e <= time.time():
+            self.data.pop(k, None)
+            self.exp.pop(k, None)
+        return k in self.data
+
+    def get(self, k):
+        self._check()
+        return self.data[k] if self._alive(k) else None
+
+    def mget(self, keys):
+        self._check()
+        return [self.data[k] if self._alive(k) else None for k in keys]
+
+    def set(self, k, v, ex=None):
+        self._check()
+        self.data[k] = str(v)
+        if ex:
+            self.exp[k] = time.time() + ex
+        return True
+
+    def delete(self, k):
+        self._check()
+        self.exp.pop(k, None)
+        return 1 if self.data.pop(k, None) is not None else 0
+
+    def incrby(self, k, n):
+        try:
+            cur = int(self.data[k]) if self._alive(k) else 0
+        except ValueError:
+            raise ResponseError("value is not an integer or out of range")
+        self.data[k] = str(cur + n)
+        return cur + n
+
+    def incrbyfloat(self, k, n):
+        cur = float(self.data[k]) if self._alive(k) else 0.0
+        self.data[k] = repr(cur + n)
+        return cur + n
+
+    def expire(self, k, sec):
+        self.exp[k] = time.time() + sec
+        return True
+
+    def pipeline(self, transaction=True):
+        return _Pipe(self)
+
+
+class _Pipe:
+    def __init__(self, r):
+        self.r, self.ops = r, []
+
+    def __getattr__(self, name):
+        def _queue(*a, **kw):
+            self.ops.append((name, a, kw))
+            return self
+        return _queue
+
+    def execute(self):
+        self.r._check()
+        return [getattr(self.r, n)(*a, **kw) for n, a, kw in self.ops]
+
+
+@contextmanager
+def redis_backend():
+    r = FakeRedis()
+    old = os.environ.get("CACHE_BACKEND")
+    os.environ["CACHE_BACKEND"] = "redis"
+    kv.set_redis_client(r)
+    kv._mem.clear()
+    try:
+        yield r
+    finally:
+        kv.set_redis_client(None)
+        if old is None:
+            os.environ.pop("CACHE_BACKEND", None)
+        else:
+            os.environ["CACHE_BACKEND"] = old
+
+
+def test_put_get_delete_with_native_ttl():
+    with redis_backend() as r:
+        assert kv.put("u1", "k", {"texto": "oi"}, ttl_sec=60)
+        assert kv.get("u1", "k") == {"texto": "oi"}
+        rk = kv._rkey("u1", "k")
+        assert r.exp[rk] > time.time()
+        assert kv.delete("u1", "k")
+        assert kv.get("u1", "k") is None
+
+
+def test_batch_uses_single_round_trip():
+    with redis_backend() as r:
+        kv.put_many("u1", {"a": 1, "b": [2]}, ttl_sec=60)
+        calls = r.calls
+        assert kv.get_many("u1", ["a", "b", "c"]) == {"a": 1, "b": [2]}
+        assert r.calls == calls + 1
+
+
+def test_incr_is_native_and_readable_by_get():
+    with redis_backend():
+        assert kv.incr("u1", "n", 2, ttl_sec=60) == 2
+        assert kv.incr("u1", "n", 3, ttl_sec=60) == 5
+        assert kv.get("u1", "n") == 5
+        assert abs(kv.incr("u1", "f", 0.25, ttl_sec=60) - 0.25) < 1e-9
+
+
+def test_connection_error_falls_back_to_memory():
+    with redis_backend() as r:
+        r.down = True
+        assert kv.put("u1", "k", "v", ttl_sec=60)
+        assert kv.get("u1", "k") == "v"
+        assert kv._REDIS_DOWN_UNTIL > time.time()
+
+
+def test_incr_data_error_fails_only_that_call():
+    with redis_backend():
+        kv.put("u1", "j", {"a": 1}, ttl_sec=60)
+        with pytest.raises(ResponseError):
+            kv.incr("u1", "j", 1, ttl_sec=60)
+        assert kv._REDIS_DOWN_UNTIL == 0.0  # Redis continua ligado
+        assert kv.incr("u1", "n", 1, ttl_sec=60) == 1
+        assert not kv._mem
+
+
+def test_budget_guard_counts_via_redis_incr():
+    with redis_backend():
+        # Firestore fica desligado com CACHE_BACKEND=redis
+        assert bg._counters_db() is None
+        start = bg._get_gpt4o_day_count()
+        bg.note_gpt4o_used(2)
+        assert bg._get_gpt4o_day_count() == start + 2
@@ -0,0 +1,147 @@
+import os
+import sys
+from pathlib import Path
+from contextlib import contextmanager
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import cache.kv as kv
+
+
+class _Snap:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data or {})
+
+
+class _Ref:
+    def __init__(self, db, path):
+        self.db, self.path = db, path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def get(self):
+        self.db.reads += 1
+        return _Snap(self.id, self.db.docs.get(self.path))
+
+    def set(self, body):
+        self.db.writes += 1
+        self.db.docs[self.path] = dict(body)
+
+    def delete(self):
+        self.db.docs.pop(self.path, None)
+
+
+class _Coll:
+    def __init__(self, db, path):
+        self.db, self.path = db, path
+
+    def document(self, doc_id):
+        return _Ref(self.db, f"{self.path}/{doc_id}")
+
+
+class _Batch:
+    def __init__(self, db):
+        self.db, self.ops = db, []
+
+    def set(self, ref, body):
+        self.ops.append((ref, body))
+
+    def commit(self):
+        self.db.commits += 1
+        for ref, body in self.ops:
+            ref.set(body)
+
+
+class _FakeDb:
+    def __init__(self):
+        self.docs, self.reads, self.writes, self.commits, self.get_all_calls = {}, 0, 0, 0, 0
+
+    def collection(self, path):
+        return _Coll(self, path)
+
+    def batch(self):
+        return _Batch(self)
+
+    def get_all(self, refs):
+        self.get_all_calls += 1
+        return [_Snap(r.id, self.docs.get(r.path)) for r in refs]
+
+
+@contextmanager
+def fake_firestore():
+    db = _FakeDb()
+    old_db, old_env = kv._DB, os.environ.get("FIREBASE_PROJECT_ID")
+    kv._DB = db
+    os.environ["FIREBASE_PROJECT_ID"] = "test"
+    kv._l1.clear()
+    try:
+        yield db
+    finally:
+        kv._DB = old_db
+        kv._l1.clear()
+        if old_env is None:
+            os.environ.pop("FIREBASE_PROJECT_ID", None)
+        else:
+            os.environ["FIREBASE_PROJECT_ID"] = old_env
+
+
+def test_put_is_write_through_and_get_hits_l1():
+    with fake_firestore() as db:
+        assert kv.put("u1", "k", {"n": 1}, ttl_sec=60)
+        assert db.writes == 1
+        for _ in range(5):
+            assert kv.get("u1", "k") == {"n": 1}
+        assert db.reads == 0
+
+
+def test_l1_miss_reads_l2_once_then_serves_from_l1():
+    with fake_firestore() as db:
+        kv.put("u1", "k", 7, ttl_sec=60)
+        kv._l1.clear()
+        assert kv.get("u1", "k") == 7
+        assert kv.get("u1", "k") == 7
+        assert db.reads == 1
+
+
+def test_l1_ttl_is_capped_by_l2_expiry():
+    with fake_firestore():
+        kv.put("u1", "short", "x", ttl_sec=2)
+        exp_ts = kv._l1.expires_at(("u1", "short"))
+        assert exp_ts is not None
+        assert exp_ts <= kv._l1.now() + 2
+
+
+def test_delete_invalidates_l1():
+    with fake_firestore() as db:
+        kv.put("u1", "k", 1, ttl_sec=60)
+        assert kv.delete("u1", "k")
+        assert kv.get("u1", "k") is None
+        assert db.reads == 1
+
+
+def test_get_many_and_put_many_batch():
+    with fake_firestore() as db:
+        assert kv.put_many("u1", {"a": 1, "b": 2, "c": 3}, ttl_sec=60)
+        assert db.commits == 1
+        kv._l1.clear()
+        kv.put("u1", "d", 4, ttl_sec=60)
+        out = kv.get_many("u1", ["a", "b", "d", "zz"])
+        assert out == {"a": 1, "b": 2, "d": 4}
+        assert db.get_all_calls == 1
+        assert db.reads == 0
+
+
+def test_stats_report_hit_ratio_per_backend():
+    with fake_firestore():
+        kv.put("u1", "k", 1, ttl_sec=60)
+        kv.get("u1", "k")
+        s = kv.stats()
+        assert set(["l1", "firestore", "memory"]).issubset(s)
+        assert s["l1"]["hits"] >= 1
+        assert 0.0 <= s["l1"]["hit_ratio"] <= 1.0
@@ -0,0 +1,80 @@
+import sys
+import threading
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from cache.lru import LRUCache
+
+
+class _Clock:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_evicts_least_recently_used_not_hot_entry():
+    c = LRUCache(max_items=3)
+    c.set("a", 1)
+    c.set("b", 2)
+    c.set("c", 3)
+    assert c.get("a") == 1  # "a" fica quente
+    c.set("d", 4)
+    assert c.get("b") is None
+    assert c.get("a") == 1
+    assert c.stats()["evictions"] == 1
+
+
+def test_ttl_expiry_and_heap_sweep():
+    clock = _Clock()
+    c = LRUCache(max_items=100, clock=clock)
+    for i in range(10):
+        c.set(f"k{i}", i, ttl=10 if i % 2 else 100)
+    clock.t += 50
+    assert c.sweep() == 5
+    assert len(c) == 5
+    assert c.get("k0") == 0
+    assert c.get("k1") is None
+
+
+def test_overwrite_keeps_latest_expiry():
+    clock = _Clock()
+    c = LRUCache(max_items=10, clock=clock)
+    c.set("k", "old", ttl=1)
+    c.set("k", "new", ttl=100)
+    clock.t += 5
+    assert c.sweep() == 0
+    assert c.get("k") == "new"
+
+
+def test_max_bytes_limit():
+    c = LRUCache(max_items=100, max_bytes=1000)
+    for i in range(10):
+        c.set(i, b"x" * 300)
+    st = c.stats()
+    assert st["bytes"] <= 1000
+    assert st["items"] == 3
+    assert c.get(9) is not None
+
+
+def test_stats_and_thread_safety():
+    c = LRUCache(max_items=50)
+
+    def worker(n):
+        for i in range(500):
+            c.set((n, i % 80), i)
+            c.get((n, (i + 1) % 80))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(16)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    st = c.stats()
+    assert st["items"] <= 50
+    assert st["hits"] + st["misses"] == 16 * 500
+    assert 0.0 <= st["hit_ratio"] <= 1.0
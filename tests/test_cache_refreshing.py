@@ -0,0 +1,95 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from cache.refreshing import RefreshingMap, RefreshingValue, stats_all
+
+
+def test_cold_start_is_single_flight():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return {"v": len(calls)}
+
+    rv = RefreshingValue(loader, ttl=60, name="t_cold")
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(rv.get())) for _ in range(16)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    assert len(calls) == 1
+    assert all(o == {"v": 1} for o in out)
+    assert rv.stats()["cold_waits"] >= 1
+
+
+def test_stale_while_revalidate_serves_old_value_and_refreshes_once():
+    calls = []
+    gate = threading.Event()
+
+    def loader():
+        calls.append(1)
+        if len(calls) > 1:
+            gate.wait(1)
+        return len(calls)
+
+    rv = RefreshingValue(loader, ttl=60, name="t_swr", jitter=0)
+    assert rv.get() == 1
+    rv.invalidate()
+    vals = [rv.get() for _ in range(10)]
+    assert vals == [1] * 10
+    gate.set()
+    for _ in range(100):
+        if rv.get() == 2:
+            break
+        time.sleep(0.01)
+    assert rv.get() == 2
+    assert len(calls) == 2
+    assert rv.stats()["stale_served"] >= 10
+
+
+def test_loader_error_keeps_old_value_and_counts_error():
+    state = {"fail": False}
+
+    def loader():
+        if state["fail"]:
+            raise RuntimeError("firestore down")
+        return "ok"
+
+    rv = RefreshingValue(loader, ttl=60, name="t_err", jitter=0)
+    assert rv.get() == "ok"
+    state["fail"] = True
+    rv.invalidate()
+    assert rv.get() == "ok"
+    for _ in range(100):
+        if rv.stats()["errors"]:
+            break
+        time.sleep(0.01)
+    st = rv.stats()
+    assert st["errors"] == 1
+    assert st["last_error"].startswith("RuntimeError")
+    assert rv.get() == "ok"
+
+
+def test_cold_error_returns_default():
+    rv = RefreshingValue(lambda: 1 / 0, ttl=60, name="t_default", default={})
+    assert rv.get() == {}
+
+
+def test_jitter_spreads_deadlines_and_map_exports_stats():
+    rv = RefreshingValue(lambda: 1, ttl=100, name="t_jitter", jitter=0.2)
+    deadlines = {round(rv._next_deadline(0.0), 3) for _ in range(20)}
+    assert len(deadlines) > 1
+    assert all(80.0 <= d <= 120.0 for d in deadlines)
+
+    m = RefreshingMap("t_map", ttl=60, default={})
+    assert m.get("a", lambda: {"a": 1}) == {"a": 1}
+    assert m.get("a", lambda: {"a": 2}) == {"a": 1}
+    assert stats_all()["t_map"]["keys"] == 1
@@ -0,0 +1,216 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("pytz")
+pytest.importorskip("flask")
+
+from services import digest_runner as dr  # noqa: E402
+from services import mailer  # noqa: E402
+
+_OPS = {
+    "==": lambda a, b: a == b,
+    ">=": lambda a, b: a is not None and a >= b,
+    "<": lambda a, b: a is not None and a < b,
+}
+
+
+class _Ref:
+    def __init__(self, db, path):
+        self.db, self.path = db, path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def get(self):
+        self.db.reads += 1
+        return _Snap(self, self.db.docs.get(self.path))
+
+    def set(self, body, merge=False):
+        self.db.docs[self.path] = dict(body)
+
+    def collection(self, name):
+        return _Query(self.db, prefix=f"{self.path}/{name}")
+
+
+class _Snap:
+    def __init__(self, ref, data):
+        self.reference, self._data, self.id = ref, data, ref.id
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data or {})
+
+
+class _Query:
+    def __init__(self, db, prefix=None, group=None, filters=(), after=None, lim=None):
+        self.db, self.prefix, self.group = db, prefix, group
+        self.filters, self.after, self.lim = list(filters), after, lim
+
+    def _clone(self, **kw):
+        args = dict(prefix=self.prefix, group=self.group, filters=self.filters, after=self.after, lim=self.lim)
+        args.update(kw)
+        return _Query(self.db, **args)
+
+    def where(self, field, op, value):
+        return self._clone(filters=self.filters + [(field, op, value)])
+
+    def order_by(self, field, direction=None):
+        return self
+
+    def start_after(self, snap):
+        return self._clone(after=snap.reference.path)
+
+    def limit(self, n):
+        return self._clone(lim=n)
+
+    def document(self, doc_id):
+        return _Ref(self.db, f"{self.prefix}/{doc_id}")
+
+    def stream(self):
+        self.db.queries += 1
+        rows = []
+        for path in sorted(self.db.docs):
+            parts = path.split("/")
+            if self.prefix is not None and "/".join(parts[:-1]) != self.prefix:
+                continue
+            if self.group is not None and parts[-2] != self.group:
+                continue
+            if self.after is not None and path <= self.after:
+                continue
+            data = self.db.docs[path]
+            if all(_OPS[op](data.get(f), v) for f, op, v in self.filters):
+                rows.append(_Snap(_Ref(self.db, path), data))
+        return rows[: self.lim] if self.lim else rows
+
+
+class FakeDb:
+    def __init__(self):
+        self.docs, self.reads, self.queries, self.get_all_calls = {}, 0, 0, 0
+
+    def collection(self, name):
+        return _Query(self, prefix=name)
+
+    def collection_group(self, name):
+        return _Query(self, group=name)
+
+    def document(self, path):
+        return _Ref(self, path)
+
+    def get_all(self, refs):
+        self.get_all_calls += 1
+        return [_Snap(r, self.docs.get(r.path)) for r in refs]
+
+
+DATE = "2026-05-18"  # segunda-feira
+
+
+def _seed(n=7):
+    db = FakeDb()
+    for i in range(n):
+        uid = f"u{i}"
+        db.docs[f"profissionais/{uid}"] = {"nome": f"Prof {i}", "email": f"{uid}@ex.com"}
+        db.docs[f"profissionais/{uid}/agendamentos/a1"] = {"date": DATE, "hhmm": "09:00", "status": "agendado",
+                                                           "service_id": "corte", "cliente": {"nome": "Ana"}}
+        db.docs[f"profissionais/{uid}/agendamentos/a2"] = {"date": DATE, "hhmm": "10:00", "status": "cancelado"}
+    db.docs["profissionais/u1"]["digest"] = {"agenda": False}
+    db.docs["profissionais/u2"]["email"] = ""
+    db.docs["profissionais/u3/config/agendamento"] = {"diasAtendimento": [6, 7]}
+    return db
+
+
+def _sink(batches, fail=()):
+    def send_many(messages):
+        batches.append(messages)
+        return [(m["to"] not in fail, "boom" if m["to"] in fail else "") for m in messages]
+    return send_many
+
+
+def test_agenda_digest_batches_and_skips():
+    db = _seed()
+    batches = []
+    out = dr.run_digests(db, _sink(batches, fail=("u6@ex.com",)), kind="agenda", date_str=DATE, page_size=3)
+    assert out["ok"] and out["complete"]
+    assert out["tenants"] == 7 and out["eligible"] == 4
+    assert out["sent"] == 3 and out["failed"] == 1
+    assert out["skipped"] == {"opt_out": 1, "no_email": 1, "not_workday": 1}
+    assert [len(b) for b in batches] == [1, 2, 1]  # um send_many por página
+    msg = batches[0][0]
+    assert msg["to"] == "u0@ex.com" and "09:00 — corte — Ana" in msg["text"] and "10:00" not in msg["text"]
+    assert db.get_all_calls == 3  # config da página em um round-trip
+    assert db.docs[f"{dr.STATE_COLL}/digest_agenda"]["done"] is True
+
+    again = dr.run_digests(db, _sink(batches), kind="agenda", date_str=DATE)
+    assert again.get("alreadyDone") and len(batches) == 3
+
+
+def test_budget_exhaustion_resumes_from_cursor(monkeypatch):
+    db = _seed()
+    batches = []
+    clock = iter([0.0, 0.0] + [99.0] * 50)
+    monkeypatch.setattr(dr.time, "monotonic", lambda: next(clock))
+    out = dr.run_digests(db, _sink(batches), kind="agenda", date_str=DATE, page_size=3, time_budget_sec=10)
+    monkeypatch.undo()
+    assert not out["complete"] and out["sent"] == 1
+    assert db.docs[f"{dr.STATE_COLL}/digest_agenda"]["lastUid"] == "u2"
+
+    out = dr.run_digests(db, _sink(batches), kind="agenda", date_str=DATE, page_size=3)
+    assert out["complete"] and out["sent"] == 3
+    sent = [m["to"] for b in batches for m in b]
+    assert sent == ["u0@ex.com", "u4@ex.com", "u5@ex.com", "u6@ex.com"]
+
+
+def test_orcamentos_uses_group_range_and_dry_run_sends_nothing():
+    from routes.orcamentos_digest import _day_bounds_utc
+
+    db = _seed(3)
+    start, end = _day_bounds_utc(DATE, "America/Sao_Paulo")
+    db.docs["profissionais/u0/orcamentos/o1"] = {"createdAt": start, "numero": "ORC-1", "total": 150.0,
+                                                 "clienteNome": "Bia"}
+    db.docs["profissionais/u0/orcamentos/o2"] = {"createdAt": end, "numero": "ORC-2", "total": 9.0}
+    out = dr.run_digests(db, None, kind="orcamentos", date_str=DATE, dry_run=True, skip_empty=True)
+    assert out["rendered"] == 1 and out["sent"] == 0
+    assert out["skipped"] == {"no_email": 1, "empty": 1}  # opt-out de agenda não vale para orçamentos
+    assert f"{dr.STATE_COLL}/digest_orcamentos" not in db.docs
+
+
+class _FakeSMTP:
+    instances = []
+    drop_after = None
+
+    def __init__(self, host, port, timeout=None):
+        self.sent = []
+        _FakeSMTP.instances.append(self)
+
+    def ehlo(self):
+        pass
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        pass
+
+    def sendmail(self, from_addr, recipients, raw):
+        if _FakeSMTP.drop_after is not None and len(self.sent) >= _FakeSMTP.drop_after:
+            _FakeSMTP.drop_after = None
+            raise mailer.smtplib.SMTPServerDisconnected("bye")
+        self.sent.append(recipients)
+
+    def quit(self):
+        pass
+
+
+def test_send_many_reuses_one_smtp_connection(monkeypatch):
+    monkeypatch.setenv("EMAIL_PROVIDER", "smtp")
+    monkeypatch.setenv("EMAIL_SENDER", "MEI Robô <no-reply@ex.com>")
+    monkeypatch.setattr(mailer.smtplib, "SMTP", _FakeSMTP)
+    _FakeSMTP.instances, _FakeSMTP.drop_after = [], 3
+    msgs = [{"to": f"p{i}@ex.com", "subject": "s", "text": "t"} for i in range(5)] + [{"to": "", "subject": "s"}]
+    res = mailer.send_many(msgs)
+    assert [ok for ok, _ in res] == [True] * 5 + [False]
+    assert len(_FakeSMTP.instances) == 2  # uma conexão + uma reconexão após queda
+    assert sum(len(s.sent) for s in _FakeSMTP.instances) == 5
@@ -0,0 +1,133 @@
+import sys
+import threading
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from services import gcs_handler as gh  # noqa: E402
+
+
+class _Blob:
+    def __init__(self, bucket, name, generation=None):
+        self.bucket, self.name, self.generation = bucket, name, generation
+
+    def download_as_bytes(self):
+        self.bucket.downloads.append((self.name, self.generation))
+        return f"{self.name}@{self.generation}".encode()
+
+    def upload_from_string(self, data, content_type=None):
+        self.bucket.objects[self.name] = max(self.bucket.objects.values() or [0]) + 1
+
+    def make_public(self):
+        pass
+
+    @property
+    def public_url(self):
+        return f"https://x/{self.name}"
+
+
+class FakeBucket:
+    def __init__(self, objects):
+        self.objects = dict(objects)
+        self.listings, self.downloads = [], []
+
+    def list_blobs(self, prefix="", fields=None):
+        self.listings.append(prefix)
+        return [_Blob(self, n, g) for n, g in sorted(self.objects.items()) if n.startswith(prefix)]
+
+    def blob(self, name, generation=None):
+        return _Blob(self, name, generation)
+
+
+def _setup(monkeypatch, objects, prefixes="kb/"):
+    bucket = FakeBucket(objects)
+    monkeypatch.setattr(gh, "_bucket", bucket)
+    monkeypatch.setattr(gh, "_docx_index", None)
+    monkeypatch.setenv("GCS_DOCX_PREFIXES", prefixes)
+    monkeypatch.setenv("GCS_DOCX_COLD_WAIT_SEC", "5")
+    gh._docx_index_ready.clear()
+    gh._docx_cache.clear()
+    return bucket
+
+
+def test_index_lists_once_and_matches_tokens_by_prefix(monkeypatch):
+    bucket = _setup(monkeypatch, {
+        "kb/Tabela_Preços-2024.docx": 1,
+        "kb/horario de atendimento.docx": 2,
+        "kb/~$Tabela_Preços-2024.docx": 3,
+        "kb/preços.pdf": 4,
+        "outros/precos_antigos.docx": 5,
+    })
+    assert gh.detectar_arquivos_relevantes("Qual o preço da tabela?") == ["kb/Tabela_Preços-2024.docx"]
+    assert gh.detectar_arquivos_relevantes("horários de atendimento") == ["kb/horario de atendimento.docx"]
+    assert gh.detectar_arquivos_relevantes("a de o") == []
+    assert bucket.listings == ["kb/"]  # uma listagem, só no prefixo
+
+
+def _settle():
+    th = gh._docx_refresh_thread
+    if th is not None:
+        th.join(5)
+
+
+def test_index_refreshes_on_ttl_and_docx_upload(monkeypatch):
+    bucket = _setup(monkeypatch, {"kb/corte.docx": 1})
+    gh.detectar_arquivos_relevantes("corte")
+    gh.upload_bytes(b"x", "kb/barba.docx")
+    assert gh.detectar_arquivos_relevantes("barba") == []  # índice anterior enquanto relista
+    _settle()
+    assert gh.detectar_arquivos_relevantes("barba") == ["kb/barba.docx"] and len(bucket.listings) == 2
+    monkeypatch.setenv("GCS_DOCX_INDEX_TTL_SEC", "0")
+    gh.detectar_arquivos_relevantes("barba")
+    _settle()
+    assert len(bucket.listings) == 3
+
+
+def test_stale_index_never_waits_for_listing(monkeypatch):
+    bucket = _setup(monkeypatch, {"kb/corte.docx": 1})
+    assert gh.detectar_arquivos_relevantes("corte") == ["kb/corte.docx"]
+    gate = threading.Event()
+    real = bucket.list_blobs
+
+    def slow(prefix="", fields=None):
+        gate.wait(5)
+        return real(prefix=prefix, fields=fields)
+
+    bucket.list_blobs = slow
+    gh.invalidate_docx_index()
+    for _ in range(5):  # uma única relistagem em voo; perguntas seguem com o índice anterior
+        assert gh.detectar_arquivos_relevantes("corte") == ["kb/corte.docx"]
+    gate.set()
+    _settle()
+    assert bucket.listings == ["kb/", "kb/"]
+
+
+def test_default_prefix_is_not_the_whole_bucket(monkeypatch):
+    bucket = _setup(monkeypatch, {"docx/corte.docx": 1, "outros/barba.docx": 2}, prefixes="")
+    assert gh.detectar_arquivos_relevantes("corte barba") == ["docx/corte.docx"]
+    assert bucket.listings == ["docx/"]
+    monkeypatch.setenv("GCS_DOCX_PREFIXES", "*")
+    assert gh._docx_prefixes() == [""]
+
+
+def test_docx_text_cached_by_path_and_generation(monkeypatch):
+    bucket = _setup(monkeypatch, {"kb/corte.docx": 7})
+
+    def Document(buf):
+        return types.SimpleNamespace(paragraphs=[types.SimpleNamespace(text=buf.read().decode())])
+
+    monkeypatch.setattr(gh, "_DOCX_OK", True)
+    monkeypatch.setattr(gh, "Document", Document, raising=False)
+    ctx = gh.montar_contexto_para_pergunta("corte")
+    assert "kb/corte.docx@7" in ctx and bucket.downloads == [("kb/corte.docx", 7)]
+    gh.montar_contexto_para_pergunta("corte")
+    assert len(bucket.downloads) == 1
+    bucket.objects["kb/corte.docx"] = 8  # nova versão do arquivo
+    gh.invalidate_docx_index()
+    gh.montar_contexto_para_pergunta("corte")
+    _settle()
+    assert "kb/corte.docx@8" in gh.montar_contexto_para_pergunta("corte")
+    assert gh._docx_cache.stats()["items"] == 2
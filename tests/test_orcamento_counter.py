@@ -0,0 +1,159 @@
+import sys
+import threading
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from services import orcamento_counter as oc  # noqa: E402
+
+
+class _Ref:
+    def __init__(self, db, path):
+        self.db, self.path = db, path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def get(self, transaction=None):
+        return _Snap(self, self.db.docs.get(self.path))
+
+    def set(self, body, merge=False):
+        cur = self.db.docs.get(self.path) if merge else None
+        self.db.docs[self.path] = {**(cur or {}), **body}
+
+    def collection(self, name):
+        return _Col(self.db, f"{self.path}/{name}")
+
+
+class _Snap:
+    def __init__(self, ref, data):
+        self.reference, self._data, self.id = ref, data, ref.id
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class _Agg:
+    def __init__(self, value):
+        self.value = value
+
+
+class _Col:
+    def __init__(self, db, prefix, after=None, lim=None):
+        self.db, self.prefix, self.after, self.lim = db, prefix, after, lim
+
+    def document(self, doc_id):
+        return _Ref(self.db, f"{self.prefix}/{doc_id}")
+
+    def order_by(self, field):
+        return self
+
+    def start_after(self, snap):
+        return _Col(self.db, self.prefix, snap.reference.path, self.lim)
+
+    def limit(self, n):
+        return _Col(self.db, self.prefix, self.after, n)
+
+    def _paths(self):
+        return [p for p in sorted(self.db.docs)
+                if p.rsplit("/", 1)[0] == self.prefix and (self.after is None or p > self.after)]
+
+    def stream(self):
+        self.db.streamed += 1
+        rows = [_Snap(_Ref(self.db, p), self.db.docs[p]) for p in self._paths()]
+        return rows[: self.lim] if self.lim else rows
+
+    def count(self):
+        db = self
+
+        class _Q:
+            def get(self):
+                db.db.counts += 1
+                return [[_Agg(len(db._paths()))]]
+        return _Q()
+
+
+class _Txn:
+    def set(self, ref, body, merge=False):
+        ref.set(body, merge=merge)
+
+
+class FakeDb:
+    def __init__(self):
+        self.docs, self.streamed, self.counts = {}, 0, 0
+        self.lock = threading.Lock()
+
+    def collection(self, name):
+        return _Col(self, name)
+
+    def transaction(self):
+        return _Txn()
+
+
+def _serial(db):
+    # transação serializável: a fake executa o corpo sob um lock global
+    def transactional(fn):
+        def run(txn):
+            with db.lock:
+                return fn(txn)
+        return run
+    return transactional
+
+
+def _setup(monkeypatch, n_existing=0):
+    db = FakeDb()
+    for i in range(n_existing):
+        db.docs[f"profissionais/u1/orcamentos/o{i}"] = {"numero": f"x{i}"}
+    monkeypatch.setattr(oc, "_transactional", _serial(db))
+    monkeypatch.setenv("ORCAMENTO_NUMERO_BLOCK", "1")
+    oc._BLOCKS.clear()
+    return db
+
+
+def test_first_number_seeds_from_count_then_uses_counter(monkeypatch):
+    db = _setup(monkeypatch, n_existing=3)
+    assert oc.next_seq("u1", db) == 4
+    assert oc.next_seq("u1", db) == 5
+    assert db.counts == 1 and db.streamed == 0  # só o seed conta; depois é o contador
+    assert db.docs["profissionais/u1/config/orcamentoCounter"]["seq"] == 5
+    assert oc.next_numero("u2", db).endswith("-00001")
+
+
+def test_concurrent_numbers_are_unique_and_gap_free(monkeypatch):
+    db = _setup(monkeypatch)
+    got, lock = [], threading.Lock()
+
+    def worker():
+        for _ in range(25):
+            v = oc.next_seq("u1", db)
+            with lock:
+                got.append(v)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(got) == list(range(1, 201))
+
+
+def test_block_reservation_hands_out_locally(monkeypatch):
+    db = _setup(monkeypatch)
+    monkeypatch.setenv("ORCAMENTO_NUMERO_BLOCK", "10")
+    seqs = [oc.next_seq("u1", db) for _ in range(12)]
+    assert seqs == list(range(1, 13))
+    assert db.docs["profissionais/u1/config/orcamentoCounter"]["seq"] == 20  # dois blocos reservados
+
+
+def test_seed_counters_never_lowers_and_is_idempotent(monkeypatch):
+    db = _setup(monkeypatch, n_existing=4)
+    db.docs["profissionais/u1"] = {}
+    db.docs["profissionais/u2"] = {}
+    db.docs["profissionais/u2/config/orcamentoCounter"] = {"seq": 50}
+    out = oc.seed_counters(db, page_size=1)
+    assert out["complete"] and out["scanned"] == 2 and out["seeded"] == 1 and out["kept"] == 1
+    assert db.docs["profissionais/u1/config/orcamentoCounter"]["seq"] == 4
+    assert db.docs["profissionais/u2/config/orcamentoCounter"]["seq"] == 50
+    again = oc.seed_counters(db)
+    assert again["seeded"] == 0 and again["kept"] == 2
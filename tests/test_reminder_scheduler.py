@@ -0,0 +1,166 @@
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+pytz = pytest.importorskip("pytz")
+from services import reminder_scheduler as rs  # noqa: E402
+
+_OPS = {
+    "==": lambda a, b: a == b,
+    ">=": lambda a, b: a >= b,
+    "<=": lambda a, b: a <= b,
+}
+
+
+class AlreadyExists(Exception):
+    pass
+
+
+class _Ref:
+    def __init__(self, db, path):
+        self.db, self.path = db, path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name):
+        return _Query(self.db, prefix=f"{self.path}/{name}")
+
+    def create(self, body):
+        if self.path in self.db.docs:
+            raise AlreadyExists(self.path)
+        self.db.docs[self.path] = dict(body)
+
+    def update(self, body):
+        self.db.docs[self.path].update(body)
+
+    def delete(self):
+        self.db.docs.pop(self.path, None)
+
+
+class _Snap:
+    def __init__(self, ref, data):
+        self.reference, self._data, self.id = ref, data, ref.id
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class _Query:
+    def __init__(self, db, prefix=None, group=None, filters=(), after=None, lim=None):
+        self.db, self.prefix, self.group = db, prefix, group
+        self.filters, self.after, self.lim = list(filters), after, lim
+
+    def _clone(self, **kw):
+        args = dict(prefix=self.prefix, group=self.group, filters=self.filters, after=self.after, lim=self.lim)
+        args.update(kw)
+        return _Query(self.db, **args)
+
+    def where(self, field, op, value):
+        return self._clone(filters=self.filters + [(field, op, value)])
+
+    def order_by(self, field):
+        return self
+
+    def start_after(self, snap):
+        return self._clone(after=snap.reference.path)
+
+    def limit(self, n):
+        return self._clone(lim=n)
+
+    def document(self, doc_id):
+        return _Ref(self.db, f"{self.prefix}/{doc_id}")
+
+    def stream(self):
+        self.db.queries += 1
+        rows = []
+        for path, data in sorted(self.db.docs.items(), key=lambda kv: (kv[1].get("date", ""), kv[0])):
+            parts = path.split("/")
+            if self.prefix is not None and "/".join(parts[:-1]) != self.prefix:
+                continue
+            if self.group is not None and parts[-2] != self.group:
+                continue
+            if not all(f in data and _OPS[op](data[f], v) for f, op, v in self.filters):
+                continue
+            rows.append(_Snap(_Ref(self.db, path), data))
+        if self.after is not None:
+            idx = [r.reference.path for r in rows].index(self.after)
+            rows = rows[idx + 1:]
+        return rows[: self.lim] if self.lim else rows
+
+
+class FakeDb:
+    def __init__(self):
+        self.docs, self.queries = {}, 0
+
+    def collection(self, name):
+        return _Query(self, prefix=name)
+
+    def collection_group(self, name):
+        return _Query(self, group=name)
+
+
+SP = pytz.timezone("America/Sao_Paulo")
+NOW = SP.localize(datetime(2026, 3, 2, 10, 0)).timestamp()
+
+
+def _ev(db, uid, doc_id, hhmm, phone="5511999990000", status="agendado", date="2026-03-02"):
+    db.docs[f"profissionais/{uid}/agendamentos/{doc_id}"] = {
+        "date": date, "hhmm": hhmm, "status": status, "service_id": "corte", "cliente": {"whatsapp": phone},
+    }
+
+
+def _seed():
+    db = FakeDb()
+    _ev(db, "u1", "a", "12:00")              # vence agora (lead 120)
+    _ev(db, "u1", "b", "11:55")              # venceu há 5 min → tolerância
+    _ev(db, "u2", "c", "12:07")              # vence em 7 min → fora
+    _ev(db, "u2", "d", "12:00", status="cancelado")
+    _ev(db, "u2", "e", "11:30")              # venceu há 30 min → fora da tolerância
+    _ev(db, "u3", "f", "12:00", phone=None)
+    db.docs["outra/x/agendamentos/g"] = {"date": "2026-03-02", "hhmm": "12:00", "status": "agendado"}
+    return db
+
+
+def test_run_is_cross_tenant_windowed_and_idempotent():
+    db = _seed()
+    sent = []
+    out = rs.run_reminders(db, lambda to, body: (sent.append((to, body)) or (True, {})), now=NOW, page_size=2)
+    assert out["ok"] and out["sent"] == 2 and out["skippedNoPhone"] == 1
+    assert {i["uid"] for i in out["sentItems"]} == {"u1"}
+    assert "corte" in sent[0][1]
+
+    again = rs.run_reminders(db, lambda to, body: (sent.append(to) or (True, {})), now=NOW + 60)
+    assert again["sent"] == 0 and again["duplicates"] == 2
+    assert len(sent) == 2
+
+
+def test_failed_send_releases_ledger_for_retry():
+    db = _seed()
+    out = rs.run_reminders(db, lambda to, body: (False, {"error": "x"}), now=NOW)
+    assert out["errors"] == 2 and out["sent"] == 0
+    assert not [k for k in db.docs if k.startswith(rs.LEDGER_COLL)]
+    out = rs.run_reminders(db, lambda to, body: (True, {}), now=NOW + 60)
+    assert out["sent"] == 2
+
+
+def test_scoped_to_uid():
+    db = _seed()
+    out = rs.run_reminders(db, lambda to, body: (True, {}), uid="u2", now=NOW + 7 * 60)
+    assert out["sent"] == 1 and out["sentItems"][0]["hhmm"] == "12:07"
+
+
+def test_time_wheel_pops_in_due_order():
+    w = rs.TimeWheel(slot_sec=60, slots=8)
+    for due in (130, 10, 70, 10_000, 65):
+        w.add(due, due)
+    assert w.pop_due(0) == []
+    assert w.pop_due(70) == [10, 65, 70]
+    assert w.pop_due(200) == [130]
+    assert len(w) == 1 and w.next_due() == 10_000
+    assert w.pop_due(9_999) == []
+    assert w.pop_due(10_000) == [10_000]
@@ -0,0 +1,118 @@
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from domain import scheduling as sched
+
+_OPS = {
+    "==": lambda a, b: a == b,
+    "in": lambda a, b: a in b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+}
+
+
+class _Snap:
+    def __init__(self, doc_id, data):
+        self.id, self._data = doc_id, data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class _Col:
+    """Coleção fake com where encadeado (in/>=/<), limit e contagem de docs lidos."""
+
+    def __init__(self, docs, reads=None, filters=(), lim=None):
+        self.docs, self.filters, self.lim = docs, list(filters), lim
+        self.reads = reads if reads is not None else [0]
+
+    def where(self, field, op, value):
+        return _Col(self.docs, self.reads, self.filters + [(field, op, value)], self.lim)
+
+    def limit(self, n):
+        return _Col(self.docs, self.reads, self.filters, n)
+
+    def stream(self):
+        out = []
+        for doc_id, data in self.docs.items():
+            if all(f in data and _OPS[op](data[f], v) for f, op, v in self.filters):
+                out.append(_Snap(doc_id, data))
+                if self.lim and len(out) >= self.lim:
+                    break
+        self.reads[0] += len(out)
+        return out
+
+
+def _legacy_busy(docs, start, end):
+    busy = []
+    for data in docs.values():
+        iv = sched._parse_busy_doc(data)
+        if iv and not (iv[1] <= start or iv[0] >= end):
+            busy.append(iv)
+    busy.sort(key=lambda x: x[0])
+    merged = []
+    for iv in busy:
+        if not merged or iv[0] > merged[-1][1]:
+            merged.append(iv)
+        else:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], iv[1]))
+    return merged
+
+
+def _history(n, base):
+    docs = {}
+    for i in range(n):
+        ini = base - timedelta(days=1 + i // 8, hours=i % 8)
+        docs[f"h{i}"] = {"inicio": ini.isoformat(), "duracaoMin": 60, "estado": "confirmado"}
+    return docs
+
+
+def _setup(monkeypatch, docs):
+    col = _Col(docs)
+    monkeypatch.setattr(sched, "_db_ready", lambda: True)
+    monkeypatch.setattr(sched, "_get_col_ref", lambda path: col)
+    sched._BUSY_CACHE.clear()
+    return col
+
+
+def test_load_busy_range_query_matches_full_scan(monkeypatch):
+    base = datetime(2026, 3, 2, 9, 0, tzinfo=sched.SP_TZ)
+    docs = _history(10_000, base)
+    docs["a"] = {"inicio": (base + timedelta(hours=1)).isoformat(), "duracaoMin": 90, "estado": "confirmado"}
+    docs["b"] = {"inicio": (base + timedelta(hours=2)).isoformat(), "duracaoMin": 30, "estado": "solicitado"}
+    # UTC com Z: 15:00Z = 12:00 SP
+    docs["c"] = {"dataHora": "2026-03-03T15:00:00Z", "duracaoMin": 45, "estado": "solicitado"}
+    docs["d"] = {"inicio": (base + timedelta(hours=4)).isoformat(), "estado": "cancelado"}
+    # começa antes da janela e termina dentro dela
+    docs["e"] = {"inicio": (base - timedelta(hours=3)).isoformat(), "duracaoMin": 240, "estado": "confirmado"}
+    col = _setup(monkeypatch, docs)
+
+    start, end = base, base + timedelta(days=5)
+    got = sched._load_busy("u1", start, end)
+    assert got == _legacy_busy(docs, start, end)
+    assert len(got) == 2  # e+a+b se encostam e viram um intervalo; c é outro dia
+    # só a janela (com folga de 1 dia) é lida, não o histórico inteiro
+    assert col.reads[0] < 100
+
+
+def test_load_busy_cache_and_invalidation(monkeypatch):
+    base = datetime(2026, 3, 2, 9, 0, tzinfo=sched.SP_TZ)
+    docs = {"a": {"inicio": (base + timedelta(hours=1)).isoformat(), "duracaoMin": 60, "estado": "confirmado"}}
+    col = _setup(monkeypatch, docs)
+
+    start, end = base, base + timedelta(days=3)
+    first = sched._load_busy("u1", start, end)
+    reads = col.reads[0]
+    # earliest anda alguns minutos: mesma janela alinhada ao dia → cache
+    assert sched._load_busy("u1", start + timedelta(minutes=7), end) == first
+    assert col.reads[0] == reads
+
+    docs["b"] = {"inicio": (base + timedelta(hours=5)).isoformat(), "duracaoMin": 60, "estado": "confirmado"}
+    sched.invalidate_busy("u1")
+    assert len(sched._load_busy("u1", start, end)) == 2
+    assert col.reads[0] > reads
@@ -0,0 +1,82 @@
+import sys
+import struct
+import threading
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from services import speech_clients as sc  # noqa: E402
+
+
+class _Resp:
+    def __init__(self, text):
+        alt = types.SimpleNamespace(transcript=text, confidence=0.9)
+        self.results = [types.SimpleNamespace(alternatives=[alt])]
+
+
+class FakeSpeechClient:
+    created = []
+
+    def __init__(self, credentials=None):
+        self.credentials = credentials
+        self.calls = []
+        FakeSpeechClient.created.append(self)
+
+    def recognize(self, config, audio):
+        self.calls.append("recognize")
+        return _Resp("oi")
+
+    def long_running_recognize(self, config, audio):
+        self.calls.append("long_running")
+        return types.SimpleNamespace(result=lambda timeout=None: _Resp("oi longo"))
+
+
+def _fake_speech():
+    enc = types.SimpleNamespace(OGG_OPUS="OGG_OPUS", MP3="MP3", LINEAR16="LINEAR16")
+    return types.SimpleNamespace(
+        SpeechClient=FakeSpeechClient,
+        RecognitionConfig=type("RecognitionConfig", (), {"AudioEncoding": enc, "__init__": lambda self, **kw: None}),
+        RecognitionAudio=lambda content: content,
+    )
+
+
+def _ogg(seconds: float, size: int = 2000) -> bytes:
+    head = b"OggS" + bytes([0, 2]) + struct.pack("<qIII", 0, 1, 0, 0) + bytes([1, 19])
+    head += b"OpusHead" + bytes([1, 1]) + struct.pack("<HIhB", 312, 48000, 0, 0)
+    tail = b"OggS" + bytes([0, 4]) + struct.pack("<qIII", 312 + int(seconds * 48000), 1, 2, 0) + bytes([0])
+    return head + b"\0" * (size - len(head) - len(tail)) + tail
+
+
+def test_client_created_once_across_threads(monkeypatch):
+    sc.reset()
+    FakeSpeechClient.created.clear()
+    monkeypatch.setitem(sys.modules, "google.cloud.speech", _fake_speech())
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(sc.get_speech_client())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(FakeSpeechClient.created) == 1 and all(c is got[0] for c in got)
+    row = sc.stats()["speech/adc"]
+    assert row["created"] and row["cred"] == "adc" and row["uses"] == 8
+
+    sc.warm_up(background=False)  # tts indisponível: só registra a falha
+    st = sc.stats()
+    assert st["speech/adc"]["uses"] == 8 and st["tts/adc"]["failures"] == 1 and not st["tts/adc"]["created"]
+
+
+def test_stt_uses_shared_client_and_sync_recognize_for_short_ogg(monkeypatch):
+    sc.reset()
+    FakeSpeechClient.created.clear()
+    monkeypatch.setitem(sys.modules, "google.cloud.speech", _fake_speech())
+    from routes import voz_stt_bp as stt
+
+    assert stt.ogg_duration_sec(_ogg(12.5)) == 12.5
+    assert stt.perform_stt_logic(_ogg(12.5), "audio/ogg")[0]["transcript"] == "oi"
+    assert stt.perform_stt_logic(_ogg(90), "audio/ogg")[0]["transcript"] == "oi longo"
+    (client,) = FakeSpeechClient.created
+    assert client.calls == ["recognize", "long_running"]
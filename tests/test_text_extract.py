@@ -0,0 +1,112 @@
+import sys
+import time
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from services import text_extract as te  # noqa: E402
+
+
+class _FakePage:
+    def __init__(self, i, delay):
+        self.i, self.delay = i, delay
+
+    def extract_text(self):
+        time.sleep(self.delay)
+        return f"pagina {self.i} " + "x" * 50
+
+
+def _fake_pypdf(monkeypatch, n_pages, delay=0.0):
+    class PdfReader:
+        def __init__(self, buf):
+            self.pages = [_FakePage(i, delay) for i in range(n_pages)]
+
+    monkeypatch.setitem(sys.modules, "pypdf", types.SimpleNamespace(PdfReader=PdfReader))
+
+
+def test_text_streams_blocks_with_char_budget():
+    data = ("linha de texto com algumas palavras\n" * 400).encode("utf-8")
+    pages = list(te.iter_pages(data, "a.txt"))
+    assert len(pages) > 2 and all(len(p.text) <= te._BLOCK_CHARS + 100 for p in pages)
+    text, kind, rep = te.extract_with_report(data, "a.md", max_chars=5000)
+    assert kind == "text" and len(text) == 5000 and rep.truncated == "max_chars" and rep.chars == 5000
+    assert te.extract_text_from_bytes(b"oi", "x.bin") == ("", "unknown")
+
+
+def test_pdf_pages_budgets_and_timings(monkeypatch):
+    _fake_pypdf(monkeypatch, 20, delay=0.01)
+    rep = te.ExtractReport()
+    pages = list(te.iter_pages(b"%PDF", "doc.PDF", max_pages=5, report=rep))
+    assert [p.index for p in pages] == [0, 1, 2, 3, 4]
+    assert rep.as_dict()["pagesTotal"] == 20 and rep.truncated == "max_pages"
+    assert len(rep.page_ms) == 5 and min(rep.page_ms) >= 5
+    _, _, rep = te.extract_with_report(b"%PDF", "doc.pdf", time_budget_sec=0.05)
+    assert rep.truncated == "time_budget" and 2 <= rep.pages < 20
+
+
+def test_pdf_generator_stops_early_and_reader_errors_are_contained(monkeypatch):
+    _fake_pypdf(monkeypatch, 50)
+    gen = te.iter_pages(b"%PDF", "d.pdf")
+    assert next(gen).index == 0
+    gen.close()  # consumidor parou: nada mais é extraído
+
+    class Broken:
+        def __init__(self, buf):
+            raise ValueError("pdf corrompido")
+
+    monkeypatch.setitem(sys.modules, "pypdf", types.SimpleNamespace(PdfReader=Broken))
+    text, kind, rep = te.extract_with_report(b"x", "d.pdf")
+    assert (text, kind, rep.truncated) == ("", "pdf", "error")
+
+
+_PYPDF_ON_DISK = """
+import time
+
+
+class _Page:
+    def __init__(self, i, delay):
+        self.i, self.delay = i, delay
+
+    def extract_text(self):
+        time.sleep(self.delay)
+        return f"pagina {self.i} " + "x" * 50
+
+
+class PdfReader:
+    def __init__(self, buf):
+        n, delay = buf.read().decode().split()[1:]
+        self.pages = [_Page(i, float(delay)) for i in range(int(n))]
+"""
+
+
+def _pypdf_for_spawn(monkeypatch, tmp_path):
+    # processos "spawn" não herdam o monkeypatch de sys.modules: o fake precisa ser importável
+    (tmp_path / "pypdf.py").write_text(_PYPDF_ON_DISK)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "pypdf", raising=False)
+
+
+def test_pdf_process_pool_keeps_order(monkeypatch, tmp_path):
+    _pypdf_for_spawn(monkeypatch, tmp_path)
+    text, _, rep = te.extract_with_report(b"%PDF 30 0", "d.pdf", workers=2)
+    assert rep.pages == 30 and text.splitlines()[0].startswith("pagina 0 ")
+    assert [ln.split()[1] for ln in text.splitlines()] == [str(i) for i in range(30)]
+
+
+def test_pdf_pool_workers_terminated_when_budget_expires(monkeypatch, tmp_path):
+    _pypdf_for_spawn(monkeypatch, tmp_path)
+    seen = []
+    real = te._stop_pool
+
+    def spy(pool, kill):
+        procs = list(pool._processes.values())
+        real(pool, kill)
+        seen.append((kill, [p.is_alive() for p in procs]))
+
+    monkeypatch.setattr(te, "_stop_pool", spy)
+    _, _, rep = te.extract_with_report(b"%PDF 40 1.0", "d.pdf", workers=2, time_budget_sec=0.5)
+    assert rep.truncated == "time_budget" and rep.pages < 40
+    assert seen and seen[0][0] is True and not any(seen[0][1])
@@ -0,0 +1,192 @@
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from services import ttl_sweeper as sw
+
+
+class _Ref:
+    def __init__(self, db, path):
+        self.db, self.path = db, path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def get(self):
+        return _Snap(self, self.db.docs.get(self.path))
+
+    def set(self, body, merge=False):
+        self.db.docs[self.path] = dict(body)
+
+
+class _Snap:
+    def __init__(self, ref, data):
+        self.reference, self._data = ref, data
+        self.id = ref.id
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data or {})
+
+
+class _Query:
+    def __init__(self, db, coll=None, group=None):
+        self.db, self.coll, self.group = db, coll, group
+        self.filters, self.order, self.after, self.lim = [], [], None, None
+
+    def _clone(self, **kw):
+        q = _Query(self.db, self.coll, self.group)
+        q.filters, q.order, q.after, q.lim = list(self.filters), list(self.order), self.after, self.lim
+        for k, v in kw.items():
+            setattr(q, k, v)
+        return q
+
+    def where(self, field, op, value):
+        assert op == "<"
+        return self._clone(filters=self.filters + [(field, value)])
+
+    def order_by(self, field):
+        return self._clone(order=self.order + [field])
+
+    def start_after(self, values):
+        # cursor por valores, na ordem de order_by (prefixo permitido)
+        return self._clone(after=[values[f].path if f == "__name__" else values[f] for f in self.order if f in values])
+
+    def limit(self, n):
+        return self._clone(lim=n)
+
+    def document(self, doc_id):
+        return _Ref(self.db, f"{self.coll}/{doc_id}")
+
+    def _key(self, path, data):
+        return [path if f == "__name__" else data[f] for f in self.order]
+
+    def stream(self):
+        rows = []
+        for path, data in self.db.docs.items():
+            parts = path.split("/")
+            if self.coll is not None and "/".join(parts[:-1]) != self.coll:
+                continue
+            if self.group is not None and (len(parts) < 2 or parts[-2] != self.group):
+                continue
+            if any(f not in data or not (data[f] < v) for f, v in self.filters):
+                continue
+            if self.after is not None and not (self._key(path, data)[: len(self.after)] > self.after):
+                continue
+            rows.append(_Snap(_Ref(self.db, path), data))
+        rows.sort(key=lambda s: self._key(s.reference.path, s.to_dict()))
+        return rows[: self.lim] if self.lim else rows
+
+
+class _Batch:
+    def __init__(self, db):
+        self.db, self.ops = db, []
+
+    def delete(self, ref):
+        self.ops.append(ref.path)
+
+    def commit(self):
+        self.db.commits += 1
+        for p in self.ops:
+            self.db.docs.pop(p, None)
+
+
+class FakeDb:
+    def __init__(self):
+        self.docs, self.commits = {}, 0
+
+    def collection(self, path):
+        return _Query(self, coll=path)
+
+    def collection_group(self, name):
+        return _Query(self, group=name)
+
+    def document(self, path):
+        return _Ref(self, path)
+
+    def batch(self):
+        return _Batch(self)
+
+
+NOW = 1_700_000_000.0
+
+
+def _seed(db):
+    for i in range(25):
+        db.docs[f"platform_wa_dedupe/d{i}"] = {"expiresAt": NOW - 100 + i}
+    db.docs["platform_wa_dedupe/fresh"] = {"expiresAt": NOW + 3600}
+    db.docs["platform_tasks_dedup/old"] = {"expiresAt": NOW - 10}
+    db.docs["profissionais/u1/cache/k1"] = {"expAt": "2023-01-01T00:00:00Z"}
+    db.docs["profissionais/u1/cache/k2"] = {"expAt": "2099-01-01T00:00:00Z"}
+    db.docs["outra/x/cache/k3"] = {"expAt": "2023-01-01T00:00:00Z"}
+
+
+def test_sweep_deletes_only_expired_docs_and_reports():
+    db = FakeDb()
+    _seed(db)
+    out = sw.run_sweep(db, page_size=10, now=NOW)
+    assert out["complete"]
+    assert out["deleted"] == 27
+    assert out["targets"]["platform_wa_dedupe"]["deleted"] == 25
+    assert "platform_wa_dedupe/fresh" in db.docs
+    assert "profissionais/u1/cache/k1" not in db.docs
+    assert "profissionais/u1/cache/k2" in db.docs
+    assert "outra/x/cache/k3" in db.docs  # fora de profissionais/ → não apaga
+    assert db.commits >= 3
+
+
+def test_budget_exhaustion_persists_cursor_and_resumes():
+    db = FakeDb()
+    _seed(db)
+    out = sw.run_sweep(db, page_size=10, time_budget_sec=0, now=NOW)
+    assert not out["complete"]
+    assert out["deleted"] == 0
+    state = db.docs[f"{sw.STATE_COLL}/{sw.STATE_DOC}"]
+    assert state["target"] == "platform_tasks_dedup"
+    out2 = sw.run_sweep(db, page_size=10, now=NOW)
+    assert out2["complete"]
+    assert out2["deleted"] == 27
+
+
+def test_dry_run_deletes_nothing():
+    db = FakeDb()
+    _seed(db)
+    out = sw.run_sweep(db, page_size=10, dry_run=True, only=["platform_wa_dedupe"], now=NOW)
+    assert out["scanned"] == 25
+    assert out["deleted"] == 0
+    assert out["targets"]["platform_wa_dedupe"]["expired"] == 25
+    assert len([k for k in db.docs if k.startswith("platform_wa_dedupe/")]) == 26
+
+
+def test_legacy_dedupe_without_expires_at_swept_by_created_at():
+    db = FakeDb()
+    old = datetime.fromtimestamp(NOW - 30 * 86400, timezone.utc)
+    recent = datetime.fromtimestamp(NOW - 3600, timezone.utc)
+    db.docs["platform_tasks_dedup/legacy"] = {"createdAt": old}
+    db.docs["platform_tasks_dedup/recent"] = {"createdAt": recent}
+    db.docs["platform_tasks_dedup/new"] = {"createdAt": old, "expiresAt": NOW + 60}
+    db.docs["platform_wa_dedupe/legacy"] = {"createdAt": old}
+    out = sw.run_sweep(db, page_size=10, now=NOW)
+    assert out["complete"]
+    assert out["targets"]["platform_tasks_dedup_legacy"]["deleted"] == 1
+    assert out["targets"]["platform_wa_dedupe_legacy"]["deleted"] == 1
+    assert sorted(k for k in db.docs if "dedup" in k) == ["platform_tasks_dedup/new", "platform_tasks_dedup/recent"]
+
+
+def test_dry_run_cursor_does_not_skip_docs_sharing_boundary_value():
+    db = FakeDb()
+    for i in range(7):
+        db.docs[f"platform_wa_dedupe/d{i}"] = {"expiresAt": NOW - 100}  # todos com o mesmo valor
+    out = sw.run_sweep(db, page_size=3, dry_run=True, only=["platform_wa_dedupe"], now=NOW)
+    assert out["targets"]["platform_wa_dedupe"]["expired"] == 7
+
+    # retomada com cursor salvo no meio de um grupo de valores iguais
+    db.docs[f"{sw.STATE_COLL}/{sw.STATE_DOC}"] = {
+        "target": "platform_wa_dedupe",
+        "cursors": {"platform_wa_dedupe": {"value": NOW - 100, "path": "platform_wa_dedupe/d2"}},
+    }
+    out = sw.run_sweep(db, page_size=3, only=["platform_wa_dedupe"], now=NOW)
+    assert out["deleted"] == 4
+    assert sorted(k for k in db.docs if k.startswith("platform_wa_dedupe/")) == [f"platform_wa_dedupe/d{i}" for i in range(3)]
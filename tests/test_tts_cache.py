@@ -0,0 +1,124 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from services import tts_cache as tc  # noqa: E402
+
+
+class PreconditionFailed(Exception):
+    pass
+
+
+class _Blob:
+    def __init__(self, bucket, name):
+        self.bucket, self.name = bucket, name
+        stored = bucket.objects.get(name)
+        self.size = len(stored[0]) if stored else 0
+        self.content_type = stored[1] if stored else None
+
+    def upload_from_string(self, data, content_type=None, if_generation_match=None):
+        if if_generation_match == 0 and self.name in self.bucket.objects:
+            raise PreconditionFailed("412")
+        self.bucket.objects[self.name] = (data, content_type)
+        self.bucket.uploads += 1
+
+    def generate_signed_url(self, version=None, expiration=None, method=None):
+        self.bucket.signed += 1
+        return f"https://signed/{self.name}?n={self.bucket.signed}"
+
+
+class FakeBucket:
+    def __init__(self):
+        self.objects, self.uploads, self.signed = {}, 0, 0
+
+    def blob(self, name):
+        return _Blob(self, name)
+
+    def get_blob(self, name):
+        return _Blob(self, name) if name in self.objects else None
+
+
+def _setup(monkeypatch):
+    tc.clear()
+    bucket = FakeBucket()
+    monkeypatch.setattr(tc, "_bucket", lambda: bucket)
+    calls = {"synth": 0, "upload": 0}
+
+    def synth(cacheable=True):
+        def run():
+            calls["synth"] += 1
+            return (b"ID3" + b"x" * 997, "audio/mpeg", cacheable)
+        return run
+
+    def upload(b, ct):
+        calls["upload"] += 1
+        return "https://avulso"
+
+    return bucket, calls, synth, upload
+
+
+def _get(synth, upload, text="Oi, Ana! Já te respondo.", **kw):
+    args = dict(text=text, voice_id="v1", provider="google_standard:pt-BR:", mime="audio/mpeg",
+                mode="worker", synth=synth, upload=upload)
+    args.update(kw)
+    return tc.get_or_create_url(**args)
+
+
+def test_miss_stores_then_memory_and_gcs_hits_skip_synth(monkeypatch):
+    bucket, calls, synth, upload = _setup(monkeypatch)
+    url, info = _get(synth(), upload)
+    assert info["cache"] == "miss" and url.startswith("https://signed/tts_cache/worker/")
+    assert info["object"].endswith(".mp3") and bucket.uploads == 1 and calls["synth"] == 1
+
+    url2, info2 = _get(synth(), upload, text="  Oi,  Ana!   Já te respondo. ")
+    assert info2["cache"] == "hit" and url2 == url  # texto normalizado; URL assinada reaproveitada
+    assert calls["synth"] == 1 and bucket.signed == 1
+
+    tc._INDEX.clear()
+    tc._URLS.clear()  # outra instância / restart: o bucket é o índice
+    _, info3 = _get(synth(), upload)
+    assert info3["cache"] == "hit" and calls["synth"] == 1 and bucket.uploads == 1
+
+    _, other = _get(synth(), upload, voice_id="v2")
+    assert other["cache"] == "miss" and bucket.uploads == 2
+    st = tc.stats()
+    assert st["hits_mem"] == 1 and st["hits_gcs"] == 1 and st["misses"] == 2
+    assert st["hit_ratio"] == 0.5 and st["bytes_saved"] == 2000 and st["bytes_stored"] == 2000
+
+
+def test_degraded_audio_is_uploaded_standalone_and_races_reuse_object(monkeypatch):
+    bucket, calls, synth, upload = _setup(monkeypatch)
+    url, info = _get(synth(cacheable=False), upload)
+    assert url == "https://avulso" and info["cache"] == "skip" and not bucket.objects
+    assert tc.stats()["not_cacheable"] == 1
+
+    obj = tc.object_path(tc.cache_key("Oi", "v1", "p", "audio/mpeg", "worker"), "worker", "audio/mpeg")
+    bucket.objects[obj] = (b"y" * 500, "audio/mpeg")
+    monkeypatch.setattr(bucket, "get_blob", lambda name: None)  # corrida: outra instância grava antes
+    url, info = _get(synth(), upload, text="Oi", provider="p")
+    assert info["object"] == obj and url.startswith("https://signed/") and bucket.uploads == 0
+
+    _, empty = _get(lambda: None, upload, text="vazio")
+    assert empty["reason"] == "empty_audio" and calls["upload"] == 1
+
+
+def test_long_or_opted_out_text_bypasses_cache_and_misses_are_remembered(monkeypatch):
+    bucket, calls, synth, upload = _setup(monkeypatch)
+    lookups = []
+    real_get_blob = bucket.get_blob
+    monkeypatch.setattr(bucket, "get_blob", lambda name: lookups.append(name) or real_get_blob(name))
+
+    url, info = _get(synth(), upload, text="resposta " * 40)
+    assert url == "https://avulso" and info["cache"] == "bypass" and not lookups and not bucket.objects
+    _, info = _get(synth(), upload, cache=False)
+    assert info["cache"] == "bypass" and not lookups and calls["upload"] == 2
+
+    # synth não-cacheável: miss lembrado, a próxima consulta não vai ao GCS
+    _get(synth(cacheable=False), upload, text="Já volto")
+    _, info = _get(synth(cacheable=False), upload, text="Já volto")
+    assert info["cache"] == "skip" and len(lookups) == 1
+    st = tc.stats()
+    assert st["bypass"] == 2 and st["misses_mem"] == 1
@@ -0,0 +1,106 @@
+import sys
+import struct
+import threading
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import pytest  # noqa: E402
+
+from services import audio_concat as ac  # noqa: E402
+from services import tts_sentences as ts  # noqa: E402
+from services import tts_fallback as tf  # noqa: E402
+
+# frame MPEG1 Layer III, 128 kbps, 44.1 kHz, sem padding → 417 bytes
+_HDR = b"\xff\xfb\x90\x00"
+
+
+def _frame(fill: bytes) -> bytes:
+    return _HDR + fill * (417 - 4)
+
+
+def _mp3(fill: bytes, frames: int = 2) -> bytes:
+    xing = _HDR + b"\x00" * 32 + b"Xing" + b"\x00" * (417 - 40)
+    return b"ID3\x03\x00\x00\x00\x00\x00\x05" + b"t" * 5 + xing + _frame(fill) * frames + b"TAG" + b"\x00" * 125
+
+
+def _opus(serial: int, packets, preskip: int = 312) -> bytes:
+    head = b"OpusHead" + bytes([1, 1]) + struct.pack("<HIhB", preskip, 48000, 0, 0)
+    pages = [ac.build_page(0x02, 0, serial, 0, bytes([len(head)]), head),
+             ac.build_page(0, 0, serial, 1, bytes([12]), b"OpusTags\x00\x00\x00\x00")]
+    granule = preskip
+    for i, pkt in enumerate(packets):
+        granule += 960
+        last = i == len(packets) - 1
+        pages.append(ac.build_page(0x04 if last else 0, granule, serial, i + 2, bytes([len(pkt)]), pkt))
+    return b"".join(pages)
+
+
+def test_split_merges_short_fragments():
+    text = "Oi! Tudo bem? O plano custa R$ 89 por mês e inclui agenda.\nQuer que eu te mande o link agora?"
+    assert ts.split_sentences(text, min_chars=16) == [
+        "Oi! Tudo bem? O plano custa R$ 89 por mês e inclui agenda.",
+        "Quer que eu te mande o link agora?",
+    ]
+    assert ts.split_sentences("Só uma frase.") == ["Só uma frase."]
+
+
+def test_mp3_and_ogg_concat_without_reencode():
+    out = ac.concat([_mp3(b"a"), _mp3(b"b", frames=1)])
+    assert out == _frame(b"a") * 2 + _frame(b"b")  # sem ID3, TAG nem frame Xing
+
+    merged = ac.concat([_opus(11, [b"p1", b"p2"]), _opus(22, [b"p3"])])
+    pages = ac._ogg_pages(merged)
+    assert [p[4] for p in pages[2:]] == [b"p1", b"p2", b"p3"]
+    assert {p[2] for p in pages} == {11}
+    assert [p[1] for p in pages[2:]] == [1272, 2232, 2232 + 960]  # pre-skip do 2º não conta
+    assert [p[0] for p in pages] == [0x02, 0, 0, 0, 0x04]
+    pos = 0
+    for seq, p in enumerate(pages):  # CRC e sequência reescritos
+        size = 27 + len(p[3]) + len(p[4])
+        raw = merged[pos:pos + size]
+        assert struct.unpack_from("<I", raw, 18)[0] == seq
+        assert struct.unpack_from("<I", raw, 22)[0] == ac._ogg_crc(raw[:22] + b"\0" * 4 + raw[26:])
+        pos += size
+    with pytest.raises(ValueError):
+        ac.concat([_mp3(b"a"), _opus(1, [b"x"])])
+
+
+def test_ogg_concat_discounts_preskip_of_later_segments():
+    merged = ac.concat([_opus(1, [b"a"], preskip=0), _opus(2, [b"b", b"c"], preskip=3840), _opus(3, [b"d"])])
+    pages = ac._ogg_pages(merged)
+    assert struct.unpack_from("<H", pages[0][4], 10)[0] == 0  # OpusHead do primeiro segmento
+    # granule final = pre-skip do 1º + amostras de áudio de todos os segmentos
+    assert [p[1] for p in pages[2:]] == [960, 1920, 2880, 3840]
+
+
+def test_institutional_synthesizes_only_new_sentences_concurrently(monkeypatch):
+    ts.clear()
+    monkeypatch.setenv("TTS_SENTENCE_CACHE", "1")
+    monkeypatch.setenv("TTS_SENTENCE_MIN_CHARS", "5")
+    monkeypatch.delenv("INSTITUTIONAL_GOOGLE_TTS_MODE", raising=False)
+    calls, threads = [], set()
+
+    def google(*, text, lang="pt-BR"):
+        calls.append(text)
+        threads.add(threading.current_thread().name)
+        return _mp3(text[:1].encode(), frames=1)
+
+    monkeypatch.setattr(tf, "_tts_google", google)
+    tel = {}
+    a = tf.tts_institutional_bytes(text="Agenda pelo WhatsApp. Lembretes automáticos. Custa R$ 89.", telemetry=tel)
+    assert a == _frame(b"A") + _frame(b"L") + _frame(b"C")
+    assert tel["sentenceCache"] == {"sentences": 3, "hits": 0, "synth": 3} and tel["ok"]
+    assert all(n.startswith("tts-sent") for n in threads)
+
+    calls.clear()
+    b = tf.tts_institutional_bytes(text="Oi, Maria. Agenda pelo WhatsApp. Custa R$ 89.", telemetry=tel)
+    assert calls == ["Oi, Maria."] and b.endswith(_frame(b"A") + _frame(b"C"))
+    assert ts.stats()["hits"] == 2
+
+    # uma frase falhou: nada novo no cache, texto inteiro pelo caminho normal
+    monkeypatch.setattr(tf, "_tts_google", lambda *, text, lang="pt-BR": b"" if text == "Nova frase aqui." else _mp3(b"z"))
+    out = tf.tts_institutional_bytes(text="Nova frase aqui. Outra frase nova.", telemetry=tel)
+    assert out == _mp3(b"z") and tel["sentenceCache"]["reason"] == "sentence_synth_failed"
@@ -0,0 +1,71 @@
+import sys
+import threading
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import pytest  # noqa: E402
+from flask import Flask  # noqa: E402
+
+from services import voz_tts_service as svc  # noqa: E402
+from services import institutional_tts_media as itm  # noqa: E402
+from routes.voz_tts import voz_tts_bp  # noqa: E402
+
+
+def _client():
+    app = Flask(__name__)
+    app.register_blueprint(voz_tts_bp, url_prefix="/api/voz")
+    return app.test_client()
+
+
+def test_route_is_thin_wrapper_with_same_codes(monkeypatch):
+    seen = []
+    monkeypatch.setattr(svc, "_tts_bytes", lambda text, voice_id: seen.append((text, voice_id)) or b"ID3audio")
+    monkeypatch.setenv("ELEVEN_VOICE_ID", "env-voice")
+    monkeypatch.setenv("VOZ_TTS_MAX_CHARS", "10")
+    c = _client()
+
+    r = c.post("/api/voz/tts", json={"text": " oi "})
+    assert r.status_code == 200 and r.data == b"ID3audio"
+    assert r.headers["Content-Type"] == "audio/mpeg" and r.headers["X-Voice-Id"] == "env-voice"
+    assert seen == [("oi", "env-voice")]
+    assert c.post("/api/voz/tts?voice_id=q", data={"text": "oi"}).headers["X-Voice-Id"] == "q"
+
+    assert c.post("/api/voz/tts", json={"text": ""}).get_json() == {"ok": False, "error": "missing_text"}
+    r = c.post("/api/voz/tts", json={"text": "x" * 11})
+    assert r.status_code == 413 and r.get_json()["limit"] == 10
+    monkeypatch.setattr(svc, "_tts_bytes", lambda text, voice_id: b"")
+    assert c.post("/api/voz/tts", json={"text": "oi"}).status_code == 502
+    monkeypatch.setenv("VOZ_V2_ENABLED", "0")
+    assert c.post("/api/voz/tts", json={"text": "oi"}).status_code == 403
+
+
+def test_limiter_rejects_when_slots_busy_and_institutional_calls_in_process(monkeypatch):
+    gate, started = threading.Event(), threading.Event()
+
+    def slow(text, voice_id):
+        started.set()
+        gate.wait(5)
+        return b"audio"
+
+    monkeypatch.setattr(svc, "_SLOTS", threading.BoundedSemaphore(1))
+    monkeypatch.setattr(svc, "_tts_bytes", slow)
+    monkeypatch.setenv("VOZ_TTS_QUEUE_TIMEOUT_SEC", "0.05")
+    t = threading.Thread(target=svc.synthesize, args=("primeira",))
+    t.start()
+    started.wait(5)
+    try:
+        with pytest.raises(svc.TTSError) as exc:
+            svc.synthesize("segunda")
+        assert exc.value.error == "tts_busy" and exc.value.status == 503
+    finally:
+        gate.set()
+        t.join(5)
+    assert svc.stats()["in_flight"] == 0
+
+    monkeypatch.setattr(svc, "_tts_bytes", lambda text, voice_id: f"{voice_id}:{text}".encode())
+    assert itm._call_internal_tts("oi", "v1", "audio/mpeg") == (b"v1:oi", "audio/mpeg")
+    monkeypatch.setenv("VOZ_TTS_MAX_CHARS", "1")
+    assert itm._call_internal_tts("oi", "v1", "audio/mpeg") is None
@@ -0,0 +1,92 @@
+# tools/bench_audio_transcode.py
+# Benchmark de transcodificação OGG/Opus → WAV 16 kHz mono (notas de voz típicas do WhatsApp).
+#
+# Gera clipes Ogg Opus de 5/10/20/30 s (voz sintética: senoides moduladas + ruído) com o ffmpeg
+# e mede, por clipe:
+#   - spawn:  um Popen("ffmpeg -i pipe:0 ... pipe:1") por clipe (caminho antigo do worker)
+#   - pool:   services.audio_transcode.FfmpegPool (processos já iniciados, repostos em background)
+#   - pyav:   decodificação em processo (só se PyAV estiver instalado)
+# Saída: mediana e p90 em ms por duração e backend.
+#
+# Uso: python tools/bench_audio_transcode.py [--runs 20] [--secs 5,10,20,30] [--pool 2]
+# Requer ffmpeg no PATH (o Dockerfile já instala) para gerar os clipes.
+
+from __future__ import annotations
+
+import argparse
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from services import audio_transcode as at  # noqa: E402
+
+
+def make_clip(ffmpeg: str, seconds: int) -> bytes:
+    src = (f"aevalsrc=0.3*sin(2*PI*(180+40*sin(2*PI*3*t))*t)*(0.6+0.4*sin(2*PI*2*t))"
+           f"+0.02*(random(0)-0.5):s=48000:d={seconds}")
+    cmd = [ffmpeg, "-hide_banner", "-loglevel", "error", "-f", "lavfi", "-i", src,
+           "-ac", "1", "-c:a", "libopus", "-b:a", "24k", "-application", "voip", "-f", "ogg", "pipe:1"]
+    return subprocess.run(cmd, check=True, capture_output=True).stdout
+
+
+def spawn_decode(ffmpeg: str, data: bytes) -> bytes:
+    p = subprocess.Popen([ffmpeg, *at._FFMPEG_ARGS], stdin=subprocess.PIPE,
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, _ = p.communicate(data)
+    return out
+
+
+def timed(fn, data: bytes, runs: int, pause: float = 0.0):
+    ms = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        out = fn(data)
+        ms.append((time.perf_counter() - t0) * 1000)
+        assert out, "decodificação vazia"
+        if pause:
+            time.sleep(pause)  # intervalo entre mensagens: deixa o pool repor
+    ms.sort()
+    return statistics.median(ms), ms[int(0.9 * (len(ms) - 1))]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=20)
+    ap.add_argument("--secs", default="5,10,20,30")
+    ap.add_argument("--pool", type=int, default=2)
+    ap.add_argument("--pause", type=float, default=0.05, help="segundos entre clipes (pool)")
+    args = ap.parse_args()
+
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        print("ffmpeg não encontrado no PATH: nada a medir")
+        return
+    pool = at.FfmpegPool(args.pool, ffmpeg)
+    pool.warm()
+    time.sleep(0.5)
+
+    backends = {"spawn": lambda d: spawn_decode(ffmpeg, d), "pool": pool.decode}
+    if at.av is not None:
+        backends["pyav"] = at._pyav_decode
+
+    print(f"{'clipe':>6} {'bytes':>8} " + " ".join(f"{name + ' p50/p90 ms':>22}" for name in backends))
+    for secs in [int(s) for s in args.secs.split(",") if s.strip()]:
+        clip = make_clip(ffmpeg, secs)
+        cols = []
+        for name, fn in backends.items():
+            p50, p90 = timed(fn, clip, args.runs, args.pause if name == "pool" else 0.0)
+            cols.append(f"{p50:>10.1f} / {p90:>8.1f}")
+        print(f"{secs:>5}s {len(clip):>8} " + " ".join(f"{c:>22}" for c in cols))
+    print(f"pool: spawned={pool.spawned} cold={pool.cold}")
+    pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# tools/bench_scheduling_busy.py
+# Benchmark de domain.scheduling._load_busy com 10k agendamentos históricos (coleção fake).
+#
+# Compara:
+#   - legado: varredura limit(1000) + filtro no Python (e perde conflitos além dos 1000 docs)
+#   - atual:  range query na janela + cache por uid (frio e quente)
+#
+# A métrica que importa é reads/call (docs cobrados pelo Firestore); o tempo da
+# coleção fake inclui a filtragem que no Firestore roda no servidor.
+#
+# Uso: python tools/bench_scheduling_busy.py [--history 10000] [--rounds 50]
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from domain import scheduling as sched  # noqa: E402
+
+_OPS = {
+    "in": lambda a, b: a in b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+}
+
+
+class _Snap:
+    def __init__(self, doc_id, data):
+        self.id, self._data = doc_id, data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class _Col:
+    # simula o servidor: filtros rodam "do lado do Firestore"; reads = docs devolvidos
+    def __init__(self, docs, reads, filters=(), lim=None):
+        self.docs, self.reads, self.filters, self.lim = docs, reads, list(filters), lim
+
+    def where(self, field, op, value):
+        return _Col(self.docs, self.reads, self.filters + [(field, op, value)], self.lim)
+
+    def limit(self, n):
+        return _Col(self.docs, self.reads, self.filters, n)
+
+    def stream(self):
+        out = []
+        for doc_id, data in self.docs:
+            if all(f in data and _OPS[op](data[f], v) for f, op, v in self.filters):
+                out.append(_Snap(doc_id, data))
+                if self.lim and len(out) >= self.lim:
+                    break
+        self.reads[0] += len(out)
+        return out
+
+
+def _docs(history: int, base: datetime):
+    docs = []
+    for i in range(history):
+        ini = base - timedelta(days=1 + i // 8, hours=i % 8)
+        estado = "confirmado" if i % 5 else "cancelado"
+        docs.append((f"h{i}", {"inicio": ini.isoformat(), "duracaoMin": 60, "estado": estado}))
+    for i in range(40):
+        ini = base + timedelta(days=i // 4, hours=i % 4 * 2)
+        docs.append((f"w{i}", {"inicio": ini.isoformat(), "duracaoMin": 60, "estado": "confirmado"}))
+    return docs
+
+
+def _legacy(col, start, end):
+    busy = []
+    for d in col.limit(1000).stream():
+        iv = sched._parse_busy_doc(d.to_dict())
+        if iv and not (iv[1] <= start or iv[0] >= end):
+            busy.append(iv)
+    return sorted(busy)
+
+
+def _timeit(fn, rounds):
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        out = fn()
+    return (time.perf_counter() - t0) * 1000.0 / rounds, out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--history", type=int, default=10_000)
+    ap.add_argument("--rounds", type=int, default=50)
+    args = ap.parse_args()
+
+    base = datetime(2026, 3, 2, 9, 0, tzinfo=sched.SP_TZ)
+    start, end = base, base + timedelta(days=10)
+    reads = [0]
+    col = _Col(_docs(args.history, base), reads)
+    sched._db_ready = lambda: True  # type: ignore[assignment]
+    sched._get_col_ref = lambda path: col  # type: ignore[assignment]
+
+    reads[0] = 0
+    ms, legacy = _timeit(lambda: _legacy(col, start, end), args.rounds)
+    print(f"legado      {ms:8.2f} ms/call  reads/call={reads[0] // args.rounds:6d}  busy={len(legacy)}")
+
+    def cold():
+        sched.invalidate_busy("bench")
+        return sched._load_busy("bench", start, end)
+
+    reads[0] = 0
+    ms, out = _timeit(cold, args.rounds)
+    print(f"range frio  {ms:8.2f} ms/call  reads/call={reads[0] // args.rounds:6d}  busy={len(out)}")
+
+    reads[0] = 0
+    ms, out = _timeit(lambda: sched._load_busy("bench", start, end), args.rounds)
+    print(f"range quente{ms:8.2f} ms/call  reads/call={reads[0] // args.rounds:6d}  busy={len(out)}")
+    print("cache:", sched.busy_cache_stats())
+
+
+if __name__ == "__main__":
+    main()